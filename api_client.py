@@ -0,0 +1,687 @@
+"""
+Client de l'API de prédiction et course couverte (hedging) avec le classifieur local
+
+L'API peut être servie par plusieurs points d'accès : chaque appel est routé
+vers celui dont la latence moyenne (EWMA) et le taux d'erreur sont les plus
+faibles, et une copie peut être envoyée au deuxième meilleur si la réponse
+tarde au-delà d'un percentile des latences observées. Les points d'accès dont
+le disjoncteur est ouvert (voir api_health.py) sont ignorés.
+
+Aucune fonction de ce module n'appelle Streamlit : les erreurs sont renvoyées
+dans le résultat ({'success': False, 'error': ...}) et affichées par la page.
+"""
+
+import io
+import os
+import time
+import threading
+import collections
+import concurrent.futures
+
+import numpy as np
+import requests
+from PIL import Image
+
+from api_health import CircuitBreaker, CircuitOpenError, HealthProber, HEALTH_INTERVAL, RESET_TIMEOUT
+from image_ingest import load_image
+from worker_pool import BULK, PoolSaturated, current_worker_pool
+
+# Points d'accès par défaut (les deux instances AWS historiques)
+DEFAULT_API_ENDPOINTS = ("http://16.171.235.240", "http://13.60.70.230")
+
+# Délai d'attente de l'API distante (secondes)
+API_TIMEOUT = 30
+
+# Délai avant de se rabattre sur le classifieur local (secondes)
+DEFAULT_HEDGE_DELAY = 3.0
+
+# Percentile des latences du point d'accès principal au-delà duquel une copie est envoyée au suivant
+DEFAULT_HEDGE_PERCENTILE = 95
+
+# Délai de copie tant que les mesures sont insuffisantes, et bornes du délai (secondes)
+DEFAULT_ENDPOINT_HEDGE_DELAY = 2.0
+MIN_ENDPOINT_HEDGE_DELAY = 0.05
+MIN_LATENCY_SAMPLES = 5
+
+# Tentatives maximales par requête (point d'accès principal + copie ou bascule)
+MAX_ATTEMPTS = 2
+
+# Poids de la dernière mesure dans les moyennes exponentielles
+EWMA_ALPHA = 0.2
+
+# Pénalité de score par point de taux d'erreur (un point d'accès à 50 % d'erreurs "coûte" 6 fois sa latence)
+ERROR_PENALTY = 10.0
+
+# Stratégies d'agrégation des scores de plusieurs images d'un même produit
+AGGREGATION_STRATEGIES = {
+    'mean': "Moyenne",
+    'max': "Maximum",
+    'confidence': "Moyenne pondérée par la confiance",
+}
+DEFAULT_AGGREGATION = 'mean'
+
+# Nombre maximal de paires (image, description) par requête /predict_batch
+DEFAULT_BATCH_SIZE = 32
+
+# Appels unitaires simultanés quand l'API ne sait pas traiter de lot
+BATCH_FALLBACK_WORKERS = 8
+
+# Appels distants en cours, partagés par toutes les sessions du processus
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="prediction-api")
+
+# Requêtes vers les points d'accès (distinct de _executor pour éviter tout interblocage)
+_endpoint_executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="api-endpoint")
+
+# Appels unitaires de repli des lots (distinct de _endpoint_executor, qu'ils utilisent)
+_batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_FALLBACK_WORKERS,
+                                                        thread_name_prefix="prediction-batch")
+
+
+def parse_endpoints(api_config=None, environ=None):
+    """
+    Liste des points d'accès de l'API
+
+    Ordre de priorité : ``base_urls`` (liste) puis ``base_url`` dans la section
+    [api] des secrets, puis les variables API_BASE_URLS (séparées par des
+    virgules) et API_BASE_URL, puis DEFAULT_API_ENDPOINTS.
+
+    Args:
+        api_config: Section [api] des secrets (dict ou None)
+        environ: Variables d'environnement (os.environ par défaut)
+
+    Returns:
+        tuple[str]: URL sans barre oblique finale, sans doublon
+    """
+    api_config = api_config or {}
+    environ = os.environ if environ is None else environ
+    if api_config.get('base_urls'):
+        urls = list(api_config['base_urls'])
+    elif api_config.get('base_url'):
+        urls = [api_config['base_url']]
+    elif environ.get('API_BASE_URLS'):
+        urls = environ['API_BASE_URLS'].split(',')
+    elif environ.get('API_BASE_URL'):
+        urls = [environ['API_BASE_URL']]
+    else:
+        urls = list(DEFAULT_API_ENDPOINTS)
+    return tuple(dict.fromkeys(url.strip().rstrip('/') for url in urls if url.strip()))
+
+
+class EndpointStats:
+    """Latence moyenne (EWMA), taux d'erreur (EWMA) et dernières latences d'un point d'accès"""
+
+    def __init__(self, history=200):
+        self.ewma_latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=history)
+        # Route /predict_batch absente : pas de lot envoyé avant cette date (time.monotonic)
+        self.batch_unsupported_until = 0.0
+
+    def record(self, latency, ok):
+        """Ajoute le résultat d'une requête"""
+        self.requests += 1
+        if ok:
+            self.latencies.append(latency)
+            self.ewma_latency = latency if self.ewma_latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency)
+        else:
+            self.errors += 1
+        self.error_rate = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * self.error_rate
+
+    def score(self):
+        """Coût estimé d'une requête (plus petit = meilleur ; 0 = jamais interrogé, à explorer)"""
+        if self.ewma_latency is None:
+            # Aucune réponse réussie : latence supposée égale au délai de copie par défaut
+            return 0.0 if self.errors == 0 else DEFAULT_ENDPOINT_HEDGE_DELAY * (1 + ERROR_PENALTY * self.error_rate)
+        return self.ewma_latency * (1 + ERROR_PENALTY * self.error_rate)
+
+
+class EndpointRouter:
+    """Choix du point d'accès et délai de copie (hedging), partagés par les sessions du processus"""
+
+    def __init__(self, endpoints, hedge_percentile=DEFAULT_HEDGE_PERCENTILE, reset_timeout=RESET_TIMEOUT):
+        self.endpoints = tuple(endpoints)
+        self.hedge_percentile = hedge_percentile
+        self.reset_timeout = reset_timeout
+        self._stats = {endpoint: EndpointStats() for endpoint in self.endpoints}
+        self._breakers = {endpoint: CircuitBreaker(reset_timeout=reset_timeout) for endpoint in self.endpoints}
+        self._lock = threading.Lock()
+
+    def ranked(self):
+        """Points d'accès du meilleur au moins bon (ordre de configuration en cas d'égalité)"""
+        with self._lock:
+            return sorted(self.endpoints, key=lambda endpoint: self._stats[endpoint].score())
+
+    def is_available(self, endpoint):
+        """Le disjoncteur du point d'accès laisserait-il passer une requête ?"""
+        return self._breakers[endpoint].is_available()
+
+    def any_available(self):
+        """Au moins un point d'accès peut-il recevoir une requête ?"""
+        return any(breaker.is_available() for breaker in self._breakers.values())
+
+    def allow_request(self, endpoint):
+        """Réserve le passage d'une requête par le disjoncteur du point d'accès"""
+        return self._breakers[endpoint].allow_request()
+
+    def record(self, endpoint, latency, ok):
+        """Enregistre le résultat d'une requête vers un point d'accès"""
+        with self._lock:
+            self._stats[endpoint].record(latency, ok)
+        if ok:
+            self._breakers[endpoint].record_success()
+        else:
+            self._breakers[endpoint].record_failure()
+
+    def record_health(self, endpoint, ok):
+        """Enregistre le résultat d'une sonde de santé (disjoncteur uniquement)"""
+        if ok:
+            self._breakers[endpoint].record_success(trial=False)
+        else:
+            self._breakers[endpoint].record_failure()
+
+    def mark_batch_unsupported(self, endpoint):
+        """Le point d'accès ne gère pas /predict_batch : plus de lot avant reset_timeout (déploiement en cours)"""
+        with self._lock:
+            self._stats[endpoint].batch_unsupported_until = time.monotonic() + self.reset_timeout
+
+    def batch_endpoints(self):
+        """Points d'accès auxquels envoyer des lots (route /predict_batch présente ou à re-sonder)"""
+        now = time.monotonic()
+        with self._lock:
+            return [endpoint for endpoint, stats in self._stats.items() if stats.batch_unsupported_until <= now]
+
+    def hedge_delay(self, endpoint):
+        """Délai avant d'envoyer une copie de la requête : percentile des latences du point d'accès"""
+        with self._lock:
+            latencies = list(self._stats[endpoint].latencies)
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_ENDPOINT_HEDGE_DELAY
+        return max(MIN_ENDPOINT_HEDGE_DELAY, float(np.percentile(latencies, self.hedge_percentile)))
+
+    def snapshot(self):
+        """État de chaque point d'accès (pour l'affichage)"""
+        with self._lock:
+            return [{
+                'endpoint': endpoint,
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'ewma_latency': stats.ewma_latency,
+                'error_rate': stats.error_rate,
+                'p95_latency': float(np.percentile(stats.latencies, 95)) if stats.latencies else None,
+                **self._breakers[endpoint].snapshot(),
+            } for endpoint, stats in self._stats.items()]
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(endpoints, hedge_percentile=DEFAULT_HEDGE_PERCENTILE):
+    """Routeur unique par liste de points d'accès (les statistiques sont partagées par tout le processus)"""
+    key = (tuple(endpoints), hedge_percentile)
+    with _routers_lock:
+        if key not in _routers:
+            _routers[key] = EndpointRouter(endpoints, hedge_percentile)
+        return _routers[key]
+
+
+_probers = {}
+
+
+def ensure_health_prober(router, interval=HEALTH_INTERVAL):
+    """Sonde de santé unique par routeur, démarrée au premier appel"""
+    with _routers_lock:
+        if id(router) not in _probers:
+            _probers[id(router)] = HealthProber(router, interval)
+        return _probers[id(router)].start()
+
+
+def is_client_error(error):
+    """
+    Erreur HTTP 4xx : la requête est refusée, mais le point d'accès a répondu
+
+    Une image trop lourde (413) ou invalide (422) serait refusée de même par les
+    autres points d'accès : elle ne compte pas comme une panne et n'est ni
+    renvoyée ailleurs, ni copiée.
+    """
+    response = getattr(error, 'response', None)
+    return (isinstance(error, requests.HTTPError) and response is not None
+            and 400 <= response.status_code < 500)
+
+
+def routed_request(router, send, hedge=True, endpoints=None):
+    """
+    Envoie une requête au meilleur point d'accès, avec copie éventuelle vers le suivant
+
+    Args:
+        router: EndpointRouter
+        send: Fonction send(endpoint) qui renvoie la réponse ou lève une exception
+        hedge: Envoyer une copie au deuxième point d'accès si la réponse tarde
+            (en cas d'échec, il est essayé dans tous les cas)
+        endpoints: Points d'accès autorisés (None = tous)
+
+    Returns:
+        tuple: (réponse, point d'accès qui a répondu)
+
+    Raises:
+        CircuitOpenError: Immédiatement, si tous les disjoncteurs sont ouverts
+        requests.HTTPError: Aussitôt, pour une réponse 4xx (voir is_client_error)
+        Exception: La dernière erreur si aucun point d'accès n'a répondu
+    """
+    candidates = [endpoint for endpoint in router.ranked()
+                  if router.is_available(endpoint) and (endpoints is None or endpoint in endpoints)]
+    attempts = 0
+
+    def next_endpoint():
+        nonlocal attempts
+        while candidates and attempts < MAX_ATTEMPTS:
+            endpoint = candidates.pop(0)
+            if router.allow_request(endpoint):
+                attempts += 1
+                return endpoint
+        return None
+
+    def timed_send(endpoint):
+        start = time.perf_counter()
+        try:
+            response = send(endpoint)
+        except Exception as e:
+            # Seules les erreurs de connexion, délais dépassés et 5xx comptent comme des pannes
+            router.record(endpoint, time.perf_counter() - start, ok=is_client_error(e))
+            raise
+        router.record(endpoint, time.perf_counter() - start, ok=True)
+        return response
+
+    primary = next_endpoint()
+    if primary is None:
+        raise CircuitOpenError("API indisponible : disjoncteur ouvert sur tous les points d'accès")
+    futures = {_endpoint_executor.submit(timed_send, primary): primary}
+    delay = router.hedge_delay(primary)
+    last_error = None
+    while futures:
+        can_hedge = hedge and candidates and attempts < MAX_ATTEMPTS
+        done, _ = concurrent.futures.wait(futures, timeout=delay if can_hedge else None,
+                                          return_when=concurrent.futures.FIRST_COMPLETED)
+        if not done:
+            # Réponse en retard : copie vers le point d'accès suivant
+            endpoint = next_endpoint()
+            if endpoint is not None:
+                futures[_endpoint_executor.submit(timed_send, endpoint)] = endpoint
+            else:
+                hedge = False
+            continue
+        for future in done:
+            endpoint = futures.pop(future)
+            try:
+                return future.result(), endpoint
+            except Exception as e:
+                if is_client_error(e):
+                    raise
+                last_error = e
+        # Échec rapide : le point d'accès suivant est essayé sans attendre
+        if not futures:
+            endpoint = next_endpoint()
+            if endpoint is not None:
+                futures[_endpoint_executor.submit(timed_send, endpoint)] = endpoint
+    raise last_error
+
+
+def resize_image_for_model(image, target_size=(224, 224)):
+    """
+    Redimensionne l'image à la taille exacte attendue par le modèle CLIP (224x224)
+
+    Args:
+        image: Image PIL
+        target_size: Tuple (width, height) - taille cible (224x224 par défaut)
+
+    Returns:
+        Image PIL redimensionnée
+    """
+    # Redimensionner l'image à la taille exacte du modèle
+    resized_image = image.resize(target_size, Image.LANCZOS)
+    return resized_image
+
+
+def prepare_image_bytes(image_file, target_size=(224, 224)):
+    """
+    Image redimensionnée pour le modèle et encodée en JPEG
+
+    Le fichier est lu en place (sans copie de ses octets) et décodé à une
+    résolution réduite, dans les budgets de image_ingest.
+
+    Args:
+        image_file: Image PIL, fichier uploadé Streamlit, objet fichier ou chemin local
+
+    Returns:
+        tuple: (nom de fichier, octets JPEG)
+
+    Raises:
+        ImageRejected: Image hors budget ou illisible
+    """
+    if isinstance(image_file, Image.Image):
+        image = image_file
+    else:
+        # Décodage réduit (draft JPEG) à deux fois la taille cible, pour un redimensionnement de qualité
+        image, _ = load_image(image_file, max_side=2 * max(target_size))
+
+    # Redimensionner l'image à 224x224 (taille d'entrée du modèle CLIP)
+    resized_image = resize_image_for_model(image.convert('RGB'), target_size=target_size)
+
+    # Convertir l'image redimensionnée en bytes
+    img_byte_arr = io.BytesIO()
+    resized_image.save(img_byte_arr, format='JPEG', quality=95, optimize=True)
+    if isinstance(image_file, (str, os.PathLike)):
+        return os.path.basename(image_file), img_byte_arr.getvalue()
+    return getattr(image_file, 'name', 'resized_image.jpg'), img_byte_arr.getvalue()
+
+
+def _prepared(image_file):
+    """(nom, octets JPEG) d'une image, préparée si besoin"""
+    return image_file if isinstance(image_file, tuple) else prepare_image_bytes(image_file)
+
+
+def _post_prediction(base_url, filename, image_bytes, text_description, timeout):
+    """Requête /predict vers un point d'accès (lève une exception en cas d'échec)"""
+    files = {'image': (filename, image_bytes, 'image/jpeg')}
+    data = {'text_description': text_description}
+    response = requests.post(f"{base_url}/predict", files=files, data=data, timeout=timeout)
+    response.raise_for_status()  # Lève une exception pour les codes d'état HTTP d'erreur
+    return response.json()
+
+
+def _prediction_error(error):
+    """Résultat d'échec à partir d'une exception de requête"""
+    if isinstance(error, requests.exceptions.RequestException):
+        return {"success": False, "error": f"Erreur lors de l'appel à l'API de prédiction: {error}"}
+    return {"success": False, "error": f"Réponse invalide de l'API de prédiction: {error}"}
+
+
+def call_prediction_api(base_url, image_file, text_description, timeout=API_TIMEOUT):
+    """
+    Appelle l'API FastAPI pour la prédiction avec image redimensionnée
+
+    Args:
+        image_file: Image à préparer (voir prepare_image_bytes) ou tuple (nom, octets JPEG) déjà préparé
+
+    Returns:
+        dict: Réponse de l'API, ou {'success': False, 'error': ...} en cas d'échec
+    """
+    try:
+        filename, image_bytes = _prepared(image_file)
+    except Exception as e:
+        return {"success": False, "error": f"Erreur lors du traitement de l'image: {e}"}
+
+    try:
+        return _post_prediction(base_url, filename, image_bytes, text_description, timeout)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return _prediction_error(e)
+
+
+def aggregate_predictions(results, strategy=DEFAULT_AGGREGATION):
+    """
+    Combine les prédictions de plusieurs images d'un même produit
+
+    Args:
+        results: Réponses /predict par image (avec 'scores')
+        strategy: 'mean', 'max' ou 'confidence' (moyenne pondérée par la confiance de chaque image)
+
+    Returns:
+        dict: Réponse au format /predict, avec image_count, aggregation et per_image
+    """
+    if strategy not in AGGREGATION_STRATEGIES:
+        raise ValueError(f"Stratégie d'agrégation inconnue : {strategy}")
+    results = [result for result in results if result.get('success', False) and result.get('scores')]
+    if not results:
+        return {"success": False, "error": "Aucune image n'a pu être classée par l'API"}
+
+    categories = sorted({entry['category'] for result in results for entry in result['scores']})
+    column = {category: i for i, category in enumerate(categories)}
+    # Matrice images x catégories (0 pour une catégorie absente des scores d'une image)
+    matrix = np.zeros((len(results), len(categories)))
+    for row, result in enumerate(results):
+        for entry in result['scores']:
+            matrix[row, column[entry['category']]] = entry['score']
+
+    if strategy == 'max':
+        combined = matrix.max(axis=0)
+    elif strategy == 'confidence':
+        weights = np.array([result.get('confidence', matrix[row].max()) for row, result in enumerate(results)])
+        combined = weights @ matrix / max(weights.sum(), 1e-12)
+    else:
+        combined = matrix.mean(axis=0)
+
+    order = np.argsort(-combined, kind='stable')
+    return {
+        'success': True,
+        'predicted_category': categories[order[0]],
+        'confidence': float(combined[order[0]]),
+        'scores': [{'category': categories[i], 'score': float(combined[i])} for i in order],
+        'inference_time': sum(result.get('inference_time', 0.0) for result in results),
+        'image_count': len(results),
+        'aggregation': strategy,
+        'per_image': [{'predicted_category': result.get('predicted_category'),
+                       'confidence': result.get('confidence')} for result in results],
+    }
+
+
+def _post_multi_prediction(base_url, images, text_description, timeout):
+    """
+    Requête unique /predict_multi (plusieurs parties 'images', une description partagée)
+
+    Si l'API ne connaît pas cette route (404/405), chaque image est envoyée à
+    /predict sur une même connexion HTTP.
+
+    Returns:
+        list[dict]: Réponse de l'API pour chaque image
+    """
+    files = [('images', (filename, image_bytes, 'image/jpeg')) for filename, image_bytes in images]
+    data = {'text_description': text_description}
+    with requests.Session() as session:
+        response = session.post(f"{base_url}/predict_multi", files=files, data=data, timeout=timeout)
+        if response.status_code in (404, 405):
+            results = []
+            for filename, image_bytes in images:
+                single = session.post(f"{base_url}/predict", files={'image': (filename, image_bytes, 'image/jpeg')},
+                                      data=data, timeout=timeout)
+                single.raise_for_status()
+                results.append(single.json())
+            return results
+        response.raise_for_status()
+        return response.json()['results']
+
+
+def routed_prediction(router, image_file, text_description, timeout=API_TIMEOUT, hedge=True):
+    """
+    Prédiction via le meilleur point d'accès de l'API (copie vers le suivant si la réponse tarde)
+
+    Args:
+        image_file: Image à préparer (voir prepare_image_bytes) ou tuple (nom, octets JPEG) déjà préparé
+
+    Returns:
+        dict: Réponse de l'API (avec la clé 'endpoint'), ou {'success': False, 'error': ...}
+    """
+    try:
+        filename, image_bytes = _prepared(image_file)
+    except Exception as e:
+        return {"success": False, "error": f"Erreur lors du traitement de l'image: {e}"}
+
+    try:
+        result, endpoint = routed_request(
+            router,
+            lambda endpoint: _post_prediction(endpoint, filename, image_bytes, text_description, timeout),
+            hedge=hedge
+        )
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return _prediction_error(e)
+    return dict(result, endpoint=endpoint)
+
+
+def routed_multi_prediction(router, image_files, text_description, strategy=DEFAULT_AGGREGATION,
+                            timeout=API_TIMEOUT, hedge=True):
+    """
+    Prédiction d'un produit à plusieurs images, en une seule requête routée
+
+    Args:
+        image_files: Images à préparer (voir prepare_image_bytes) ou tuples (nom, octets JPEG)
+        strategy: Stratégie d'agrégation des scores (voir AGGREGATION_STRATEGIES)
+
+    Returns:
+        dict: Prédiction agrégée (avec la clé 'endpoint'), ou {'success': False, 'error': ...}
+    """
+    if len(image_files) == 1:
+        return routed_prediction(router, image_files[0], text_description, timeout=timeout, hedge=hedge)
+    try:
+        images = [_prepared(image_file) for image_file in image_files]
+    except Exception as e:
+        return {"success": False, "error": f"Erreur lors du traitement de l'image: {e}"}
+
+    try:
+        results, endpoint = routed_request(
+            router,
+            lambda endpoint: _post_multi_prediction(endpoint, images, text_description, timeout),
+            hedge=hedge
+        )
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        return _prediction_error(e)
+    return dict(aggregate_predictions(results, strategy), endpoint=endpoint)
+
+
+def _post_batch_prediction(base_url, images, text_descriptions, timeout):
+    """
+    Requête /predict_batch : parties 'images' et 'text_descriptions' appariées dans l'ordre
+
+    Returns:
+        list[dict]: Réponse de l'API par paire, ou None si le point d'accès ne gère pas les lots
+    """
+    files = [('images', (filename, image_bytes, 'image/jpeg')) for filename, image_bytes in images]
+    data = [('text_descriptions', text) for text in text_descriptions]
+    response = requests.post(f"{base_url}/predict_batch", files=files, data=data, timeout=timeout)
+    if response.status_code in (404, 405):
+        return None
+    response.raise_for_status()
+    results = response.json()['results']
+    if len(results) != len(images):
+        raise ValueError(f"{len(results)} résultats reçus pour {len(images)} paires")
+    return results
+
+
+def predict_batch(router, items, batch_size=DEFAULT_BATCH_SIZE, timeout=API_TIMEOUT):
+    """
+    Prédictions pour une liste de paires (image, description), par lots
+
+    Chaque lot d'au plus batch_size paires part dans une seule requête
+    /predict_batch, que le serveur peut traiter en une passe du modèle. Un point
+    d'accès qui ne connaît pas cette route ne reçoit plus de lot pendant
+    reset_timeout (voir EndpointRouter.mark_batch_unsupported) ; si aucun ne la
+    connaît, les paires du lot sont envoyées à /predict en parallèle.
+
+    Args:
+        router: Routeur des points d'accès (EndpointRouter)
+        items: Paires (image, description) ; image à préparer (voir prepare_image_bytes) ou (nom, octets JPEG)
+        batch_size: Nombre maximal de paires par requête
+
+    Returns:
+        list[dict]: Un résultat par paire, dans l'ordre des entrées ({'success': False, 'error': ...} en cas d'échec)
+    """
+    results = [None] * len(items)
+    pool = current_worker_pool()
+
+    def prepare(start):
+        # Préparation des images d'un lot dans le pool partagé, après les prédictions interactives
+        futures = []
+        saturated = False
+        for position in range(start, min(start + batch_size, len(items))):
+            if not saturated:
+                try:
+                    futures.append((position, pool.submit(_prepared, items[position][0], priority=BULK)))
+                    continue
+                except PoolSaturated:
+                    # File pleine après submit_timeout : contre-pression, le reste du lot est préparé ici
+                    saturated = True
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(_prepared(items[position][0]))
+            except Exception as e:
+                future.set_exception(e)
+            futures.append((position, future))
+        return futures
+
+    # Le lot suivant est préparé pendant l'envoi du lot courant : au plus deux lots d'images en mémoire
+    pending = prepare(0)
+    for start in range(0, len(items), batch_size):
+        current, pending = pending, prepare(start + batch_size)
+        chunk = []
+        for position, future in current:
+            try:
+                chunk.append((position, future.result(), items[position][1]))
+            except Exception as e:
+                results[position] = {"success": False, "error": f"Erreur lors du traitement de l'image: {e}"}
+        if not chunk:
+            continue
+
+        batch_results, failed = None, False
+        batch_endpoints = router.batch_endpoints()
+        while batch_results is None and batch_endpoints:
+            try:
+                batch_results, endpoint = routed_request(
+                    router,
+                    lambda endpoint: _post_batch_prediction(endpoint, [image for _, image, _ in chunk],
+                                                            [text for _, _, text in chunk], timeout),
+                    endpoints=batch_endpoints
+                )
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                for position, _, _ in chunk:
+                    results[position] = _prediction_error(e)
+                failed = True
+                break
+            if batch_results is None:
+                # Route absente : le lot est renvoyé aux autres points d'accès qui la gèrent
+                router.mark_batch_unsupported(endpoint)
+                batch_endpoints = router.batch_endpoints()
+        if failed:
+            continue
+        if batch_results is not None:
+            for (position, _, _), result in zip(chunk, batch_results):
+                results[position] = dict(result, endpoint=endpoint)
+        else:
+            # Repli : une requête /predict par paire, en parallèle, résultats remis à leur place
+            futures = {_batch_executor.submit(routed_prediction, router, image, text, timeout): position
+                       for position, image, text in chunk}
+            for future, position in futures.items():
+                results[position] = future.result()
+    return results
+
+
+def hedged_prediction(remote_call, local_call=None, hedge_delay=DEFAULT_HEDGE_DELAY):
+    """
+    Course entre l'API distante et le classifieur local
+
+    L'appel distant est lancé immédiatement. S'il répond avec succès avant
+    hedge_delay, son résultat est retourné ; sinon (lenteur ou erreur) le
+    classifieur local répond et l'appel distant continue en arrière-plan.
+
+    Args:
+        remote_call: Fonction sans argument appelant l'API distante
+        local_call: Fonction sans argument du classifieur local (None = attendre l'API)
+        hedge_delay: Délai accordé à l'API distante (secondes)
+
+    Returns:
+        tuple: (résultat, future de l'appel distant encore en cours ou None)
+    """
+    future = _executor.submit(remote_call)
+    if local_call is None:
+        return future.result(), None
+
+    try:
+        result = future.result(timeout=hedge_delay)
+    except concurrent.futures.TimeoutError:
+        local_result = dict(local_call(), fallback_reason='timeout', hedge_delay=hedge_delay)
+        return local_result, future
+
+    if result.get('success', False):
+        return result, None
+    # L'API a échoué avant le délai : inutile d'attendre, le local répond
+    return dict(local_call(), fallback_reason='error', remote_error=result.get('error', 'Erreur inconnue')), None
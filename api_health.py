@@ -0,0 +1,203 @@
+"""
+Santé des points d'accès de l'API : disjoncteur et sonde de santé en arrière-plan
+
+Chaque point d'accès a un disjoncteur (fermé / ouvert / semi-ouvert) : après
+plusieurs échecs consécutifs il s'ouvre et les appels échouent immédiatement,
+sans attendre le délai d'attente réseau. Une fois RESET_TIMEOUT écoulé, il
+passe en semi-ouvert et ne laisse passer qu'un nombre limité de requêtes
+d'essai avant de se refermer. Une sonde partagée par tout le processus
+interroge régulièrement ``/health`` : ses échecs comptent comme ceux des
+requêtes, mais ses succès ne remettent pas à zéro les échecs des requêtes
+(un /health qui répond n'empêche pas d'ouvrir un /predict qui échoue) et ne
+comptent que pour refermer un disjoncteur semi-ouvert.
+
+Aucune fonction de ce module n'appelle Streamlit.
+"""
+
+import time
+import threading
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Échecs consécutifs avant ouverture du disjoncteur
+FAILURE_THRESHOLD = 3
+
+# Durée minimale d'ouverture avant un essai (secondes)
+RESET_TIMEOUT = 30.0
+
+# Requêtes d'essai simultanées autorisées en semi-ouvert
+HALF_OPEN_MAX_CALLS = 1
+
+# Succès consécutifs (requêtes ou sondes) nécessaires pour refermer le disjoncteur
+SUCCESS_THRESHOLD = 2
+
+# Sonde de santé : chemin, intervalle et délai d'attente (secondes)
+HEALTH_PATH = '/health'
+HEALTH_INTERVAL = 10.0
+HEALTH_TIMEOUT = 2.0
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Aucun point d'accès disponible : tous les disjoncteurs sont ouverts"""
+
+
+class CircuitBreaker:
+    """Disjoncteur d'un point d'accès (fermé / ouvert / semi-ouvert)"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 half_open_max_calls=HALF_OPEN_MAX_CALLS, success_threshold=SUCCESS_THRESHOLD,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._successes = 0
+        self._trials = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Passe en semi-ouvert une fois le délai d'ouverture écoulé (verrou déjà pris)"""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._half_open()
+
+    def _half_open(self):
+        self._state = HALF_OPEN
+        self._successes = 0
+        self._trials = 0
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._failures = 0
+        self._trials = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def is_available(self):
+        """Une requête pourrait-elle passer (sans réserver de place d'essai) ?"""
+        with self._lock:
+            self._refresh()
+            return self._state == CLOSED or (self._state == HALF_OPEN and self._trials < self.half_open_max_calls)
+
+    def allow_request(self):
+        """Autorise une requête (réserve une place d'essai en semi-ouvert)"""
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            return False
+
+    def record_success(self, trial=True):
+        """
+        Enregistre un succès
+
+        Args:
+            trial: True pour une requête autorisée par allow_request, False pour une sonde
+        """
+        with self._lock:
+            # Le délai d'ouverture est respecté : en ouvert, un succès ne change pas l'état
+            self._refresh()
+            if trial:
+                self._failures = 0
+            if self._state == HALF_OPEN:
+                if trial:
+                    self._trials = max(0, self._trials - 1)
+                self._successes += 1
+                if self._successes >= self.success_threshold:
+                    self._state = CLOSED
+
+    def record_failure(self):
+        """Enregistre un échec (requête ou sonde)"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open()
+
+    def snapshot(self):
+        """État du disjoncteur (pour l'affichage)"""
+        with self._lock:
+            self._refresh()
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+            return {'state': self._state, 'consecutive_failures': self._failures, 'retry_in': retry_in}
+
+
+def probe_health(endpoint, timeout=HEALTH_TIMEOUT, path=HEALTH_PATH):
+    """
+    Interroge la route de santé d'un point d'accès
+
+    Returns:
+        dict: ok, latency, error, checked_at
+    """
+    start = time.perf_counter()
+    try:
+        response = requests.get(f"{endpoint}{path}", timeout=timeout)
+        ok, error = response.status_code == 200, None if response.status_code == 200 else f"HTTP {response.status_code}"
+    except requests.exceptions.RequestException as e:
+        ok, error = False, str(e)
+    return {'ok': ok, 'latency': time.perf_counter() - start, 'error': error, 'checked_at': time.time()}
+
+
+class HealthProber:
+    """Sonde de santé périodique (thread d'arrière-plan) alimentant les disjoncteurs d'un routeur"""
+
+    def __init__(self, router, interval=HEALTH_INTERVAL, timeout=HEALTH_TIMEOUT, probe=probe_health):
+        self.router = router
+        self.interval = interval
+        self.timeout = timeout
+        self._probe = probe
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Démarre le thread de sonde (sans effet s'il tourne déjà)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="api-health-prober", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête le thread de sonde"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+
+    def probe_all(self):
+        """Sonde chaque point d'accès une fois et met à jour son disjoncteur"""
+        for endpoint in self.router.endpoints:
+            status = self._probe(endpoint, timeout=self.timeout)
+            self.router.record_health(endpoint, status['ok'])
+            with self._lock:
+                self._status[endpoint] = status
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_all()
+            self._stop.wait(self.interval)
+
+    def status(self):
+        """Dernier résultat de sonde par point d'accès"""
+        with self._lock:
+            return dict(self._status)
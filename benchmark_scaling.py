@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Benchmark de montée en charge sur des catalogues synthétiques
+
+Pour chaque échelle (multiple de la taille du catalogue fourni), un catalogue
+synthétique est généré (synthetic_catalog.py, réutilisé s'il existe déjà) puis
+chaque parcours est mesuré dans un processus neuf, exécuté depuis le répertoire
+du catalogue :
+
+- indexes : construction hors ligne des index d'images (empreintes perceptuelles,
+  descripteurs visuels), utilisés ensuite par la page de prédiction ;
+- eda : page EDA en calcul direct (sans snapshot), avec le moteur choisi ;
+- prediction : page de prédiction avec le produit de test affiché (vignettes,
+  produits similaires), sans appel à l'API.
+
+Mesures : temps de chargement des données (dans son propre processus neuf,
+avant les rendus : ni modules importés ni données déjà lues), premier rendu de
+la page (caches froids), rendu suivant (caches chauds) et pic de mémoire
+résidente. Les résultats sont écrits en CSV et tracés (échelles logarithmiques)
+en PNG.
+
+Usage :
+    python benchmark_scaling.py --scales 1 10 100 --work-dir synthetic
+    python benchmark_scaling.py --scales 1 10 --paths eda --engine chunked
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES = {
+    'eda': os.path.join(REPO_DIR, 'pages', '1_eda.py'),
+    'prediction': os.path.join(REPO_DIR, 'pages', '2_prediction.py'),
+}
+# Parcours mesurés, dans l'ordre d'exécution (les index avant la page de prédiction)
+PATHS = ('indexes', 'eda', 'prediction')
+DEFAULT_SCALES = (1, 10)
+
+# Point d'accès injoignable : aucun appel réseau pendant les mesures
+OFFLINE_API = 'http://127.0.0.1:9'
+
+# Étapes mesurées chacune dans un processus neuf, dans cet ordre
+STAGES = ('load', 'render')
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo)"""
+    try:
+        # VmHWM repart de zéro au lancement du processus, contrairement à ru_maxrss hérité du parent
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _load_data(path, engine):
+    """Chargement des données du parcours (hors Streamlit)"""
+    from catalog import CONSUMER_COLUMNS, load_catalog, read_catalog
+    if path == 'eda' and engine == 'chunked':
+        from eda_engine import compute_aggregates_chunked
+        return compute_aggregates_chunked()
+    if path == 'eda':
+        return load_catalog()
+    return read_catalog(columns=CONSUMER_COLUMNS['prediction'])
+
+
+def build_indexes():
+    """Construit les index d'images du catalogue du répertoire courant"""
+    from image_hashing import ImageHashIndex
+    from visual_search import VisualIndex
+    ImageHashIndex.build().save()
+    VisualIndex.build().save()
+
+
+def run_worker(path, engine, timeout, stage='render'):
+    """
+    Mesures d'un parcours dans le processus courant (répertoire courant = catalogue)
+
+    Args:
+        stage: 'load' (chargement des données seul) ou 'render' (rendus de la page)
+
+    Returns:
+        dict: load_s pour 'load' ; cold_render_s, warm_render_s, peak_mb, baseline_mb, exceptions pour 'render'
+              (les index mesurent leur construction dans load_s)
+    """
+    if path == 'indexes':
+        baseline_mb = peak_rss_mb()
+        start = time.perf_counter()
+        build_indexes()
+        return {'load_s': time.perf_counter() - start, 'cold_render_s': None, 'warm_render_s': None,
+                'peak_mb': peak_rss_mb(), 'baseline_mb': baseline_mb, 'exceptions': 0}
+
+    if stage == 'load':
+        start = time.perf_counter()
+        _load_data(path, engine)
+        return {'load_s': time.perf_counter() - start}
+
+    from streamlit.testing.v1 import AppTest
+
+    baseline_mb = peak_rss_mb()
+    app = AppTest.from_file(PAGES[path], default_timeout=timeout)
+    if path == 'prediction':
+        app.session_state['test_prediction_launched'] = True
+
+    start = time.perf_counter()
+    app.run()
+    cold_render_s = time.perf_counter() - start
+    start = time.perf_counter()
+    app.run()
+    warm_render_s = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+
+    return {'cold_render_s': cold_render_s, 'warm_render_s': warm_render_s,
+            'peak_mb': peak_mb, 'baseline_mb': baseline_mb, 'exceptions': len(app.exception)}
+
+
+def measure(path, data_dir, engine='memory', timeout=3600):
+    """
+    Mesure un parcours depuis data_dir, chaque étape dans un processus neuf
+
+    Le chargement des données est mesuré en premier, seul dans son processus :
+    les rendus de la page ne le faussent pas en ayant déjà importé les modules
+    et lu les données.
+
+    Returns:
+        dict: Mesures (voir run_worker)
+    """
+    if path == 'indexes':
+        return _measure_stage(path, 'render', data_dir, engine, timeout)
+    result = {}
+    for stage in STAGES:
+        result.update(_measure_stage(path, stage, data_dir, engine, timeout))
+    return result
+
+
+def _measure_stage(path, stage, data_dir, engine, timeout):
+    """Exécute run_worker dans un processus neuf et renvoie ses mesures"""
+    environment = dict(
+        os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])),
+        EDA_SNAPSHOT_PATH=os.devnull, EDA_ENGINE=engine, API_BASE_URLS=OFFLINE_API,
+        PREDICTION_HISTORY_PATH=os.path.join(data_dir, 'prediction_history.db'),
+    )
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', path, '--stage', stage, '--engine', engine,
+         '--timeout', str(timeout)],
+        cwd=data_dir, env=environment, capture_output=True, text=True, timeout=timeout
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Mesure '{path}' ({stage}) en échec dans {data_dir} :\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def ensure_catalog(work_dir, scale, **options):
+    """Catalogue synthétique d'une échelle, généré s'il n'existe pas encore"""
+    from synthetic_catalog import generate_catalog
+
+    data_dir = os.path.join(work_dir, f"x{scale:g}")
+    marker = os.path.join(data_dir, '.complete')
+    if not os.path.exists(marker):
+        _, _, rows = generate_catalog(data_dir, scale=scale, **options)
+        with open(marker, 'w') as f:
+            f.write(str(rows))
+    with open(marker) as f:
+        return data_dir, int(f.read())
+
+
+def run_benchmark(scales=DEFAULT_SCALES, paths=PATHS, work_dir='synthetic', engine='memory', **options):
+    """
+    Mesure chaque parcours à chaque échelle
+
+    Returns:
+        pd.DataFrame: scale, rows, path, load_s, cold_render_s, warm_render_s, peak_mb, baseline_mb
+    """
+    import pandas as pd
+
+    results = []
+    for scale in scales:
+        data_dir, rows = ensure_catalog(work_dir, scale, **options)
+        for path in [path for path in PATHS if path in paths]:
+            result = measure(path, data_dir, engine)
+            results.append(dict(scale=scale, rows=rows, path=path, engine=engine, **result))
+            render = ("" if result['cold_render_s'] is None else
+                      f"rendu {result['cold_render_s']:>7.2f}s / {result['warm_render_s']:>6.2f}s  ")
+            print(f"x{scale:<6g} {rows:>9} {path:<11} chargement {result['load_s']:>7.2f}s  {render}"
+                  f"pic {result['peak_mb']:>7.0f} Mo", flush=True)
+    return pd.DataFrame(results)
+
+
+def plot_results(results, output_path):
+    """Courbes de montée en charge (temps et mémoire en fonction du nombre de produits)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    metrics = [('load_s', "Chargement des données / index (s)"), ('cold_render_s', "Premier rendu (s)"),
+               ('warm_render_s', "Rendu suivant (s)"), ('peak_mb', "Pic de mémoire (Mo)")]
+    colors = {path: f"C{i}" for i, path in enumerate(PATHS)}
+    fig, axes = plt.subplots(1, len(metrics), figsize=(5 * len(metrics), 4))
+    for ax, (metric, label) in zip(axes, metrics):
+        for path, group in results.dropna(subset=[metric]).groupby('path'):
+            ax.plot(group['rows'], group[metric], marker='o', label=path, color=colors[path])
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel("Produits")
+        ax.set_title(label)
+        ax.grid(True, which='both', alpha=0.3)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=120)
+    plt.close(fig)
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark de montée en charge sur catalogues synthétiques")
+    parser.add_argument('--scales', type=float, nargs='+', default=list(DEFAULT_SCALES),
+                        help="Multiples de la taille du catalogue fourni")
+    parser.add_argument('--paths', nargs='+', choices=list(PATHS), default=list(PATHS),
+                        help="Parcours mesurés (la page de prédiction utilise les index construits par 'indexes')")
+    parser.add_argument('--engine', default='memory', choices=['memory', 'chunked'], help="Moteur EDA")
+    parser.add_argument('--work-dir', default='synthetic', help="Répertoire des catalogues générés")
+    parser.add_argument('--image-size', default=None, help="Dimensions des images synthétiques, ex. 800x800")
+    parser.add_argument('--link-images', action='store_true', help="Liens physiques vers les images de substitution")
+    parser.add_argument('--output', default='benchmark_scaling', help="Préfixe des fichiers .csv et .png")
+    parser.add_argument('--timeout', type=float, default=3600, help="Durée maximale d'une mesure (s)")
+    parser.add_argument('--worker', choices=list(PATHS), help=argparse.SUPPRESS)
+    parser.add_argument('--stage', choices=list(STAGES), default='render', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.engine, args.timeout, args.stage)))
+        return
+
+    from synthetic_catalog import _parse_size
+
+    options = {'link_images': args.link_images,
+               'image_size': _parse_size(args.image_size) if args.image_size else None,
+               'source_csv': os.path.join(REPO_DIR, 'produits_original.csv'),
+               'source_images': os.path.join(REPO_DIR, 'Images')}
+    results = run_benchmark(args.scales, args.paths, os.path.abspath(args.work_dir), args.engine, **options)
+    results.to_csv(f"{args.output}.csv", index=False)
+    plot_results(results, f"{args.output}.png")
+    print(f"✅ Résultats : {args.output}.csv, courbes : {args.output}.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Mesure de la mémoire résidente par session simulée
+
+Exécute la page EDA en calcul direct pour un nombre croissant de sessions
+simultanées (streamlit.testing) dans un même processus et relève la mémoire
+résidente après chaque session. Avec le catalogue partagé, l'accroissement
+par session doit rester quasi nul.
+
+Usage :
+    python benchmark_sessions.py --sessions 20
+"""
+
+import os
+import gc
+import argparse
+
+from profiling import rss_bytes
+
+PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages', '1_eda.py')
+
+
+def measure_sessions(n_sessions, page_path=PAGE_PATH):
+    """
+    Exécute n_sessions sessions de la page et mesure la mémoire résidente
+
+    Returns:
+        list[dict]: sessions, rss_mb, delta_mb (depuis la première session)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    # Forcer le calcul en direct : le snapshot ne charge pas le catalogue
+    os.environ['EDA_SNAPSHOT_PATH'] = os.devnull
+
+    sessions = []  # garder les sessions vivantes, comme des utilisateurs connectés
+    measures = []
+    baseline = None
+    for i in range(1, n_sessions + 1):
+        app = AppTest.from_file(page_path, default_timeout=120)
+        app.run()
+        sessions.append(app)
+        gc.collect()
+        rss_mb = rss_bytes() / 1024 ** 2
+        baseline = rss_mb if baseline is None else baseline
+        measures.append({'sessions': i, 'rss_mb': rss_mb, 'delta_mb': rss_mb - baseline})
+    return measures
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Mémoire résidente en fonction du nombre de sessions")
+    parser.add_argument('--sessions', type=int, default=10, help="Nombre de sessions simulées")
+    args = parser.parse_args()
+
+    measures = measure_sessions(args.sessions)
+    print(f"{'sessions':>8} {'RSS (Mo)':>10} {'Δ (Mo)':>8}")
+    for m in measures:
+        print(f"{m['sessions']:>8} {m['rss_mb']:>10.1f} {m['delta_mb']:>8.1f}")
+    if len(measures) > 1:
+        per_session = measures[-1]['delta_mb'] / (len(measures) - 1)
+        print(f"📈 Accroissement moyen : {per_session:.2f} Mo par session supplémentaire")
+
+
+if __name__ == "__main__":
+    main()
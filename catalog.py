@@ -0,0 +1,344 @@
+"""
+Chargement et traitement du catalogue produits (produits_original.csv + Images/)
+
+Le catalogue traité est conservé une seule fois par processus
+(catalog_watcher.get_live_catalog, qui le rafraîchit quand les données changent)
+et partagé en lecture seule entre les sessions : chaque session reçoit une vue
+légère (catalog_view) protégée par le copy-on-write de pandas.
+"""
+
+import os
+import ast
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# Copy-on-write : une écriture sur une vue copie la colonne modifiée au lieu de
+# modifier le catalogue partagé (comportement par défaut à partir de pandas 3).
+# Sous pandas 2, l'option est globale : elle s'applique à tout le processus dès
+# l'import de ce module (voir « Mémoire par session » dans README_STREAMLIT_CLOUD.md)
+if pd.__version__.startswith("2."):
+    pd.set_option("mode.copy_on_write", True)
+
+# Chemins du dataset
+CATALOG_CSV_PATH = 'produits_original.csv'
+IMAGES_DIR = 'Images'
+
+
+def _string_dtype():
+    """Chaînes Arrow (compactes) si pyarrow est disponible, sinon chaînes pandas"""
+    try:
+        import pyarrow  # noqa: F401
+        return "string[pyarrow]"
+    except ImportError:
+        return "string"
+
+
+_STRING = _string_dtype()
+
+# Schéma déclaré des colonnes sources : chaînes Arrow pour les textes longs,
+# catégories pour les valeurs répétées, numériques réduits à 32 bits
+CATALOG_SCHEMA = {
+    'uniq_id': _STRING,
+    'crawl_timestamp': 'category',
+    'product_url': _STRING,
+    'product_name': _STRING,
+    'product_category_tree': _STRING,
+    'pid': _STRING,
+    'retail_price': 'float32',
+    'discounted_price': 'float32',
+    'image': _STRING,
+    'is_FK_Advantage_product': 'boolean',
+    'description': _STRING,
+    'product_rating': 'category',
+    'overall_rating': 'category',
+    'brand': 'category',
+    'product_specifications': _STRING,
+    'keywords': _STRING,
+}
+
+# Colonnes dérivées ajoutées par load_catalog
+DERIVED_SCHEMA = {
+    'main_category': 'category',
+    'sub_categories': 'category',
+    'image_exists': 'bool',
+    'image_pixels': 'int32',
+    'aspect_ratio': 'float32',
+}
+
+# Colonnes sources nécessaires à chaque consommateur (None = toutes).
+# 'eda' : colonnes conservées dans le catalogue partagé de la page EDA (sources
+# des colonnes dérivées, comparées à chaque rafraîchissement) ; les agrégats
+# portant sur toutes les colonnes sont calculés avant élagage (catalog_watcher)
+CONSUMER_COLUMNS = {
+    'eda': ['uniq_id', 'product_category_tree', 'image'],
+    'prediction': ['uniq_id', 'product_name', 'brand', 'description', 'product_specifications', 'retail_price',
+                   'image'],
+    'images': ['uniq_id', 'product_name', 'product_category_tree', 'image'],
+    'classifier': ['product_name', 'brand', 'description', 'product_specifications', 'product_category_tree'],
+}
+
+
+def get_image_size(image_path):
+    """Obtient (largeur, hauteur) d'une image en ne lisant que son en-tête"""
+    try:
+        with Image.open(image_path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def get_image_pixels(image_path):
+    """Obtient le nombre de pixels d'une image"""
+    size = get_image_size(image_path)
+    return size[0] * size[1] if size else 0
+
+
+def get_aspect_ratio(image_path):
+    """Obtient le ratio d'aspect d'une image"""
+    size = get_image_size(image_path)
+    return size[0] / size[1] if size else 0
+
+
+def _first_category_path(tree):
+    """Premier chemin de l'arbre de catégories ('A >> B >> ...') ou None"""
+    if not isinstance(tree, str):
+        return None
+    try:
+        paths = ast.literal_eval(tree)
+    except (ValueError, SyntaxError):
+        return None
+    return paths[0] if paths else None
+
+
+def read_catalog(csv_path=CATALOG_CSV_PATH, columns=None):
+    """
+    Lit le CSV des produits avec le schéma compact
+
+    Args:
+        csv_path: Chemin du CSV des produits
+        columns: Colonnes à lire (None = toutes), voir CONSUMER_COLUMNS
+
+    Returns:
+        DataFrame: Colonnes sources typées selon CATALOG_SCHEMA
+    """
+    dtypes = {col: dtype for col, dtype in CATALOG_SCHEMA.items() if columns is None or col in columns}
+    return pd.read_csv(csv_path, usecols=columns, dtype=dtypes)
+
+
+def derive_columns(df, images_dir=IMAGES_DIR, image_info=True):
+    """
+    Ajoute au DataFrame les colonnes dérivées utilisées par l'EDA (catégories, images)
+
+    Le calcul est ligne à ligne : il s'applique aussi bien au catalogue entier
+    qu'à un morceau lu par pd.read_csv(chunksize=...).
+
+    Args:
+        df: Colonnes sources (voir read_catalog)
+        images_dir: Répertoire des images
+        image_info: Lire l'en-tête de chaque image (False = colonne 'image' conservée telle quelle)
+
+    Returns:
+        DataFrame: Colonnes sources et colonnes dérivées typées selon DERIVED_SCHEMA
+    """
+    # Traiter les catégories (structure différente dans produits_original.csv)
+    if 'product_category_tree' in df.columns:
+        # Un seul décodage par arbre distinct, sans conserver les listes Python
+        codes, trees = pd.factorize(df['product_category_tree'])
+        first_paths = [_first_category_path(tree) for tree in trees]
+        # Extraire seulement la catégorie principale (avant le premier >>) ; code -1 (arbre absent) -> 'Unknown'
+        main = np.array([x.split(' >> ')[0] if x else 'Unknown' for x in first_paths] + ['Unknown'], dtype=object)
+        sub = np.array([x.split(' >> ')[1] if x and ' >> ' in x else 'Unknown' for x in first_paths] + ['Unknown'],
+                       dtype=object)
+        df['main_category'] = main[codes]
+        df['sub_categories'] = sub[codes]
+
+    # Ajouter des informations sur les images (colonne 'image' dans produits_original.csv)
+    if image_info and 'image' in df.columns:
+        sizes = [get_image_size(os.path.join(images_dir, x)) if pd.notna(x) else None for x in df['image']]
+        df['image_exists'] = [size is not None for size in sizes]
+        df['image_pixels'] = [size[0] * size[1] if size else 0 for size in sizes]
+        df['aspect_ratio'] = [size[0] / size[1] if size else 0 for size in sizes]
+
+    return df.astype({col: dtype for col, dtype in DERIVED_SCHEMA.items() if col in df.columns})
+
+
+def load_catalog(csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, columns=None, image_info=True):
+    """
+    Charge le catalogue et ajoute les colonnes dérivées utilisées par l'EDA
+
+    Args:
+        csv_path: Chemin du CSV des produits
+        images_dir: Répertoire des images
+        columns: Colonnes sources à conserver (None = toutes)
+        image_info: Ajouter les informations d'image (lecture de l'en-tête de chaque image)
+
+    Returns:
+        DataFrame: Catalogue avec main_category, sub_categories et les informations d'image
+    """
+    return derive_columns(read_catalog(csv_path, columns), images_dir, image_info)
+
+
+def iter_catalog_chunks(csv_path=CATALOG_CSV_PATH, columns=None, chunk_rows=50_000):
+    """
+    Lit le CSV des produits par morceaux avec le schéma compact
+
+    Yields:
+        DataFrame: Au plus chunk_rows lignes ; l'index continue d'un morceau à l'autre
+    """
+    dtypes = {col: dtype for col, dtype in CATALOG_SCHEMA.items() if columns is None or col in columns}
+    with pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def memory_report(df):
+    """
+    Empreinte mémoire du catalogue par colonne
+
+    Returns:
+        DataFrame: dtype, octets et part du total par colonne (du plus lourd au plus léger)
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report['share'] = report['bytes'] / max(int(report['bytes'].sum()), 1)
+    return report.sort_values('bytes', ascending=False)
+
+
+def dataset_fingerprint(*paths):
+    """
+    Empreinte légère d'un ensemble de fichiers/répertoires (taille et date de modification)
+
+    Sert de clé de cache : elle change dès qu'un fichier est modifié ou qu'une
+    image est ajoutée/supprimée, sans relire les données.
+    """
+    parts = []
+    for path in paths or (CATALOG_CSV_PATH, IMAGES_DIR):
+        try:
+            stat = os.stat(path)
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.md5("|".join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+# Empreintes de contenu déjà calculées : chemin -> (taille, date de modification, md5)
+_file_digests = {}
+_file_digests_lock = threading.Lock()
+
+
+def file_digest(path, block_size=1 << 20):
+    """
+    md5 du contenu complet d'un fichier, lu par blocs
+
+    Le résultat est mémorisé par chemin avec la taille et la date de
+    modification du fichier : un fichier inchangé n'est pas relu.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _file_digests_lock:
+        cached = _file_digests.get(key)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    with _file_digests_lock:
+        _file_digests[key] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _csv_digest(digest, csv_path):
+    try:
+        digest.update(f"csv:{file_digest(csv_path)};".encode('utf-8'))
+    except OSError:
+        digest.update(b'csv:missing;')
+
+
+def _image_entries(images_dir):
+    """Images du répertoire (entrées os.scandir) triées par nom"""
+    try:
+        return sorted((entry for entry in os.scandir(images_dir) if entry.is_file()), key=lambda entry: entry.name)
+    except OSError:
+        return []
+
+
+def manifest_fingerprint(csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR):
+    """
+    Empreinte de validation des artefacts pré-calculés, stable d'un clone git à l'autre
+
+    Le CSV est haché en entier (quelques Mo) ; les images ne sont pas relues :
+    seuls leurs noms et tailles entrent dans l'empreinte (une lecture du
+    répertoire). Les pages comparent cette empreinte à celle de l'artefact.
+    """
+    digest = hashlib.md5()
+    _csv_digest(digest, csv_path)
+    for entry in _image_entries(images_dir):
+        try:
+            digest.update(f"{entry.name}:{entry.stat().st_size};".encode('utf-8'))
+        except OSError:
+            digest.update(f"{entry.name}:missing;".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def content_fingerprint(csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR):
+    """
+    Empreinte de contenu complète du dataset (CSV et contenu de chaque image)
+
+    Relit toutes les images : réservée aux scripts de construction hors ligne,
+    qui l'enregistrent dans l'artefact pour identifier exactement les données
+    d'origine. Les pages valident les artefacts avec manifest_fingerprint.
+    """
+    digest = hashlib.md5()
+    _csv_digest(digest, csv_path)
+    for entry in _image_entries(images_dir):
+        try:
+            digest.update(f"{entry.name}:{file_digest(entry.path)};".encode('utf-8'))
+        except OSError:
+            digest.update(f"{entry.name}:missing;".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def catalog_view(shared_catalog, columns=None):
+    """
+    Vue légère du catalogue partagé pour une session
+
+    La vue partage les données du catalogue (aucune copie) ; grâce au
+    copy-on-write, une modification de la vue n'affecte jamais les autres
+    sessions.
+
+    Args:
+        shared_catalog: Catalogue partagé (CatalogVersion.catalog de get_live_catalog)
+        columns: Colonnes à conserver (None = toutes)
+    """
+    view = shared_catalog if columns is None else shared_catalog[columns]
+    return view.copy(deep=False)
+
+
+def main():
+    """Rapport mémoire : chargement par défaut vs schéma compact et colonnes élaguées"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Empreinte mémoire du catalogue")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV des produits")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Répertoire des images")
+    args = parser.parse_args()
+
+    default_bytes = pd.read_csv(args.csv, dtype=object).memory_usage(deep=True).sum()
+    print(f"Chargement par défaut (object)  : {default_bytes / 1024:>10.1f} Ko")
+
+    compact = load_catalog(args.csv, args.images)
+    print(f"Schéma compact (toutes colonnes) : {memory_report(compact)['bytes'].sum() / 1024:>10.1f} Ko")
+    for consumer, columns in CONSUMER_COLUMNS.items():
+        if columns is not None:
+            pruned = memory_report(load_catalog(args.csv, args.images, columns))['bytes'].sum()
+            print(f"Consommateur '{consumer}'{' ' * (18 - len(consumer))}: {pruned / 1024:>10.1f} Ko")
+    print()
+    print(memory_report(compact).to_string())
+
+
+if __name__ == "__main__":
+    main()
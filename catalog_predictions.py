@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Table pré-calculée des prédictions du catalogue
+
+Les produits du catalogue ont des entrées connues et stables (image et texte) :
+ils sont classés une fois, hors ligne, par l'API (requêtes /predict_batch), et
+le résultat est stocké dans une table compacte et versionnée (uniq_id ->
+catégorie, confiance, scores, version du modèle). La page de prédiction y
+répond instantanément aux produits du catalogue dont la description n'a pas été
+modifiée ; l'API n'est appelée que pour les nouvelles images ou les
+descriptions modifiées.
+
+Usage :
+    python catalog_predictions.py --csv produits_original.csv --images Images --output catalog_predictions.npz
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from catalog import (CATALOG_CSV_PATH, IMAGES_DIR, CONSUMER_COLUMNS, read_catalog, manifest_fingerprint,
+                     content_fingerprint)
+from clip_text import CONTEXT_LENGTH, DEFAULT_VOCAB_PATH, fit_fields, get_tokenizer
+
+DEFAULT_PREDICTIONS_PATH = 'catalog_predictions.npz'
+
+# Version du format de la table : l'incrémenter à chaque changement de structure
+# (2 : empreintes calculées sur le texte tronqué au contexte de CLIP)
+TABLE_VERSION = 2
+
+# Version du modèle enregistrée si l'API n'en renvoie pas
+DEFAULT_MODEL_VERSION = 'clip-api'
+
+# Textes génériques qui ne décrivent pas le produit
+GENERIC_PATTERNS = [
+    r'marque\s+non\s+spécifiée',
+    r'brand\s+not\s+specified',
+    r'non\s+spécifié',
+    r'not\s+specified',
+    r'non\s+disponible',
+    r'not\s+available',
+    r'à\s+définir',
+    r'to\s+be\s+defined',
+    r'non\s+renseigné',
+    r'not\s+provided'
+]
+
+
+def clean_generic_text(text):
+    """Supprime les textes génériques qui ne sont pas des descriptions de produits"""
+    cleaned_text = text
+    for pattern in GENERIC_PATTERNS:
+        cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.IGNORECASE)
+
+    # Nettoyer les espaces multiples
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
+    return cleaned_text
+
+
+def build_description(product_name, brand, description, specifications):
+    """Description complète envoyée à l'API, telle que construite par la page de prédiction"""
+    return clean_generic_text(f"{product_name} {brand} {description} {specifications}".strip())
+
+
+def model_input(product_name, brand, description, specifications, tokenizer, context_length=CONTEXT_LENGTH):
+    """
+    Texte réellement lu par le modèle : champs nettoyés puis tronqués au contexte de CLIP
+
+    Returns:
+        dict: Voir clip_text.fit_fields (text : texte à envoyer à l'API)
+    """
+    fields = {'product_name': product_name, 'brand': brand, 'description': description,
+              'specifications': specifications}
+    return fit_fields({name: clean_generic_text(str(value or '')) for name, value in fields.items()},
+                      tokenizer, context_length)
+
+
+def description_hash(text):
+    """Empreinte courte d'une description complète"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def product_form_fields(product):
+    """
+    Champs du formulaire de prédiction pré-remplis pour un produit du catalogue
+
+    Args:
+        product: Ligne du catalogue (colonnes CONSUMER_COLUMNS['prediction'])
+
+    Returns:
+        dict: name, brand, description, specifications
+    """
+    # Nettoyer la description (enlever les \n et \t)
+    description = product['description'] if pd.notna(product['description']) else product['product_name']
+    if description:
+        description = description.replace('\n', ' ').replace('\t', ' ').strip()
+        # Garder seulement les 2 premières phrases pour la lisibilité
+        sentences = description.split('. ')
+        if len(sentences) > 2:
+            description = '. '.join(sentences[:2]) + '.'
+
+    # Nettoyer les spécifications (parser le format Ruby/JSON)
+    specs = product['product_specifications'] if pd.notna(product['product_specifications']) else f"Prix: {product['retail_price']} INR"
+    if specs and specs.startswith('{"product_specification"'):
+        try:
+            # Remplacer => par : pour convertir en JSON valide
+            json_specs = specs.replace('=>', ':')
+            specs_data = json.loads(json_specs)
+            if 'product_specification' in specs_data:
+                key_specs = []
+                for spec in specs_data['product_specification'][:5]:  # Limiter à 5 specs
+                    if 'key' in spec and 'value' in spec:
+                        key_specs.append(f"{spec['key']}: {spec['value']}")
+                specs = '; '.join(key_specs) if key_specs else f"Prix: {product['retail_price']} INR"
+        except (ValueError, TypeError, AttributeError):
+            specs = f"Prix: {product['retail_price']} INR"
+
+    return {
+        'name': product['product_name'],
+        'brand': product['brand'] if pd.notna(product['brand']) else 'Escort',
+        'description': description,
+        'specifications': specs,
+    }
+
+
+class PredictionTable:
+    """Prédictions pré-calculées, indexées par uniq_id"""
+
+    def __init__(self, ids, description_hashes, categories, scores, model_version, fingerprint=None, built_at=None,
+                 content_hash=None):
+        self.ids = [str(uniq_id) for uniq_id in ids]
+        self.description_hashes = [str(h) for h in description_hashes]
+        self.categories = [str(c) for c in categories]
+        self.scores = np.asarray(scores, dtype=np.float16).reshape(len(self.ids), len(self.categories))
+        self.model_version = str(model_version)
+        # Empreinte de validation (manifest_fingerprint) et empreinte de contenu complète (construction hors ligne)
+        self.fingerprint = fingerprint
+        self.content_hash = content_hash
+        self.built_at = built_at
+        self._positions = {uniq_id: position for position, uniq_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_results(cls, ids, descriptions, results, model_version=DEFAULT_MODEL_VERSION, fingerprint=None):
+        """
+        Table à partir des réponses de l'API (les échecs sont ignorés)
+
+        Args:
+            ids: uniq_id des produits
+            descriptions: Description complète envoyée pour chaque produit
+            results: Réponse /predict de chaque produit
+        """
+        kept = [(uniq_id, description, result) for uniq_id, description, result in zip(ids, descriptions, results)
+                if result.get('success', False) and result.get('scores')]
+        categories = sorted({entry['category'] for _, _, result in kept for entry in result['scores']})
+        column = {category: i for i, category in enumerate(categories)}
+        scores = np.zeros((len(kept), len(categories)), dtype=np.float32)
+        for row, (_, _, result) in enumerate(kept):
+            for entry in result['scores']:
+                scores[row, column[entry['category']]] = entry['score']
+        model_version = next((result['model_version'] for _, _, result in kept if result.get('model_version')),
+                             model_version)
+        return cls([uniq_id for uniq_id, _, _ in kept], [description_hash(d) for _, d, _ in kept],
+                   categories, scores, model_version, fingerprint, time.time())
+
+    def lookup(self, uniq_id, description=None):
+        """
+        Prédiction pré-calculée d'un produit, au format de la réponse /predict
+
+        Args:
+            uniq_id: Identifiant du produit
+            description: Description complète envoyée ; None pour ne pas la vérifier
+
+        Returns:
+            dict: Prédiction (source='precomputed'), ou None si le produit est absent ou sa description modifiée
+        """
+        position = self._positions.get(uniq_id)
+        if position is None:
+            return None
+        if description is not None and description_hash(description) != self.description_hashes[position]:
+            return None
+        row = self.scores[position].astype(np.float32)
+        order = np.argsort(-row, kind='stable')
+        return {
+            'success': True,
+            'predicted_category': self.categories[order[0]],
+            'confidence': float(row[order[0]]),
+            'scores': [{'category': self.categories[i], 'score': float(row[i])} for i in order if row[i] > 0],
+            'inference_time': 0.0,
+            'source': 'precomputed',
+            'model_version': self.model_version,
+        }
+
+    def save(self, path=DEFAULT_PREDICTIONS_PATH):
+        """Écrit la table (.npz compressé, scores en float16) de façon atomique"""
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path, version=TABLE_VERSION, ids=np.array(self.ids),
+            description_hashes=np.array(self.description_hashes), categories=np.array(self.categories),
+            scores=self.scores, model_version=self.model_version, fingerprint=self.fingerprint or '',
+            content_fingerprint=self.content_hash or '', built_at=self.built_at or 0.0
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PREDICTIONS_PATH, expected_fingerprint=None):
+        """Charge une table (None si absente, illisible, d'une autre version ou périmée)"""
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != TABLE_VERSION:
+                    return None
+                fingerprint = str(data['fingerprint'])
+                if expected_fingerprint is not None and fingerprint != expected_fingerprint:
+                    return None
+                return cls(data['ids'].tolist(), data['description_hashes'].tolist(), data['categories'].tolist(),
+                           data['scores'], str(data['model_version']), fingerprint, float(data['built_at']),
+                           str(data['content_fingerprint']) or None)
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def catalog_inputs(csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, tokenizer=None, context_length=CONTEXT_LENGTH):
+    """
+    Entrées de prédiction de chaque produit du catalogue dont l'image existe
+
+    Args:
+        tokenizer: Tokeniseur de troncature (par défaut celui de clip_text.get_tokenizer)
+        context_length: Contexte de l'encodeur de texte (0 = description complète)
+
+    Returns:
+        list[tuple]: (uniq_id, chemin de l'image, texte envoyé au modèle)
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    catalog = read_catalog(csv_path, columns=CONSUMER_COLUMNS['prediction'])
+    inputs = []
+    for product in catalog.astype(object).to_dict('records'):
+        # Fichier image déclaré par le catalogue (colonne 'image')
+        image_path = os.path.join(images_dir, product['image']) if isinstance(product['image'], str) else None
+        if image_path is not None and os.path.exists(image_path):
+            fields = product_form_fields(product)
+            inputs.append((product['uniq_id'], image_path, model_input(
+                fields['name'], fields['brand'], fields['description'], fields['specifications'],
+                tokenizer, context_length)['text']))
+    return inputs
+
+
+def build_table(router, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, batch_size=None,
+                model_version=DEFAULT_MODEL_VERSION, limit=None, tokenizer=None, context_length=CONTEXT_LENGTH):
+    """
+    Classe le catalogue par lots via l'API et construit la table
+
+    Args:
+        router: Routeur des points d'accès de l'API (api_client.EndpointRouter)
+        limit: Nombre maximal de produits (None = tout le catalogue)
+        tokenizer, context_length: Troncature des textes, identique à celle de la page de prédiction
+
+    Returns:
+        tuple: (PredictionTable, nombre de produits en échec)
+    """
+    from api_client import DEFAULT_BATCH_SIZE, predict_batch
+
+    inputs = catalog_inputs(csv_path, images_dir, tokenizer, context_length)[:limit]
+    results = predict_batch(router, [(image_path, description) for _, image_path, description in inputs],
+                            batch_size=batch_size or DEFAULT_BATCH_SIZE)
+    table = PredictionTable.from_results([uniq_id for uniq_id, _, _ in inputs],
+                                         [description for _, _, description in inputs], results,
+                                         model_version, manifest_fingerprint(csv_path, images_dir))
+    return table, len(inputs) - len(table)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_prediction_table(fingerprint, path=DEFAULT_PREDICTIONS_PATH, csv_path=CATALOG_CSV_PATH,
+                         images_dir=IMAGES_DIR):
+    """
+    Table pré-calculée partagée par toutes les sessions du processus
+
+    Args:
+        fingerprint: Empreinte légère (dataset_fingerprint) des données et de la table, clé de rechargement
+
+    Returns:
+        PredictionTable: Table, ou None si elle est absente ou périmée
+    """
+    return PredictionTable.load(path, expected_fingerprint=manifest_fingerprint(csv_path, images_dir))
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    from api_client import DEFAULT_BATCH_SIZE, parse_endpoints, get_router
+
+    parser = argparse.ArgumentParser(description="Classe le catalogue via l'API et écrit la table des prédictions")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV des produits")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Répertoire des images")
+    parser.add_argument('--output', default=DEFAULT_PREDICTIONS_PATH, help="Fichier table à écrire")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Produits par requête")
+    parser.add_argument('--model-version', default=DEFAULT_MODEL_VERSION,
+                        help="Version du modèle (si l'API n'en renvoie pas)")
+    parser.add_argument('--limit', type=int, default=None, help="Nombre maximal de produits")
+    parser.add_argument('--vocab', default=DEFAULT_VOCAB_PATH, help="Vocabulaire BPE de CLIP (troncature exacte)")
+    parser.add_argument('--context-length', type=int, default=CONTEXT_LENGTH,
+                        help="Contexte de l'encodeur de texte (0 = description complète)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table, failures = build_table(get_router(parse_endpoints()), args.csv, args.images, args.batch_size,
+                                  args.model_version, args.limit, get_tokenizer(args.vocab), args.context_length)
+    table.content_hash = content_fingerprint(args.csv, args.images)
+    table.save(args.output)
+    print(f"✅ Table écrite : {args.output} ({os.path.getsize(args.output) / 1024:.1f} Ko, {len(table)} produits, "
+          f"{failures} échecs, modèle {table.model_version}, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
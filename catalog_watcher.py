@@ -0,0 +1,259 @@
+"""
+Rafraîchissement incrémental du catalogue partagé
+
+Le CSV des produits et le répertoire des images sont surveillés (watchdog /
+inotify s'il est installé, sinon par scrutation périodique). À chaque
+changement, les lignes sont comparées par uniq_id et les images par (date de
+modification, taille) : seules les lignes nouvelles, dont l'arbre de catégories
+ou l'image a changé, ou dont le fichier image a été ajouté, modifié ou supprimé
+sont re-dérivées (catalog.derive_columns) ; les colonnes dérivées des autres
+lignes sont reprises de la version précédente.
+
+Seules les colonnes utilisées par les sections de la page EDA restent en
+mémoire (CONSUMER_COLUMNS['eda'] et colonnes dérivées) : les agrégats portant
+sur toutes les colonnes (aperçu, valeurs manquantes, statistiques
+descriptives) sont calculés une fois par version, avant l'élagage.
+
+La nouvelle version est construite dans un thread d'arrière-plan puis publiée
+par simple remplacement de référence : les sessions continuent de lire la
+version courante pendant le calcul et reçoivent la nouvelle à leur prochain
+rerun, sans jamais attendre.
+"""
+
+import os
+import time
+import hashlib
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR, CONSUMER_COLUMNS, DERIVED_SCHEMA, read_catalog, derive_columns
+from eda_snapshot import AGGREGATES
+
+# Intervalle de scrutation du CSV et des images (secondes)
+POLL_INTERVAL = 5.0
+
+# Délai de regroupement des événements du système de fichiers (secondes)
+DEBOUNCE_DELAY = 0.5
+
+# Colonnes sources dont dépendent les colonnes dérivées
+DERIVATION_COLUMNS = ['product_category_tree', 'image']
+
+# Agrégats de la page EDA calculés sur toutes les colonnes, avant élagage
+TABLE_AGGREGATES = ('overview', 'missing_values', 'describe_tables')
+
+
+def scan_images(images_dir=IMAGES_DIR):
+    """État du répertoire des images : nom -> (date de modification, taille)"""
+    try:
+        with os.scandir(images_dir) as entries:
+            return {entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+                    for entry in entries if entry.is_file()}
+    except OSError:
+        return {}
+
+
+def csv_state(csv_path=CATALOG_CSV_PATH):
+    """État du CSV : (date de modification, taille), ou None s'il est absent"""
+    try:
+        stat = os.stat(csv_path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _comparable(values):
+    """Valeurs en tableau d'objets, valeurs manquantes remplacées par None (comparables entre elles)"""
+    values = values.astype(object)
+    return values.where(values.notna(), None).to_numpy()
+
+
+class CatalogVersion:
+    """Version publiée du catalogue (lecture seule)"""
+
+    def __init__(self, number, catalog, csv_state, images_state, derived_rows, built_in, aggregates=None):
+        self.number = number
+        self.catalog = catalog
+        # Agrégats calculés sur le catalogue complet (TABLE_AGGREGATES)
+        self.aggregates = aggregates or {}
+        self.csv_state = csv_state
+        self.images_state = images_state
+        self.derived_rows = derived_rows
+        self.built_in = built_in
+        self.published_at = time.time()
+        # Clé de cache : empreinte de l'état des fichiers, identique d'un réplica à l'autre (cache partagé)
+        digest = hashlib.md5(repr((csv_state, sorted(images_state.items()))).encode('utf-8'))
+        self.token = digest.hexdigest()[:16]
+
+
+class IncrementalCatalog:
+    """Catalogue partagé, rafraîchi de façon incrémentale en arrière-plan"""
+
+    def __init__(self, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, poll_interval=POLL_INTERVAL):
+        self.csv_path = csv_path
+        self.images_dir = images_dir
+        self.poll_interval = poll_interval
+        self.last_error = None
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._current = self._build(None)
+
+    def current(self):
+        """Version publiée (jamais bloquant)"""
+        return self._current
+
+    def _build(self, previous):
+        """Construit une version à partir de la précédente (None : calcul complet)"""
+        start = time.perf_counter()
+        images_state = scan_images(self.images_dir)
+        state = csv_state(self.csv_path)
+        source = read_catalog(self.csv_path)
+
+        if previous is None or not source['uniq_id'].is_unique or not previous.catalog['uniq_id'].is_unique:
+            catalog = derive_columns(source, self.images_dir)
+            derived_rows = len(catalog)
+        else:
+            catalog, derived_rows = self._derive_incrementally(source, previous, images_state)
+        aggregates = {name: AGGREGATES[name](catalog) for name in TABLE_AGGREGATES}
+        # Seules les colonnes des sections EDA restent en mémoire ; le catalogue complet est libéré
+        resident = [column for column in catalog.columns
+                    if column in CONSUMER_COLUMNS['eda'] or column in DERIVED_SCHEMA]
+        return CatalogVersion(0 if previous is None else previous.number + 1, catalog[resident].copy(), state,
+                              images_state, derived_rows, time.perf_counter() - start, aggregates)
+
+    def _derive_incrementally(self, source, previous, images_state):
+        """Colonnes dérivées recalculées pour les seules lignes touchées par le changement"""
+        old = previous.catalog.set_index('uniq_id')
+        ids = source['uniq_id']
+        known = ids.isin(old.index).to_numpy()
+
+        # Lignes dont les colonnes sources des dérivées ont changé
+        dirty = ~known
+        for column in DERIVATION_COLUMNS:
+            if column in source.columns:
+                before = _comparable(old[column].reindex(ids))
+                after = _comparable(source[column])
+                dirty |= before != after
+
+        # Lignes dont le fichier image a été ajouté, modifié ou supprimé
+        if 'image' in source.columns:
+            changed_files = {name for name in set(images_state) | set(previous.images_state)
+                             if images_state.get(name) != previous.images_state.get(name)}
+            if changed_files:
+                dirty |= source['image'].isin(changed_files).to_numpy()
+
+        derived_columns = [column for column in DERIVED_SCHEMA if column in old.columns]
+        derived = old[derived_columns].reindex(ids).astype(object)
+        derived.index = source.index
+        if dirty.any():
+            recomputed = derive_columns(source[dirty].copy(), self.images_dir)
+            derived.loc[dirty, derived_columns] = recomputed[derived_columns].astype(object).to_numpy()
+
+        catalog = pd.concat([source, derived], axis=1)
+        return catalog.astype({column: DERIVED_SCHEMA[column] for column in derived_columns}), int(dirty.sum())
+
+    def has_changed(self):
+        """Le CSV ou les images ont-ils changé depuis la version publiée ?"""
+        current = self._current
+        return csv_state(self.csv_path) != current.csv_state or scan_images(self.images_dir) != current.images_state
+
+    def refresh(self, force=False):
+        """
+        Construit et publie une nouvelle version si les données ont changé
+
+        Returns:
+            CatalogVersion: Version publiée (inchangée si rien n'a changé ou en cas d'erreur)
+        """
+        with self._refresh_lock:
+            if force or self.has_changed():
+                try:
+                    self._current = self._build(self._current)
+                    self.last_error = None
+                except Exception as e:
+                    # CSV en cours d'écriture ou illisible : la version courante reste servie
+                    self.last_error = str(e)
+            return self._current
+
+    def notify(self):
+        """Signale un changement (événement du système de fichiers)"""
+        self._wake.set()
+
+    def start(self):
+        """Démarre la surveillance (sans effet si elle tourne déjà)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._observer = _start_observer(self)
+            self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrête la surveillance"""
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    @property
+    def mode(self):
+        """'events' (watchdog) ou 'polling'"""
+        return 'events' if self._observer is not None else 'polling'
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Avec watchdog, la scrutation n'est qu'un filet de sécurité
+            woken = self._wake.wait(self.poll_interval * (6 if self._observer is not None else 1))
+            if self._stop.is_set():
+                return
+            if woken:
+                # Regrouper les événements d'une même écriture (copie de plusieurs images, CSV réécrit)
+                time.sleep(DEBOUNCE_DELAY)
+                self._wake.clear()
+            self.refresh()
+
+
+def _start_observer(catalog):
+    """Observateur watchdog (inotify sous Linux), ou None si watchdog n'est pas installé"""
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    csv_path = os.path.abspath(catalog.csv_path)
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            paths = {os.path.abspath(getattr(event, 'src_path', '')), os.path.abspath(getattr(event, 'dest_path', '') or '')}
+            if csv_path in paths or any(os.path.dirname(path) == os.path.abspath(catalog.images_dir) for path in paths):
+                catalog.notify()
+
+    observer = Observer()
+    observer.schedule(_Handler(), os.path.dirname(csv_path) or '.', recursive=False)
+    if os.path.isdir(catalog.images_dir):
+        observer.schedule(_Handler(), catalog.images_dir, recursive=False)
+    observer.daemon = True
+    try:
+        observer.start()
+    except OSError:
+        # Limite de surveillance inotify atteinte : scrutation seule
+        return None
+    return observer
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_catalog(csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, poll_interval=POLL_INTERVAL):
+    """
+    Catalogue partagé par toutes les sessions du processus, surveillé et rafraîchi en arrière-plan
+
+    Returns:
+        IncrementalCatalog: Catalogue ; current() donne la version publiée
+    """
+    return IncrementalCatalog(csv_path, images_dir, poll_interval).start()
@@ -0,0 +1,248 @@
+"""
+Troncature du texte au contexte de l'encodeur de texte CLIP
+
+L'encodeur de texte de CLIP ne lit que 77 jetons (début et fin de texte
+compris) : au-delà, le texte envoyé est tokenisé par le serveur puis ignoré.
+Le texte est donc découpé côté client, champ par champ, selon l'importance de
+chaque champ pour la classification, et seul ce que le modèle lira est envoyé.
+
+Le comptage utilise le vocabulaire BPE de CLIP (bpe_simple_vocab_16e6.txt.gz,
+celui du dépôt openai/CLIP) s'il est présent : le découpage est alors exact.
+Sinon, une estimation (un jeton par tranche de 6 lettres, par chiffre et par
+signe de ponctuation) est utilisée, et l'aperçu l'indique.
+"""
+
+import os
+import gzip
+import math
+import html
+import functools
+
+import streamlit as st
+
+try:
+    import regex as re
+    _PRETOKENIZE = (r"""<\|startoftext\|>|<\|endoftext\|>|'s|'t|'re|'ve|'m|'ll|'d|[\p{L}]+|[\p{N}]|"""
+                    r"""[^\s\p{L}\p{N}]+""")
+except ImportError:
+    import re
+    # Sans le module regex : classes Unicode approchées avec celles de re
+    _PRETOKENIZE = r"""<\|startoftext\|>|<\|endoftext\|>|'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|(?:[^\s\w]|_)+"""
+
+DEFAULT_VOCAB_PATH = 'bpe_simple_vocab_16e6.txt.gz'
+
+# Longueur du contexte de l'encodeur de texte (jetons de début et de fin compris)
+CONTEXT_LENGTH = 77
+
+# Taille du vocabulaire de CLIP : 256 octets x 2 (avec </w>), 48 894 fusions, 2 jetons spéciaux
+_MERGE_COUNT = 49152 - 256 - 2
+
+# Lettres par jeton de l'estimation sans vocabulaire
+APPROXIMATE_LETTERS_PER_TOKEN = 6
+
+# Champs du formulaire par ordre d'importance, avec la part de contexte réservée
+# en premier passage (None = tout ce qui reste) ; le reliquat est ensuite
+# redistribué dans le même ordre
+FIELD_PRIORITY = [
+    ('product_name', 24),
+    ('brand', 6),
+    ('specifications', 20),
+    ('description', None),
+]
+
+# Ordre des champs dans le texte envoyé (celui de la description complète)
+FIELD_ORDER = ['product_name', 'brand', 'description', 'specifications']
+
+_PATTERN = re.compile(_PRETOKENIZE, re.IGNORECASE)
+
+
+@functools.lru_cache()
+def bytes_to_unicode():
+    """Octets -> caractères Unicode imprimables (table du tokeniseur BPE de CLIP/GPT-2)"""
+    printable = (list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1))
+                 + list(range(ord("®"), ord("ÿ") + 1)))
+    characters = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            characters.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, [chr(c) for c in characters]))
+
+
+def _pairs(word):
+    return {(word[i], word[i + 1]) for i in range(len(word) - 1)}
+
+
+def pretokenize(text):
+    """
+    Morceaux de texte tokenisés séparément (mots, chiffres, ponctuation)
+
+    Returns:
+        list: (début, fin) de chaque morceau dans le texte
+    """
+    return [match.span() for match in _PATTERN.finditer(text)]
+
+
+class ClipTokenizer:
+    """Tokeniseur BPE de CLIP (même découpage que clip.simple_tokenizer)"""
+
+    exact = True
+
+    def __init__(self, merges):
+        byte_encoder = bytes_to_unicode()
+        vocab = list(byte_encoder.values())
+        vocab = vocab + [v + '</w>' for v in vocab] + [''.join(merge) for merge in merges]
+        vocab.extend(['<|startoftext|>', '<|endoftext|>'])
+        self.byte_encoder = byte_encoder
+        self.encoder = {token: i for i, token in enumerate(vocab)}
+        self.bpe_ranks = {merge: i for i, merge in enumerate(merges)}
+        self.cache = {'<|startoftext|>': ('<|startoftext|>',), '<|endoftext|>': ('<|endoftext|>',)}
+
+    @classmethod
+    def load(cls, path=DEFAULT_VOCAB_PATH):
+        """Charge les fusions BPE (format bpe_simple_vocab_16e6.txt.gz)"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        return cls([tuple(line.split()) for line in lines[1:_MERGE_COUNT + 1] if line.strip()])
+
+    def bpe(self, token):
+        """Sous-mots BPE d'un morceau (encodé en caractères d'octets)"""
+        if token in self.cache:
+            return self.cache[token]
+        word = tuple(token[:-1]) + (token[-1] + '</w>',)
+        pairs = _pairs(word)
+        while pairs:
+            bigram = min(pairs, key=lambda pair: self.bpe_ranks.get(pair, math.inf))
+            if bigram not in self.bpe_ranks:
+                break
+            first, second = bigram
+            merged, i = [], 0
+            while i < len(word):
+                if word[i] == first and i < len(word) - 1 and word[i + 1] == second:
+                    merged.append(first + second)
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+            word = tuple(merged)
+            pairs = _pairs(word) if len(word) > 1 else set()
+        self.cache[token] = word
+        return word
+
+    def _piece(self, piece):
+        return ''.join(self.byte_encoder[b] for b in piece.lower().encode('utf-8'))
+
+    def count(self, piece):
+        """Nombre de jetons d'un morceau"""
+        return len(self.bpe(self._piece(piece)))
+
+    def encode(self, text):
+        """Identifiants des jetons d'un texte (sans jetons de début et de fin)"""
+        text = html.unescape(html.unescape(text))
+        return [self.encoder[token] for start, end in pretokenize(text)
+                for token in self.bpe(self._piece(text[start:end]))]
+
+
+class ApproximateTokenizer:
+    """Estimation du nombre de jetons sans le vocabulaire BPE (même pré-découpage)"""
+
+    exact = False
+
+    def count(self, piece):
+        if piece[0].isalpha():
+            return max(1, math.ceil(len(piece) / APPROXIMATE_LETTERS_PER_TOKEN))
+        # Chiffres isolés ; ponctuation : un jeton par signe au plus
+        return len(piece)
+
+
+@st.cache_resource(show_spinner=False)
+def get_tokenizer(path=DEFAULT_VOCAB_PATH):
+    """
+    Tokeniseur partagé par le processus
+
+    Returns:
+        ClipTokenizer si le vocabulaire est présent, sinon ApproximateTokenizer
+    """
+    if path and os.path.exists(path):
+        try:
+            return ClipTokenizer.load(path)
+        except (OSError, ValueError, EOFError):
+            pass
+    return ApproximateTokenizer()
+
+
+def _token_ends(text, tokenizer):
+    """Fin de chaque morceau et nombre cumulé de jetons à cette fin"""
+    ends, total = [], 0
+    for start, end in pretokenize(text):
+        total += tokenizer.count(text[start:end])
+        ends.append((end, total))
+    return ends
+
+
+def _prefix(ends, budget):
+    """(longueur du texte, jetons) du plus long préfixe de morceaux entiers tenant dans budget"""
+    kept = (0, 0)
+    for end, total in ends:
+        if total > budget:
+            break
+        kept = (end, total)
+    return kept
+
+
+def fit_fields(fields, tokenizer, context_length=CONTEXT_LENGTH, priority=FIELD_PRIORITY, order=FIELD_ORDER):
+    """
+    Garde de chaque champ ce qui tient dans le contexte, par ordre d'importance
+
+    Les champs sont coupés entre deux mots ; un champ déjà contenu dans un champ
+    plus important (marque répétée dans le nom) n'est pas envoyé une seconde fois.
+
+    Args:
+        fields: Nom du champ -> texte (déjà nettoyé)
+        tokenizer: ClipTokenizer ou ApproximateTokenizer
+        context_length: Jetons lus par l'encodeur (début et fin compris) ; 0 = pas de troncature
+
+    Returns:
+        dict: text (texte envoyé), tokens, context_length, exact et fields (par champ :
+              name, kept, dropped, kept_tokens, total_tokens)
+    """
+    budget = context_length - 2 if context_length else math.inf
+    ends = {name: _token_ends(fields.get(name) or '', tokenizer) for name in order}
+    totals = {name: ends[name][-1][1] if ends[name] else 0 for name in order}
+    allowed = dict.fromkeys(order, 0)
+
+    kept_texts = []
+    for name, _ in priority:
+        text = (fields.get(name) or '').lower()
+        if text and any(text in other for other in kept_texts):
+            ends[name], totals[name] = [], 0
+        elif text:
+            kept_texts.append(text)
+
+    # Premier passage : part réservée de chaque champ ; second passage : reliquat
+    remaining = budget
+    for reserved in (True, False):
+        for name, share in priority:
+            if name not in allowed:
+                continue
+            wanted = totals[name] - allowed[name]
+            if reserved and share is not None:
+                wanted = min(wanted, share)
+            grant = min(wanted, remaining)
+            allowed[name] += grant
+            remaining -= grant
+
+    kept_fields, parts, tokens = [], [], 0
+    for name in order:
+        text = fields.get(name) or ''
+        length, kept_tokens = _prefix(ends[name], allowed[name]) if ends[name] else (0, 0)
+        kept = text[:length].strip()
+        if kept:
+            parts.append(kept)
+        tokens += kept_tokens
+        kept_fields.append({'name': name, 'kept': kept, 'dropped': text[length:].strip() if ends[name] else text,
+                            'kept_tokens': kept_tokens, 'total_tokens': totals[name]})
+    return {'text': ' '.join(parts), 'tokens': tokens, 'context_length': context_length,
+            'exact': tokenizer.exact, 'fields': kept_fields}
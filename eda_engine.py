@@ -0,0 +1,459 @@
+"""
+Moteurs de calcul des agrégats de la page EDA
+
+- 'memory' : le catalogue entier est chargé dans un DataFrame (load_catalog) et
+  chaque agrégat est calculé par les fonctions de eda_snapshot.AGGREGATES.
+- 'chunked' : le CSV est lu par morceaux ; chaque morceau est traité (colonnes
+  dérivées, lecture des en-têtes d'images) dans un pool de threads puis résumé
+  en agrégats partiels, fusionnés dans l'ordre des morceaux. L'état conservé
+  est de taille fixe, quelle que soit la taille du catalogue :
+  - compteurs exacts (lignes, valeurs manquantes, catégories, images valides)
+    et moments (effectif, moyenne, écart-type, min, max) des colonnes numériques ;
+  - par colonne catégorique, une esquisse KMV des sketch_size plus petites
+    empreintes de 64 bits (nombre de valeurs distinctes) et la table des
+    sketch_size valeurs les plus fréquentes (valeur la plus fréquente) ;
+  - un échantillon uniforme de sample_rows lignes (réservoir) pour les quantiles,
+    le nuage de points et les images d'exemple, et au plus sample_rows images
+    invalides.
+  Une seconde lecture du CSV, où seules les quelques lignes utiles sont
+  re-dérivées, récupère les valeurs affichées (valeur la plus fréquente, image
+  d'exemple).
+
+Les deux moteurs produisent des agrégats identiques tant que le catalogue compte
+au plus sample_rows lignes et chaque colonne catégorique moins de sketch_size
+valeurs distinctes. Au-delà, les quantiles, les points et les images d'exemple
+proviennent de l'échantillon, le nombre de valeurs distinctes est estimé et la
+valeur la plus fréquente est approchée ; les autres agrégats restent exacts.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR, load_catalog, derive_columns, iter_catalog_chunks
+from eda_snapshot import AGGREGATES, series_to_dict, frame_to_dict
+
+ENGINES = ('memory', 'chunked')
+DEFAULT_ENGINE = 'memory'
+
+# Lignes par morceau du moteur 'chunked'
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Threads de traitement des morceaux (lecture des en-têtes d'images)
+DEFAULT_SCAN_WORKERS = min(4, os.cpu_count() or 1)
+
+# Taille de l'état du moteur 'chunked' : lignes échantillonnées, empreintes par colonne catégorique
+DEFAULT_SAMPLE_ROWS = 200_000
+DEFAULT_SKETCH_SIZE = 4096
+
+_NUMERICAL_TYPES = 'number'
+_CATEGORICAL_TYPES = ['object', 'string', 'category', 'bool']
+
+# Colonnes ajoutées aux lignes échantillonnées
+_MAIN_CODE = '__main_code'
+_IMAGE_EXISTS = '__image_exists'
+
+
+def _distinct(values, rows):
+    """Empreintes distinctes d'une colonne : (empreinte, première ligne, occurrences)"""
+    mask = values.notna().to_numpy()
+    hashes = pd.util.hash_array(values.to_numpy(dtype=object)[mask])
+    hashes, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+    return hashes, rows[mask][first], counts
+
+
+class DistinctSketch:
+    """
+    Valeurs distinctes d'une colonne catégorique en mémoire bornée
+
+    - kmv : les size plus petites empreintes vues (K Minimum Values), triées ;
+      fusion par np.union1d, estimation (size - 1) / (size-ième empreinte / 2^64)
+    - hashes / first / counts : table des valeurs suivies (au plus size), celles
+      de plus grand nombre d'occurrences ; exacte tant que la colonne compte au
+      plus size valeurs distinctes, minorante au-delà
+    """
+
+    def __init__(self, size=DEFAULT_SKETCH_SIZE):
+        self.size = size
+        self.count = 0
+        self.kmv = np.empty(0, dtype=np.uint64)
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.first = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def add(self, hashes, first, counts):
+        """Ajoute les empreintes distinctes (triées) d'un morceau, voir _distinct"""
+        self.count += int(counts.sum())
+        self.kmv = np.union1d(self.kmv, hashes[:self.size])[:self.size]
+
+        hashes, inverse = np.unique(np.concatenate([self.hashes, hashes]), return_inverse=True)
+        merged_first = np.full(len(hashes), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(merged_first, inverse, np.concatenate([self.first, first]))
+        merged_counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts]),
+                                    minlength=len(hashes)).astype(np.int64)
+        if len(hashes) > self.size:
+            # Les plus fréquentes, à égalité les premières apparues
+            keep = np.sort(np.lexsort((merged_first, -merged_counts))[:self.size])
+            hashes, merged_first, merged_counts = hashes[keep], merged_first[keep], merged_counts[keep]
+        self.hashes, self.first, self.counts = hashes, merged_first, merged_counts
+
+    def unique_count(self):
+        """Nombre de valeurs distinctes : exact sous size, estimé au-delà"""
+        if len(self.kmv) < self.size:
+            return len(self.kmv)
+        return int(round((self.size - 1) / (float(self.kmv[-1]) / 2.0 ** 64)))
+
+    def top(self):
+        """(première ligne, occurrences) de la valeur la plus fréquente, None si colonne vide"""
+        if len(self.hashes) == 0:
+            return None
+        # Comme value_counts (tri stable) : à égalité, la valeur apparue la première
+        order = np.argsort(self.first, kind='stable')
+        position = int(np.argmax(self.counts[order]))
+        return int(self.first[order][position]), int(self.counts[order][position])
+
+
+def _moments(frame):
+    """Moments d'un DataFrame numérique par colonne : (effectif, moyenne, M2, min, max)"""
+    values = frame.astype(np.float64)
+    mean = values.mean()
+    return (values.count().to_numpy(dtype=np.float64), mean.to_numpy(),
+            ((values - mean) ** 2).sum().to_numpy(), values.min().to_numpy(), values.max().to_numpy())
+
+
+def _merge_moments(left, right):
+    """Fusionne deux jeux de moments (formule de Chan et al.)"""
+    if left is None:
+        return right
+    n_a, mean_a, m2_a, min_a, max_a = left
+    n_b, mean_b, m2_b, min_b, max_b = right
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = mean_b - mean_a
+        mean = np.where(n_b == 0, mean_a, np.where(n_a == 0, mean_b, mean_a + delta * n_b / n))
+        m2 = np.where(n_b == 0, m2_a, np.where(n_a == 0, m2_b, m2_a + m2_b + delta ** 2 * n_a * n_b / n))
+    return n, mean, m2, np.fmin(min_a, min_b), np.fmax(max_a, max_b)
+
+
+def _exact_moments(describe, moments):
+    """Remplace effectif, moyenne, écart-type, min et max d'un describe() d'échantillon par les valeurs exactes"""
+    count, mean, m2, minimum, maximum = moments
+    describe = describe.copy()
+    describe.loc['count'] = count
+    describe.loc['mean'] = mean
+    with np.errstate(invalid='ignore', divide='ignore'):
+        describe.loc['std'] = np.sqrt(m2 / (count - 1))
+    describe.loc['min'] = minimum
+    describe.loc['max'] = maximum
+    return describe
+
+
+class RowSample:
+    """
+    Échantillon uniforme d'au plus capacity lignes (réservoir, algorithme R)
+
+    Contient toutes les lignes tant que capacity n'est pas atteint. Le tirage
+    est reproductible (graine fixe, lignes ajoutées dans l'ordre du CSV).
+    """
+
+    def __init__(self, capacity=DEFAULT_SAMPLE_ROWS, seed=42):
+        self.capacity = capacity
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._parts = []
+        # Réservoir plein : index global et valeurs de chaque colonne
+        self._index = None
+        self._arrays = None
+
+    @property
+    def complete(self):
+        """Toutes les lignes vues sont dans l'échantillon"""
+        return self.seen <= self.capacity
+
+    def add(self, frame):
+        """Ajoute les lignes d'un morceau (index global)"""
+        take = max(0, min(len(frame), self.capacity - self.seen))
+        if take:
+            self._parts.append(frame.iloc[:take])
+            self.seen += take
+        rest = frame.iloc[take:]
+        if rest.empty:
+            return
+        if self._arrays is None:
+            full = pd.concat(self._parts)
+            self._parts = []
+            self._index = full.index.to_numpy(dtype=np.int64).copy()
+            self._arrays = {col: full[col].to_numpy().copy() for col in full.columns}
+        # La ligne de rang p remplace l'emplacement tiré dans [0, p] s'il est dans le réservoir
+        slots = self._rng.integers(0, np.arange(self.seen, self.seen + len(rest)) + 1)
+        self.seen += len(rest)
+        chosen = np.flatnonzero(slots < self.capacity)[::-1]
+        # Emplacement tiré plusieurs fois : la dernière ligne l'emporte
+        slots, last = np.unique(slots[chosen], return_index=True)
+        chosen = chosen[last]
+        self._index[slots] = rest.index.to_numpy(dtype=np.int64)[chosen]
+        for col, values in self._arrays.items():
+            values[slots] = rest[col].to_numpy()[chosen]
+
+    def __len__(self):
+        return len(self._index) if self._index is not None else sum(len(part) for part in self._parts)
+
+    def to_frame(self):
+        """Lignes échantillonnées, dans l'ordre du CSV"""
+        if self._arrays is None:
+            return pd.concat(self._parts) if self._parts else pd.DataFrame()
+        order = np.argsort(self._index)
+        return pd.DataFrame({col: values[order] for col, values in self._arrays.items()}, index=self._index[order])
+
+
+def scan_chunk(chunk, images_dir=IMAGES_DIR):
+    """
+    Agrégats partiels d'un morceau du CSV (exécuté dans un thread du pool)
+
+    Args:
+        chunk: Morceau lu par iter_catalog_chunks (index global des lignes)
+        images_dir: Répertoire des images
+
+    Returns:
+        dict: Agrégats partiels, fusionnés par ChunkedAggregates.add
+    """
+    df = derive_columns(chunk, images_dir)
+    rows = df.index.to_numpy(dtype=np.int64)
+    categorical_cols = df.select_dtypes(include=_CATEGORICAL_TYPES).columns
+    categorical = df[categorical_cols].astype(str)
+    numerical = df.select_dtypes(include=_NUMERICAL_TYPES)
+    has_pixels = df['image_pixels'] > 0
+    # Images valides par catégorie (image présente et lisible), avec la première ligne de chacune
+    valid_categories = df.loc[df['image_exists'] & has_pixels, 'main_category'].astype(object)
+    return {
+        'columns': list(df.columns),
+        'rows': len(df),
+        'missing': df.isna().sum(),
+        'numerical': numerical,
+        'moments': _moments(numerical),
+        'image_moments': _moments(numerical.loc[has_pixels, ['image_pixels', 'aspect_ratio']]),
+        'categorical_columns': list(categorical_cols),
+        'distinct': {col: _distinct(categorical[col], rows) for col in categorical_cols},
+        'main_category': df['main_category'].astype(object).to_numpy(),
+        'sub_counts': df['sub_categories'].astype(object).value_counts(sort=False),
+        'image_exists': df['image_exists'].to_numpy(),
+        'valid_counts': valid_categories.value_counts(sort=False),
+        'first_valid': valid_categories.drop_duplicates(),
+        'invalid': df[~has_pixels][['image', 'main_category', 'image_pixels']],
+    }
+
+
+class ChunkedAggregates:
+    """Fusion, dans l'ordre des lignes, des agrégats partiels des morceaux (état de taille fixe)"""
+
+    def __init__(self, sample_rows=DEFAULT_SAMPLE_ROWS, sketch_size=DEFAULT_SKETCH_SIZE):
+        self.sample_rows = sample_rows
+        self.sketch_size = sketch_size
+        self.columns = None
+        self.numerical_columns = []
+        self.row_count = 0
+        self.missing = None
+        self.moments = None
+        self.image_moments = None
+        self.categorical_columns = []
+        self.distinct = {}
+        self.categories = {}
+        self.main_counts = {}
+        self.sub_counts = {}
+        self.valid_counts = {}
+        self.first_valid = {}
+        self.sample = RowSample(sample_rows)
+        self.invalid = []
+        self.invalid_rows = 0
+
+    def add(self, partial):
+        """Ajoute les agrégats partiels du morceau suivant"""
+        if self.columns is None:
+            self.columns = partial['columns']
+            self.numerical_columns = list(partial['numerical'].columns)
+            self.categorical_columns = partial['categorical_columns']
+            self.missing = partial['missing']
+        else:
+            self.missing = self.missing + partial['missing']
+        self.row_count += partial['rows']
+        self.moments = _merge_moments(self.moments, partial['moments'])
+        self.image_moments = _merge_moments(self.image_moments, partial['image_moments'])
+        for col, distinct in partial['distinct'].items():
+            self.distinct.setdefault(col, DistinctSketch(self.sketch_size)).add(*distinct)
+        # Catégories principales codées dans l'ordre de première apparition
+        main_codes = np.array([self.categories.setdefault(category, len(self.categories))
+                               for category in partial['main_category']], dtype=np.int32)
+        for category, count in pd.Series(partial['main_category']).value_counts(sort=False).items():
+            self.main_counts[category] = self.main_counts.get(category, 0) + int(count)
+        for category, count in partial['sub_counts'].items():
+            self.sub_counts[category] = self.sub_counts.get(category, 0) + int(count)
+        for category, count in partial['valid_counts'].items():
+            self.valid_counts[category] = self.valid_counts.get(category, 0) + int(count)
+        for row, category in partial['first_valid'].items():
+            self.first_valid.setdefault(category, int(row))
+        self.sample.add(partial['numerical'].assign(**{_MAIN_CODE: main_codes,
+                                                       _IMAGE_EXISTS: partial['image_exists']}))
+        if self.invalid_rows < self.sample_rows:
+            invalid = partial['invalid'].iloc[:self.sample_rows - self.invalid_rows]
+            self.invalid.append(invalid)
+            self.invalid_rows += len(invalid)
+
+    def finalize(self, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        Agrégats finaux, au format de eda_snapshot.AGGREGATES
+
+        Args:
+            csv_path: CSV relu (sans les images) pour les quelques valeurs affichées
+
+        Returns:
+            dict: Nom de l'agrégat -> résultat
+        """
+        sampled = self.sample.to_frame()
+        numerical = sampled[self.numerical_columns] if not sampled.empty else pd.DataFrame(
+            columns=self.numerical_columns)
+        categories = list(self.categories)
+        main = pd.Series(pd.Categorical.from_codes(sampled[_MAIN_CODE].to_numpy(), categories)
+                         if not sampled.empty else [], index=numerical.index, dtype='category')
+        # Catégories triées, comme après astype('category') sur le catalogue entier
+        main = main.cat.reorder_categories(sorted(categories))
+        image_exists = sampled[_IMAGE_EXISTS].to_numpy(dtype=bool) if not sampled.empty else np.array([], dtype=bool)
+
+        # Images d'exemple : même tirage que Series.sample(n=1, random_state=42) sur les images valides
+        # (de l'échantillon ; première image valide si l'échantillon n'en contient aucune)
+        valid = image_exists & (numerical['image_pixels'].to_numpy() > 0)
+        sample_rows = {}
+        for category in categories:
+            rows = numerical.index[valid & (main == category).to_numpy()]
+            row = int(rows.to_series().sample(n=1, random_state=42).iloc[0]) if len(rows) \
+                else self.first_valid.get(category)
+            sample_rows[category] = (row, self.valid_counts.get(category, 0))
+
+        tops = {}
+        for col, sketch in self.distinct.items():
+            top = sketch.top()
+            if top is not None:
+                tops[col] = top
+        values = self._fetch_values(csv_path, images_dir, chunk_rows,
+                                    {row for row, _ in tops.values()} | {row for row, _ in sample_rows.values()
+                                                                         if row is not None})
+
+        # Statistiques descriptives (moments exacts si les quantiles viennent d'un échantillon)
+        numerical_describe = numerical.describe() if not numerical.columns.empty else None
+        if numerical_describe is not None and not self.sample.complete:
+            numerical_describe = _exact_moments(numerical_describe, self.moments)
+        categorical_describe = None
+        if self.categorical_columns:
+            categorical_describe = pd.DataFrame(
+                {col: [self.distinct[col].count, self.distinct[col].unique_count(), values[tops[col][0]][col],
+                       tops[col][1]] if col in tops
+                 else [0, 0, np.nan, np.nan] for col in self.categorical_columns},
+                index=['count', 'unique', 'top', 'freq'], dtype=object
+            )
+
+        # Comptes par catégorie : ordre des catégories triées (dtype category), puis tri décroissant stable
+        ordered = sorted(categories)
+        main_count = pd.Series([self.main_counts[category] for category in ordered],
+                               index=pd.CategoricalIndex(ordered, name='main_category'), name='count',
+                               dtype=np.int64).sort_values(ascending=False, kind='stable')
+        sub_count = pd.Series({category: self.sub_counts[category] for category in sorted(self.sub_counts)},
+                              name='count', dtype=np.int64).sort_values(ascending=False, kind='stable')
+
+        valid_image_df = numerical[numerical['image_pixels'] > 0][['image_pixels', 'aspect_ratio']]
+        valid_image_describe = valid_image_df.describe() if not valid_image_df.empty else None
+        if valid_image_describe is not None and not self.sample.complete:
+            valid_image_describe = _exact_moments(valid_image_describe, self.image_moments)
+        invalid_images = pd.concat(self.invalid) if self.invalid else pd.DataFrame(
+            columns=['image', 'main_category', 'image_pixels'])
+
+        return {
+            'overview': {'columns': self.columns or [], 'row_count': int(self.row_count)},
+            'missing_values': series_to_dict(self.missing),
+            'describe_tables': {
+                'numerical': frame_to_dict(numerical_describe),
+                'categorical': frame_to_dict(categorical_describe),
+            },
+            'category_counts': {
+                'main': series_to_dict(main_count),
+                'sub_top20': series_to_dict(sub_count.head(20)),
+            },
+            'image_samples': [
+                {'category': category, 'valid_count': count,
+                 'sample_image': None if row is None else values[row]['image']}
+                for category, (row, count) in sample_rows.items()
+            ],
+            'image_statistics': {
+                'valid_count': int(self.image_moments[0][0]) if self.image_moments is not None else 0,
+                'describe': frame_to_dict(valid_image_describe),
+                'points': {
+                    'aspect_ratio': valid_image_df['aspect_ratio'].tolist(),
+                    'image_pixels': valid_image_df['image_pixels'].tolist(),
+                    'main_category': main[valid_image_df.index].tolist(),
+                },
+                'invalid': frame_to_dict(invalid_images.astype({'main_category': object}).reset_index(drop=True)),
+            },
+        }
+
+    @staticmethod
+    def _fetch_values(csv_path, images_dir, chunk_rows, rows):
+        """Seconde lecture : valeurs (converties en texte) des lignes demandées"""
+        values = {}
+        if not rows:
+            return values
+        for chunk in iter_catalog_chunks(csv_path, chunk_rows=chunk_rows):
+            selected = chunk.index.intersection(sorted(rows))
+            if len(selected):
+                # Colonnes dérivées recalculées sur ces seules lignes
+                for row, record in derive_columns(chunk.loc[selected], images_dir).astype(str).iterrows():
+                    values[int(row)] = record.to_dict()
+        return values
+
+
+def compute_aggregates_chunked(csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, chunk_rows=DEFAULT_CHUNK_ROWS,
+                               workers=DEFAULT_SCAN_WORKERS):
+    """
+    Agrégats de la page EDA par morceaux, en mémoire bornée
+
+    Les morceaux sont traités en parallèle ; au plus 2 x workers morceaux sont en
+    mémoire à la fois.
+
+    Args:
+        csv_path: Chemin du CSV des produits
+        images_dir: Répertoire des images
+        chunk_rows: Lignes par morceau
+        workers: Threads de traitement
+
+    Returns:
+        dict: Nom de l'agrégat -> résultat (voir eda_snapshot.AGGREGATES)
+    """
+    aggregates = ChunkedAggregates()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eda-scan") as executor:
+        pending = []
+        for chunk in iter_catalog_chunks(csv_path, chunk_rows=chunk_rows):
+            pending.append(executor.submit(scan_chunk, chunk, images_dir))
+            # Fusion dans l'ordre des morceaux, avec un nombre borné de morceaux en vol
+            while len(pending) >= 2 * workers:
+                aggregates.add(pending.pop(0).result())
+        for future in pending:
+            aggregates.add(future.result())
+    return aggregates.finalize(csv_path, images_dir, chunk_rows)
+
+
+def compute_aggregates(engine=DEFAULT_ENGINE, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR,
+                       chunk_rows=DEFAULT_CHUNK_ROWS, workers=DEFAULT_SCAN_WORKERS):
+    """
+    Tous les agrégats de la page EDA avec le moteur choisi
+
+    Args:
+        engine: 'memory' ou 'chunked'
+
+    Returns:
+        dict: Nom de l'agrégat -> résultat
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur EDA inconnu : {engine}")
+    if engine == 'chunked':
+        return compute_aggregates_chunked(csv_path, images_dir, chunk_rows, workers)
+    df = load_catalog(csv_path, images_dir)
+    return {name: compute(df) for name, compute in AGGREGATES.items()}
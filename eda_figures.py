@@ -0,0 +1,312 @@
+"""
+Construction des graphiques de la page EDA
+
+Chaque figure est mémorisée sous forme de JSON Plotly (ou de PNG pour le nuage
+de mots) par (empreinte du dataset, mode d'accessibilité) : changer une option
+de la sidebar ne reconstruit que les graphiques des sections ouvertes, et
+revenir à un mode déjà vu ne reconstruit rien. Les figures sont aussi
+partagées entre réplicas par le cache partagé (shared_cache.py).
+
+plotly.express, matplotlib et wordcloud sont importés à la première
+construction d'une figure, pas au chargement du module.
+"""
+
+import io
+
+import streamlit as st
+
+from shared_cache import shared_memoize
+
+# Configuration d'accessibilité pour les graphiques
+ACCESSIBLE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                     '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+# Palette optimisée pour le mode contraste élevé (couleurs vives sur fond sombre)
+HIGH_CONTRAST_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7',
+                        '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9',
+                        '#F8C471', '#82E0AA', '#F1948A', '#85C1E9', '#D7BDE2']
+
+
+def accessibility_mode(accessibility):
+    """Clé hachable (high_contrast, large_text, color_blind) des options d'accessibilité"""
+    return (
+        bool(accessibility.get('high_contrast', False)),
+        bool(accessibility.get('large_text', False)),
+        bool(accessibility.get('color_blind', False)),
+    )
+
+
+def _theme(mode):
+    """Couleurs et tailles de police correspondant à un mode d'accessibilité"""
+    high_contrast, large_text, color_blind = mode
+    if color_blind:
+        from plotly.colors import qualitative
+        colors = qualitative.Safe  # Accessible palette for color-blind users
+    elif high_contrast:
+        colors = HIGH_CONTRAST_COLORS
+    else:
+        colors = ACCESSIBLE_COLORS
+    return {
+        'colors': colors,
+        'bg_color': '#000000' if high_contrast else '#FFFFFF',
+        'text_color': '#FFFFFF' if high_contrast else '#000000',
+        'continuous_scale': 'viridis' if color_blind else 'plasma' if high_contrast else 'Blues',
+        'high_contrast': high_contrast,
+        'large_text': large_text,
+    }
+
+
+def figure_from_json(figure_json):
+    """Reconstruit une figure Plotly à partir de son JSON mémorisé"""
+    import plotly.io as pio
+    return pio.from_json(figure_json)
+
+
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def category_bar_json(dataset_hash, mode, _category_count):
+    """Histogramme du nombre de produits par catégorie principale"""
+    import plotly.express as px
+
+    theme = _theme(mode)
+    text_color = theme['text_color']
+    large_text = theme['large_text']
+
+    fig1 = px.bar(_category_count, x=_category_count.index, y=_category_count.values,
+                  title="Nombre de Produits par Catégorie Principale",
+                  color=_category_count.index,
+                  color_discrete_sequence=theme['colors'][:len(_category_count)])
+
+    fig1.update_layout(
+        xaxis_title="Catégories",
+        yaxis_title="Nombre de produits",
+        plot_bgcolor=theme['bg_color'],
+        paper_bgcolor=theme['bg_color'],
+        font=dict(size=14 if not large_text else 18, color=text_color),
+        legend_title="Catégories",
+        legend=dict(font=dict(color=text_color)),
+        margin=dict(l=50, r=50, t=50, b=100),  # Ensure enough space for rotated labels
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        )
+    )
+    fig1.update_xaxes(
+        tickangle=45,
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig1.update_yaxes(
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    return fig1.to_json()
+
+
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def subcategory_pie_json(dataset_hash, mode, _subcat_count):
+    """Camembert des 20 principales branches de catégories"""
+    import plotly.express as px
+
+    theme = _theme(mode)
+    text_color = theme['text_color']
+    large_text = theme['large_text']
+
+    fig2 = px.pie(_subcat_count, values=_subcat_count.values, names=_subcat_count.index,
+                  title="Top 20 Branches de Catégories",
+                  color_discrete_sequence=theme['colors'])
+    fig2.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Valeur: %{value}<br>Pourcentage: %{percent}',
+        textfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig2.update_layout(
+        uniformtext_minsize=12 if not large_text else 16,
+        uniformtext_mode='hide',
+        legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02, font=dict(color=text_color, size=10)),
+        plot_bgcolor=theme['bg_color'],
+        paper_bgcolor=theme['bg_color'],
+        font=dict(color=text_color),
+        margin=dict(r=200),  # Ajouter une marge à droite pour la légende
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        )
+    )
+    return fig2.to_json()
+
+
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def keyword_bar_json(dataset_hash, mode, _keyword_freq_df):
+    """Histogramme des 50 mots-clés les plus fréquents"""
+    import plotly.express as px
+
+    theme = _theme(mode)
+    text_color = theme['text_color']
+    large_text = theme['large_text']
+    high_contrast = theme['high_contrast']
+
+    fig3 = px.bar(_keyword_freq_df.head(50), x='Mot Clé', y='Fréquence',
+                  title="Fréquence des Mots-Clés (Top 50)",
+                  color='Fréquence',
+                  color_continuous_scale=theme['continuous_scale'])
+    fig3.update_layout(
+        xaxis_title="Mots-clés",
+        yaxis_title="Fréquence",
+        xaxis_tickangle=45,
+        plot_bgcolor=theme['bg_color'],
+        paper_bgcolor=theme['bg_color'],
+        font=dict(size=14 if not large_text else 18, color=text_color),
+        showlegend=False,
+        hoverlabel=dict(
+            bgcolor="white" if high_contrast else "rgba(255,255,255,0.8)",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black"
+        )
+    )
+    fig3.update_xaxes(
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig3.update_yaxes(
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    return fig3.to_json()
+
+
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def keyword_pie_json(dataset_hash, mode, _keyword_freq_df):
+    """Camembert des 20 mots-clés les plus fréquents"""
+    import plotly.express as px
+
+    theme = _theme(mode)
+    text_color = theme['text_color']
+    large_text = theme['large_text']
+    high_contrast = theme['high_contrast']
+
+    fig4 = px.pie(_keyword_freq_df.head(20), values='Fréquence', names='Mot Clé',
+                  title="Top 20 Mots-Clés par Fréquence",
+                  color_discrete_sequence=theme['colors'])
+    fig4.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Fréquence: %{value}<br>Pourcentage: %{percent}',
+        textfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig4.update_layout(
+        plot_bgcolor=theme['bg_color'],
+        paper_bgcolor=theme['bg_color'],
+        font=dict(color=text_color),
+        legend=dict(font=dict(color=text_color)),
+        hoverlabel=dict(
+            bgcolor="white" if high_contrast else "rgba(255,255,255,0.8)",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black"
+        )
+    )
+    return fig4.to_json()
+
+
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def wordcloud_png(dataset_hash, mode, _top_keywords):
+    """
+    Nuage de mots des mots-clés les plus fréquents, rendu en PNG
+
+    Returns:
+        bytes: Image PNG ou None si wordcloud n'est pas installé
+    """
+    try:
+        from wordcloud import WordCloud
+    except ImportError:
+        return None
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    high_contrast, large_text, color_blind = mode
+    # Choisir la palette en fonction du mode d'accessibilité
+    if color_blind:
+        colormap = 'viridis'
+    elif high_contrast:
+        colormap = 'hot'
+    else:
+        colormap = 'plasma'
+
+    wordcloud = WordCloud(
+        width=800,
+        height=400,
+        background_color='black' if high_contrast else 'white',
+        colormap=colormap,
+        contour_color='white' if high_contrast else 'black',
+        contour_width=1
+    ).generate_from_frequencies(_top_keywords)
+
+    fig = plt.figure(figsize=(10, 5))
+    plt.imshow(wordcloud, interpolation='bilinear')
+    plt.axis('off')
+    plt.title("Nuage de Mots des Mots-Clés les Plus Fréquents",
+              fontsize=16 if not large_text else 20,
+              pad=20,
+              color='white' if high_contrast else 'black')
+
+    # Appliquer le fond sombre en mode contraste élevé
+    if high_contrast:
+        plt.gca().set_facecolor('black')
+        fig.set_facecolor('black')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', facecolor=fig.get_facecolor(), bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def image_scatter_json(dataset_hash, mode, _valid_image_df, _categories):
+    """Nuage de points du ratio hauteur/largeur vs nombre de pixels"""
+    import plotly.express as px
+
+    theme = _theme(mode)
+    text_color = theme['text_color']
+    large_text = theme['large_text']
+
+    fig5 = px.scatter(_valid_image_df, x='aspect_ratio', y='image_pixels',
+                      color=_categories,
+                      title="Ratio Hauteur/Largeur vs Nombre de Pixels (Images Valides)",
+                      color_discrete_sequence=theme['colors'],
+                      labels={'aspect_ratio': 'Ratio Hauteur/Largeur', 'image_pixels': 'Nombre de Pixels'})
+    fig5.update_layout(
+        plot_bgcolor=theme['bg_color'],
+        paper_bgcolor=theme['bg_color'],
+        font=dict(size=12 if not large_text else 16, color=text_color),
+        legend_title="Catégories principales",
+        legend=dict(font=dict(color=text_color)),
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        )
+    )
+    fig5.update_traces(
+        marker=dict(size=8, opacity=0.7),
+        selector=dict(mode='markers')
+    )
+    fig5.update_xaxes(
+        tickfont=dict(color=text_color, size=12 if not large_text else 16)
+    )
+    fig5.update_yaxes(
+        tickfont=dict(color=text_color, size=12 if not large_text else 16)
+    )
+    return fig5.to_json()
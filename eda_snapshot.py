@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Snapshot EDA pré-calculé
+
+Calcule hors ligne tous les agrégats affichés par la page EDA dans un unique
+fichier JSON compressé et versionné. La page charge ce fichier (quelques Ko)
+au lieu de relire le CSV et de parcourir les images, et revient au calcul en
+direct lorsque le snapshot est absent, d'une autre version ou périmé.
+
+Usage :
+    python eda_snapshot.py --csv produits_original.csv --images Images --output eda_snapshot.json.gz
+"""
+
+import os
+import gzip
+import json
+import time
+import argparse
+
+import pandas as pd
+
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR, load_catalog, manifest_fingerprint, content_fingerprint
+
+# Version du format : l'incrémenter à chaque changement de structure
+SNAPSHOT_VERSION = 2
+DEFAULT_SNAPSHOT_PATH = 'eda_snapshot.json.gz'
+
+
+# Conversion pandas <-> structures JSON
+def series_to_dict(series):
+    """Série pandas -> {'name', 'index', 'values'}"""
+    return {'name': series.name, 'index': series.index.tolist(), 'values': series.tolist()}
+
+
+def dict_to_series(data):
+    """{'name', 'index', 'values'} -> Série pandas"""
+    return pd.Series(data['values'], index=data['index'], name=data.get('name'))
+
+
+def frame_to_dict(frame):
+    """DataFrame -> dictionnaire orient='split' (None si absent)"""
+    if frame is None:
+        return None
+    return json.loads(frame.to_json(orient='split', date_format='iso'))
+
+
+def dict_to_frame(data):
+    """Dictionnaire orient='split' -> DataFrame (None si absent)"""
+    if data is None:
+        return None
+    return pd.DataFrame(data['data'], index=data['index'], columns=data['columns'])
+
+
+# Agrégats de la page EDA (résultats sérialisables en JSON)
+def compute_overview(df):
+    """Colonnes et nombre de lignes"""
+    return {'columns': list(df.columns), 'row_count': int(len(df))}
+
+
+def compute_missing_values(df):
+    """Valeurs manquantes par colonne"""
+    return series_to_dict(df.isna().sum())
+
+
+def compute_describe_tables(df):
+    """Statistiques descriptives (numériques, catégoriques)"""
+    numerical_cols = df.select_dtypes(include='number').columns
+    categorical_cols = df.select_dtypes(include=['object', 'string', 'category', 'bool']).columns
+    return {
+        'numerical': frame_to_dict(df[numerical_cols].describe()) if not numerical_cols.empty else None,
+        'categorical': frame_to_dict(df[categorical_cols].astype(str).describe()) if not categorical_cols.empty else None,
+    }
+
+
+def compute_category_counts(df):
+    """Nombre de produits par catégorie principale et top 20 des branches"""
+    return {
+        'main': series_to_dict(df['main_category'].value_counts()),
+        'sub_top20': series_to_dict(df['sub_categories'].value_counts().head(20)),
+    }
+
+
+def compute_image_samples(df):
+    """Par catégorie : nombre d'images valides et image d'exemple"""
+    samples = []
+    for category in df['main_category'].unique():
+        valid_images = df[(df['main_category'] == category) & df['image_exists'] & (df['image_pixels'] > 0)]['image']
+        samples.append({
+            'category': category,
+            'valid_count': int(len(valid_images)),
+            'sample_image': valid_images.sample(n=1, random_state=42).iloc[0] if not valid_images.empty else None,
+        })
+    return samples
+
+
+def compute_image_statistics(df):
+    """Statistiques pixels / ratio d'aspect, points du nuage et images invalides"""
+    valid_image_df = df[df['image_pixels'] > 0][['image_pixels', 'aspect_ratio']]
+    invalid_images = df[df['image_pixels'] <= 0][['image', 'main_category', 'image_pixels']]
+    return {
+        'valid_count': int(len(valid_image_df)),
+        'describe': frame_to_dict(valid_image_df.describe()) if not valid_image_df.empty else None,
+        'points': {
+            'aspect_ratio': valid_image_df['aspect_ratio'].tolist(),
+            'image_pixels': valid_image_df['image_pixels'].tolist(),
+            'main_category': df.loc[valid_image_df.index, 'main_category'].tolist(),
+        },
+        'invalid': frame_to_dict(invalid_images.reset_index(drop=True)),
+    }
+
+
+# Agrégats calculés pour chaque section de la page
+AGGREGATES = {
+    'overview': compute_overview,
+    'missing_values': compute_missing_values,
+    'describe_tables': compute_describe_tables,
+    'category_counts': compute_category_counts,
+    'image_samples': compute_image_samples,
+    'image_statistics': compute_image_statistics,
+}
+
+
+def build_snapshot(df, fingerprint, aggregates=None, content_hash=None):
+    """
+    Calcule tous les agrégats de la page EDA
+
+    Args:
+        df: Catalogue traité (voir catalog.load_catalog), ou None si aggregates est fourni
+        fingerprint: Empreinte de validation des données sources (catalog.manifest_fingerprint)
+        aggregates: Agrégats déjà calculés (voir eda_engine.compute_aggregates)
+        content_hash: Empreinte de contenu complète (catalog.content_fingerprint), enregistrée telle quelle
+
+    Returns:
+        dict: Snapshot versionné
+    """
+    return {
+        'version': SNAPSHOT_VERSION,
+        'fingerprint': fingerprint,
+        'content_fingerprint': content_hash,
+        'created_at': time.time(),
+        'aggregates': aggregates if aggregates is not None else {name: compute(df) for name, compute in AGGREGATES.items()},
+    }
+
+
+def save_snapshot(snapshot, path=DEFAULT_SNAPSHOT_PATH):
+    """Écrit le snapshot (JSON gzip) de façon atomique"""
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path=DEFAULT_SNAPSHOT_PATH, expected_fingerprint=None):
+    """
+    Charge un snapshot s'il est utilisable
+
+    Args:
+        path: Chemin du snapshot
+        expected_fingerprint: Empreinte actuelle des données (None = pas de contrôle)
+
+    Returns:
+        dict: Snapshot, ou None s'il est absent, illisible, d'une autre version ou périmé
+    """
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    if expected_fingerprint is not None and snapshot.get('fingerprint') != expected_fingerprint:
+        return None
+    return snapshot
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Construit le snapshot des agrégats de la page EDA")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV des produits")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Répertoire des images")
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOT_PATH, help="Fichier snapshot à écrire")
+    parser.add_argument('--engine', default='memory', choices=['memory', 'chunked'],
+                        help="Moteur de calcul ('chunked' : lecture par morceaux, mémoire bornée)")
+    parser.add_argument('--chunk-rows', type=int, default=50_000, help="Lignes par morceau (moteur 'chunked')")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    fingerprint = manifest_fingerprint(args.csv, args.images)
+    content_hash = content_fingerprint(args.csv, args.images)
+    if args.engine == 'chunked':
+        from eda_engine import compute_aggregates_chunked
+        snapshot = build_snapshot(None, fingerprint, compute_aggregates_chunked(args.csv, args.images, args.chunk_rows),
+                                  content_hash)
+    else:
+        snapshot = build_snapshot(load_catalog(args.csv, args.images), fingerprint, content_hash=content_hash)
+    save_snapshot(snapshot, args.output)
+    print(f"✅ Snapshot écrit : {args.output} ({os.path.getsize(args.output) / 1024:.1f} Ko, "
+          f"{snapshot['aggregates']['overview']['row_count']} produits, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Export par morceaux des tables de résultats (CSV, JSONL, Parquet)
+
+Les lignes arrivent d'un générateur de DataFrames de taille bornée et sont
+écrites au fil de l'eau, éventuellement compressées : la mémoire reste de
+l'ordre d'un morceau, quel que soit le nombre de lignes. Côté Streamlit,
+deferred_export fournit à st.download_button une fonction appelée uniquement
+au clic : le fichier est écrit sur disque par morceaux, puis Streamlit le lit
+d'un bloc pour le servir. Au clic, la mémoire est donc d'un morceau pendant
+l'écriture, puis de la taille du fichier exporté (compressé le cas échéant)
+tant que Streamlit le conserve pour le téléchargement.
+
+Usage :
+    python export.py history --format parquet --output predictions.parquet
+    python export.py keywords --format csv --gzip --output keyword_frequencies.csv.gz
+"""
+
+import io
+import gzip
+import time
+import os
+import argparse
+import tempfile
+
+import pandas as pd
+
+# Lignes par morceau
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Format -> (type MIME, extension)
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'jsonl': ('application/x-ndjson', '.jsonl'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+
+def parquet_available():
+    """pyarrow est-il installé (nécessaire à l'export Parquet) ?"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def iter_frame_chunks(frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Morceaux successifs d'un DataFrame déjà en mémoire (vues, sans copie)"""
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def iter_csv_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, **read_options):
+    """Morceaux d'un fichier CSV, lus au fur et à mesure"""
+    with pd.read_csv(path, chunksize=chunk_rows, **read_options) as reader:
+        yield from reader
+
+
+def export_file_name(base_name, fmt, compress=False):
+    """Nom du fichier exporté (extension du format, .gz si compressé)"""
+    return base_name + FORMATS[fmt][1] + ('.gz' if compress and fmt != 'parquet' else '')
+
+
+def export_mime(fmt, compress=False):
+    """Type MIME du fichier exporté"""
+    return 'application/gzip' if compress and fmt != 'parquet' else FORMATS[fmt][0]
+
+
+def write_export(chunks, output, fmt='csv', compress=False):
+    """
+    Écrit des morceaux de DataFrame dans un fichier binaire ouvert
+
+    Args:
+        chunks: Itérable de DataFrames (mêmes colonnes)
+        output: Fichier binaire ouvert en écriture
+        fmt: 'csv', 'jsonl' ou 'parquet'
+        compress: gzip pour CSV et JSONL ; Parquet est toujours compressé (zstd)
+
+    Returns:
+        int: Nombre de lignes écrites
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+    if fmt == 'parquet':
+        return _write_parquet(chunks, output)
+
+    rows = 0
+    binary = gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6) if compress else output
+    text = io.TextIOWrapper(binary, encoding='utf-8', newline='', write_through=False)
+    try:
+        for chunk in chunks:
+            # Chaque morceau est sérialisé d'un bloc (une écriture par morceau plutôt que par ligne)
+            if fmt == 'csv':
+                text.write(chunk.to_csv(index=False, header=rows == 0))
+            elif len(chunk):
+                # Une ligne JSON par enregistrement, terminée par un saut de ligne
+                text.write(chunk.to_json(orient='records', lines=True, force_ascii=False, date_format='iso'))
+            rows += len(chunk)
+        text.flush()
+    finally:
+        # Détacher le wrapper pour ne pas fermer le fichier de l'appelant
+        text.detach()
+        if compress:
+            binary.close()
+    return rows
+
+
+def _write_parquet(chunks, output):
+    """Écriture Parquet morceau par morceau (un groupe de lignes par morceau)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema, compression='zstd')
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_to_tempfile(chunks, fmt='csv', compress=False):
+    """
+    Export dans un fichier temporaire sur disque
+
+    Le fichier est rouvert en lecture seule (io.BufferedReader, type accepté par
+    st.download_button) puis supprimé : il disparaît à sa fermeture.
+
+    Returns:
+        Fichier binaire ouvert en lecture, positionné au début
+    """
+    with tempfile.NamedTemporaryFile(mode='wb', suffix=FORMATS[fmt][1], delete=False) as output:
+        path = output.name
+        try:
+            write_export(chunks, output, fmt, compress)
+        except BaseException:
+            output.close()
+            os.unlink(path)
+            raise
+    reader = open(path, 'rb')
+    try:
+        os.unlink(path)
+    except OSError:
+        # Windows : un fichier ouvert ne peut pas être supprimé, il reste dans le répertoire temporaire
+        pass
+    return reader
+
+
+def deferred_export(make_chunks, fmt='csv', compress=False):
+    """
+    Données différées pour st.download_button : l'export n'est produit qu'au clic
+
+    Args:
+        make_chunks: Fonction sans argument renvoyant le générateur de morceaux
+
+    Returns:
+        callable: Fonction sans argument renvoyant le fichier exporté
+    """
+    return lambda: export_to_tempfile(make_chunks(), fmt, compress)
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    from catalog import CATALOG_CSV_PATH
+    from prediction_history import DEFAULT_HISTORY_PATH, PredictionHistory
+
+    parser = argparse.ArgumentParser(description="Exporte une table de résultats par morceaux")
+    parser.add_argument('table', choices=['history', 'keywords', 'catalog'], help="Table à exporter")
+    parser.add_argument('--format', default='csv', choices=list(FORMATS), help="Format du fichier")
+    parser.add_argument('--gzip', action='store_true', help="Compresser (CSV et JSONL)")
+    parser.add_argument('--output', required=True, help="Fichier à écrire")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH, help="Base de l'historique des prédictions")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Lignes par morceau")
+    args = parser.parse_args()
+
+    if args.table == 'history':
+        chunks = PredictionHistory(args.history).iter_frames(args.chunk_rows)
+    elif args.table == 'keywords':
+        chunks = iter_csv_chunks('keyword_frequencies.csv', args.chunk_rows)
+    else:
+        chunks = iter_csv_chunks(CATALOG_CSV_PATH, args.chunk_rows)
+
+    start = time.perf_counter()
+    with open(args.output, 'wb') as output:
+        rows = write_export(chunks, output, args.format, args.gzip)
+    print(f"✅ {rows} lignes exportées vers {args.output} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Dérivés d'affichage des images (taille d'affichage, JPEG ou WebP)
+
+st.image décode l'image d'origine, la réduit et la réencode à chaque rerun. Les
+dérivés sont produits une fois à la largeur d'affichage, puis mis en cache par
+(chemin et date de modification, largeur) pour les images du catalogue, ou par
+fichier uploadé et largeur dans la session. Un JPEG plus étroit que la largeur
+demandée est transmis tel quel par st.image, sans nouveau décodage.
+
+st.image convertit en JPEG tout format autre que JPEG et PNG : les pages
+utilisent donc des dérivés JPEG (PNG si l'image a de la transparence). Le WebP
+reste disponible pour les autres usages (fmt='WEBP').
+"""
+
+import io
+import os
+
+import streamlit as st
+from PIL import Image
+
+from image_ingest import open_image, ImageRejected
+from shared_cache import shared_memoize
+from worker_pool import DISPLAY, PoolSaturated, run_in_pool
+
+# Format et qualité des dérivés affichés par st.image
+DISPLAY_FORMAT = 'JPEG'
+DISPLAY_QUALITY = 80
+
+# Nombre maximal de dérivés du catalogue gardés en cache (quelques dizaines de Ko chacun)
+DERIVATIVE_CACHE_ENTRIES = 512
+
+# Mime de chaque format produit
+MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def encode_derivative(image, width, fmt=DISPLAY_FORMAT, quality=DISPLAY_QUALITY):
+    """
+    Encode une image réduite à la largeur d'affichage (jamais agrandie)
+
+    Args:
+        image: Image PIL décodée
+        width: Largeur d'affichage (pixels)
+        fmt: 'JPEG' ou 'WEBP' ; un JPEG avec transparence est produit en PNG
+
+    Returns:
+        tuple: (octets encodés, format effectif)
+    """
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+
+    alpha = _has_alpha(image)
+    if fmt == 'JPEG' and alpha:
+        fmt = 'PNG'
+    if fmt == 'PNG':
+        options = {'optimize': True}
+    elif fmt == 'WEBP':
+        image = image.convert('RGBA' if alpha else 'RGB')
+        options = {'quality': quality, 'method': 4}
+    else:
+        image = image.convert('RGB')
+        options = {'quality': quality, 'optimize': True, 'progressive': True}
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue(), fmt
+
+
+def file_derivative(path, width, fmt=DISPLAY_FORMAT, quality=DISPLAY_QUALITY):
+    """
+    Dérivé d'affichage d'un fichier image (JPEG décodé directement réduit)
+
+    Returns:
+        bytes: Image encodée à la largeur d'affichage
+
+    Raises:
+        ImageRejected: Image illisible
+    """
+    # Hauteur minimale 1 : seule la largeur contraint la réduction du décodeur
+    image, _ = open_image(path, max_bytes=None, draft_size=(width, 1), allowed_formats=None)
+    with image:
+        try:
+            image.load()
+        except (OSError, ValueError) as e:
+            raise ImageRejected(f"Image illisible : {e}") from e
+        return encode_derivative(image, width, fmt, quality)[0]
+
+
+@st.cache_data(max_entries=DERIVATIVE_CACHE_ENTRIES, show_spinner=False)
+@shared_memoize
+def _cached_file_derivative(path, width, stamp, fmt, quality):
+    """Dérivé mis en cache ; stamp (date de modification, taille) invalide l'entrée si le fichier change"""
+    # Produit dans le pool partagé, après les prétraitements des prédictions interactives
+    return run_in_pool(file_derivative, path, width, fmt, quality, priority=DISPLAY)
+
+
+def display_image(path, width, fmt=DISPLAY_FORMAT, quality=DISPLAY_QUALITY):
+    """
+    Image du catalogue à passer à st.image, produite une fois par (fichier, largeur)
+
+    Args:
+        path: Chemin de l'image
+        width: Largeur d'affichage (celle passée à st.image)
+
+    Returns:
+        bytes: Dérivé encodé, ou le chemin si l'image est absente, illisible ou si le pool est saturé
+    """
+    try:
+        stat = os.stat(path)
+        return _cached_file_derivative(path, width, (stat.st_mtime_ns, stat.st_size), fmt, quality)
+    except (OSError, ImageRejected, PoolSaturated):
+        return path
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Index de hachage perceptuel des images du catalogue
+
+Chaque image est résumée par deux empreintes de 64 bits (pHash et dHash) qui
+varient peu lorsqu'une image est recompressée, redimensionnée ou légèrement
+recadrée. Les empreintes sont stockées dans un fichier .npz compact et
+interrogées par distance de Hamming au moyen d'un BK-tree : une image
+uploadée quasi identique à une image connue est reconnue sans appel à l'API.
+
+Usage :
+    python image_hashing.py --csv produits_original.csv --images Images --output image_hashes.npz
+"""
+
+import os
+import time
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from PIL import Image
+
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR, read_catalog, load_catalog, manifest_fingerprint, content_fingerprint
+from shared_cache import cache_key, current_shared_cache
+
+DEFAULT_INDEX_PATH = 'image_hashes.npz'
+
+# Version du format de l'index : l'incrémenter à chaque changement d'algorithme
+INDEX_VERSION = 1
+
+# Côté de la grille de hachage (8 x 8 = 64 bits)
+HASH_SIZE = 8
+
+# Côté de l'image réduite sur laquelle est calculée la DCT du pHash
+PHASH_IMAGE_SIZE = 32
+
+# Distance de Hamming maximale (sur 64 bits) pour considérer deux images comme quasi identiques
+DUPLICATE_MAX_DISTANCE = 8
+
+
+def _dct_matrix(size):
+    """Matrice de la DCT-II orthonormée de taille size x size"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+_DCT = _dct_matrix(PHASH_IMAGE_SIZE)
+
+
+def _bits_to_int(bits):
+    """Tableau de booléens (64) -> entier non signé"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def _grayscale(image, size):
+    """Image en niveaux de gris réduite à size (largeur, hauteur)"""
+    # draft() laisse le décodeur JPEG réduire l'image dès la décompression
+    image.draft('L', (size[0] * 4, size[1] * 4))
+    return np.asarray(image.convert('L').resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def dhash(image):
+    """
+    Hachage par différence : compare chaque pixel à son voisin de droite
+
+    Args:
+        image: Image PIL
+
+    Returns:
+        int: Empreinte de 64 bits
+    """
+    pixels = _grayscale(image, (HASH_SIZE + 1, HASH_SIZE))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    """
+    Hachage perceptuel : signe des basses fréquences de la DCT par rapport à leur médiane
+
+    Args:
+        image: Image PIL
+
+    Returns:
+        int: Empreinte de 64 bits
+    """
+    pixels = _grayscale(image, (PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE))
+    low_frequencies = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # La composante continue (luminosité moyenne) est exclue du calcul de la médiane
+    median = np.median(low_frequencies.ravel()[1:])
+    return _bits_to_int(low_frequencies > median)
+
+
+def image_hashes(image):
+    """(pHash, dHash) d'une image PIL, d'un chemin ou d'un objet fichier"""
+    if isinstance(image, Image.Image):
+        return phash(image), dhash(image)
+    with Image.open(image) as img:
+        # L'image n'est décodée qu'une fois (au format réduit choisi par le pHash)
+        return phash(img), dhash(img)
+
+
+def hamming(a, b):
+    """Distance de Hamming entre deux empreintes"""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Arbre BK pour la recherche par distance de Hamming
+
+    Chaque enfant est rangé sous sa distance au nœud parent ; l'inégalité
+    triangulaire permet d'élaguer les branches à distance > d + max_distance
+    ou < d - max_distance de la requête.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, item):
+        """Ajoute un élément sous l'empreinte key"""
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """
+        Éléments à distance <= max_distance de key
+
+        Returns:
+            list[tuple]: (distance, item), du plus proche au plus éloigné
+        """
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class ImageHashIndex:
+    """Empreintes (pHash, dHash) des images du catalogue, interrogeables par distance"""
+
+    def __init__(self, ids, phashes, dhashes, fingerprint=None, content_hash=None):
+        self.ids = np.asarray(ids, dtype=str)
+        self.phashes = np.asarray(phashes, dtype=np.uint64)
+        self.dhashes = np.asarray(dhashes, dtype=np.uint64)
+        # Empreinte de validation (manifest_fingerprint) et empreinte de contenu complète (construction hors ligne)
+        self.fingerprint = fingerprint
+        self.content_hash = content_hash
+        self._tree = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def tree(self):
+        """BK-tree des pHash, construit au premier accès"""
+        with self._lock:
+            if self._tree is None:
+                tree = BKTree()
+                for position, key in enumerate(self.phashes.tolist()):
+                    tree.add(key, position)
+                self._tree = tree
+        return self._tree
+
+    @classmethod
+    def build(cls, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR):
+        """Calcule les empreintes de toutes les images référencées par le catalogue"""
+        catalog = read_catalog(csv_path, columns=['uniq_id', 'image'])
+        ids, phashes, dhashes = [], [], []
+        for uniq_id, image in zip(catalog['uniq_id'], catalog['image']):
+            if not isinstance(image, str):
+                continue
+            try:
+                hashes = image_hashes(os.path.join(images_dir, image))
+            except Exception:
+                continue
+            ids.append(uniq_id)
+            phashes.append(hashes[0])
+            dhashes.append(hashes[1])
+        return cls(ids, phashes, dhashes, manifest_fingerprint(csv_path, images_dir))
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        """Écrit l'index (.npz compressé) de façon atomique"""
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, version=INDEX_VERSION, fingerprint=self.fingerprint or '',
+                            content_fingerprint=self.content_hash or '', ids=self.ids, phashes=self.phashes,
+                            dhashes=self.dhashes)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH, expected_fingerprint=None):
+        """
+        Charge un index s'il est utilisable
+
+        Returns:
+            ImageHashIndex: Index, ou None s'il est absent, illisible, d'une autre version ou périmé
+        """
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != INDEX_VERSION:
+                    return None
+                fingerprint = str(data['fingerprint'])
+                if expected_fingerprint is not None and fingerprint != expected_fingerprint:
+                    return None
+                return cls(data['ids'], data['phashes'], data['dhashes'], fingerprint,
+                           str(data['content_fingerprint']) or None)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def find(self, hashes, max_distance=DUPLICATE_MAX_DISTANCE):
+        """
+        Images du catalogue quasi identiques à une empreinte
+
+        Args:
+            hashes: (pHash, dHash) de l'image recherchée
+            max_distance: Distance de Hamming maximale sur chacune des deux empreintes
+
+        Returns:
+            list[dict]: uniq_id, phash_distance, dhash_distance (du plus proche au plus éloigné)
+        """
+        query_phash, query_dhash = hashes
+        matches = []
+        for phash_distance, position in self.tree.search(query_phash, max_distance):
+            dhash_distance = hamming(query_dhash, int(self.dhashes[position]))
+            # Le dHash confirme le pHash et écarte les faux positifs
+            if dhash_distance <= max_distance:
+                matches.append({
+                    'uniq_id': str(self.ids[position]),
+                    'phash_distance': phash_distance,
+                    'dhash_distance': dhash_distance,
+                })
+        matches.sort(key=lambda match: match['phash_distance'] + match['dhash_distance'])
+        return matches
+
+    def duplicate_groups(self, max_distance=DUPLICATE_MAX_DISTANCE):
+        """
+        Groupes d'images quasi identiques du catalogue
+
+        Returns:
+            list[list[str]]: uniq_id de chaque groupe (au moins deux images), du plus grand groupe au plus petit
+        """
+        parent = list(range(len(self)))
+
+        def root(position):
+            while parent[position] != position:
+                parent[position] = parent[parent[position]]
+                position = parent[position]
+            return position
+
+        dhashes = self.dhashes.tolist()
+        for position, key in enumerate(self.phashes.tolist()):
+            for _, other in self.tree.search(key, max_distance):
+                if other != position and hamming(dhashes[position], dhashes[other]) <= max_distance:
+                    parent[root(other)] = root(position)
+
+        groups = {}
+        for position in range(len(self)):
+            groups.setdefault(root(position), []).append(str(self.ids[position]))
+        return sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
+
+
+class PredictionMemo:
+    """
+    Prédictions déjà obtenues pour des images uploadées, retrouvées par pHash
+
+    Partagé entre les sessions d'un processus : une image déjà classée (ou une
+    copie recompressée) n'est pas renvoyée à l'API. Les prédictions sont aussi
+    publiées dans le cache partagé (shared_cache.py) : les autres réplicas
+    retrouvent les images strictement identiques.
+    """
+
+    shared_name = 'prediction_memo'
+
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._tree = BKTree()
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, hashes, description, result):
+        """Mémorise le résultat de l'API pour une image et sa description"""
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Reconstruire l'arbre sans la moitié la plus ancienne
+                kept = self._entries[len(self._entries) // 2:]
+                self._tree, self._entries = BKTree(), []
+                for entry in kept:
+                    self._insert(entry)
+            self._insert({'hashes': hashes, 'description': description, 'result': result})
+        current_shared_cache().store(self.shared_name, self._shared_key(hashes, description), result)
+
+    def _shared_key(self, hashes, description):
+        return cache_key(self.shared_name, (tuple(int(h) for h in hashes), description))
+
+    def _insert(self, entry):
+        self._tree.add(entry['hashes'][0], len(self._entries))
+        self._entries.append(entry)
+
+    def find(self, hashes, description, max_distance=DUPLICATE_MAX_DISTANCE):
+        """Résultat mémorisé pour une image quasi identique et la même description (ou None)"""
+        with self._lock:
+            for _, position in self._tree.search(hashes[0], max_distance):
+                entry = self._entries[position]
+                if (entry['description'] == description
+                        and hamming(entry['hashes'][1], hashes[1]) <= max_distance):
+                    return entry['result']
+        found, result = current_shared_cache().lookup(self.shared_name, self._shared_key(hashes, description))
+        return result if found else None
+
+
+def duplicate_report(index, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR, max_distance=DUPLICATE_MAX_DISTANCE):
+    """
+    Rapport des images quasi identiques du catalogue
+
+    Returns:
+        DataFrame: group, uniq_id, product_name, main_category, image (une ligne par image en double)
+    """
+    products = load_catalog(csv_path, images_dir, columns=['uniq_id', 'product_name', 'product_category_tree', 'image'],
+                            image_info=False).set_index('uniq_id')
+    rows = []
+    for group_number, group in enumerate(index.duplicate_groups(max_distance), start=1):
+        for uniq_id in group:
+            known = uniq_id in products.index
+            rows.append({
+                'group': group_number,
+                'uniq_id': uniq_id,
+                'product_name': products.at[uniq_id, 'product_name'] if known else None,
+                'main_category': products.at[uniq_id, 'main_category'] if known else None,
+                'image': products.at[uniq_id, 'image'] if known else None,
+            })
+    return pd.DataFrame(rows, columns=['group', 'uniq_id', 'product_name', 'main_category', 'image'])
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_shared_hash_index(fingerprint, path=DEFAULT_INDEX_PATH, csv_path=CATALOG_CSV_PATH,
+                          images_dir=IMAGES_DIR, build_missing=False):
+    """
+    Index de hachage partagé par toutes les sessions du processus
+
+    Args:
+        fingerprint: Empreinte légère (dataset_fingerprint) des données et de l'index, clé de rechargement
+        path: Fichier index pré-calculé
+        csv_path: Chemin du CSV des produits
+        images_dir: Répertoire des images
+        build_missing: Recalculer l'index s'il est absent ou périmé (plusieurs secondes)
+
+    Returns:
+        ImageHashIndex: Index, ou None s'il est indisponible
+    """
+    index = ImageHashIndex.load(path, expected_fingerprint=manifest_fingerprint(csv_path, images_dir))
+    if index is None and build_missing:
+        index = ImageHashIndex.build(csv_path, images_dir)
+    return index
+
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_memo():
+    """Prédictions mémorisées par image, partagées par toutes les sessions du processus"""
+    return PredictionMemo()
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Construit l'index de hachage perceptuel des images du catalogue")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV des produits")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Répertoire des images")
+    parser.add_argument('--output', default=DEFAULT_INDEX_PATH, help="Fichier index à écrire")
+    parser.add_argument('--max-distance', type=int, default=DUPLICATE_MAX_DISTANCE,
+                        help="Distance de Hamming maximale du rapport de doublons")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = ImageHashIndex.build(args.csv, args.images)
+    index.content_hash = content_fingerprint(args.csv, args.images)
+    index.save(args.output)
+    groups = index.duplicate_groups(args.max_distance)
+    print(f"✅ Index écrit : {args.output} ({os.path.getsize(args.output) / 1024:.1f} Ko, "
+          f"{len(index)} images, {time.perf_counter() - start:.1f}s)")
+    print(f"🪞 {len(groups)} groupes d'images quasi identiques "
+          f"({sum(len(group) for group in groups)} images)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Ingestion bornée en mémoire des images uploadées
+
+Les dimensions sont lues dans l'en-tête, avant tout décodage : une image dont le
+fichier ou le nombre de pixels dépasse le budget est refusée sans être
+décompressée. Les JPEG sont décodés en mode draft (résolution réduite par le
+décodeur, au 1/2, 1/4 ou 1/8), ce qui borne la mémoire d'une image à la taille
+demandée plutôt qu'à sa taille d'origine. Le fichier uploadé est lu en place,
+sans copie de ses octets.
+
+Aucune fonction de ce module n'appelle Streamlit.
+"""
+
+import os
+
+from PIL import Image
+
+# Taille maximale d'un fichier image (octets), alignée sur server.maxUploadSize
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Nombre maximal de pixels décodés (après réduction draft)
+MAX_IMAGE_PIXELS = 36_000_000
+
+# Réduction maximale du mode draft (JPEG décodé au 1/8 de côté au mieux)
+DRAFT_MAX_SCALE = 8
+
+# Garde-fou global de Pillow (avertissement au-delà, erreur au double) : relevé une fois, à l'import,
+# au-dessus des budgets de ce module, vérifiés par open_image sur les dimensions de l'en-tête
+if Image.MAX_IMAGE_PIXELS is not None:
+    Image.MAX_IMAGE_PIXELS = max(Image.MAX_IMAGE_PIXELS, MAX_IMAGE_PIXELS * DRAFT_MAX_SCALE ** 2)
+
+# Côté maximal de l'image conservée pour l'affichage et les descripteurs
+DISPLAY_MAX_SIDE = 1024
+
+# Formats acceptés (ceux proposés par le composant d'upload)
+ALLOWED_FORMATS = ('JPEG', 'PNG')
+
+
+class ImageRejected(ValueError):
+    """Image refusée avant décodage (taille, dimensions ou format)"""
+
+
+def source_size(source):
+    """
+    Taille en octets d'un chemin ou d'un objet fichier, sans lire son contenu
+
+    Returns:
+        int: Taille, ou None si elle n'est pas connue
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if isinstance(size, int):
+        return size
+    try:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def open_image(source, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS, draft_size=None,
+               allowed_formats=ALLOWED_FORMATS):
+    """
+    Ouvre une image sans la décoder et vérifie les budgets
+
+    Args:
+        source: Chemin ou objet fichier (UploadedFile Streamlit)
+        max_bytes: Taille maximale du fichier (None : pas de limite)
+        max_pixels: Nombre maximal de pixels décodés (None : pas de limite)
+        draft_size: Taille (largeur, hauteur) minimale souhaitée : les JPEG seront décodés réduits
+
+    Returns:
+        tuple: (image PIL non décodée, dimensions d'origine)
+
+    Raises:
+        ImageRejected: Fichier trop lourd, image trop grande, illisible ou d'un format refusé
+    """
+    size = source_size(source)
+    if max_bytes is not None and size is not None and size > max_bytes:
+        raise ImageRejected(f"Fichier trop volumineux : {size / 1024 ** 2:.1f} Mo "
+                            f"(maximum {max_bytes / 1024 ** 2:.0f} Mo)")
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageRejected(f"Image trop grande : {e}") from e
+    except (OSError, ValueError) as e:
+        raise ImageRejected(f"Image illisible : {e}") from e
+
+    if allowed_formats is not None and image.format not in allowed_formats:
+        raise ImageRejected(f"Format non supporté : {image.format}")
+
+    original_size = image.size
+    if max_pixels is not None and original_size[0] * original_size[1] > max_pixels * DRAFT_MAX_SCALE ** 2:
+        # Même décodée au 1/8 de côté, l'image dépasserait le budget
+        raise ImageRejected(f"Image trop grande : {original_size[0]} x {original_size[1]} pixels "
+                            f"(maximum {max_pixels / 1e6:.0f} Mpx)")
+    if draft_size is not None:
+        # Sans effet hors JPEG ; la taille de l'image devient celle qui sera décodée
+        image.draft(None, draft_size)
+    if max_pixels is not None and image.size[0] * image.size[1] > max_pixels:
+        raise ImageRejected(f"Image trop grande : {original_size[0]} x {original_size[1]} pixels "
+                            f"(maximum {max_pixels / 1e6:.0f} Mpx)")
+    return image, original_size
+
+
+def load_image(source, max_side=DISPLAY_MAX_SIDE, **budgets):
+    """
+    Décode une image dans les budgets, réduite à max_side pixels de côté au plus
+
+    Args:
+        source: Chemin ou objet fichier (UploadedFile Streamlit)
+        max_side: Côté maximal de l'image renvoyée
+        **budgets: max_bytes, max_pixels, allowed_formats (voir open_image)
+
+    Returns:
+        tuple: (image PIL décodée, dimensions d'origine)
+
+    Raises:
+        ImageRejected: Voir open_image
+    """
+    image, original_size = open_image(source, draft_size=(max_side, max_side), **budgets)
+    try:
+        image.load()
+    except (OSError, ValueError) as e:
+        raise ImageRejected(f"Image illisible : {e}") from e
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image, original_size
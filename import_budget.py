@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Rapport et budget du temps d'import des modules de l'application
+
+Mesure le coût d'import de chaque module (``python -X importtime``) dans un
+processus neuf et vérifie que les dépendances lourdes ne sont chargées qu'à
+la première utilisation.
+
+Les deux vérifications font partie des tests. Les budgets de temps laissent
+une large marge (plusieurs fois le temps mesuré sur une machine de
+développement) et un module en dépassement est remesuré : le budget porte sur
+la médiane de plusieurs processus neufs, pas sur un pic ponctuel d'une CI
+partagée.
+
+Usage :
+    python import_budget.py                 # rapport pour tous les modules budgétés
+    python import_budget.py eda_figures -n 30
+"""
+
+import os
+import re
+import ast
+import sys
+import argparse
+import statistics
+import subprocess
+
+# Dépendances lourdes qui ne doivent jamais être importées au chargement d'un module
+HEAVY_MODULES = ('torch', 'matplotlib', 'wordcloud', 'plotly.express', 'seaborn')
+
+# Budget de temps d'import cumulé (secondes) par module de l'application.
+# Streamlit et pandas (~1 s à froid) sont inclus dans chaque budget.
+IMPORT_BUDGETS = {
+    'accessibility_streamlit_cloud': 2.5,
+    'profiling': 2.5,
+    'catalog': 2.0,
+    'eda_figures': 3.0,
+    'eda_snapshot': 2.0,
+    'image_hashing': 2.0,
+    'visual_search': 2.0,
+    'local_classifier': 2.0,
+    'api_client': 1.5,
+    'api_health': 1.0,
+    'image_ingest': 1.0,
+    'prediction_history': 2.0,
+    'export': 1.5,
+    'catalog_predictions': 2.0,
+    'image_derivatives': 1.0,
+    'eda_engine': 2.0,
+    'catalog_watcher': 2.0,
+    'shared_cache': 1.0,
+    'clip_text': 1.0,
+    'worker_pool': 0.5,
+}
+
+# Nombre de mesures d'un module en dépassement (le budget porte sur leur médiane)
+OVERRUN_SAMPLES = 5
+
+# Pages Streamlit dont les imports de premier niveau sont contrôlés
+PAGE_FILES = ('app.py', 'pages/1_eda.py', 'pages/2_prediction.py', 'pages/3_profiling.py',
+              'pages/4_administration.py')
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure_import_times(module, python=None, cwd=None):
+    """
+    Importe un module dans un nouvel interpréteur avec ``-X importtime``
+
+    Args:
+        module: Nom du module à importer
+        python: Interpréteur à utiliser (par défaut celui en cours)
+        cwd: Répertoire de travail (par défaut la racine du dépôt)
+
+    Returns:
+        list[dict]: module, self_s, cumulative_s, depth (ordre d'import)
+    """
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                'module': name,
+                'self_s': int(self_us) / 1e6,
+                'cumulative_s': int(cumulative_us) / 1e6,
+                'depth': len(indent) // 2,
+            })
+    return entries
+
+
+def total_import_time(entries, module):
+    """Temps cumulé de l'import d'un module (dernière ligne le concernant)"""
+    for entry in reversed(entries):
+        if entry['module'] == module:
+            return entry['cumulative_s']
+    return 0.0
+
+
+def heavy_modules_imported(entries, heavy_modules=HEAVY_MODULES):
+    """Dépendances lourdes présentes dans une trace d'import"""
+    imported = {entry['module'] for entry in entries}
+    return sorted(name for name in heavy_modules if name in imported)
+
+
+def top_level_imports(path):
+    """Modules importés au premier niveau d'un script (hors fonctions et blocs try)"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.add(node.module)
+            modules.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return modules
+
+
+def heavy_page_imports(path, heavy_modules=HEAVY_MODULES):
+    """Dépendances lourdes importées au premier niveau d'un script de page"""
+    return sorted(name for name in top_level_imports(path)
+                  if any(name == heavy or name.startswith(heavy + '.') for heavy in heavy_modules))
+
+
+def measure_budgets(budgets=IMPORT_BUDGETS, heavy_modules=HEAVY_MODULES, samples=OVERRUN_SAMPLES):
+    """
+    Mesure l'import de chaque module budgété (un processus neuf par mesure)
+
+    Un module dont la première mesure dépasse le budget est remesuré : elapsed
+    est alors la médiane de samples mesures.
+
+    Returns:
+        list[dict]: module, elapsed, budget, heavy (dépendances lourdes importées)
+    """
+    rows = []
+    for module, budget in budgets.items():
+        entries = measure_import_times(module)
+        elapsed = total_import_time(entries, module)
+        if elapsed > budget:
+            elapsed = statistics.median([elapsed] + [total_import_time(measure_import_times(module), module)
+                                                     for _ in range(samples - 1)])
+        rows.append({'module': module, 'elapsed': elapsed, 'budget': budget,
+                     'heavy': heavy_modules_imported(entries, heavy_modules)})
+    return rows
+
+
+def heavy_import_violations(rows):
+    """Modules qui importent une dépendance lourde au chargement (vérification déterministe)"""
+    return [f"{row['module']}: importe {', '.join(row['heavy'])} au chargement" for row in rows if row['heavy']]
+
+
+def budget_overruns(rows):
+    """Modules dont le temps d'import (médiane en cas de dépassement) dépasse le budget"""
+    return [f"{row['module']}: {row['elapsed']:.2f}s > budget {row['budget']:.2f}s"
+            for row in rows if row['elapsed'] > row['budget']]
+
+
+def check_budgets(budgets=IMPORT_BUDGETS, heavy_modules=HEAVY_MODULES):
+    """
+    Vérifie le budget de chaque module
+
+    Returns:
+        list[str]: Violations (vide si tout est dans le budget)
+    """
+    rows = measure_budgets(budgets, heavy_modules)
+    return budget_overruns(rows) + heavy_import_violations(rows)
+
+
+def check_page_imports(pages=PAGE_FILES, heavy_modules=HEAVY_MODULES):
+    """
+    Vérifie qu'aucune page n'importe de dépendance lourde au premier niveau
+
+    Returns:
+        list[str]: Violations (vide si toutes les pages sont conformes)
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    violations = []
+    for page in pages:
+        heavy = heavy_page_imports(os.path.join(root, page), heavy_modules)
+        if heavy:
+            violations.append(f"{page}: importe {', '.join(heavy)} au premier niveau")
+    return violations
+
+
+def print_report(module, limit=20):
+    """Affiche les modules les plus coûteux de l'import d'un module"""
+    entries = measure_import_times(module)
+    print(f"📦 {module} : {total_import_time(entries, module):.3f}s (cumulé)")
+    print(f"{'cumulé (s)':>11} {'propre (s)':>11}  module")
+    for entry in sorted(entries, key=lambda e: e['cumulative_s'], reverse=True)[:limit]:
+        print(f"{entry['cumulative_s']:>11.3f} {entry['self_s']:>11.3f}  {'  ' * entry['depth']}{entry['module']}")
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Rapport du temps d'import des modules de l'application")
+    parser.add_argument('modules', nargs='*', help="Modules à analyser (défaut : modules budgétés)")
+    parser.add_argument('-n', '--limit', type=int, default=20, help="Nombre de lignes par rapport")
+    args = parser.parse_args()
+
+    for module in args.modules or IMPORT_BUDGETS:
+        print_report(module, args.limit)
+        print()
+
+    violations = check_budgets({m: IMPORT_BUDGETS[m] for m in args.modules if m in IMPORT_BUDGETS}
+                               if args.modules else IMPORT_BUDGETS)
+    violations += check_page_imports()
+    for violation in violations:
+        print(f"❌ {violation}")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Classifieur texte local de secours (TF-IDF + Bayes naïf multinomial)
+
+Entraîné hors ligne sur les textes de produits_original.csv et leur catégorie
+principale, il prédit en quelques millisecondes sur CPU, sans dépendance autre
+que NumPy. La page de prédiction l'utilise quand l'API distante est lente ou
+indisponible (voir api_client.hedged_prediction).
+
+Usage :
+    python local_classifier.py --csv produits_original.csv --output local_classifier.npz
+"""
+
+import os
+import re
+import time
+import argparse
+from collections import Counter
+
+import numpy as np
+import streamlit as st
+
+from catalog import CATALOG_CSV_PATH, CONSUMER_COLUMNS, load_catalog
+
+DEFAULT_MODEL_PATH = 'local_classifier.npz'
+
+# Version du format du modèle : l'incrémenter à chaque changement de prétraitement
+MODEL_VERSION = 1
+
+# Taille maximale du vocabulaire et fréquence documentaire minimale d'un terme
+MAX_VOCABULARY = 8000
+MIN_DOCUMENT_FREQUENCY = 2
+
+# Lissage de Laplace du Bayes naïf
+ALPHA = 0.1
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Mots vides anglais (les descriptions du catalogue sont en anglais)
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+you your our we can all any only buy online price prices genuine products product free shipping cash
+delivery flipkart com rs best
+""".split())
+
+
+def tokenize(text):
+    """Termes en minuscules (lettres et chiffres), sans mots vides ni termes d'une lettre"""
+    return [token for token in _TOKEN_PATTERN.findall(str(text).lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+
+def product_text(product):
+    """Texte d'un produit, dans l'ordre utilisé par la page de prédiction"""
+    parts = [product.get(column) for column in ('product_name', 'brand', 'description', 'product_specifications')]
+    return " ".join(str(part) for part in parts if isinstance(part, str))
+
+
+class LocalClassifier:
+    """TF-IDF (sous-linéaire, normalisé L2) et Bayes naïf multinomial"""
+
+    def __init__(self, vocabulary, idf, classes, class_log_prior, feature_log_prob):
+        self.vocabulary = list(vocabulary)
+        self.term_index = {term: position for position, term in enumerate(self.vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.classes = [str(c) for c in classes]
+        self.class_log_prior = np.asarray(class_log_prior, dtype=np.float32)
+        self.feature_log_prob = np.asarray(feature_log_prob, dtype=np.float32)
+
+    def transform(self, texts):
+        """Matrice TF-IDF dense (textes x vocabulaire), lignes normalisées L2"""
+        matrix = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(self.term_index[t] for t in tokenize(text) if t in self.term_index)
+            if counts:
+                columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                matrix[row, columns] = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def fit(cls, texts, labels, max_vocabulary=MAX_VOCABULARY, min_df=MIN_DOCUMENT_FREQUENCY, alpha=ALPHA):
+        """
+        Entraîne le modèle
+
+        Args:
+            texts: Textes des produits
+            labels: Catégorie principale de chaque produit
+        """
+        tokenized = [tokenize(text) for text in texts]
+        document_frequency = Counter(term for tokens in tokenized for term in set(tokens))
+        vocabulary = sorted(
+            (term for term, df in document_frequency.items() if df >= min_df),
+            key=lambda term: (-document_frequency[term], term)
+        )[:max_vocabulary]
+        vocabulary.sort()
+        idf = np.array([np.log((1 + len(texts)) / (1 + document_frequency[t])) + 1 for t in vocabulary],
+                       dtype=np.float32)
+
+        classes = sorted(set(labels))
+        model = cls(vocabulary, idf, classes, np.zeros(len(classes)), np.zeros((len(classes), len(vocabulary))))
+        features = model.transform(texts)
+        label_index = np.array([classes.index(label) for label in labels])
+
+        class_counts = np.bincount(label_index, minlength=len(classes))
+        feature_totals = np.zeros((len(classes), len(vocabulary)), dtype=np.float64)
+        np.add.at(feature_totals, label_index, features)
+        smoothed = feature_totals + alpha
+        model.class_log_prior = np.log(class_counts / class_counts.sum()).astype(np.float32)
+        model.feature_log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+        return model
+
+    def predict_proba(self, texts):
+        """Probabilités par classe (textes x classes)"""
+        log_likelihood = self.transform(texts) @ self.feature_log_prob.T + self.class_log_prior
+        log_likelihood -= log_likelihood.max(axis=1, keepdims=True)
+        probabilities = np.exp(log_likelihood)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, text):
+        """
+        Prédit la catégorie d'un produit, au format de la réponse de l'API /predict
+
+        Returns:
+            dict: success, predicted_category, confidence, scores, inference_time, source='local'
+        """
+        start = time.perf_counter()
+        probabilities = self.predict_proba([text])[0]
+        order = np.argsort(-probabilities)
+        return {
+            'success': True,
+            'predicted_category': self.classes[order[0]],
+            'confidence': float(probabilities[order[0]]),
+            'scores': [{'category': self.classes[i], 'score': float(probabilities[i])} for i in order],
+            'inference_time': time.perf_counter() - start,
+            'source': 'local',
+        }
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        """Écrit le modèle (.npz compressé) de façon atomique"""
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path, version=MODEL_VERSION,
+            vocabulary=np.array(self.vocabulary), idf=self.idf, classes=np.array(self.classes),
+            class_log_prior=self.class_log_prior, feature_log_prob=self.feature_log_prob.astype(np.float16)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """Charge un modèle (None s'il est absent, illisible ou d'une autre version)"""
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != MODEL_VERSION:
+                    return None
+                return cls(data['vocabulary'].tolist(), data['idf'], data['classes'].tolist(),
+                           data['class_log_prior'], data['feature_log_prob'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def load_training_data(csv_path=CATALOG_CSV_PATH):
+    """Textes et catégories principales du catalogue"""
+    catalog = load_catalog(csv_path, columns=CONSUMER_COLUMNS['classifier'])
+    catalog = catalog[catalog['main_category'] != 'Unknown']
+    texts = [product_text(product) for product in catalog.astype(object).to_dict('records')]
+    return texts, catalog['main_category'].astype(str).tolist()
+
+
+def evaluate(texts, labels, test_fraction=0.2, seed=42):
+    """Exactitude sur un échantillon de validation tiré au hasard"""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(texts))
+    split = int(len(texts) * (1 - test_fraction))
+    train, test = order[:split], order[split:]
+    model = LocalClassifier.fit([texts[i] for i in train], [labels[i] for i in train])
+    probabilities = model.predict_proba([texts[i] for i in test])
+    predicted = [model.classes[i] for i in probabilities.argmax(axis=1)]
+    return float(np.mean([p == labels[i] for p, i in zip(predicted, test)]))
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_local_classifier(fingerprint, path=DEFAULT_MODEL_PATH):
+    """
+    Classifieur local partagé par toutes les sessions du processus
+
+    Args:
+        fingerprint: Empreinte légère (dataset_fingerprint) du fichier modèle, clé de rechargement
+        path: Fichier du modèle
+
+    Returns:
+        LocalClassifier: Modèle, ou None s'il n'a pas été entraîné
+    """
+    return LocalClassifier.load(path)
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Entraîne le classifieur texte local de secours")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV des produits")
+    parser.add_argument('--output', default=DEFAULT_MODEL_PATH, help="Fichier modèle à écrire")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    texts, labels = load_training_data(args.csv)
+    accuracy = evaluate(texts, labels)
+    model = LocalClassifier.fit(texts, labels)
+    model.save(args.output)
+
+    start_predict = time.perf_counter()
+    model.predict(texts[0])
+    print(f"✅ Modèle écrit : {args.output} ({os.path.getsize(args.output) / 1024:.1f} Ko, "
+          f"{len(model.vocabulary)} termes, {len(model.classes)} catégories, {time.perf_counter() - start:.1f}s)")
+    print(f"🎯 Exactitude en validation (20 %) : {accuracy:.1%} ; "
+          f"prédiction : {(time.perf_counter() - start_predict) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
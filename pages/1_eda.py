@@ -1,34 +1,29 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-try:
-    from wordcloud import WordCloud
-except ImportError:
-    WordCloud = None
-import matplotlib.pyplot as plt
-from PIL import Image
 import os
-import requests
 import json
-try:
-    import torch
-except ImportError:
-    torch = None
+from datetime import datetime
 
 # Configuration
 KEYWORD_FREQ_PATH = 'keyword_frequencies.csv'
-# Configuration de l'API
-# Utilise les secrets Streamlit Cloud si disponibles, sinon la valeur par défaut
-try:
-    API_BASE_URL = st.secrets["api"]["base_url"]
-except (KeyError, FileNotFoundError):
-    API_BASE_URL = "http://16.171.235.240"
-
 # Importer le module d'accessibilité
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from accessibility_streamlit_cloud import init_accessibility_state, render_accessibility_sidebar, apply_accessibility_styles
+from profiling import start_rerun_profile, stop_rerun_profile
+from catalog import (CATALOG_CSV_PATH, IMAGES_DIR, dataset_fingerprint, manifest_fingerprint,
+                     catalog_view, memory_report)
+from catalog_watcher import POLL_INTERVAL, get_live_catalog
+from eda_snapshot import (DEFAULT_SNAPSHOT_PATH, AGGREGATES, load_snapshot,
+                          dict_to_series, dict_to_frame)
+from eda_engine import ENGINES, DEFAULT_ENGINE, DEFAULT_CHUNK_ROWS, compute_aggregates_chunked
+from image_hashing import DEFAULT_INDEX_PATH, get_shared_hash_index, duplicate_report
+from image_derivatives import display_image
+from export import FORMATS, parquet_available, iter_csv_chunks, deferred_export, export_file_name, export_mime
+from shared_cache import configure_from_secrets as configure_shared_cache, shared_memoize
+from worker_pool import configure_from_secrets as configure_worker_pool
+import eda_figures
 
 # Configuration de la page
 st.set_page_config(
@@ -37,445 +32,405 @@ st.set_page_config(
     layout="wide"
 )
 
+# Profilage opt-in du rerun (CLIP_PROFILE_RERUNS=1 ou ?profile=1)
+_rerun_profile = start_rerun_profile("1_eda")
+
 # Initialiser l'état d'accessibilité
 init_accessibility_state()
 
-# Charger les données depuis l'API AWS
-@st.cache_data
-def load_eda_data_from_api():
-    """Charge les données EDA depuis l'API AWS (optionnel)"""
+# Cache partagé entre réplicas (section [cache] des secrets, voir shared_cache.py)
+configure_shared_cache()
+
+# Pool de prétraitement des images partagé avec la page de prédiction (dérivés des galeries)
+configure_worker_pool()
+
+# Snapshot EDA pré-calculé (voir eda_snapshot.py), utilisé s'il est à jour
+try:
+    EDA_SNAPSHOT_PATH = st.secrets["eda"]["snapshot_path"]
+except (KeyError, FileNotFoundError):
+    EDA_SNAPSHOT_PATH = os.environ.get("EDA_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+# Moteur du calcul en direct : 'memory' (catalogue en mémoire) ou 'chunked' (par morceaux, voir eda_engine.py)
+try:
+    EDA_ENGINE = st.secrets["eda"]["engine"]
+except (KeyError, FileNotFoundError):
+    EDA_ENGINE = os.environ.get("EDA_ENGINE", DEFAULT_ENGINE)
+if EDA_ENGINE not in ENGINES:
+    EDA_ENGINE = DEFAULT_ENGINE
+try:
+    EDA_CHUNK_ROWS = int(st.secrets["eda"]["chunk_rows"])
+except (KeyError, FileNotFoundError):
+    EDA_CHUNK_ROWS = int(os.environ.get("EDA_CHUNK_ROWS", DEFAULT_CHUNK_ROWS))
+
+# Intervalle de surveillance du CSV et des images (rafraîchissement incrémental, voir catalog_watcher.py)
+try:
+    EDA_WATCH_INTERVAL = float(st.secrets["eda"]["watch_interval"])
+except (KeyError, FileNotFoundError):
+    EDA_WATCH_INTERVAL = float(os.environ.get("EDA_WATCH_INTERVAL", POLL_INTERVAL))
+
+# Index de hachage perceptuel des images (voir image_hashing.py)
+try:
+    IMAGE_HASH_INDEX_PATH = st.secrets["images"]["hash_index_path"]
+except (KeyError, FileNotFoundError):
+    IMAGE_HASH_INDEX_PATH = os.environ.get("IMAGE_HASH_INDEX_PATH", DEFAULT_INDEX_PATH)
+
+# Clés de cache : empreinte des données (et du snapshot) et mode d'accessibilité
+dataset_hash = dataset_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR)
+keywords_hash = dataset_fingerprint(KEYWORD_FREQ_PATH)
+mode = eda_figures.accessibility_mode(st.session_state.accessibility)
+
+@st.cache_data(show_spinner=False)
+def load_fresh_snapshot(snapshot_hash):
+    """Charge le snapshot EDA s'il correspond aux données actuelles (sinon None)"""
+    return load_snapshot(EDA_SNAPSHOT_PATH, expected_fingerprint=manifest_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR))
+
+snapshot = load_fresh_snapshot(dataset_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR, EDA_SNAPSHOT_PATH))
+
+# Catalogue partagé par tout le processus (calcul en direct uniquement)
+def load_and_process_data():
+    """Version publiée du catalogue surveillé, partagée en lecture seule entre les sessions"""
     try:
-        response = requests.get(f"{API_BASE_URL}/eda-data", timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            # L'API n'a pas d'endpoint EDA, utiliser les données locales
-            return None
-    except Exception:
-        # L'API n'a pas d'endpoint EDA, utiliser les données locales
+        # Données locales (rafraîchies en arrière-plan)
+        return get_live_catalog(CATALOG_CSV_PATH, IMAGES_DIR, EDA_WATCH_INTERVAL).current()
+    except Exception as e:
+        st.error(f"❌ Erreur lors du chargement des données: {str(e)}")
         return None
 
-# Charger les données si elles ne sont pas disponibles
-if 'df' not in st.session_state:
-    @st.cache_data
-    def load_and_process_data():
-        """Charge et traite les données des produits depuis l'API"""
-        try:
-            # Charger les données depuis l'API (optionnel)
-            eda_data = load_eda_data_from_api()
-            
-            # Charger les données locales pour le traitement détaillé
-            df = pd.read_csv('produits_original.csv')
-            
-            # Traiter les catégories (structure différente dans produits_original.csv)
-            import ast
-            df['categories'] = df['product_category_tree'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-            # Extraire seulement la catégorie principale (avant le premier >>)
-            df['main_category'] = df['categories'].apply(lambda x: x[0].split(' >> ')[0] if x and len(x) > 0 else 'Unknown')
-            df['sub_categories'] = df['categories'].apply(lambda x: x[0].split(' >> ')[1] if x and len(x) > 0 and ' >> ' in x[0] else 'Unknown')
-            
-            # Ajouter des informations sur les images (colonne 'image' dans produits_original.csv)
-            df['image_exists'] = df['image'].apply(lambda x: os.path.exists(f"Images/{x}") if pd.notna(x) else False)
-            df['image_pixels'] = df['image'].apply(lambda x: get_image_pixels(f"Images/{x}") if pd.notna(x) and os.path.exists(f"Images/{x}") else 0)
-            df['aspect_ratio'] = df['image'].apply(lambda x: get_aspect_ratio(f"Images/{x}") if pd.notna(x) and os.path.exists(f"Images/{x}") else 0)
-            
-            return df
-        except Exception as e:
-            st.error(f"❌ Erreur lors du chargement des données: {str(e)}")
-            return pd.DataFrame()
-    
-    def get_image_pixels(image_path):
-        """Obtient le nombre de pixels d'une image"""
-        try:
-            with Image.open(image_path) as img:
-                return img.width * img.height
-        except:
-            return 0
-    
-    def get_aspect_ratio(image_path):
-        """Obtient le ratio d'aspect d'une image"""
-        try:
-            with Image.open(image_path) as img:
-                return img.width / img.height
-        except:
-            return 0
-    
-    import ast
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def load_chunked_aggregates(dataset_hash):
+    """Agrégats calculés par morceaux, sans charger le catalogue entier"""
+    return compute_aggregates_chunked(CATALOG_CSV_PATH, IMAGES_DIR, EDA_CHUNK_ROWS)
+
+chunked_aggregates = None
+catalog_version = None
+if snapshot is None and EDA_ENGINE == 'chunked':
+    with st.spinner("🔄 Calcul des agrégats par morceaux..."):
+        chunked_aggregates = load_chunked_aggregates(dataset_hash)
+elif snapshot is None:
     with st.spinner("🔄 Chargement des données..."):
-        st.session_state.df = load_and_process_data()
+        catalog_version = load_and_process_data()
+        # La session ne conserve qu'une vue légère, jamais une copie du catalogue
+        catalog = catalog_view(catalog_version.catalog) if catalog_version is not None else pd.DataFrame()
+        if catalog_version is not None:
+            # Les agrégats et figures sont mémorisés par version publiée du catalogue
+            dataset_hash = catalog_version.token
 
 
 # Configuration de page supprimée - gérée par interface.py
 
 st.title("Analyse Exploratoire des Données (EDA)")
 
-# Access data from session state
-if 'df' not in st.session_state or st.session_state.df.empty:
-    st.error("❌ Aucune donnée disponible. Vérifiez la connexion à l'API AWS.")
-    st.stop()
-df = st.session_state.df
-
-# Validate DataFrame
-required_columns = ['main_category', 'sub_categories', 'image', 'image_exists', 'image_pixels', 'aspect_ratio']
-missing_columns = [col for col in required_columns if col not in df.columns]
-if missing_columns:
-    st.error(f"❌ Colonnes manquantes dans le DataFrame : {missing_columns}")
-    st.stop()
-
-# Configuration d'accessibilité pour les graphiques
-ACCESSIBLE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', 
-                    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
-
-# Configuration des couleurs selon le mode d'accessibilité
-if st.session_state.accessibility.get('color_blind', False):
-    PLOTLY_COLORS = px.colors.qualitative.Safe  # Accessible palette for color-blind users
-elif st.session_state.accessibility.get('high_contrast', False):
-    # Palette optimisée pour le mode contraste élevé (couleurs vives sur fond sombre)
-    PLOTLY_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
-                     '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9',
-                     '#F8C471', '#82E0AA', '#F1948A', '#85C1E9', '#D7BDE2']
+if snapshot is not None:
+    df = None
+    created_at = datetime.fromtimestamp(snapshot['created_at']).strftime('%Y-%m-%d %H:%M')
+    st.caption(f"📦 Agrégats issus du snapshot EDA du {created_at}")
+elif chunked_aggregates is not None:
+    df = None
+    if chunked_aggregates['overview']['row_count'] == 0:
+        st.error("❌ Aucune donnée disponible. Vérifiez la connexion à l'API AWS.")
+        st.stop()
+    st.caption(f"🧮 Snapshot EDA absent ou périmé : agrégats calculés par morceaux de {EDA_CHUNK_ROWS} lignes")
 else:
-    PLOTLY_COLORS = ACCESSIBLE_COLORS
+    if catalog.empty:
+        st.error("❌ Aucune donnée disponible. Vérifiez la connexion à l'API AWS.")
+        st.stop()
+    df = catalog
+
+    # Validate DataFrame
+    required_columns = ['main_category', 'sub_categories', 'image', 'image_exists', 'image_pixels', 'aspect_ratio']
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        st.error(f"❌ Colonnes manquantes dans le DataFrame : {missing_columns}")
+        st.stop()
+    refreshed_at = datetime.fromtimestamp(catalog_version.published_at).strftime('%Y-%m-%d %H:%M:%S')
+    st.caption(f"🔄 Snapshot EDA absent ou périmé : agrégats calculés en direct "
+               f"(catalogue version {catalog_version.number} du {refreshed_at}, "
+               f"{catalog_version.derived_rows} ligne(s) recalculée(s))")
+
+
+# Agrégats mémorisés par empreinte du dataset (le DataFrame n'est pas haché)
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def compute_aggregate(name, dataset_hash, _df):
+    """Calcule en direct un agrégat de la page EDA"""
+    return AGGREGATES[name](_df)
+
+def get_aggregate(name):
+    """Agrégat depuis le snapshot s'il est à jour, sinon calculé en direct (en mémoire ou par morceaux)"""
+    if snapshot is not None:
+        return snapshot['aggregates'][name]
+    if chunked_aggregates is not None:
+        return chunked_aggregates[name]
+    if name in catalog_version.aggregates:
+        # Calculé sur le catalogue complet, avant élagage des colonnes inutilisées
+        return catalog_version.aggregates[name]
+    return compute_aggregate(name, dataset_hash, df)
+
+@st.cache_data(show_spinner=False)
+def load_keyword_frequencies(keywords_hash):
+    """Fréquences des mots-clés"""
+    return pd.read_csv(KEYWORD_FREQ_PATH)
+
+
+def section(label, key, expanded=False):
+    """
+    Section repliable à exécution différée
+
+    Le contenu d'une section n'est calculé que lorsque l'expander est ouvert
+    (``on_change="rerun"`` expose l'état via ``.open``).
+    """
+    container = st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    return container, container.open is not False
+
 
 # Données structurées
-st.subheader("Données Structurées")
-st.write("**Informations de débogage :**")
-st.write(f"Colonnes du DataFrame : {list(df.columns)}")
-st.write(f"Nombre de lignes : {len(df)}")
-st.write(f"Valeurs manquantes par colonne :")
-st.dataframe(df.isna().sum())
-
-st.write("**Statistiques descriptives (Numériques) :**")
-numerical_cols = df.select_dtypes(include=['float64', 'int64']).columns
-if not numerical_cols.empty:
-    st.dataframe(df[numerical_cols].describe())
-else:
-    st.warning("⚠️ Aucune colonne numérique disponible pour les statistiques.")
+container, is_open = section("🧾 Données Structurées", "eda_section_structured")
+if is_open:
+    with container:
+        overview = get_aggregate('overview')
+        st.write("**Informations de débogage :**")
+        st.write(f"Colonnes du DataFrame : {overview['columns']}")
+        st.write(f"Nombre de lignes : {overview['row_count']}")
+        st.write(f"Valeurs manquantes par colonne :")
+        st.dataframe(dict_to_series(get_aggregate('missing_values')))
+
+        describe_tables = get_aggregate('describe_tables')
+        numerical_describe = dict_to_frame(describe_tables['numerical'])
+        categorical_describe = dict_to_frame(describe_tables['categorical'])
+        st.write("**Statistiques descriptives (Numériques) :**")
+        if numerical_describe is not None:
+            st.dataframe(numerical_describe)
+        else:
+            st.warning("⚠️ Aucune colonne numérique disponible pour les statistiques.")
 
-st.write("**Statistiques descriptives (Catégoriques) :**")
-categorical_cols = df.select_dtypes(include=['object', 'bool']).columns
-if not categorical_cols.empty:
-    st.dataframe(df[categorical_cols].describe())
-else:
-    st.warning("⚠️ Aucune colonne catégorique disponible pour les statistiques.")
+        st.write("**Statistiques descriptives (Catégoriques) :**")
+        if categorical_describe is not None:
+            st.dataframe(categorical_describe)
+        else:
+            st.warning("⚠️ Aucune colonne catégorique disponible pour les statistiques.")
+
+        # Empreinte mémoire du catalogue partagé (calcul en direct uniquement)
+        if df is not None:
+            report = memory_report(df)
+            st.write(f"**Empreinte mémoire du catalogue :** {report['bytes'].sum() / 1024:.0f} Ko")
+            st.dataframe(report, column_config={'share': st.column_config.ProgressColumn(
+                "Part", format="percent", min_value=0.0, max_value=1.0)})
+
+# Catégories
+container, is_open = section("🗂️ Catégories de produits", "eda_section_categories", expanded=True)
+if is_open:
+    with container:
+        category_counts = get_aggregate('category_counts')
+        category_count = dict_to_series(category_counts['main'])
+        subcat_count = dict_to_series(category_counts['sub_top20'])
+
+        st.write("**Nombre de produits par catégorie principale :**")
+        if category_count.empty:
+            st.warning("⚠️ Aucune catégorie principale trouvée dans le DataFrame.")
+        else:
+            st.dataframe(category_count)
 
-st.write("**Nombre de produits par catégorie principale :**")
-category_count = df['main_category'].value_counts()
-if category_count.empty:
-    st.warning("⚠️ Aucune catégorie principale trouvée dans le DataFrame.")
-else:
-    st.dataframe(category_count)
-
-    # Graphique accessible avec couleurs contrastées
-    bg_color = '#000000' if st.session_state.accessibility.get('high_contrast', False) else '#FFFFFF'
-    text_color = '#FFFFFF' if st.session_state.accessibility.get('high_contrast', False) else '#000000'
-    
-    fig1 = px.bar(category_count, x=category_count.index, y=category_count.values, 
-                  title="Nombre de Produits par Catégorie Principale",
-                  color=category_count.index,
-                  color_discrete_sequence=PLOTLY_COLORS[:len(category_count)])
-    
-    fig1.update_layout(
-        xaxis_title="Catégories",
-        yaxis_title="Nombre de produits",
-        plot_bgcolor=bg_color,
-        paper_bgcolor=bg_color,
-        font=dict(size=14 if not st.session_state.accessibility.get('large_text', False) else 18, color=text_color),
-        legend_title="Catégories",
-        legend=dict(font=dict(color=text_color)),
-        margin=dict(l=50, r=50, t=50, b=100),  # Ensure enough space for rotated labels
-        hoverlabel=dict(
-            bgcolor="white",
-            font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
-            font_family="Arial, sans-serif",
-            font_color="black",
-            bordercolor="black"
-        )
-    )
-    fig1.update_xaxes(
-        tickangle=45,
-        tickfont=dict(color=text_color, size=14 if not st.session_state.accessibility.get('large_text', False) else 16)
-    )
-    fig1.update_yaxes(
-        tickfont=dict(color=text_color, size=14 if not st.session_state.accessibility.get('large_text', False) else 16)
-    )
-    st.plotly_chart(fig1, use_container_width=True, aria_label="Graphique du nombre de produits par catégorie principale")
-
-    # Alternative textuelle pour les utilisateurs de lecteurs d'écran
-    st.write("**Données textuelles du graphique :**")
-    for category, count in category_count.items():
-        st.write(f"- {category}: {count} produits")
-
-st.write("**Nombre de produits par branche de catégories :**")
-subcat_count = df['sub_categories'].value_counts().head(20)
-if subcat_count.empty:
-    st.warning("⚠️ Aucune sous-catégorie trouvée dans le DataFrame.")
-else:
-    st.dataframe(subcat_count)
-
-    # Graphique en camembert avec couleurs accessibles
-    fig2 = px.pie(subcat_count, values=subcat_count.values, names=subcat_count.index, 
-                  title="Top 20 Branches de Catégories",
-                  color_discrete_sequence=PLOTLY_COLORS)
-    fig2.update_traces(
-        textposition='inside',
-        textinfo='percent+label',
-        hovertemplate='<b>%{label}</b><br>Valeur: %{value}<br>Pourcentage: %{percent}',
-        textfont=dict(color=text_color, size=14 if not st.session_state.accessibility.get('large_text', False) else 16)
-    )
-    fig2.update_layout(
-        uniformtext_minsize=12 if not st.session_state.accessibility.get('large_text', False) else 16,
-        uniformtext_mode='hide',
-        legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02, font=dict(color=text_color, size=10)),
-        plot_bgcolor=bg_color,
-        paper_bgcolor=bg_color,
-        font=dict(color=text_color),
-        margin=dict(r=200),  # Ajouter une marge à droite pour la légende
-        hoverlabel=dict(
-            bgcolor="white",
-            font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
-            font_family="Arial, sans-serif",
-            font_color="black",
-            bordercolor="black"
-        )
-    )
-    st.plotly_chart(fig2, use_container_width=True, aria_label="Graphique en camembert des top 20 branches de catégories")
+            # Graphique accessible avec couleurs contrastées
+            fig1 = eda_figures.figure_from_json(eda_figures.category_bar_json(dataset_hash, mode, category_count))
+            st.plotly_chart(fig1, use_container_width=True, alt="Graphique du nombre de produits par catégorie principale")
+
+            # Alternative textuelle pour les utilisateurs de lecteurs d'écran
+            st.write("**Données textuelles du graphique :**")
+            for category, count in category_count.items():
+                st.write(f"- {category}: {count} produits")
+
+        st.write("**Nombre de produits par branche de catégories :**")
+        if subcat_count.empty:
+            st.warning("⚠️ Aucune sous-catégorie trouvée dans le DataFrame.")
+        else:
+            st.dataframe(subcat_count)
+
+            # Graphique en camembert avec couleurs accessibles
+            fig2 = eda_figures.figure_from_json(eda_figures.subcategory_pie_json(dataset_hash, mode, subcat_count))
+            st.plotly_chart(fig2, use_container_width=True, alt="Graphique en camembert des top 20 branches de catégories")
 
 # Données textuelles non structurées
-st.subheader("Données Textuelles Non Structurées")
-try:
-    keyword_freq_df = pd.read_csv(KEYWORD_FREQ_PATH)
-    if keyword_freq_df.empty or 'Mot Clé' not in keyword_freq_df.columns or 'Fréquence' not in keyword_freq_df.columns:
-        st.error(f"❌ Le fichier {KEYWORD_FREQ_PATH} est vide ou ne contient pas les colonnes attendues ('Mot Clé', 'Fréquence').")
-    else:
-        total_keywords = keyword_freq_df['Fréquence'].sum()
-        st.write(f"**Nombre total de mots-clés :** {total_keywords}")
-        st.write("**Fréquence des mots-clés (Top 50) :**")
-        st.dataframe(keyword_freq_df.head(50))
-        
-        csv = keyword_freq_df.to_csv(index=False).encode('utf-8')
-        
-        # Empêcher le bouton de téléchargement de changer en mode contraste élevé
-        if st.session_state.accessibility.get('high_contrast', False):
-            st.markdown("""
-            <style>
-            /* Garder les styles par défaut du bouton de téléchargement */
-            div[data-testid="stDownloadButton"] button {
-                background-color: rgb(255, 255, 255) !important;
-                color: rgb(38, 39, 48) !important;
-                border: 1px solid rgba(49, 51, 63, 0.2) !important;
-            }
-            div[data-testid="stDownloadButton"] button:hover {
-                background-color: rgba(49, 51, 63, 0.1) !important;
-                color: rgb(38, 39, 48) !important;
-                border: 1px solid rgba(49, 51, 63, 0.2) !important;
-            }
-            /* Forcer la couleur du texte à rester sombre */
-            div[data-testid="stDownloadButton"] button * {
-                color: rgb(38, 39, 48) !important;
-            }
-            div[data-testid="stDownloadButton"] button span {
-                color: rgb(38, 39, 48) !important;
-            }
-            /* Texte blanc lors du survol */
-            div[data-testid="stDownloadButton"] button:hover * {
-                color: white !important;
-            }
-            div[data-testid="stDownloadButton"] button:hover span {
-                color: white !important;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-        
-        # Créer un conteneur avec un ID unique pour le bouton
-        download_container = st.container()
-        with download_container:
-            st.download_button(
-                label="Télécharger les fréquences des mots clés (CSV)",
-                data=csv,
-                file_name="keyword_frequencies.csv",
-                mime="text/csv",
-                key="download_keywords_csv"
-            )
-        
-        # Graphique barre accessible
-        fig3 = px.bar(keyword_freq_df.head(50), x='Mot Clé', y='Fréquence', 
-                      title="Fréquence des Mots-Clés (Top 50)",
-                      color='Fréquence',
-                      color_continuous_scale='viridis' if st.session_state.accessibility.get('color_blind', False) 
-                      else 'plasma' if st.session_state.accessibility.get('high_contrast', False) 
-                      else 'Blues')
-        fig3.update_layout(
-            xaxis_title="Mots-clés",
-            yaxis_title="Fréquence",
-            xaxis_tickangle=45,
-            plot_bgcolor=bg_color,
-            paper_bgcolor=bg_color,
-            font=dict(size=14 if not st.session_state.accessibility.get('large_text', False) else 18, color=text_color),
-            showlegend=False,
-            hoverlabel=dict(
-                bgcolor="white" if st.session_state.accessibility.get('high_contrast', False) else "rgba(255,255,255,0.8)",
-                font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
-                font_family="Arial, sans-serif",
-                font_color="black" if st.session_state.accessibility.get('high_contrast', False) else "black"
-            )
-        )
-        fig3.update_xaxes(
-            tickfont=dict(color=text_color, size=14 if not st.session_state.accessibility.get('large_text', False) else 16)
-        )
-        fig3.update_yaxes(
-            tickfont=dict(color=text_color, size=14 if not st.session_state.accessibility.get('large_text', False) else 16)
-        )
-        st.plotly_chart(fig3, use_container_width=True, aria_label="Graphique en barres des fréquences des mots-clés (Top 50)")
-
-        # Graphique camembert accessible
-        fig4 = px.pie(keyword_freq_df.head(20), values='Fréquence', names='Mot Clé', 
-                      title="Top 20 Mots-Clés par Fréquence",
-                      color_discrete_sequence=PLOTLY_COLORS)
-        fig4.update_traces(
-            textposition='inside',
-            textinfo='percent+label',
-            hovertemplate='<b>%{label}</b><br>Fréquence: %{value}<br>Pourcentage: %{percent}',
-            textfont=dict(color=text_color, size=14 if not st.session_state.accessibility.get('large_text', False) else 16)
-        )
-        fig4.update_layout(
-            plot_bgcolor=bg_color,
-            paper_bgcolor=bg_color,
-            font=dict(color=text_color),
-            legend=dict(font=dict(color=text_color)),
-            hoverlabel=dict(
-                bgcolor="white" if st.session_state.accessibility.get('high_contrast', False) else "rgba(255,255,255,0.8)",
-                font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
-                font_family="Arial, sans-serif",
-                font_color="black" if st.session_state.accessibility.get('high_contrast', False) else "black"
-            )
-        )
-        st.plotly_chart(fig4, use_container_width=True, aria_label="Graphique en camembert des top 20 mots-clés par fréquence")
-
-        # Nuage de mots avec contraste amélioré
-        top_keywords = dict(keyword_freq_df.head(50)[['Mot Clé', 'Fréquence']].values)
-        if top_keywords:
-            # Choisir la palette en fonction du mode d'accessibilité
-            if st.session_state.accessibility.get('color_blind', False):
-                colormap = 'viridis'
-            elif st.session_state.accessibility.get('high_contrast', False):
-                colormap = 'hot'
+container, is_open = section("🔤 Données Textuelles Non Structurées", "eda_section_keywords")
+if is_open:
+    with container:
+        try:
+            keyword_freq_df = load_keyword_frequencies(keywords_hash)
+            if keyword_freq_df.empty or 'Mot Clé' not in keyword_freq_df.columns or 'Fréquence' not in keyword_freq_df.columns:
+                st.error(f"❌ Le fichier {KEYWORD_FREQ_PATH} est vide ou ne contient pas les colonnes attendues ('Mot Clé', 'Fréquence').")
             else:
-                colormap = 'plasma'
-            
-            wordcloud = WordCloud(
-                width=800, 
-                height=400, 
-                background_color='black' if st.session_state.accessibility.get('high_contrast', False) else 'white',
-                colormap=colormap,
-                contour_color='white' if st.session_state.accessibility.get('high_contrast', False) else 'black',
-                contour_width=1
-            ).generate_from_frequencies(top_keywords)
-            
-            plt.figure(figsize=(10, 5))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis('off')
-            plt.title("Nuage de Mots des Mots-Clés les Plus Fréquents", 
-                     fontsize=16 if not st.session_state.accessibility.get('large_text', False) else 20, 
-                     pad=20,
-                     color='white' if st.session_state.accessibility.get('high_contrast', False) else 'black')
-            
-            # Appliquer le fond sombre en mode contraste élevé
-            if st.session_state.accessibility.get('high_contrast', False):
-                plt.gca().set_facecolor('black')
-                plt.gcf().set_facecolor('black')
-            
-            st.pyplot(plt)
-        else:
-            st.warning("⚠️ Aucun mot-clé disponible pour générer le nuage de mots.")
-    
-except FileNotFoundError:
-    st.error(f"❌ Fichier {KEYWORD_FREQ_PATH} non trouvé.")
+                total_keywords = keyword_freq_df['Fréquence'].sum()
+                st.write(f"**Nombre total de mots-clés :** {total_keywords}")
+                st.write("**Fréquence des mots-clés (Top 50) :**")
+                st.dataframe(keyword_freq_df.head(50))
+
+                # Export produit seulement au clic, par morceaux lus depuis le fichier
+                formats = [fmt for fmt in FORMATS if fmt != 'parquet' or parquet_available()]
+                export_col1, export_col2 = st.columns(2)
+                with export_col1:
+                    export_format = st.selectbox("Format d'export", formats, format_func=str.upper,
+                                                 key="keywords_export_format")
+                with export_col2:
+                    export_gzip = st.checkbox("Compresser (gzip)", key="keywords_export_gzip",
+                                              disabled=export_format == 'parquet')
+
+                # Empêcher le bouton de téléchargement de changer en mode contraste élevé
+                if st.session_state.accessibility.get('high_contrast', False):
+                    st.markdown("""
+                <style>
+                /* Garder les styles par défaut du bouton de téléchargement */
+                div[data-testid="stDownloadButton"] button {
+                    background-color: rgb(255, 255, 255) !important;
+                    color: rgb(38, 39, 48) !important;
+                    border: 1px solid rgba(49, 51, 63, 0.2) !important;
+                }
+                div[data-testid="stDownloadButton"] button:hover {
+                    background-color: rgba(49, 51, 63, 0.1) !important;
+                    color: rgb(38, 39, 48) !important;
+                    border: 1px solid rgba(49, 51, 63, 0.2) !important;
+                }
+                /* Forcer la couleur du texte à rester sombre */
+                div[data-testid="stDownloadButton"] button * {
+                    color: rgb(38, 39, 48) !important;
+                }
+                div[data-testid="stDownloadButton"] button span {
+                    color: rgb(38, 39, 48) !important;
+                }
+                /* Texte blanc lors du survol */
+                div[data-testid="stDownloadButton"] button:hover * {
+                    color: white !important;
+                }
+                div[data-testid="stDownloadButton"] button:hover span {
+                    color: white !important;
+                }
+                </style>
+                """, unsafe_allow_html=True)
+
+                # Créer un conteneur avec un ID unique pour le bouton
+                download_container = st.container()
+                with download_container:
+                    st.download_button(
+                        label=f"Télécharger les fréquences des mots clés ({export_format.upper()})",
+                        data=deferred_export(lambda: iter_csv_chunks(KEYWORD_FREQ_PATH), export_format, export_gzip),
+                        file_name=export_file_name("keyword_frequencies", export_format, export_gzip),
+                        mime=export_mime(export_format, export_gzip),
+                        on_click="ignore",
+                        key="download_keywords_csv"
+                    )
+
+                # Graphique barre accessible
+                fig3 = eda_figures.figure_from_json(eda_figures.keyword_bar_json(keywords_hash, mode, keyword_freq_df))
+                st.plotly_chart(fig3, use_container_width=True, alt="Graphique en barres des fréquences des mots-clés (Top 50)")
+
+                # Graphique camembert accessible
+                fig4 = eda_figures.figure_from_json(eda_figures.keyword_pie_json(keywords_hash, mode, keyword_freq_df))
+                st.plotly_chart(fig4, use_container_width=True, alt="Graphique en camembert des top 20 mots-clés par fréquence")
+
+                # Nuage de mots avec contraste amélioré
+                top_keywords = dict(keyword_freq_df.head(50)[['Mot Clé', 'Fréquence']].values)
+                if top_keywords:
+                    wordcloud_image = eda_figures.wordcloud_png(keywords_hash, mode, top_keywords)
+                    if wordcloud_image is not None:
+                        st.image(wordcloud_image, use_container_width=True,
+                                 alt="Nuage de mots des mots-clés les plus fréquents")
+                    else:
+                        st.warning("⚠️ Le module wordcloud n'est pas installé.")
+                else:
+                    st.warning("⚠️ Aucun mot-clé disponible pour générer le nuage de mots.")
+
+        except FileNotFoundError:
+            st.error(f"❌ Fichier {KEYWORD_FREQ_PATH} non trouvé.")
 
 # Données visuelles non structurées
-st.subheader("Données Visuelles Non Structurées")
-st.write("**Exemple d'image par catégorie :**")
-
-# Debugging: Display category and image availability
-st.write("**Disponibilité des images par catégorie :**")
-for category in df['main_category'].unique()[:3]:
-    count = len(df[(df['main_category'] == category) & df['image_exists'] & (df['image_pixels'] > 0)])
-    st.write(f"- {category}: {count} images valides (image_pixels > 0)")
-
-for category in df['main_category'].unique()[:3]:
-    st.write(f"**Catégorie : {category}**")
-    filtered_df = df[(df['main_category'] == category) & df['image_exists'] & (df['image_pixels'] > 0)]['image']
-    if not filtered_df.empty:
-        sample_paths = filtered_df.sample(n=1, random_state=42)
-        for path in sample_paths:
-            full_path = f"Images/{path}"
-            if os.path.exists(full_path):
-                try:
-                    img = Image.open(full_path)
-                    st.image(img, caption=f"Exemple pour {category}", width=200)
-                    # Texte alternatif pour les images
-                    st.caption(f"Image d'exemple pour la catégorie {category}")
-                except Exception as e:
-                    st.write(f"⚠️ Impossible de charger l'image pour {category}: {str(e)}")
+container, is_open = section("🖼️ Données Visuelles Non Structurées", "eda_section_images")
+if is_open:
+    with container:
+        st.write("**Exemple d'image par catégorie :**")
+
+        # Debugging: Display category and image availability
+        image_samples = get_aggregate('image_samples')[:3]
+        st.write("**Disponibilité des images par catégorie :**")
+        for sample in image_samples:
+            st.write(f"- {sample['category']}: {sample['valid_count']} images valides (image_pixels > 0)")
+
+        for sample in image_samples:
+            category = sample['category']
+            st.write(f"**Catégorie : {category}**")
+            if sample['sample_image'] is not None:
+                full_path = f"{IMAGES_DIR}/{sample['sample_image']}"
+                if os.path.exists(full_path):
+                    try:
+                        st.image(display_image(full_path, 200), caption=f"Exemple pour {category}", width=200)
+                        # Texte alternatif pour les images
+                        st.caption(f"Image d'exemple pour la catégorie {category}")
+                    except Exception as e:
+                        st.write(f"⚠️ Impossible de charger l'image pour {category}: {str(e)}")
+                else:
+                    st.write(f"⚠️ Chemin d'image non valide pour {category}: {full_path}")
             else:
-                st.write(f"⚠️ Chemin d'image non valide pour {category}: {full_path}")
-    else:
-        st.write(f"Aucune image valide disponible pour la catégorie {category} (aucune image avec image_pixels > 0).")
+                st.write(f"Aucune image valide disponible pour la catégorie {category} (aucune image avec image_pixels > 0).")
 
 # Statistiques sur les images
-st.write("**Statistiques sur les images :**")
-valid_image_df = df[df['image_pixels'] > 0][['image_pixels', 'aspect_ratio']]
-if valid_image_df.empty:
-    st.warning("⚠️ Aucune image valide (image_pixels > 0) disponible pour les statistiques.")
-else:
-    st.write(f"**Nombre d'images valides :** {len(valid_image_df)}")
-    st.dataframe(valid_image_df.describe())
-
-# Scatter plot accessible
-if not valid_image_df.empty and 'aspect_ratio' in valid_image_df.columns and 'image_pixels' in valid_image_df.columns:
-    fig5 = px.scatter(valid_image_df, x='aspect_ratio', y='image_pixels', 
-                      color=df.loc[valid_image_df.index, 'main_category'],
-                      title="Ratio Hauteur/Largeur vs Nombre de Pixels (Images Valides)",
-                      color_discrete_sequence=PLOTLY_COLORS,
-                      labels={'aspect_ratio': 'Ratio Hauteur/Largeur', 'image_pixels': 'Nombre de Pixels'})
-    fig5.update_layout(
-        plot_bgcolor=bg_color,
-        paper_bgcolor=bg_color,
-        font=dict(size=12 if not st.session_state.accessibility.get('large_text', False) else 16, color=text_color),
-        legend_title="Catégories principales",
-        legend=dict(font=dict(color=text_color)),
-        hoverlabel=dict(
-            bgcolor="white",
-            font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
-            font_family="Arial, sans-serif",
-            font_color="black",
-            bordercolor="black"
-        )
-    )
-    fig5.update_traces(
-        marker=dict(size=8, opacity=0.7),
-        selector=dict(mode='markers')
-    )
-    fig5.update_xaxes(
-        tickfont=dict(color=text_color, size=12 if not st.session_state.accessibility.get('large_text', False) else 16)
-    )
-    fig5.update_yaxes(
-        tickfont=dict(color=text_color, size=12 if not st.session_state.accessibility.get('large_text', False) else 16)
-    )
-    st.plotly_chart(fig5, use_container_width=True, aria_label="Nuage de points du ratio hauteur/largeur vs nombre de pixels")
-else:
-    st.warning("⚠️ Données insuffisantes pour afficher le nuage de points (aucune image valide avec aspect_ratio ou image_pixels).")
+container, is_open = section("📐 Statistiques sur les images", "eda_section_image_stats")
+if is_open:
+    with container:
+        image_statistics = get_aggregate('image_statistics')
+        points = image_statistics['points']
+        valid_image_df = pd.DataFrame({'image_pixels': points['image_pixels'], 'aspect_ratio': points['aspect_ratio']})
+        if valid_image_df.empty:
+            st.warning("⚠️ Aucune image valide (image_pixels > 0) disponible pour les statistiques.")
+        else:
+            st.write(f"**Nombre d'images valides :** {image_statistics['valid_count']}")
+            st.dataframe(dict_to_frame(image_statistics['describe']))
+
+        # Scatter plot accessible
+        if not valid_image_df.empty:
+            fig5 = eda_figures.figure_from_json(eda_figures.image_scatter_json(
+                dataset_hash, mode, valid_image_df, points['main_category']))
+            st.plotly_chart(fig5, use_container_width=True, alt="Nuage de points du ratio hauteur/largeur vs nombre de pixels")
+        else:
+            st.warning("⚠️ Données insuffisantes pour afficher le nuage de points (aucune image valide avec aspect_ratio ou image_pixels).")
 
-# Debugging: Display invalid images
-st.write("**Images invalides (image_pixels = 0 ou manquant) :**")
-invalid_images = df[df['image_pixels'] <= 0][['image', 'main_category', 'image_pixels']]
-if not invalid_images.empty:
-    st.dataframe(invalid_images)
-else:
-    st.write("✅ Toutes les images ont des valeurs valides pour image_pixels.")
+        # Debugging: Display invalid images
+        st.write("**Images invalides (image_pixels = 0 ou manquant) :**")
+        invalid_images = dict_to_frame(image_statistics['invalid'])
+        if not invalid_images.empty:
+            st.dataframe(invalid_images)
+        else:
+            st.write("✅ Toutes les images ont des valeurs valides pour image_pixels.")
+
+# Images quasi identiques (index de hachage perceptuel)
+@st.cache_data(show_spinner=False)
+@shared_memoize
+def load_duplicate_report(index_hash):
+    """Rapport des images quasi identiques, recalculé uniquement si les données ou l'index changent"""
+    index = get_shared_hash_index(index_hash, IMAGE_HASH_INDEX_PATH, CATALOG_CSV_PATH, IMAGES_DIR, build_missing=True)
+    return duplicate_report(index, CATALOG_CSV_PATH, IMAGES_DIR)
+
+container, is_open = section("🪞 Images quasi identiques", "eda_section_duplicates")
+if is_open:
+    with container:
+        with st.spinner("🔄 Recherche des images quasi identiques..."):
+            duplicates = load_duplicate_report(dataset_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR, IMAGE_HASH_INDEX_PATH))
+        if duplicates.empty:
+            st.write("✅ Aucune image quasi identique dans le catalogue.")
+        else:
+            st.write(f"**Groupes d'images quasi identiques :** {duplicates['group'].nunique()} "
+                     f"({len(duplicates)} images)")
+            st.dataframe(duplicates.drop(columns='image'), use_container_width=True)
+
+            # Aperçu des plus grands groupes
+            for group_number, group in list(duplicates.groupby('group'))[:3]:
+                st.write(f"**Groupe {group_number} :** {len(group)} images")
+                paths = [os.path.join(IMAGES_DIR, image) for image in group['image'].head(6)]
+                st.image([display_image(path, 120) for path in paths if os.path.exists(path)], width=120,
+                         caption=[name for name, path in zip(group['product_name'].head(6), paths) if os.path.exists(path)])
 
 # Afficher les options d'accessibilité dans la sidebar
 render_accessibility_sidebar()
 
 # Appliquer les styles d'accessibilité
-apply_accessibility_styles()
\ No newline at end of file
+apply_accessibility_styles()
+
+# Enregistrer le profil du rerun (voir start_rerun_profile pour les reruns interrompus)
+stop_rerun_profile(_rerun_profile)
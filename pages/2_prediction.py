@@ -5,20 +5,35 @@ Utilise l'API AWS pour la classification d'images et de texte
 
 import os
 import streamlit as st
-from PIL import Image
-import json
 import pandas as pd
-import requests
-import io
-import numpy as np
-import re
-import ast
-import plotly.express as px
+import time
+import uuid
+import functools
+from datetime import datetime
 
 # Importer le module d'accessibilité
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from accessibility_streamlit_cloud import init_accessibility_state, render_accessibility_sidebar, apply_accessibility_styles
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR, CONSUMER_COLUMNS, read_catalog, load_catalog, dataset_fingerprint
+from image_hashing import (DEFAULT_INDEX_PATH, image_hashes, get_shared_hash_index, get_prediction_memo)
+from visual_search import DEFAULT_FEATURES_PATH, image_features, get_shared_visual_index
+from local_classifier import DEFAULT_MODEL_PATH, get_local_classifier
+from api_client import (DEFAULT_HEDGE_DELAY, DEFAULT_HEDGE_PERCENTILE, parse_endpoints, get_router,
+                        ensure_health_prober, resize_image_for_model, prepare_image_bytes,
+                        routed_multi_prediction, hedged_prediction, AGGREGATION_STRATEGIES, DEFAULT_AGGREGATION)
+from image_ingest import MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS, ImageRejected, load_image
+from image_derivatives import encode_derivative, display_image
+from prediction_history import DEFAULT_HISTORY_PATH, get_prediction_history
+from export import deferred_export, export_file_name, export_mime, parquet_available
+from catalog_predictions import (DEFAULT_PREDICTIONS_PATH, product_form_fields, build_description, model_input,
+                                 get_prediction_table)
+from clip_text import CONTEXT_LENGTH, DEFAULT_VOCAB_PATH, get_tokenizer
+from api_health import HEALTH_INTERVAL, CLOSED, HALF_OPEN
+from shared_cache import configure_from_secrets as configure_shared_cache
+from worker_pool import (configure_from_secrets as configure_worker_pool, INTERACTIVE, PoolSaturated,
+                         current_worker_pool, run_in_pool)
+from profiling import start_rerun_profile, stop_rerun_profile, record_run, track_run, get_run_metrics
 
 # Configuration de la page
 st.set_page_config(
@@ -27,23 +42,105 @@ st.set_page_config(
     layout="wide"
 )
 
+# Profilage opt-in du rerun (CLIP_PROFILE_RERUNS=1 ou ?profile=1)
+_rerun_profile = start_rerun_profile("2_prediction")
+_page_cpu_start = time.thread_time()
+
 # Configuration de l'API AWS
-# Utilise les secrets Streamlit Cloud si disponibles, sinon l'environnement ou la valeur par défaut
+# Utilise les secrets Streamlit Cloud si disponibles ([api] base_urls ou base_url),
+# sinon l'environnement (API_BASE_URLS, API_BASE_URL) ou les points d'accès par défaut
+try:
+    API_ENDPOINTS = parse_endpoints(st.secrets["api"])
+except (KeyError, FileNotFoundError):
+    API_ENDPOINTS = parse_endpoints()
+
+# Percentile des latences au-delà duquel la requête est copiée vers un deuxième point d'accès
+try:
+    API_HEDGE_PERCENTILE = float(st.secrets["api"]["hedge_percentile"])
+except (KeyError, FileNotFoundError):
+    API_HEDGE_PERCENTILE = float(os.environ.get("API_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE))
+
+# Routeur partagé par toutes les sessions (latences et erreurs par point d'accès)
+api_router = get_router(API_ENDPOINTS, API_HEDGE_PERCENTILE)
+
+# Sonde de santé en arrière-plan (une par processus), qui alimente les disjoncteurs du routeur
+try:
+    API_HEALTH_INTERVAL = float(st.secrets["api"]["health_interval"])
+except (KeyError, FileNotFoundError):
+    API_HEALTH_INTERVAL = float(os.environ.get("API_HEALTH_INTERVAL", HEALTH_INTERVAL))
+api_prober = ensure_health_prober(api_router, API_HEALTH_INTERVAL)
+
+# Cache partagé entre réplicas (section [cache] des secrets, voir shared_cache.py)
+configure_shared_cache()
+
+# Pool de prétraitement des images partagé par toutes les sessions (section [images] des secrets, voir worker_pool.py)
+configure_worker_pool()
+POOL_SATURATED_MESSAGE = "⏳ Serveur saturé : trop d'images en cours de traitement, réessayez dans quelques secondes"
+
+# Délai accordé à l'API avant de répondre avec le classifieur local (secondes)
+try:
+    API_HEDGE_DELAY = float(st.secrets["api"]["hedge_delay"])
+except (KeyError, FileNotFoundError):
+    API_HEDGE_DELAY = float(os.environ.get("API_HEDGE_DELAY", DEFAULT_HEDGE_DELAY))
+
+# Classifieur texte local de secours (voir local_classifier.py)
+try:
+    LOCAL_MODEL_PATH = st.secrets["api"]["local_model_path"]
+except (KeyError, FileNotFoundError):
+    LOCAL_MODEL_PATH = os.environ.get("LOCAL_MODEL_PATH", DEFAULT_MODEL_PATH)
+
+# Index de hachage perceptuel des images du catalogue (voir image_hashing.py)
+try:
+    IMAGE_HASH_INDEX_PATH = st.secrets["images"]["hash_index_path"]
+except (KeyError, FileNotFoundError):
+    IMAGE_HASH_INDEX_PATH = os.environ.get("IMAGE_HASH_INDEX_PATH", DEFAULT_INDEX_PATH)
+
+# Descripteurs visuels des images du catalogue (voir visual_search.py)
+try:
+    VISUAL_FEATURES_PATH = st.secrets["images"]["visual_features_path"]
+except (KeyError, FileNotFoundError):
+    VISUAL_FEATURES_PATH = os.environ.get("VISUAL_FEATURES_PATH", DEFAULT_FEATURES_PATH)
+
+# Budgets d'ingestion des images uploadées (voir image_ingest.py)
+try:
+    UPLOAD_MAX_BYTES = int(float(st.secrets["images"]["max_upload_mb"]) * 1024 ** 2)
+except (KeyError, FileNotFoundError):
+    UPLOAD_MAX_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", MAX_UPLOAD_BYTES / 1024 ** 2)) * 1024 ** 2)
+try:
+    UPLOAD_MAX_PIXELS = int(float(st.secrets["images"]["max_megapixels"]) * 1e6)
+except (KeyError, FileNotFoundError):
+    UPLOAD_MAX_PIXELS = int(float(os.environ.get("MAX_IMAGE_MEGAPIXELS", MAX_IMAGE_PIXELS / 1e6)) * 1e6)
+
+# Table pré-calculée des prédictions du catalogue (voir catalog_predictions.py)
+try:
+    CATALOG_PREDICTIONS_PATH = st.secrets["api"]["catalog_predictions_path"]
+except (KeyError, FileNotFoundError):
+    CATALOG_PREDICTIONS_PATH = os.environ.get("CATALOG_PREDICTIONS_PATH", DEFAULT_PREDICTIONS_PATH)
+
+# Troncature du texte au contexte de l'encodeur de texte CLIP (voir clip_text.py)
 try:
-    API_BASE_URL = st.secrets["api"]["base_url"]
+    CLIP_VOCAB_PATH = st.secrets["api"]["clip_vocab_path"]
 except (KeyError, FileNotFoundError):
-        API_BASE_URL = os.environ.get("API_BASE_URL", "http://13.60.70.230")
+    CLIP_VOCAB_PATH = os.environ.get("CLIP_VOCAB_PATH", DEFAULT_VOCAB_PATH)
+try:
+    TEXT_CONTEXT_LENGTH = int(st.secrets["api"]["text_context_length"])
+except (KeyError, FileNotFoundError):
+    TEXT_CONTEXT_LENGTH = int(os.environ.get("TEXT_CONTEXT_LENGTH", CONTEXT_LENGTH))
+text_tokenizer = get_tokenizer(CLIP_VOCAB_PATH)
+
+# Historique persistant des prédictions (voir prediction_history.py)
+try:
+    PREDICTION_HISTORY_PATH = st.secrets["history"]["path"]
+except (KeyError, FileNotFoundError):
+    PREDICTION_HISTORY_PATH = os.environ.get("PREDICTION_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+prediction_history = get_prediction_history(PREDICTION_HISTORY_PATH)
+
+# Nombre de produits similaires affichés
+SIMILAR_PRODUCTS_COUNT = 5
 
 # Initialiser l'état d'accessibilité
 init_accessibility_state()
 
-# Configuration de la page
-st.set_page_config(
-    page_title="Prédiction de Catégorie",
-    page_icon="🔮",
-    layout="wide"
-)
-
 st.title("🔮 Prédiction de Catégorie")
 
 # Afficher les options d'accessibilité dans la sidebar
@@ -52,6 +149,22 @@ render_accessibility_sidebar()
 # Appliquer les styles d'accessibilité
 apply_accessibility_styles()
 
+@st.fragment(run_every=API_HEALTH_INTERVAL)
+def render_api_status():
+    """Bandeau d'état de l'API, mis à jour à chaque sonde de santé"""
+    with track_run("api_status"):
+        states = [entry['state'] for entry in api_router.snapshot()]
+        if not api_prober.status():
+            st.caption("⚪ État de l'API : vérification en cours…")
+        elif all(state == CLOSED for state in states):
+            st.success("🟢 API disponible")
+        elif any(state in (CLOSED, HALF_OPEN) for state in states):
+            st.warning("🟠 API partiellement disponible : certaines instances ne répondent pas ou reprennent progressivement")
+        else:
+            st.error("🔴 API indisponible : les prédictions utiliseront le classifieur local")
+
+render_api_status()
+
 # Information sur l'optimisation des images
 st.info("🚀 **Optimisation automatique** : Les images sont automatiquement redimensionnées à 224x224 pixels (taille d'entrée du modèle CLIP) pour des performances optimales.")
 
@@ -66,8 +179,8 @@ def load_default_test_product():
         dict: Informations du produit de test ou None si erreur
     """
     try:
-        # Charger les données des produits
-        df = pd.read_csv('produits_original.csv')
+        # Charger uniquement les colonnes utiles à la page (schéma compact)
+        df = read_catalog(CATALOG_CSV_PATH, columns=CONSUMER_COLUMNS['prediction'])
         
         # Produit de test par défaut (montre Escort)
         test_product_id = '1120bc768623572513df956172ffefeb'
@@ -75,44 +188,14 @@ def load_default_test_product():
         
         if not product.empty:
             product = product.iloc[0]
-            image_filename = f"{test_product_id}.jpg"
-            image_path = f"Images/{image_filename}"
+            image_filename = product['image']
+            image_path = os.path.join(IMAGES_DIR, image_filename)
             
             # Vérifier si l'image existe
             if os.path.exists(image_path):
-                # Nettoyer la description (enlever les \n et \t)
-                description = product['description'] if pd.notna(product['description']) else product['product_name']
-                if description:
-                    description = description.replace('\n', ' ').replace('\t', ' ').strip()
-                    # Garder seulement les 2 premières phrases pour la lisibilité
-                    sentences = description.split('. ')
-                    if len(sentences) > 2:
-                        description = '. '.join(sentences[:2]) + '.'
-                
-                # Nettoyer les spécifications (parser le format Ruby/JSON)
-                specs = product['product_specifications'] if pd.notna(product['product_specifications']) else f"Prix: {product['retail_price']} INR"
-                if specs and specs.startswith('{"product_specification"'):
-                    try:
-                        # Remplacer => par : pour convertir en JSON valide
-                        json_specs = specs.replace('=>', ':')
-                        specs_data = json.loads(json_specs)
-                        if 'product_specification' in specs_data:
-                            key_specs = []
-                            for spec in specs_data['product_specification'][:5]:  # Limiter à 5 specs
-                                if 'key' in spec and 'value' in spec:
-                                    key_specs.append(f"{spec['key']}: {spec['value']}")
-                            specs = '; '.join(key_specs) if key_specs else f"Prix: {product['retail_price']} INR"
-                    except:
-                        specs = f"Prix: {product['retail_price']} INR"
-                
-                return {
-                    'name': product['product_name'],
-                    'brand': product['brand'] if pd.notna(product['brand']) else 'Escort',
-                    'description': description,
-                    'specifications': specs,
-                    'image_path': image_path,
-                    'image_filename': image_filename
-                }
+                # Champs du formulaire (description et spécifications nettoyées)
+                return dict(product_form_fields(product), uniq_id=test_product_id, image_path=image_path,
+                            image_filename=image_filename)
             else:
                 st.warning(f"⚠️ Image non trouvée: {image_path}")
                 return None
@@ -124,57 +207,166 @@ def load_default_test_product():
         st.error(f"❌ Erreur lors du chargement du produit de test: {str(e)}")
         return None
 
-def resize_image_for_model(image, target_size=(224, 224)):
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_known_products(dataset_hash):
+    """Produits du catalogue (nom, marque, catégorie principale, fichier image) indexés par uniq_id"""
+    return load_catalog(CATALOG_CSV_PATH, IMAGES_DIR,
+                        columns=['uniq_id', 'product_name', 'brand', 'product_category_tree', 'image'],
+                        image_info=False).set_index('uniq_id')
+
+def _upload_cache(uploaded_file):
+    """Cache de session du dernier fichier uploadé (image décodée et descripteurs)"""
+    cache = st.session_state.get('_upload_descriptors')
+    if cache is None or cache['file_id'] != uploaded_file.file_id:
+        cache = st.session_state['_upload_descriptors'] = {'file_id': uploaded_file.file_id}
+    return cache
+
+def get_upload_image(uploaded_file):
     """
-    Redimensionne l'image à la taille exacte attendue par le modèle CLIP (224x224)
+    Image uploadée, décodée une seule fois dans les budgets d'ingestion
+    
+    Returns:
+        tuple: (image réduite à DISPLAY_MAX_SIDE, dimensions d'origine), ou l'erreur ImageRejected
+    """
+    cache = _upload_cache(uploaded_file)
+    if 'image' not in cache:
+        try:
+            cache['image'] = run_in_pool(load_image, uploaded_file, max_bytes=UPLOAD_MAX_BYTES,
+                                         max_pixels=UPLOAD_MAX_PIXELS, priority=INTERACTIVE)
+        except ImageRejected as e:
+            cache['image'] = e
+    return cache['image']
+
+def get_upload_display(uploaded_file, width):
+    """Dérivé d'affichage de l'image uploadée, encodé une seule fois par fichier et largeur"""
+    cache = _upload_cache(uploaded_file)
+    key = f"display_{width}"
+    if key not in cache:
+        cache[key] = run_in_pool(encode_derivative, get_upload_image(uploaded_file)[0], width, priority=INTERACTIVE)[0]
+    return cache[key]
+
+def get_upload_descriptor(uploaded_file, compute):
+    """
+    Descripteur d'une image uploadée, calculé une seule fois par fichier
+    
+    Seuls les descripteurs du dernier fichier uploadé sont conservés dans la session.
     
     Args:
-        image: Image PIL
-        target_size: Tuple (width, height) - taille cible (224x224 par défaut)
+        uploaded_file: Fichier uploadé (UploadedFile)
+        compute: Fonction de calcul (image_hashes, image_features)
     
     Returns:
-        Image PIL redimensionnée
+        Descripteur, ou None si l'image est refusée ou illisible
     """
-    # Redimensionner l'image à la taille exacte du modèle
-    resized_image = image.resize(target_size, Image.LANCZOS)
-    return resized_image
+    cache = _upload_cache(uploaded_file)
+    if compute.__name__ not in cache:
+        upload = get_upload_image(uploaded_file)
+        try:
+            cache[compute.__name__] = None if isinstance(upload, ImageRejected) else run_in_pool(compute, upload[0])
+        except PoolSaturated:
+            # Pas de résultat à mémoriser : le descripteur sera recalculé au prochain rerun
+            raise
+        except Exception:
+            cache[compute.__name__] = None
+    return cache[compute.__name__]
 
-def call_prediction_api(image_file, text_description):
-    """Appelle l'API FastAPI pour la prédiction avec image redimensionnée."""
-    try:
-        # Charger l'image
-        if hasattr(image_file, 'getvalue'):
-            # Pour les objets Streamlit UploadedFile
-            image = Image.open(io.BytesIO(image_file.getvalue()))
-        else:
-            # Pour les fichiers locaux
-            image = Image.open(image_file)
-        
-        # Redimensionner l'image à 224x224 (taille d'entrée du modèle CLIP)
-        resized_image = resize_image_for_model(image, target_size=(224, 224))
-        
-        # Convertir l'image redimensionnée en bytes
-        img_byte_arr = io.BytesIO()
-        resized_image.save(img_byte_arr, format='JPEG', quality=95, optimize=True)
-        img_byte_arr.seek(0)
-        image_bytes = img_byte_arr.getvalue()
-        
-        # Préparer les données pour l'API
-        filename = getattr(image_file, 'name', 'resized_image.jpg')
-        files = {'image': (filename, image_bytes, 'image/jpeg')}
-        data = {'text_description': text_description}
-        
-        # Appel à l'API
-        response = requests.post(f"{API_BASE_URL}/predict", files=files, data=data, timeout=30)
-        response.raise_for_status()  # Lève une exception pour les codes d'état HTTP d'erreur
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Erreur lors de l'appel à l'API de prédiction: {e}")
-        return {"success": False, "error": str(e)}
-    except Exception as e:
-        st.error(f"❌ Erreur lors du traitement de l'image: {e}")
-        return {"success": False, "error": str(e)}
+def get_upload_hashes(uploaded_file):
+    """Empreintes (pHash, dHash) d'une image uploadée"""
+    return get_upload_descriptor(uploaded_file, image_hashes)
+
+def file_stamp(path):
+    """(date de modification, taille) d'un fichier : invalide les caches d'une image du catalogue modifiée"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_catalog_image_preview(path, stamp):
+    """Dimensions d'origine et image 224x224 d'une image du catalogue, décodée une fois par (fichier, stamp)"""
+    image, original_size = load_image(path, max_bytes=None)
+    return original_size, resize_image_for_model(image, target_size=(224, 224))
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def catalog_image_features(path, stamp):
+    """Descripteur visuel d'une image du catalogue, calculé une fois par (fichier, stamp)"""
+    return run_in_pool(image_features, path)
+
+def find_similar_products(uploaded_file=None, image_path=None, uniq_id=None, k=SIMILAR_PRODUCTS_COUNT):
+    """
+    Produits du catalogue visuellement similaires à l'image uploadée ou à une image du catalogue
+    
+    Returns:
+        list[dict]: uniq_id, name, category, similarity, image_path (vide si l'index est indisponible)
+    """
+    index = get_shared_visual_index(dataset_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR, VISUAL_FEATURES_PATH),
+                                    VISUAL_FEATURES_PATH, CATALOG_CSV_PATH, IMAGES_DIR)
+    if index is None:
+        return []
+    if uploaded_file is not None:
+        query = get_upload_descriptor(uploaded_file, image_features)
+    else:
+        query = catalog_image_features(image_path, file_stamp(image_path))
+    if query is None:
+        return []
+    
+    products = load_known_products(dataset_fingerprint(CATALOG_CSV_PATH))
+    similar = []
+    for match in index.search(query, k, exclude=uniq_id):
+        if match['uniq_id'] in products.index:
+            product = products.loc[match['uniq_id']]
+            similar.append({
+                'uniq_id': match['uniq_id'],
+                'name': product['product_name'],
+                'category': product['main_category'],
+                'similarity': match['similarity'],
+                'image_path': os.path.join(IMAGES_DIR, product['image']),
+            })
+    return similar
+
+def find_known_product(uploaded_file):
+    """
+    Produit du catalogue dont l'image est quasi identique à l'image uploadée
+    
+    Returns:
+        dict: uniq_id, name, brand, category, distance ou None
+    """
+    hashes = get_upload_hashes(uploaded_file)
+    index = get_shared_hash_index(dataset_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR, IMAGE_HASH_INDEX_PATH),
+                                  IMAGE_HASH_INDEX_PATH, CATALOG_CSV_PATH, IMAGES_DIR)
+    if hashes is None or index is None:
+        return None
+    matches = index.find(hashes)
+    if not matches:
+        return None
+    products = load_known_products(dataset_fingerprint(CATALOG_CSV_PATH))
+    match = matches[0]
+    if match['uniq_id'] not in products.index:
+        return None
+    product = products.loc[match['uniq_id']]
+    return {
+        'uniq_id': match['uniq_id'],
+        'name': product['product_name'],
+        'brand': product['brand'] if pd.notna(product['brand']) else None,
+        'category': product['main_category'],
+        'distance': match['phash_distance'],
+        'image_path': os.path.join(IMAGES_DIR, product['image']),
+    }
+
+def shorten_category_name(category):
+    """Raccourcit le nom de catégorie pour l'affichage"""
+    if ' >> ' in category:
+        # Prendre seulement la première partie avant le premier >>
+        return category.split(' >> ')[0]
+    elif len(category) > 30:
+        # Tronquer si trop long
+        return category[:27] + "..."
+    return category
+
+
+def find_precomputed_prediction(uniq_id, full_description):
+    """Prédiction pré-calculée d'un produit du catalogue (None si absente ou description modifiée)"""
+    table = get_prediction_table(dataset_fingerprint(CATALOG_CSV_PATH, IMAGES_DIR, CATALOG_PREDICTIONS_PATH),
+                                 CATALOG_PREDICTIONS_PATH, CATALOG_CSV_PATH, IMAGES_DIR)
+    return None if table is None else table.lookup(uniq_id, full_description)
 
 # Charger le produit de test par défaut
 default_product = load_default_test_product()
@@ -183,143 +375,356 @@ default_product = load_default_test_product()
 if default_product and not st.session_state.get('auto_prediction_done', False):
     st.session_state['auto_prediction_done'] = True
     st.session_state['test_prediction_launched'] = True
+    # Résultat immédiat si le produit de test figure dans la table pré-calculée
+    precomputed = find_precomputed_prediction(
+        default_product['uniq_id'],
+        model_input(default_product['name'], default_product['brand'], default_product['description'],
+                    default_product['specifications'], text_tokenizer, TEXT_CONTEXT_LENGTH)['text']
+    )
+    if precomputed is not None:
+        st.session_state['last_prediction'] = {'result': precomputed, 'brand': default_product['brand'],
+                                               'product_name': default_product['name']}
 
-# Interface de prédiction
-st.subheader("📤 Upload de l'image")
-uploaded_file = st.file_uploader(
-    "Choisissez une image de produit",
-    type=['png', 'jpg', 'jpeg'],
-    help="Formats supportés : PNG, JPG, JPEG"
-)
 
-# Affichage de l'image
-if uploaded_file is not None:
-    # Afficher l'image uploadée
-    image = Image.open(uploaded_file)
-    st.image(image, caption="Image uploadée", width=400)
-    
-    # Informations sur l'image originale
-    st.info(f"📏 Dimensions originales : {image.size[0]} x {image.size[1]} pixels")
-    
-    # Afficher l'image redimensionnée pour le modèle
-    resized_image = resize_image_for_model(image, target_size=(224, 224))
-    st.image(resized_image, caption="Image redimensionnée pour le modèle (224x224)", width=224)
-    st.success(f"✅ Image optimisée pour le modèle CLIP : 224 x 224 pixels")
-    
-elif default_product and st.session_state.get('test_prediction_launched', False):
-    # Afficher l'image du produit de test
-    image = Image.open(default_product['image_path'])
-    st.image(image, caption="Produit de test", width=400)
-    st.info(f"📏 Dimensions originales : {image.size[0]} x {image.size[1]} pixels")
-    
-    # Afficher l'image redimensionnée pour le modèle
-    resized_image = resize_image_for_model(image, target_size=(224, 224))
-    st.image(resized_image, caption="Image redimensionnée pour le modèle (224x224)", width=224)
-    st.success(f"✅ Image optimisée pour le modèle CLIP : 224 x 224 pixels")
-
-# Informations du produit
-st.subheader("📝 Informations du produit")
-
-if default_product and st.session_state.get('test_prediction_launched', False):
-    # Utiliser les données du produit de test
-    product_name = st.text_input(
-        "Nom du produit",
-        value=default_product['name'],
-        placeholder="Ex: iPhone 14 Pro"
-    )
-    
-    brand = st.text_input(
-        "Marque du produit",
-        value=default_product['brand'],
-        placeholder="Ex: Apple"
-    )
-    
-    description = st.text_area(
-        "Description du produit",
-        value=default_product['description'],
-        placeholder="Ex: Smartphone haut de gamme avec caméra professionnelle"
-    )
-    
-    specifications = st.text_area(
-        "Spécifications techniques",
-        value=default_product['specifications'],
-        placeholder="Ex: 6.1 pouces, 128GB, iOS 16"
-    )
-else:
-    # Interface normale pour saisie manuelle
-    product_name = st.text_input(
-        "Nom du produit",
-        placeholder="Ex: iPhone 14 Pro"
-    )
-    
-    brand = st.text_input(
-        "Marque du produit",
-        placeholder="Ex: Apple"
-    )
+@st.fragment
+def render_image_panel():
+    """Panneau image : upload et aperçu (rerun isolé lors d'un changement d'image)"""
+    with track_run("image_panel"):
+        st.subheader("📤 Upload de l'image")
+        uploaded_file = st.file_uploader(
+            "Choisissez une image de produit",
+            type=['png', 'jpg', 'jpeg'],
+            help="Formats supportés : PNG, JPG, JPEG",
+            key="uploaded_file"
+        )
+        extra_files = st.file_uploader(
+            "Photos supplémentaires du produit (optionnel)",
+            type=['png', 'jpg', 'jpeg'],
+            accept_multiple_files=True,
+            help="Envoyées avec l'image principale dans une seule requête ; les scores sont agrégés",
+            key="extra_uploaded_files"
+        )
+        if extra_files:
+            st.caption(f"🖼️ {len(extra_files)} photo(s) supplémentaire(s) seront analysées avec l'image principale")
+        
+        # Affichage de l'image (décodée réduite, dans les budgets d'ingestion)
+        try:
+            if uploaded_file is not None:
+                upload = get_upload_image(uploaded_file)
+                if isinstance(upload, ImageRejected):
+                    st.error(f"❌ Image refusée : {upload}")
+                    return
+                # Afficher l'image uploadée
+                image, original_size = upload
+                resized_image = resize_image_for_model(image, target_size=(224, 224))
+                st.image(get_upload_display(uploaded_file, 400), caption="Image uploadée", width=400)
+                render_known_product(find_known_product(uploaded_file))
+            elif default_product and st.session_state.get('test_prediction_launched', False):
+                # Afficher l'image du produit de test
+                original_size, resized_image = load_catalog_image_preview(
+                    default_product['image_path'], file_stamp(default_product['image_path']))
+                st.image(display_image(default_product['image_path'], 400), caption="Produit de test", width=400)
+            else:
+                return
+            
+            if uploaded_file is not None:
+                similar_products = find_similar_products(uploaded_file=uploaded_file)
+            else:
+                similar_products = find_similar_products(image_path=default_product['image_path'],
+                                                         uniq_id=default_product['uniq_id'])
+            
+            # Informations sur l'image originale
+            st.info(f"📏 Dimensions originales : {original_size[0]} x {original_size[1]} pixels")
+            
+            # Afficher l'image redimensionnée pour le modèle
+            st.image(resized_image, caption="Image redimensionnée pour le modèle (224x224)", width=224)
+            st.success(f"✅ Image optimisée pour le modèle CLIP : 224 x 224 pixels")
+            
+            render_similar_products(similar_products)
+        except PoolSaturated:
+            st.warning(POOL_SATURATED_MESSAGE)
+
+
+def render_similar_products(similar_products):
+    """Vignettes des produits du catalogue visuellement similaires"""
+    if not similar_products:
+        return
+    st.subheader("🧭 Produits visuellement similaires")
+    columns = st.columns(len(similar_products))
+    for column, product in zip(columns, similar_products):
+        with column:
+            if os.path.exists(product['image_path']):
+                st.image(display_image(product['image_path'], 120), width=120)
+            st.caption(f"**{product['name']}**  \n{product['category']} · similarité {product['similarity']:.0%}")
+
+
+def render_known_product(known_product):
+    """Signale que l'image uploadée est une copie d'une image du catalogue"""
+    if known_product is None:
+        return
+    st.info(f"🔁 **Image déjà connue** : quasi identique à « {known_product['name']} » "
+            f"(catégorie {known_product['category']}, distance {known_product['distance']}/64). "
+            "La catégorie du catalogue sera utilisée sans appel à l'API.")
+    if os.path.exists(known_product['image_path']):
+        st.image(display_image(known_product['image_path'], 150), caption="Produit du catalogue correspondant",
+                 width=150)
+
+
+@st.fragment
+def render_prediction_form():
+    """Formulaire produit : la saisie ne déclenche aucun rerun avant la soumission"""
+    with track_run("form"):
+        st.subheader("📝 Informations du produit")
+        
+        # Utiliser les données du produit de test si disponibles
+        if default_product and st.session_state.get('test_prediction_launched', False):
+            defaults = default_product
+        else:
+            defaults = {}
+        
+        with st.form("product_form"):
+            product_name = st.text_input(
+                "Nom du produit",
+                value=defaults.get('name', ''),
+                placeholder="Ex: iPhone 14 Pro"
+            )
+            
+            brand = st.text_input(
+                "Marque du produit",
+                value=defaults.get('brand', ''),
+                placeholder="Ex: Apple"
+            )
+            
+            description = st.text_area(
+                "Description du produit",
+                value=defaults.get('description', ''),
+                placeholder="Ex: Smartphone haut de gamme avec caméra professionnelle"
+            )
+            
+            specifications = st.text_area(
+                "Spécifications techniques",
+                value=defaults.get('specifications', ''),
+                placeholder="Ex: 6.1 pouces, 128GB, iOS 16"
+            )
+            
+            force_api = st.checkbox(
+                "Toujours interroger l'API",
+                help="Ignorer les images déjà connues (catalogue ou prédictions précédentes)"
+            )
+            
+            aggregation = st.selectbox(
+                "Agrégation des scores (plusieurs photos)",
+                options=list(AGGREGATION_STRATEGIES),
+                index=list(AGGREGATION_STRATEGIES).index(DEFAULT_AGGREGATION),
+                format_func=AGGREGATION_STRATEGIES.get,
+                help="Combinaison des scores par catégorie de chaque photo du produit"
+            )
+            
+            # Bouton de prédiction
+            submitted = st.form_submit_button("🔮 Prédire la catégorie", type="primary")
+        
+        if submitted:
+            try:
+                run_prediction(product_name, brand, description, specifications, force_api, aggregation)
+            except PoolSaturated:
+                st.warning(POOL_SATURATED_MESSAGE)
+        
+        render_results_panel()
+        if st.session_state.get('pending_remote') is not None:
+            render_pending_remote()
+
+
+@st.fragment(run_every=1.0)
+def render_pending_remote():
+    """Attend la réponse de l'API après une prédiction locale et la substitue dès son arrivée"""
+    pending = st.session_state.get('pending_remote')
+    if pending is None:
+        return
+    if not pending['future'].done():
+        st.caption("⏳ En attente de la réponse de l'API...")
+        return
     
-    description = st.text_area(
-        "Description du produit",
-        placeholder="Ex: Smartphone haut de gamme avec caméra professionnelle"
-    )
+    st.session_state['pending_remote'] = None
+    result = pending['future'].result()
+    if result.get('success', False):
+        if pending['memo_hashes'] is not None:
+            get_prediction_memo().add(pending['memo_hashes'], pending['details']['model_input']['text'], result)
+        # Durée jusqu'à l'arrivée de la réponse, pas jusqu'au passage du fragment (jusqu'à 1 s plus tard)
+        completed_at = pending['completed_at'].get('time', time.perf_counter())
+        show_prediction(result, pending['details'], completed_at - pending['started_at'])
+    else:
+        # L'API a fini en erreur : la prédiction locale devient le résultat définitif,
+        # affichée avec l'avertissement « API en erreur » du panneau des résultats
+        show_prediction(dict(pending['local_result'], fallback_reason='error',
+                             remote_error=result.get('error', 'Erreur inconnue')),
+                        pending['details'], pending['local_time'])
+    # Rerun de la page : le résultat s'affiche et ce fragment cesse de s'exécuter chaque seconde
+    st.rerun()
+
+
+def get_history_session_id():
+    """Identifiant de la session dans l'historique des prédictions"""
+    return st.session_state.setdefault('history_session_id', uuid.uuid4().hex)
+
+
+def show_prediction(result, details, total_time=None, record=True):
+    """
+    Affiche une prédiction (dernier résultat de la session) et l'ajoute à l'historique
     
-    specifications = st.text_area(
-        "Spécifications techniques",
-        placeholder="Ex: 6.1 pouces, 128GB, iOS 16"
-    )
+    Args:
+        result: Résultat de prédiction (format /predict)
+        details: product_name, brand, description, hashes (empreintes de l'image principale)
+        total_time: Durée vue par l'utilisateur (secondes)
+        record: False pour un résultat provisoire (réponse de l'API encore attendue)
+    """
+    st.session_state['last_prediction'] = {'result': result, 'brand': details['brand'],
+                                           'product_name': details['product_name'],
+                                           'model_input': details.get('model_input')}
+    if record and prediction_history is not None and result.get('success', False):
+        prediction_history.record(result, details['product_name'], details['brand'], details['description'],
+                                  details['hashes'], get_history_session_id(), total_time)
+
+
+def prepare_extra_image(extra_file):
+    """Photo supplémentaire décodée dans les budgets d'ingestion puis préparée pour le modèle (octets JPEG)"""
+    extra_image, _ = load_image(extra_file, max_bytes=UPLOAD_MAX_BYTES, max_pixels=UPLOAD_MAX_PIXELS)
+    return prepare_image_bytes(extra_image)[1]
+
 
-# Bouton de prédiction
-if st.button("🔮 Prédire la catégorie", type="primary"):
+def run_prediction(product_name, brand, description, specifications, force_api=False,
+                   aggregation=DEFAULT_AGGREGATION):
+    """Appelle l'API (sauf image déjà connue) et mémorise le résultat dans la session"""
+    started_at = time.perf_counter()
     # Déterminer quelle image utiliser
+    # L'image est préparée ici (224x224 JPEG), une seule fois, avant la course entre l'API et le classifieur local
+    uploaded_file = st.session_state.get('uploaded_file')
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
-        image_file = uploaded_file
+        upload = get_upload_image(uploaded_file)
+        if isinstance(upload, ImageRejected):
+            st.error(f"❌ Image refusée : {upload}")
+            return
+        image_file = (uploaded_file.name, run_in_pool(prepare_image_bytes, upload[0])[1])
     elif default_product and st.session_state.get('test_prediction_launched', False):
-        image = Image.open(default_product['image_path'])
-        # Créer un objet file-like pour l'API
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='JPEG')
-        img_byte_arr.seek(0)
-        image_file = type('obj', (object,), {'name': default_product['image_filename'], 'getvalue': lambda self=None: img_byte_arr.getvalue(), 'type': 'image/jpeg'})()
+        image_file = run_in_pool(prepare_image_bytes, default_product['image_path'])
     else:
         st.error("❌ Veuillez uploader une image avant de faire une prédiction")
-        st.stop()
+        return
     
-    # Préparer la description complète
-    full_description = f"{product_name} {brand} {description} {specifications}".strip()
+    # Photos supplémentaires : envoyées avec l'image principale dans la même requête,
+    # décodées et préparées en parallèle dans le pool partagé
+    image_files = [image_file]
+    extra_files = st.session_state.get('extra_uploaded_files') or []
+    extra_futures = [current_worker_pool().submit(prepare_extra_image, extra_file, priority=INTERACTIVE)
+                     for extra_file in extra_files]
+    for extra_file, future in zip(extra_files, extra_futures):
+        try:
+            image_files.append((extra_file.name, future.result()))
+        except ImageRejected as e:
+            st.error(f"❌ Image refusée ({extra_file.name}) : {e}")
+            return
     
-    # Nettoyer la description des textes génériques
-    def clean_generic_text(text):
-        """Supprime les textes génériques qui ne sont pas des descriptions de produits"""
-        generic_patterns = [
-            r'marque\s+non\s+spécifiée',
-            r'brand\s+not\s+specified',
-            r'non\s+spécifié',
-            r'not\s+specified',
-            r'non\s+disponible',
-            r'not\s+available',
-            r'à\s+définir',
-            r'to\s+be\s+defined',
-            r'non\s+renseigné',
-            r'not\s+provided'
-        ]
-        
-        cleaned_text = text
-        for pattern in generic_patterns:
-            cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.IGNORECASE)
-        
-        # Nettoyer les espaces multiples
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
-        return cleaned_text
+    # Préparer la description complète, nettoyée des textes génériques (historique, classifieur local)
+    full_description = build_description(product_name, brand, description, specifications)
+    # Texte envoyé à l'API : seulement ce que l'encodeur de texte lira, par ordre d'importance des champs
+    text_input = model_input(product_name, brand, description, specifications, text_tokenizer, TEXT_CONTEXT_LENGTH)
+    model_text = text_input['text']
     
-    full_description = clean_generic_text(full_description)
+    primary_hashes = get_upload_hashes(uploaded_file) if uploaded_file is not None else None
+    details = {'product_name': product_name, 'brand': brand, 'description': full_description,
+               'hashes': primary_hashes, 'model_input': text_input}
+    
+    # Produit du catalogue à la description inchangée : prédiction pré-calculée (image seule uniquement)
+    if not force_api and len(image_files) == 1:
+        if uploaded_file is None:
+            catalog_id = default_product['uniq_id']
+        else:
+            known_product = find_known_product(uploaded_file)
+            catalog_id = known_product['uniq_id'] if known_product is not None else None
+        precomputed = find_precomputed_prediction(catalog_id, model_text) if catalog_id else None
+        if precomputed is not None:
+            show_prediction(precomputed, details, time.perf_counter() - started_at)
+            return
+    
+    # Image uploadée déjà connue : prédiction mémorisée ou catégorie du catalogue (image seule uniquement)
+    hashes = primary_hashes if len(image_files) == 1 else None
+    memo = get_prediction_memo()
+    if hashes is not None and not force_api:
+        known_result = memo.find(hashes, model_text)
+        if known_result is not None:
+            show_prediction(dict(known_result, source='memo'), details, time.perf_counter() - started_at)
+            return
+        known_product = find_known_product(uploaded_file)
+        if known_product is not None:
+            show_prediction({
+                'success': True,
+                'predicted_category': known_product['category'],
+                # Catégorie recopiée du catalogue : pas un score du modèle
+                'confidence': None,
+                'inference_time': 0.0,
+                'source': 'catalog',
+                'matched_product': known_product['name'],
+            }, details, time.perf_counter() - started_at)
+            return
+    
+    # Classifieur local prêt à répondre si l'API est lente ou en erreur
+    classifier = get_local_classifier(dataset_fingerprint(LOCAL_MODEL_PATH), LOCAL_MODEL_PATH)
+    local_call = (lambda: classifier.predict(full_description)) if classifier is not None else None
     
     with st.spinner("🔄 Analyse en cours..."):
-        # Prédiction avec l'API AWS
-        result = call_prediction_api(image_file, full_description)
+        # Prédiction avec l'API AWS, couverte par le classifieur local après API_HEDGE_DELAY
+        result, pending_remote = hedged_prediction(
+            lambda: routed_multi_prediction(api_router, image_files, model_text, aggregation),
+            local_call,
+            API_HEDGE_DELAY
+        )
+    
+    # Mémoriser la prédiction de l'API pour les prochains uploads de la même image
+    if hashes is not None and result.get('success', False) and result.get('source') != 'local':
+        memo.add(hashes, model_text, result)
+    
+    # Réponse locale en attendant l'API : seul le résultat définitif entre dans l'historique
+    total_time = time.perf_counter() - started_at
+    show_prediction(result, details, total_time, record=pending_remote is None)
+    # Réponse tardive de l'API, affichée dès son arrivée (voir render_pending_remote)
+    if pending_remote is not None:
+        # Heure d'arrivée relevée par le thread qui termine la requête
+        completed_at = {}
+        pending_remote.add_done_callback(lambda future: completed_at.setdefault('time', time.perf_counter()))
+        st.session_state['pending_remote'] = {
+            'future': pending_remote, 'memo_hashes': hashes, 'details': details, 'started_at': started_at,
+            'completed_at': completed_at, 'local_result': result, 'local_time': total_time
+        }
+    else:
+        st.session_state['pending_remote'] = None
+
+
+@st.fragment
+def render_results_panel():
+    """Panneau des résultats de la dernière prédiction"""
+    with track_run("results_panel"):
+        prediction = st.session_state.get('last_prediction')
+        if prediction is None:
+            return
+        result = prediction['result']
+        brand = prediction['brand']
         
         # Affichage des résultats
         if result.get('success', False) and 'predicted_category' in result:
             st.success("✅ Prédiction terminée !")
+            if result.get('source') == 'catalog':
+                st.info(f"📚 Catégorie issue du catalogue (image quasi identique à « {result['matched_product']} ») : "
+                        "aucun appel à l'API.")
+            elif result.get('source') == 'precomputed':
+                st.info(f"📦 Prédiction pré-calculée pour ce produit du catalogue (modèle {result['model_version']}) : "
+                        "aucun appel à l'API.")
+            elif result.get('source') == 'memo':
+                st.info("♻️ Prédiction déjà calculée pour une image quasi identique : aucun appel à l'API.")
+            elif result.get('source') == 'local':
+                if result.get('fallback_reason') == 'timeout':
+                    reason = f"l'API n'a pas répondu en {result['hedge_delay']:.1f}s"
+                else:
+                    reason = f"l'API est en erreur ({result.get('remote_error', 'erreur inconnue')})"
+                st.warning(f"🖥️ **Prédiction locale** (modèle texte de secours, sans l'image) : {reason}.")
             
             # Affichage des résultats en quatre colonnes
             col1, col2, col3, col4 = st.columns(4)
@@ -340,7 +745,7 @@ if st.button("🔮 Prédire la catégorie", type="primary"):
                 confidence = result.get('confidence', 0.0)
                 st.metric(
                     "Confiance",
-                    f"{confidence:.2%}"
+                    "—" if confidence is None else f"{confidence:.2%}"
                 )
             
             with col4:
@@ -350,111 +755,32 @@ if st.button("🔮 Prédire la catégorie", type="primary"):
                     f"{inference_time:.3f}s"
                 )
             
+            if result.get('history_at'):
+                st.info(f"🕘 Résultat de l'historique du "
+                        f"{datetime.fromtimestamp(result['history_at']):%d/%m/%Y à %H:%M} : aucun appel à l'API.")
+            if result.get('endpoint'):
+                st.caption(f"🌐 Réponse du point d'accès {result['endpoint']}")
+            if result.get('image_count', 1) > 1:
+                st.caption(f"🖼️ Scores agrégés sur {result['image_count']} photos "
+                           f"({AGGREGATION_STRATEGIES[result['aggregation']].lower()})")
+                with st.expander("Prédiction par photo"):
+                    st.dataframe(pd.DataFrame([{
+                        'Photo': position + 1,
+                        'Catégorie prédite': entry['predicted_category'],
+                        'Confiance': None if entry['confidence'] is None else f"{entry['confidence']:.2%}",
+                    } for position, entry in enumerate(result['per_image'])]), use_container_width=True)
+            
             # Affichage détaillé des scores avec graphique Plotly
             if 'scores' in result:
-                st.subheader("📊 Scores de confiance par catégorie")
-                scores_df = pd.DataFrame(result['scores'])
-                
-                # Raccourcir les noms de catégories pour l'affichage
-                def shorten_category_name(category):
-                    """Raccourcit le nom de catégorie pour l'affichage"""
-                    if ' >> ' in category:
-                        # Prendre seulement la première partie avant le premier >>
-                        return category.split(' >> ')[0]
-                    elif len(category) > 30:
-                        # Tronquer si trop long
-                        return category[:27] + "..."
-                    return category
-                
-                scores_df['category_short'] = scores_df['category'].apply(shorten_category_name)
-                
-                # Configuration des couleurs selon le mode d'accessibilité
-                if st.session_state.accessibility.get('color_blind', False):
-                    colors = px.colors.qualitative.Safe
-                elif st.session_state.accessibility.get('high_contrast', False):
-                    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
-                             '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9']
-                else:
-                    colors = px.colors.qualitative.Set3
-                
-                # Créer le graphique en barres horizontales avec Plotly
-                fig = px.bar(
-                    scores_df, 
-                    x='score',
-                    y='category_short', 
-                    orientation='h',  # Barres horizontales
-                    title="Scores de Prédiction par Catégorie",
-                    color='score',
-                    color_continuous_scale='viridis' if st.session_state.accessibility.get('color_blind', False) 
-                    else 'plasma' if st.session_state.accessibility.get('high_contrast', False) 
-                    else 'Blues',
-                    text='score',
-                    hover_data={'category': True, 'category_short': False}  # Afficher le nom complet au survol
-                )
-                
-                # Configuration du layout pour l'accessibilité
-                bg_color = '#000000' if st.session_state.accessibility.get('high_contrast', False) else '#FFFFFF'
-                text_color = '#FFFFFF' if st.session_state.accessibility.get('high_contrast', False) else '#000000'
-                
-                fig.update_layout(
-                    xaxis_title="Score de Confiance",
-                    yaxis_title="Catégories",
-                    plot_bgcolor=bg_color,
-                    paper_bgcolor=bg_color,
-                    font=dict(
-                        size=14 if not st.session_state.accessibility.get('large_text', False) else 18, 
-                        color=text_color
-                    ),
-                    hoverlabel=dict(
-                        bgcolor="white",
-                        font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
-                        font_family="Arial, sans-serif",
-                        font_color="black",
-                        bordercolor="black"
-                    ),
-                    margin=dict(l=150, r=50, t=80, b=50),  # Marge gauche plus grande pour les noms de catégories
-                    height=400  # Hauteur adaptée aux barres horizontales
-                )
-                
-                # Configuration des axes pour les barres horizontales
-                fig.update_xaxes(
-                    tickfont=dict(
-                        color=text_color, 
-                        size=14 if not st.session_state.accessibility.get('large_text', False) else 16
-                    ),
-                    tickformat='.2%'  # Format en pourcentage sur l'axe X (scores)
-                )
-                fig.update_yaxes(
-                    tickfont=dict(
-                        color=text_color, 
-                        size=14 if not st.session_state.accessibility.get('large_text', False) else 16
-                    )
-                )
-                
-                # Configuration du texte sur les barres horizontales
-                fig.update_traces(
-                    texttemplate='%{text:.1%}',
-                    textposition='outside',
-                    textfont=dict(
-                        color=text_color,
-                        size=12 if not st.session_state.accessibility.get('large_text', False) else 16
-                    )
-                )
-                
-                # Afficher le graphique
-                st.plotly_chart(fig, use_container_width=True, aria_label="Graphique des scores de prédiction par catégorie")
-                
-                # Tableau des scores pour l'accessibilité
-                st.write("**Tableau des scores :**")
-                scores_display = scores_df.copy()
-                scores_display['score'] = scores_display['score'].apply(lambda x: f"{x:.2%}")
-                scores_display = scores_display.sort_values('score', ascending=False)
-                st.dataframe(scores_display, use_container_width=True)
+                render_scores(result['scores'])
             
             # Affichage des mots-clés extraits par l'API
             if 'keywords' in result and result['keywords']:
                 st.subheader("🔑 Mots-clés extraits")
                 st.write(", ".join(result['keywords']))
+            
+            if prediction.get('model_input'):
+                render_model_input(prediction['model_input'])
                 
         else:
             error_msg = result.get('error', 'Erreur inconnue')
@@ -476,7 +802,219 @@ if st.button("🔮 Prédire la catégorie", type="primary"):
             else:
                 st.info("💡 Vérifiez la configuration de l'API AWS.")
 
+
+FIELD_LABELS = {'product_name': "Nom", 'brand': "Marque", 'description': "Description",
+                'specifications': "Spécifications"}
+
+
+def render_model_input(text_input):
+    """Aperçu du texte lu par l'encodeur de texte (champs gardés et coupés)"""
+    approximate = "" if text_input['exact'] else "≈ "
+    with st.expander(f"👁️ Texte vu par le modèle ({approximate}{text_input['tokens']} jetons "
+                     f"sur {max(text_input['context_length'] - 2, 0)})"):
+        st.code(text_input['text'] or " ", language=None, wrap_lines=True)
+        st.dataframe(pd.DataFrame([{
+            'Champ': FIELD_LABELS.get(field['name'], field['name']),
+            'Jetons gardés': field['kept_tokens'],
+            'Jetons du champ': field['total_tokens'],
+            'Texte coupé': field['dropped'],
+        } for field in text_input['fields']]), use_container_width=True, hide_index=True)
+        if not text_input['exact']:
+            st.caption(f"Vocabulaire BPE de CLIP absent ({CLIP_VOCAB_PATH}) : nombre de jetons estimé.")
+
+
+def render_scores(scores):
+    """Affiche les scores de confiance par catégorie (graphique et tableau)"""
+    # Import différé : plotly.express n'est chargé qu'au premier affichage de résultats
+    import plotly.express as px
+
+    st.subheader("📊 Scores de confiance par catégorie")
+    scores_df = pd.DataFrame(scores)
+
+    # Raccourcir les noms de catégories pour l'affichage
+    scores_df['category_short'] = scores_df['category'].apply(shorten_category_name)
+
+    # Configuration des couleurs selon le mode d'accessibilité
+    if st.session_state.accessibility.get('color_blind', False):
+        colors = px.colors.qualitative.Safe
+    elif st.session_state.accessibility.get('high_contrast', False):
+        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
+                 '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9']
+    else:
+        colors = px.colors.qualitative.Set3
+
+    # Créer le graphique en barres horizontales avec Plotly
+    fig = px.bar(
+        scores_df, 
+        x='score',
+        y='category_short', 
+        orientation='h',  # Barres horizontales
+        title="Scores de Prédiction par Catégorie",
+        color='score',
+        color_continuous_scale='viridis' if st.session_state.accessibility.get('color_blind', False) 
+        else 'plasma' if st.session_state.accessibility.get('high_contrast', False) 
+        else 'Blues',
+        text='score',
+        hover_data={'category': True, 'category_short': False}  # Afficher le nom complet au survol
+    )
+
+    # Configuration du layout pour l'accessibilité
+    bg_color = '#000000' if st.session_state.accessibility.get('high_contrast', False) else '#FFFFFF'
+    text_color = '#FFFFFF' if st.session_state.accessibility.get('high_contrast', False) else '#000000'
+
+    fig.update_layout(
+        xaxis_title="Score de Confiance",
+        yaxis_title="Catégories",
+        plot_bgcolor=bg_color,
+        paper_bgcolor=bg_color,
+        font=dict(
+            size=14 if not st.session_state.accessibility.get('large_text', False) else 18, 
+            color=text_color
+        ),
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not st.session_state.accessibility.get('large_text', False) else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        ),
+        margin=dict(l=150, r=50, t=80, b=50),  # Marge gauche plus grande pour les noms de catégories
+        height=400  # Hauteur adaptée aux barres horizontales
+    )
+
+    # Configuration des axes pour les barres horizontales
+    fig.update_xaxes(
+        tickfont=dict(
+            color=text_color, 
+            size=14 if not st.session_state.accessibility.get('large_text', False) else 16
+        ),
+        tickformat='.2%'  # Format en pourcentage sur l'axe X (scores)
+    )
+    fig.update_yaxes(
+        tickfont=dict(
+            color=text_color, 
+            size=14 if not st.session_state.accessibility.get('large_text', False) else 16
+        )
+    )
+
+    # Configuration du texte sur les barres horizontales
+    fig.update_traces(
+        texttemplate='%{text:.1%}',
+        textposition='outside',
+        textfont=dict(
+            color=text_color,
+            size=12 if not st.session_state.accessibility.get('large_text', False) else 16
+        )
+    )
+
+    # Afficher le graphique
+    st.plotly_chart(fig, use_container_width=True, alt="Graphique des scores de prédiction par catégorie")
+
+    # Tableau des scores pour l'accessibilité
+    st.write("**Tableau des scores :**")
+    scores_display = scores_df.copy()
+    scores_display['score'] = scores_display['score'].apply(lambda x: f"{x:.2%}")
+    scores_display = scores_display.sort_values('score', ascending=False)
+    st.dataframe(scores_display, use_container_width=True)
+
+
+@st.fragment
+def render_history_panel():
+    """Historique des prédictions : réaffichage d'un résultat passé sans appel à l'API"""
+    if prediction_history is None:
+        return
+    with track_run("history_panel"), st.expander("🕘 Historique des prédictions"):
+        view = st.radio("Afficher", ["Cette session", "Ce produit", "Confiance faible"],
+                        horizontal=True, key="history_view")
+        last = st.session_state.get('last_prediction') or {}
+        # Seules les prédictions de la session sont visibles (toutes les sessions : page de profilage)
+        session_id = get_history_session_id()
+        if view == "Cette session":
+            entries = prediction_history.recent(session_id=session_id)
+        elif view == "Ce produit":
+            if not last.get('product_name'):
+                st.caption("Faites une prédiction pour voir l'historique de ce produit.")
+                return
+            entries = prediction_history.by_product(last['product_name'], last.get('brand', ''),
+                                                    session_id=session_id)
+        else:
+            entries = prediction_history.low_confidence(session_id=session_id)
+        if not entries:
+            st.caption("Aucune prédiction enregistrée.")
+            return
+        
+        st.dataframe(pd.DataFrame([{
+            'Date': datetime.fromtimestamp(entry['created_at']).strftime('%d/%m/%Y %H:%M:%S'),
+            'Produit': entry['product_name'],
+            'Catégorie prédite': entry['predicted_category'],
+            'Confiance': None if entry['confidence'] is None else f"{entry['confidence']:.2%}",
+            'Source': entry['source'],
+        } for entry in entries]), use_container_width=True, hide_index=True)
+        
+        position = st.selectbox(
+            "Résultat à réafficher",
+            options=range(len(entries)),
+            format_func=lambda i: f"{entries[i]['product_name']} — {entries[i]['predicted_category']}",
+            key="history_selection"
+        )
+        # Historique de la session, exporté par morceaux uniquement au clic
+        export_format = 'parquet' if parquet_available() else 'csv'
+        st.download_button(
+            f"⬇️ Exporter l'historique de la session ({export_format.upper()})",
+            data=deferred_export(functools.partial(prediction_history.iter_frames, session_id=session_id),
+                                 export_format, compress=export_format == 'csv'),
+            file_name=export_file_name("prediction_history", export_format, compress=export_format == 'csv'),
+            mime=export_mime(export_format, compress=export_format == 'csv'),
+            on_click="ignore",
+            key="download_history"
+        )
+        
+        if st.button("↩️ Réafficher ce résultat"):
+            entry = entries[position]
+            st.session_state['last_prediction'] = {'result': dict(entry['result'], history_at=entry['created_at']),
+                                                   'brand': entry['brand'], 'product_name': entry['product_name']}
+            st.rerun(scope="app")
+
+
+# Mise en page : panneau image, puis formulaire et résultats, puis historique
+render_image_panel()
+render_prediction_form()
+render_history_panel()
+
 # Informations sur le modèle
 st.markdown("---")
 st.success("✅ Système de prédiction API AWS initialisé")
-st.info("💡 Prêt pour l'analyse d'images et la classification de produits")
\ No newline at end of file
+st.info("💡 Prêt pour l'analyse d'images et la classification de produits")
+
+# Compter ce rerun complet de la page
+record_run("page", time.thread_time() - _page_cpu_start)
+
+# Mesure des reruns par portée (page complète ou fragment)
+with st.expander("📈 Métriques de rerun"):
+    run_metrics = get_run_metrics()
+    if run_metrics:
+        st.dataframe(pd.DataFrame([{
+            'Portée': scope,
+            'Exécutions': entry['runs'],
+            'CPU total (s)': round(entry['cpu_time'], 4),
+            'CPU par exécution (ms)': round(entry['cpu_per_run'] * 1000, 2),
+        } for scope, entry in run_metrics.items()]), use_container_width=True)
+
+# Latence et erreurs par point d'accès de l'API
+with st.expander("🌐 Points d'accès de l'API"):
+    health_status = api_prober.status()
+    st.dataframe(pd.DataFrame([{
+        "Point d'accès": entry['endpoint'],
+        'Requêtes': entry['requests'],
+        'Erreurs': entry['errors'],
+        'Latence EWMA (s)': None if entry['ewma_latency'] is None else round(entry['ewma_latency'], 3),
+        'Latence p95 (s)': None if entry['p95_latency'] is None else round(entry['p95_latency'], 3),
+        "Taux d'erreur": f"{entry['error_rate']:.0%}",
+        'Disjoncteur': {'closed': '🟢 fermé', 'open': '🔴 ouvert', 'half_open': '🟠 semi-ouvert'}[entry['state']],
+        'Réessai dans (s)': None if entry['retry_in'] is None else round(entry['retry_in']),
+        'Santé': ("—" if entry['endpoint'] not in health_status
+                  else health_status[entry['endpoint']]['error'] or "OK"),
+    } for entry in api_router.snapshot()]), use_container_width=True)
+
+# Enregistrer le profil du rerun (voir start_rerun_profile pour les reruns interrompus)
+stop_rerun_profile(_rerun_profile)
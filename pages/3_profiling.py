@@ -0,0 +1,81 @@
+"""
+Page d'administration du profilage des reruns
+Liste les reruns les plus lents et leurs fonctions les plus coûteuses
+"""
+
+import os
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+# Importer le module d'accessibilité
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from accessibility_streamlit_cloud import init_accessibility_state, render_accessibility_sidebar, apply_accessibility_styles
+from profiling import (PROFILE_DIR, PROFILE_ENV_VAR, PROFILE_QUERY_PARAM, PROFILE_RING_SIZE,
+                       is_profiling_enabled, list_profiles, top_functions)
+
+# Configuration de la page
+st.set_page_config(
+    page_title="Profilage - Classification de Produits",
+    page_icon="⏱️",
+    layout="wide"
+)
+
+# Initialiser l'état d'accessibilité
+init_accessibility_state()
+
+st.title("⏱️ Profilage des reruns")
+
+# Afficher les options d'accessibilité dans la sidebar
+render_accessibility_sidebar()
+
+# Appliquer les styles d'accessibilité
+apply_accessibility_styles()
+
+if is_profiling_enabled():
+    st.success("✅ Profilage activé pour cette session")
+else:
+    st.info(f"💡 Profilage désactivé. Activez-le avec `{PROFILE_ENV_VAR}=1` "
+            f"ou en ajoutant `?{PROFILE_QUERY_PARAM}=1` à l'URL d'une page.")
+
+profiles = list_profiles()
+st.write(f"**Profils conservés :** {len(profiles)} / {PROFILE_RING_SIZE} (répertoire `{PROFILE_DIR}`)")
+
+if not profiles:
+    st.warning("⚠️ Aucun profil enregistré pour le moment.")
+    st.stop()
+
+# Reruns les plus lents
+st.subheader("🐢 Reruns les plus lents")
+profiles_df = pd.DataFrame([{
+    'Page': p['page'],
+    'Date': datetime.fromtimestamp(p['started_at']).strftime('%Y-%m-%d %H:%M:%S'),
+    'Durée (s)': round(p['duration'], 3),
+    'CPU (s)': round(p['cpu_time'], 3),
+    'Fichier': p['profile_file'],
+} for p in profiles])
+st.dataframe(profiles_df, use_container_width=True)
+
+# Détail d'un profil
+st.subheader("🔍 Fonctions les plus coûteuses")
+selected_file = st.selectbox(
+    "Profil à analyser",
+    profiles_df['Fichier'],
+    format_func=lambda f: f"{f} ({profiles_df.loc[profiles_df['Fichier'] == f, 'Durée (s)'].iloc[0]} s)"
+)
+sort_order = st.radio("Trier par", ['cumulative', 'tottime'], horizontal=True,
+                      format_func=lambda s: "Temps cumulé" if s == 'cumulative' else "Temps propre")
+
+prof_path = os.path.join(PROFILE_DIR, selected_file)
+if os.path.exists(prof_path):
+    st.dataframe(pd.DataFrame(top_functions(prof_path, limit=30, sort=sort_order)), use_container_width=True)
+    with open(prof_path, 'rb') as f:
+        st.download_button(
+            label="Télécharger le profil (pstats)",
+            data=f.read(),
+            file_name=selected_file,
+            mime="application/octet-stream"
+        )
+else:
+    st.warning(f"⚠️ Fichier de profil introuvable : {prof_path}")
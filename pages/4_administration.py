@@ -0,0 +1,112 @@
+"""
+Page d'administration du processus
+Mémoire résidente, cache partagé, pool de prétraitement et historique des prédictions de toutes les sessions
+"""
+
+import os
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+# Importer le module d'accessibilité
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from accessibility_streamlit_cloud import init_accessibility_state, render_accessibility_sidebar, apply_accessibility_styles
+from profiling import rss_bytes
+from shared_cache import current_shared_cache
+from worker_pool import current_worker_pool
+from prediction_history import DEFAULT_HISTORY_PATH, get_prediction_history
+from export import deferred_export, export_file_name, export_mime, parquet_available
+
+# Configuration de la page
+st.set_page_config(
+    page_title="Administration - Classification de Produits",
+    page_icon="🛠️",
+    layout="wide"
+)
+
+# Initialiser l'état d'accessibilité
+init_accessibility_state()
+
+st.title("🛠️ Administration")
+
+# Afficher les options d'accessibilité dans la sidebar
+render_accessibility_sidebar()
+
+# Appliquer les styles d'accessibilité
+apply_accessibility_styles()
+
+st.metric("Mémoire résidente du processus", f"{rss_bytes() / 1024 ** 2:.0f} Mo")
+
+# Cache partagé entre réplicas (configuré par les pages EDA et prédiction)
+shared_cache = current_shared_cache()
+with st.expander("🗄️ Cache partagé", expanded=False):
+    if shared_cache.warning:
+        st.warning(f"⚠️ {shared_cache.warning}")
+    elif shared_cache.backend is None:
+        st.info("💡 Aucun cache partagé (`[cache] backend = \"local\"`) : chaque réplica calcule ses propres résultats.")
+    else:
+        st.write(f"**Stockage :** {shared_cache.backend.describe()}")
+    cache_stats = shared_cache.stats.snapshot()
+    if cache_stats:
+        st.dataframe(pd.DataFrame([{
+            'Fonction': name,
+            'Succès': counts['hits'],
+            'Échecs': counts['misses'],
+            'Erreurs': counts['errors'],
+            'Taux de succès': f"{counts['hit_rate']:.0%}",
+        } for name, counts in sorted(cache_stats.items())]), use_container_width=True)
+
+# Pool de prétraitement des images (configuré par la page de prédiction)
+pool_metrics = current_worker_pool().metrics()
+with st.expander("🧵 Pool de prétraitement", expanded=False):
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Threads", pool_metrics['workers'])
+    col2.metric("En cours", pool_metrics['running'])
+    col3.metric("En attente", f"{pool_metrics['queued']} / {pool_metrics['max_pending']}")
+    col4.metric("Pic d'attente", pool_metrics['peak_queued'])
+    st.dataframe(pd.DataFrame([{
+        'Priorité': label,
+        'En attente': counts['queued'],
+        'Terminées': counts['completed'],
+        'Refusées': counts['rejected'],
+        'Attente médiane (ms)': None if counts['wait_p50_ms'] is None else round(counts['wait_p50_ms'], 1),
+        'Attente p95 (ms)': None if counts['wait_p95_ms'] is None else round(counts['wait_p95_ms'], 1),
+    } for label, counts in pool_metrics['priorities'].items()]), use_container_width=True)
+
+# Historique des prédictions de toutes les sessions (la page de prédiction n'affiche que la session en cours)
+try:
+    PREDICTION_HISTORY_PATH = st.secrets["history"]["path"]
+except (KeyError, FileNotFoundError):
+    PREDICTION_HISTORY_PATH = os.environ.get("PREDICTION_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+prediction_history = get_prediction_history(PREDICTION_HISTORY_PATH)
+with st.expander("🕘 Historique des prédictions (toutes les sessions)", expanded=False):
+    if prediction_history is None:
+        st.warning("⚠️ Historique des prédictions indisponible.")
+    else:
+        col1, col2 = st.columns(2)
+        col1.metric("Prédictions enregistrées", prediction_history.count())
+        col2.metric("Prédictions ignorées (file pleine)", prediction_history.dropped)
+        view = st.radio("Afficher", ["Récentes", "Confiance faible"], horizontal=True, key="admin_history_view")
+        entries = prediction_history.recent() if view == "Récentes" else prediction_history.low_confidence()
+        if entries:
+            st.dataframe(pd.DataFrame([{
+                'Date': datetime.fromtimestamp(entry['created_at']).strftime('%d/%m/%Y %H:%M:%S'),
+                'Session': entry['session_id'],
+                'Produit': entry['product_name'],
+                'Catégorie prédite': entry['predicted_category'],
+                'Confiance': None if entry['confidence'] is None else f"{entry['confidence']:.2%}",
+                'Source': entry['source'],
+            } for entry in entries]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Aucune prédiction enregistrée.")
+        # Historique complet, exporté par morceaux uniquement au clic
+        export_format = 'parquet' if parquet_available() else 'csv'
+        st.download_button(
+            f"⬇️ Exporter tout l'historique ({export_format.upper()})",
+            data=deferred_export(prediction_history.iter_frames, export_format, compress=export_format == 'csv'),
+            file_name=export_file_name("prediction_history", export_format, compress=export_format == 'csv'),
+            mime=export_mime(export_format, compress=export_format == 'csv'),
+            on_click="ignore",
+            key="download_all_history"
+        )
@@ -0,0 +1,220 @@
+"""
+Historique persistant des prédictions (SQLite en mode WAL)
+
+Chaque prédiction (API, classifieur local, catalogue ou mémo) est ajoutée à une
+table en écriture seule avec les empreintes de son image, ses scores complets,
+ses mots-clés, ses temps et l'identifiant de session. Les écritures passent par
+une file consommée par un thread dédié : la page n'attend jamais le disque. Les
+lectures (récentes, par produit, confiance faible, export) utilisent des index,
+n'appellent jamais l'API et se limitent à une session dès que session_id est
+fourni (seule la page d'administration lit toutes les sessions).
+"""
+
+import json
+import time
+import queue
+import sqlite3
+import hashlib
+import threading
+
+import streamlit as st
+
+DEFAULT_HISTORY_PATH = 'prediction_history.db'
+
+# Seuil de confiance en dessous duquel une prédiction est jugée incertaine
+LOW_CONFIDENCE_THRESHOLD = 0.5
+
+# Prédictions en attente d'écriture au-delà desquelles les nouvelles sont ignorées
+MAX_PENDING_WRITES = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    session_id TEXT,
+    product_key TEXT NOT NULL,
+    product_name TEXT,
+    brand TEXT,
+    description_hash TEXT,
+    image_phash TEXT,
+    image_dhash TEXT,
+    predicted_category TEXT,
+    confidence REAL,
+    source TEXT,
+    endpoint TEXT,
+    inference_time REAL,
+    total_time REAL,
+    scores TEXT,
+    keywords TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions (created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_session ON predictions (session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_product ON predictions (product_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_confidence ON predictions (confidence, created_at);
+"""
+
+_COLUMNS = ('created_at', 'session_id', 'product_key', 'product_name', 'brand', 'description_hash',
+            'image_phash', 'image_dhash', 'predicted_category', 'confidence', 'source', 'endpoint',
+            'inference_time', 'total_time', 'scores', 'keywords', 'result')
+
+
+def product_key(product_name, brand=""):
+    """Clé d'un produit (nom et marque normalisés)"""
+    normalized = f"{str(product_name or '').strip().lower()}|{str(brand or '').strip().lower()}"
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _connect(path):
+    """Connexion SQLite en mode WAL (lectures concurrentes pendant les écritures)"""
+    connection = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+class PredictionHistory:
+    """Historique des prédictions : écritures en arrière-plan, requêtes indexées"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, max_pending=MAX_PENDING_WRITES):
+        self.path = path
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        with _connect(path) as connection:
+            connection.executescript(_SCHEMA)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="prediction-history", daemon=True)
+        self._writer.start()
+
+    def record(self, result, product_name="", brand="", description="", hashes=None, session_id=None,
+               total_time=None):
+        """
+        Ajoute une prédiction à l'historique, sans attendre l'écriture
+
+        Args:
+            result: Résultat de prédiction (format /predict)
+            description: Description complète envoyée (seule son empreinte est stockée)
+            hashes: (pHash, dHash) de l'image, ou None
+            total_time: Durée totale vue par l'utilisateur (secondes)
+
+        Returns:
+            bool: False si la file d'écriture est pleine (prédiction ignorée)
+        """
+        phash, dhash = hashes if hashes is not None else (None, None)
+        row = (
+            time.time(), session_id, product_key(product_name, brand), product_name, brand,
+            hashlib.sha1(description.encode('utf-8')).hexdigest()[:16] if description else None,
+            None if phash is None else f"{phash:016x}", None if dhash is None else f"{dhash:016x}",
+            result.get('predicted_category'), result.get('confidence'), result.get('source', 'api'),
+            result.get('endpoint'), result.get('inference_time'), total_time,
+            json.dumps(result.get('scores', [])), json.dumps(result.get('keywords', [])),
+            json.dumps(result, default=str),
+        )
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self._drop(1)
+            return False
+
+    def _drop(self, count):
+        # Compteur incrémenté par les threads des sessions et par le thread d'écriture
+        with self._dropped_lock:
+            self.dropped += count
+
+    def _write_loop(self):
+        """Thread d'écriture : regroupe les prédictions en attente dans une seule transaction"""
+        connection = _connect(self.path)
+        insert = f"INSERT INTO predictions ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        while True:
+            rows = [self._queue.get()]
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with connection:
+                    connection.executemany(insert, rows)
+            except sqlite3.Error:
+                self._drop(len(rows))
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Attend que toutes les prédictions en attente soient écrites"""
+        self._queue.join()
+
+    def _reader(self):
+        """Connexion de lecture propre au thread appelant"""
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = _connect(self.path)
+        return self._local.connection
+
+    def _query(self, where, parameters, order, limit, session_id=None):
+        if session_id is not None:
+            where, parameters = f"session_id = ? AND {where}", (session_id, *parameters)
+        rows = self._reader().execute(
+            f"SELECT * FROM predictions WHERE {where} ORDER BY {order} LIMIT ?", (*parameters, limit)
+        ).fetchall()
+        return [dict(row, result=json.loads(row['result']), scores=json.loads(row['scores']),
+                     keywords=json.loads(row['keywords'])) for row in rows]
+
+    def recent(self, limit=20, session_id=None):
+        """Prédictions les plus récentes (d'une session, ou de toutes)"""
+        return self._query("1 = 1", (), "created_at DESC", limit, session_id)
+
+    def by_product(self, product_name, brand="", limit=20, session_id=None):
+        """Prédictions d'un produit (nom et marque), les plus récentes d'abord (d'une session, ou de toutes)"""
+        return self._query("product_key = ?", (product_key(product_name, brand),), "created_at DESC", limit,
+                           session_id)
+
+    def low_confidence(self, threshold=LOW_CONFIDENCE_THRESHOLD, limit=20, session_id=None):
+        """Prédictions les moins sûres, sous le seuil de confiance (d'une session, ou de toutes)"""
+        return self._query("confidence < ?", (threshold,), "confidence ASC, created_at DESC", limit, session_id)
+
+    def iter_frames(self, chunk_rows=10_000, session_id=None):
+        """
+        Historique par morceaux (pagination par identifiant, mémoire bornée)
+
+        Args:
+            session_id: Session à exporter (None = toutes les sessions)
+
+        Yields:
+            pd.DataFrame: Au plus chunk_rows prédictions, des plus anciennes aux plus récentes
+        """
+        import pandas as pd
+
+        columns = ('id',) + _COLUMNS
+        where, parameters = ("id > ?", ()) if session_id is None else ("session_id = ? AND id > ?", (session_id,))
+        last_id = 0
+        while True:
+            rows = self._reader().execute(
+                f"SELECT {', '.join(columns)} FROM predictions WHERE {where} ORDER BY id LIMIT ?",
+                (*parameters, last_id, chunk_rows)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]['id']
+            yield pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+    def count(self):
+        """Nombre de prédictions enregistrées"""
+        return self._reader().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_history(path=DEFAULT_HISTORY_PATH):
+    """
+    Historique partagé par toutes les sessions du processus (un seul thread d'écriture)
+
+    Returns:
+        PredictionHistory: Historique, ou None si la base ne peut pas être ouverte
+    """
+    try:
+        return PredictionHistory(path)
+    except sqlite3.Error:
+        return None
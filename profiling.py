@@ -0,0 +1,265 @@
+"""
+Module de profilage opt-in des reruns Streamlit
+
+Streamlit ré-exécute tout le script d'une page à chaque interaction. Ce module
+permet d'envelopper chaque exécution dans un profileur déterministe (cProfile)
+et de conserver les profils (format pstats) dans un anneau borné sur disque.
+
+Activation :
+- variable d'environnement ``CLIP_PROFILE_RERUNS=1``
+- ou paramètre d'URL ``?profile=1``
+
+Lorsque l'interrupteur est désactivé, aucun profileur n'est créé.
+"""
+
+import os
+import io
+import sys
+import re
+import json
+import time
+import pstats
+import threading
+import cProfile
+from contextlib import contextmanager
+
+import streamlit as st
+
+# Configuration du profilage
+PROFILE_ENV_VAR = "CLIP_PROFILE_RERUNS"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_DIR = os.environ.get("CLIP_PROFILE_DIR", ".profiles")
+PROFILE_RING_SIZE = int(os.environ.get("CLIP_PROFILE_RING_SIZE", "50"))
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def is_profiling_enabled():
+    """Indique si le profilage des reruns est activé (environnement ou URL)"""
+    if os.environ.get(PROFILE_ENV_VAR, "").lower() in _TRUE_VALUES:
+        return True
+    try:
+        return str(st.query_params.get(PROFILE_QUERY_PARAM, "")).lower() in _TRUE_VALUES
+    except Exception:
+        # En dehors d'une exécution Streamlit, pas de paramètres d'URL
+        return False
+
+
+class RerunProfile:
+    """
+    Profil en cours d'une exécution de page
+
+    Le temps CPU est celui du thread de la session (time.thread_time), pas celui
+    du processus, qui compterait les threads des autres sessions.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.thread_id = threading.get_ident()
+        self.profiler = cProfile.Profile()
+        self.started_at = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        # Python >= 3.12 : un seul profileur actif à la fois par processus (sys.monitoring),
+        # ValueError si une autre session est déjà profilée
+        self.profiler.enable()
+
+    def stop(self):
+        """Arrête le profileur et retourne (durée réelle, temps CPU du thread)"""
+        self.profiler.disable()
+        return (time.perf_counter() - self._wall_start,
+                time.thread_time() - self._cpu_start)
+
+
+def start_rerun_profile(page):
+    """
+    Démarre le profilage d'une exécution de page si l'interrupteur est activé
+
+    À appeler en tête de page, stop_rerun_profile en fin de page. Un rerun
+    interrompu (st.rerun() ou nouvelle interaction) n'atteint pas la fin de la
+    page : son profil est enregistré ici, au début du rerun suivant, qui démarre
+    aussitôt sur le même thread. Après st.stop() ou une exception, le thread
+    s'est arrêté entre-temps : le profil, dont les durées seraient faussées,
+    est abandonné.
+
+    Args:
+        page: Nom de la page profilée (ex: "1_eda")
+
+    Returns:
+        RerunProfile, ou None si le profilage est désactivé ou si une autre
+        session est déjà profilée (Python >= 3.12)
+    """
+    if not is_profiling_enabled():
+        return None
+
+    previous = st.session_state.get('_rerun_profile')
+    if previous is not None and previous.thread_id == threading.get_ident():
+        stop_rerun_profile(previous)
+    elif previous is not None:
+        previous.profiler.disable()
+
+    try:
+        handle = RerunProfile(page)
+    except ValueError:
+        # Profileur déjà actif dans le processus : ce rerun n'est pas profilé
+        return None
+    st.session_state['_rerun_profile'] = handle
+    return handle
+
+
+def stop_rerun_profile(handle, directory=None, ring_size=None):
+    """
+    Arrête le profilage et enregistre le profil dans l'anneau sur disque
+
+    Args:
+        handle: Valeur retournée par start_rerun_profile (None = rien à faire)
+        directory: Répertoire de stockage des profils
+        ring_size: Nombre maximal de profils conservés
+
+    Returns:
+        dict: Métadonnées du profil enregistré ou None
+    """
+    if handle is None:
+        return None
+
+    duration, cpu_time = handle.stop()
+    metadata = save_profile(handle.profiler, handle.page, handle.started_at, duration, cpu_time,
+                            directory=directory, ring_size=ring_size)
+    if st.session_state.get('_rerun_profile') is handle:
+        del st.session_state['_rerun_profile']
+    return metadata
+
+
+def save_profile(profiler, page, started_at, duration, cpu_time, directory=None, ring_size=None):
+    """Enregistre un profil (pstats + métadonnées JSON) et applique la taille de l'anneau"""
+    directory = directory or PROFILE_DIR
+    ring_size = ring_size or PROFILE_RING_SIZE
+    os.makedirs(directory, exist_ok=True)
+
+    safe_page = re.sub(r'[^A-Za-z0-9_-]', '_', page)
+    base_name = f"{int(started_at * 1000000):016d}_{safe_page}"
+    prof_path = os.path.join(directory, base_name + ".prof")
+    profiler.dump_stats(prof_path)
+
+    metadata = {
+        'page': page,
+        'started_at': started_at,
+        'duration': duration,
+        'cpu_time': cpu_time,
+        'profile_file': base_name + ".prof",
+        'top_functions': top_functions(prof_path, limit=5),
+    }
+    with open(os.path.join(directory, base_name + ".json"), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+
+    _trim_ring(directory, ring_size)
+    return metadata
+
+
+def _trim_ring(directory, ring_size):
+    """Supprime les profils les plus anciens au-delà de la taille de l'anneau"""
+    entries = sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".json"))
+    for base_name in entries[:max(0, len(entries) - ring_size)]:
+        for extension in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(directory, base_name + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory=None):
+    """
+    Liste les profils enregistrés, du rerun le plus lent au plus rapide
+
+    Returns:
+        list[dict]: Métadonnées des profils
+    """
+    directory = directory or PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda p: p.get('duration', 0), reverse=True)
+
+
+def top_functions(prof_path, limit=20, sort='cumulative'):
+    """
+    Extrait les fonctions les plus coûteuses d'un fichier pstats
+
+    Args:
+        prof_path: Chemin du fichier .prof
+        limit: Nombre de fonctions retournées
+        sort: Clé de tri pstats ('cumulative' ou 'tottime')
+
+    Returns:
+        list[dict]: function, ncalls, tottime, cumtime
+    """
+    stats = pstats.Stats(prof_path, stream=io.StringIO())
+    sort_key = 'cumtime' if sort == 'cumulative' else 'tottime'
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'ncalls': ncalls,
+            'tottime': tottime,
+            'cumtime': cumtime,
+        })
+    rows.sort(key=lambda r: r[sort_key], reverse=True)
+    return rows[:limit]
+
+
+def record_run(scope, cpu_time):
+    """Ajoute une exécution et son temps CPU aux métriques de la session"""
+    metrics = st.session_state.setdefault('_run_metrics', {})
+    entry = metrics.setdefault(scope, {'runs': 0, 'cpu_time': 0.0})
+    entry['runs'] += 1
+    entry['cpu_time'] += cpu_time
+
+
+@contextmanager
+def track_run(scope):
+    """
+    Compte les exécutions d'une portée (page ou fragment) et leur temps CPU
+
+    Le temps est mesuré sur le thread courant : chaque exécution de script
+    Streamlit tourne sur son propre thread.
+    """
+    start = time.thread_time()
+    try:
+        yield
+    finally:
+        record_run(scope, time.thread_time() - start)
+
+
+def get_run_metrics():
+    """
+    Retourne les métriques d'exécution de la session
+
+    Returns:
+        dict: portée -> {'runs', 'cpu_time', 'cpu_per_run'}
+    """
+    metrics = st.session_state.get('_run_metrics', {})
+    return {
+        scope: dict(entry, cpu_per_run=entry['cpu_time'] / entry['runs'] if entry['runs'] else 0.0)
+        for scope, entry in metrics.items()
+    }
+
+
+def rss_bytes():
+    """Mémoire résidente actuelle du processus (octets)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        # Hors Linux : pic de mémoire résidente (Ko sous Linux, octets sous macOS)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,518 @@
+"""
+Cache partagé entre les réplicas de l'application
+
+st.cache_data et st.cache_resource sont propres à chaque processus : derrière un
+répartiteur de charge, chaque réplica recalcule les agrégats EDA, les figures,
+les dérivés d'images et les prédictions. Les fonctions décorées par
+shared_memoize consultent en plus un stockage commun :
+
+- 'local' : aucun stockage partagé (comportement par défaut) ;
+- 'disk' : répertoire partagé (volume commun), écritures atomiques (fichier
+  temporaire puis os.replace), verrou fcntl pendant les écritures et
+  l'éviction, éviction des entrées les moins récemment lues au-delà de max_mb ;
+- 'redis' : serveur parlant le protocole Redis (RESP), via un client minimal
+  intégré. La taille est bornée côté serveur (maxmemory et
+  maxmemory-policy allkeys-lru) ; les entrées expirent après ttl secondes.
+
+Les valeurs sont sérialisées par pickle puis compressées (zlib), et chaque
+entrée est signée (HMAC-SHA256 de la clé et du contenu, avec un secret commun
+aux réplicas) : une entrée non signée ou signée avec un autre secret est
+ignorée sans être désérialisée, car pickle.loads exécuterait du code fourni par
+quiconque peut écrire dans le répertoire ou le serveur Redis. Sans secret, le
+stockage partagé n'est pas utilisé. Comme pour st.cache_data, les arguments dont le nom commence par '_' ne font pas partie de
+la clé. Les succès, échecs et erreurs sont comptés par fonction (par processus).
+"""
+
+import os
+import hmac
+import time
+import zlib
+import pickle
+import socket
+import hashlib
+import inspect
+import tempfile
+import threading
+import functools
+from urllib.parse import urlparse
+
+import streamlit as st
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de verrou entre processus, les écritures restent atomiques
+    fcntl = None
+
+BACKENDS = ('local', 'disk', 'redis')
+DEFAULT_BACKEND = 'local'
+DEFAULT_CACHE_DIR = '.shared_cache'
+DEFAULT_REDIS_URL = 'redis://localhost:6379/0'
+DEFAULT_MAX_MB = 512
+
+# Durée de vie des entrées Redis (secondes)
+DEFAULT_TTL = 7 * 24 * 3600
+
+# Entrées plus grosses ignorées (une seule entrée ne doit pas vider le cache)
+MAX_ENTRY_FRACTION = 0.1
+
+# Délai avant une nouvelle tentative après une erreur du stockage (secondes)
+RETRY_DELAY = 30.0
+
+# Version du format des entrées (incluse dans les clés)
+FORMAT_VERSION = 2
+
+_COMPRESSED = b'Z'
+_RAW = b'P'
+
+# Signature en tête de chaque entrée stockée (HMAC-SHA256)
+_SIGNATURE_BYTES = 32
+
+
+def dumps(value):
+    """Sérialisation compacte : pickle, compressé par zlib si c'est plus petit"""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    compressed = zlib.compress(data, 3)
+    return _COMPRESSED + compressed if len(compressed) < len(data) else _RAW + data
+
+
+def loads(payload):
+    """Inverse de dumps (à n'appeler que sur une entrée dont la signature a été vérifiée)"""
+    if payload[:1] == _COMPRESSED:
+        return pickle.loads(zlib.decompress(payload[1:]))
+    if payload[:1] == _RAW:
+        return pickle.loads(payload[1:])
+    raise ValueError("Entrée de cache inconnue")
+
+
+def _signature(secret, key, payload):
+    return hmac.new(secret.encode('utf-8'), key.encode('ascii') + payload, hashlib.sha256).digest()
+
+
+def sign(secret, key, payload):
+    """Entrée stockée : signature de la clé et du contenu, suivie du contenu"""
+    return _signature(secret, key, payload) + payload
+
+
+def verify(secret, key, entry):
+    """
+    Contenu d'une entrée stockée si sa signature est valide pour cette clé
+
+    Raises:
+        ValueError: Entrée non signée, altérée ou signée avec un autre secret
+    """
+    signature, payload = entry[:_SIGNATURE_BYTES], entry[_SIGNATURE_BYTES:]
+    if len(signature) < _SIGNATURE_BYTES or not hmac.compare_digest(signature, _signature(secret, key, payload)):
+        raise ValueError("Signature de l'entrée de cache invalide")
+    return payload
+
+
+def cache_key(name, arguments):
+    """Clé d'une entrée : empreinte du nom de la fonction et des arguments"""
+    payload = pickle.dumps((FORMAT_VERSION, name, arguments), protocol=4)
+    return hashlib.sha256(payload).hexdigest()[:40]
+
+
+class DiskCache:
+    """Stockage dans un répertoire partagé entre processus (et machines, sur un volume commun)"""
+
+    name = 'disk'
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 ** 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, '.lock')
+        self._written = 0
+
+    def describe(self):
+        return f"répertoire {self.directory} ({self.max_bytes / 1024 ** 2:.0f} Mo max)"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _locked(self, exclusive):
+        """Verrou du répertoire : partagé pour écrire, exclusif pour évincer"""
+        handle = open(self._lock_path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return handle
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Date de modification = dernière lecture (ordre d'éviction)
+            os.utime(path)
+        except OSError:
+            pass
+        return payload
+
+    def set(self, key, payload):
+        if len(payload) > self.max_bytes * MAX_ENTRY_FRACTION:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._locked(exclusive=False):
+            descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(descriptor, 'wb') as f:
+                    f.write(payload)
+                os.replace(temporary, path)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
+        self._written += len(payload)
+        # Un parcours du répertoire seulement après un dixième de la capacité écrit
+        if self._written > self.max_bytes * MAX_ENTRY_FRACTION:
+            self._written = 0
+            self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Entrées du cache : (date de dernière lecture, taille, chemin)"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(root, name)))
+        return entries
+
+    def evict(self, target=0.9):
+        """Supprime les entrées les moins récemment lues jusqu'à target x max_bytes"""
+        with self._locked(exclusive=True):
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes * target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return total
+
+
+class RespError(Exception):
+    """Erreur renvoyée par le serveur Redis"""
+
+
+class RespClient:
+    """Client minimal du protocole Redis (RESP2), une connexion par client"""
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, timeout=1.0):
+        """redis://[:mot_de_passe@]hôte[:port][/base]"""
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip('/') or 0)
+        return cls(parsed.hostname or 'localhost', parsed.port or 6379, db, parsed.password, timeout)
+
+    def _connect(self):
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._socket.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._reader.close()
+                self._socket.close()
+            finally:
+                self._socket = self._reader = None
+
+    def execute(self, *args):
+        """Envoie une commande et renvoie la réponse (reconnexion à la prochaine commande en cas d'erreur réseau)"""
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._connect()
+                return self._call(*args)
+            except OSError:
+                self.close()
+                raise
+
+    def _call(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self._socket.sendall(b''.join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connexion Redis fermée")
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            raise RespError(body.decode('utf-8'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(body)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise ConnectionError(f"Réponse Redis illisible : {line!r}")
+
+
+class RedisCache:
+    """Stockage dans un serveur Redis (ou compatible : Valkey, KeyDB...)"""
+
+    name = 'redis'
+
+    def __init__(self, url=DEFAULT_REDIS_URL, max_bytes=DEFAULT_MAX_MB * 1024 ** 2, ttl=DEFAULT_TTL,
+                 prefix='clip-cache:'):
+        self.url = url
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.prefix = prefix
+        self.client = RespClient.from_url(url)
+
+    def describe(self):
+        parsed = urlparse(self.url)
+        return f"redis {parsed.hostname}:{parsed.port or 6379} (entrées de {self.ttl // 3600} h)"
+
+    def get(self, key):
+        return self.client.execute('GET', self.prefix + key)
+
+    def set(self, key, payload):
+        if len(payload) > self.max_bytes * MAX_ENTRY_FRACTION:
+            return
+        self.client.execute('SET', self.prefix + key, payload, 'EX', int(self.ttl))
+
+    def delete(self, key):
+        self.client.execute('DEL', self.prefix + key)
+
+
+class CacheStats:
+    """Succès, échecs et erreurs du cache partagé par fonction (processus courant)"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(name, {'hits': 0, 'misses': 0, 'errors': 0})
+            counts[outcome] += 1
+
+    def snapshot(self):
+        """Compteurs par fonction, avec le taux de succès"""
+        with self._lock:
+            return {name: dict(counts, hit_rate=counts['hits'] / max(counts['hits'] + counts['misses'], 1))
+                    for name, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class SharedCache:
+    """Stockage partagé utilisé par shared_memoize, désactivé après une erreur pendant RETRY_DELAY"""
+
+    def __init__(self, backend=None, secret=None):
+        if backend is not None and not secret:
+            raise ValueError("Un secret est nécessaire pour signer les entrées du cache partagé")
+        self.backend = backend
+        self.secret = secret
+        self.stats = CacheStats()
+        self.warning = None
+        self._retry_at = 0.0
+
+    @property
+    def enabled(self):
+        return self.backend is not None and time.monotonic() >= self._retry_at
+
+    def _failed(self, name):
+        self.stats.record(name, 'errors')
+        self._retry_at = time.monotonic() + RETRY_DELAY
+
+    def lookup(self, name, key):
+        """
+        Valeur mémorisée
+
+        Returns:
+            tuple: (trouvée, valeur)
+        """
+        if not self.enabled:
+            return False, None
+        try:
+            payload = self.backend.get(key)
+        except (OSError, RespError):
+            self._failed(name)
+            return False, None
+        if payload is None:
+            self.stats.record(name, 'misses')
+            return False, None
+        try:
+            payload = verify(self.secret, key, payload)
+        except ValueError:
+            # Entrée non signée ou altérée : jamais désérialisée, recalculée puis réécrite
+            self.stats.record(name, 'errors')
+            return False, None
+        try:
+            value = loads(payload)
+        except Exception:
+            # Entrée tronquée ou d'un format incompatible : recalculée puis réécrite
+            self.stats.record(name, 'errors')
+            return False, None
+        self.stats.record(name, 'hits')
+        return True, value
+
+    def store(self, name, key, value):
+        """Mémorise une valeur (sans effet si elle n'est pas sérialisable)"""
+        if not self.enabled:
+            return
+        try:
+            payload = dumps(value)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        try:
+            self.backend.set(key, sign(self.secret, key, payload))
+        except (OSError, RespError):
+            self._failed(name)
+
+
+# Stockage courant du processus (choisi par les pages, voir use_shared_cache)
+_shared_cache = SharedCache()
+
+
+def use_shared_cache(cache):
+    """Stockage utilisé par toutes les fonctions décorées du processus"""
+    global _shared_cache
+    _shared_cache = cache
+
+
+def current_shared_cache():
+    return _shared_cache
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_cache(backend=DEFAULT_BACKEND, directory=DEFAULT_CACHE_DIR, url=DEFAULT_REDIS_URL,
+                     max_mb=DEFAULT_MAX_MB, ttl=DEFAULT_TTL, secret=None):
+    """
+    Cache partagé du processus pour une configuration
+
+    Args:
+        backend: 'local', 'disk' ou 'redis'
+        secret: Secret commun aux réplicas, qui signe les entrées
+
+    Returns:
+        SharedCache: Cache (sans stockage pour 'local', ou si le secret manque)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Cache partagé inconnu : {backend}")
+    if backend != 'local' and not secret:
+        cache = SharedCache()
+        cache.warning = (f"Cache partagé « {backend} » désactivé : aucun secret de signature "
+                         "([cache] secret ou SHARED_CACHE_SECRET).")
+        return cache
+    if backend == 'disk':
+        return SharedCache(DiskCache(directory, int(max_mb * 1024 ** 2)), secret)
+    if backend == 'redis':
+        return SharedCache(RedisCache(url, int(max_mb * 1024 ** 2), int(ttl)), secret)
+    return SharedCache()
+
+
+def _setting(name, env_var, default=None):
+    """Réglage de la section [cache] des secrets, sinon variable d'environnement"""
+    try:
+        return st.secrets["cache"][name]
+    except (KeyError, FileNotFoundError):
+        return os.environ.get(env_var, default)
+
+
+def configure_from_secrets():
+    """
+    Choisit le cache partagé du processus d'après la section [cache] des secrets
+
+    Variables d'environnement de repli : SHARED_CACHE_BACKEND, SHARED_CACHE_DIR,
+    SHARED_CACHE_URL, SHARED_CACHE_MAX_MB et SHARED_CACHE_SECRET.
+
+    Returns:
+        SharedCache: Cache utilisé par les fonctions décorées (voir use_shared_cache)
+    """
+    # 'local' (aucun), 'disk' ou 'redis' ; valeur inconnue -> 'local'
+    backend = _setting('backend', 'SHARED_CACHE_BACKEND', DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        backend = DEFAULT_BACKEND
+    cache = get_shared_cache(backend, _setting('path', 'SHARED_CACHE_DIR', DEFAULT_CACHE_DIR),
+                             _setting('url', 'SHARED_CACHE_URL', DEFAULT_REDIS_URL),
+                             float(_setting('max_mb', 'SHARED_CACHE_MAX_MB', DEFAULT_MAX_MB)),
+                             # Secret commun aux réplicas, qui signe les entrées (obligatoire hors 'local')
+                             secret=_setting('secret', 'SHARED_CACHE_SECRET'))
+    use_shared_cache(cache)
+    return cache
+
+
+def shared_memoize(func=None, *, name=None):
+    """
+    Mémorise les résultats d'une fonction dans le cache partagé courant
+
+    À placer sous @st.cache_data : le cache du processus reste consulté en
+    premier, le cache partagé évite le calcul quand un autre réplica l'a déjà fait.
+    """
+    if func is None:
+        return functools.partial(shared_memoize, name=name)
+
+    signature = inspect.signature(func)
+    qualified_name = name or f"{os.path.basename(func.__code__.co_filename)}:{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _shared_cache
+        if not cache.enabled:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        try:
+            key = cache_key(qualified_name, sorted((argument, value) for argument, value in bound.arguments.items()
+                                                   if not argument.startswith('_')))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Argument non sérialisable : pas de clé partagée possible
+            return func(*args, **kwargs)
+        found, value = cache.lookup(qualified_name, key)
+        if found:
+            return value
+        value = func(*args, **kwargs)
+        cache.store(qualified_name, key, value)
+        return value
+
+    wrapper.shared_name = qualified_name
+    return wrapper
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Générateur de catalogues synthétiques au schéma de produits_original.csv
+
+Chaque produit synthétique part d'un produit du catalogue source (tiré au
+hasard) : arbre de catégories, marque, notes et mots-clés sont conservés, les
+identifiants, prix, URL et noms sont renouvelés, la description est recomposée
+à partir de phrases de la même catégorie principale (sur plusieurs lignes, à la
+même fréquence que le catalogue source) et les spécifications sont réécrites au
+format Ruby ({"product_specification"=>[{"key"=>..., "value"=>...}]}).
+
+Les images sont des JPEG de substitution aux dimensions choisies, tirées d'une
+petite réserve encodée une seule fois puis écrites (ou liées) pour chaque produit.
+Le catalogue source est recopié en tête : à l'échelle 1, le catalogue généré est
+le catalogue source.
+
+Usage :
+    python synthetic_catalog.py --scale 10 --output-dir synthetic/x10
+    python synthetic_catalog.py --rows 100000 --image-size 640x640 --link-images --output-dir synthetic/100k
+"""
+
+import io
+import os
+import re
+import json
+import time
+import shutil
+import string
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw
+
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR
+
+# Nombre d'images distinctes de la réserve de substitution
+DEFAULT_IMAGE_POOL = 64
+
+# Lignes écrites par morceau dans le CSV
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Images du catalogue source dont les dimensions sont échantillonnées
+SIZE_SAMPLE = 200
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_ALPHANUMERIC = np.array(list(string.ascii_uppercase + string.digits))
+
+
+def parse_specifications(specifications):
+    """Entrées d'une spécification au format Ruby (liste vide si illisible)"""
+    if not isinstance(specifications, str):
+        return []
+    try:
+        entries = json.loads(specifications.replace('=>', ':')).get('product_specification', [])
+    except (ValueError, AttributeError):
+        return []
+    # Une spécification unique est écrite sans liste
+    return [entries] if isinstance(entries, dict) else list(entries)
+
+
+def format_specifications(entries):
+    """Entrées -> chaîne au format Ruby de produits_original.csv"""
+    def ruby(entry):
+        return "{" + ", ".join(f"{json.dumps(k, ensure_ascii=False)}=>{json.dumps(v, ensure_ascii=False)}"
+                               for k, v in entry.items()) + "}"
+    return '{"product_specification"=>[' + ", ".join(ruby(entry) for entry in entries) + "]}"
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-')
+
+
+def _codes(rng, count, length):
+    """Codes alphanumériques majuscules aléatoires"""
+    return ["".join(row) for row in _ALPHANUMERIC[rng.integers(0, len(_ALPHANUMERIC), size=(count, length))]]
+
+
+class CatalogModel:
+    """Produits sources et réserves de phrases par catégorie principale"""
+
+    def __init__(self, source):
+        self.source = source.reset_index(drop=True)
+        self.columns = list(source.columns)
+        main_categories = source['product_category_tree'].str.extract(r'\["([^>"]+?)\s*(?:>>|")', expand=False)
+        self.main_categories = main_categories.fillna('Unknown').to_numpy()
+        self.sentences = {}
+        for category, description in zip(self.main_categories, source['description'].fillna('')):
+            self.sentences.setdefault(category, []).extend(
+                sentence.strip() for sentence in _SENTENCE_SPLIT.split(description) if sentence.strip())
+        self.multiline_rate = float(source['description'].fillna('').str.contains('\n').mean())
+
+    @classmethod
+    def from_csv(cls, csv_path=CATALOG_CSV_PATH):
+        return cls(pd.read_csv(csv_path, dtype={'is_FK_Advantage_product': object}))
+
+    def generate(self, start, count, rng):
+        """
+        Produits synthétiques start .. start + count - 1
+
+        Returns:
+            DataFrame: Colonnes de produits_original.csv
+        """
+        positions = rng.integers(0, len(self.source), size=count)
+        templates = self.source.iloc[positions]
+        categories = self.main_categories[positions]
+        uniq_ids = [hashlib.md5(f"synthetic:{start + i}".encode('utf-8')).hexdigest() for i in range(count)]
+        pids = _codes(rng, count, 16)
+        models = _codes(rng, count, 5)
+        item_codes = [code.lower() for code in _codes(rng, count, 13)]
+        price_factors = rng.lognormal(0.0, 0.2, size=count)
+        discounts = rng.uniform(0.3, 1.0, size=count)
+        multiline = rng.random(count) < self.multiline_rate
+
+        rows = []
+        for i, template in enumerate(templates.to_dict('records')):
+            name = f"{template['product_name']} {models[i]}"
+            pool = self.sentences.get(categories[i]) or [name]
+            sentences = [pool[j] for j in rng.integers(0, len(pool), size=rng.integers(2, 7))]
+            separator = "\n" if multiline[i] else " "
+            description = f"{name}{separator}" + " ".join(sentences)
+
+            specifications = template.get('product_specifications')
+            entries = parse_specifications(specifications)
+            if entries:
+                specifications = format_specifications([entries[j] for j in rng.permutation(len(entries))])
+
+            retail_price = template.get('retail_price')
+            if pd.notna(retail_price):
+                retail_price = float(round(retail_price * price_factors[i]))
+            discounted_price = template.get('discounted_price')
+            if pd.notna(discounted_price) and pd.notna(retail_price):
+                discounted_price = float(round(retail_price * discounts[i]))
+
+            rows.append(dict(
+                template,
+                uniq_id=uniq_ids[i],
+                product_url=f"http://www.flipkart.com/{_slug(name)}/p/itm{item_codes[i]}?pid={pids[i]}",
+                product_name=name,
+                pid=pids[i],
+                retail_price=retail_price,
+                discounted_price=discounted_price,
+                image=f"{uniq_ids[i]}.jpg",
+                description=description,
+                product_specifications=specifications,
+            ))
+        return pd.DataFrame(rows, columns=self.columns)
+
+
+def source_image_sizes(images_dir=IMAGES_DIR, sample=SIZE_SAMPLE):
+    """Dimensions (en-têtes) d'un échantillon d'images du catalogue source"""
+    sizes = []
+    try:
+        names = sorted(os.listdir(images_dir))[:sample]
+    except OSError:
+        return sizes
+    for name in names:
+        try:
+            with Image.open(os.path.join(images_dir, name)) as image:
+                sizes.append(image.size)
+        except OSError:
+            continue
+    return sizes
+
+
+def placeholder_pool(count, rng, sizes, quality=85):
+    """
+    Réserve d'images JPEG de substitution (fond, formes et dégradé aléatoires)
+
+    Args:
+        count: Nombre d'images distinctes
+        sizes: Dimensions possibles (tirées au hasard pour chaque image)
+
+    Returns:
+        list[bytes]: Images encodées
+    """
+    pool = []
+    for _ in range(count):
+        width, height = sizes[rng.integers(0, len(sizes))]
+        background = tuple(int(c) for c in rng.integers(40, 230, size=3))
+        image = Image.new('RGB', (width, height), background)
+        draw = ImageDraw.Draw(image)
+        for _ in range(4):
+            x0, y0 = int(rng.integers(0, width)), int(rng.integers(0, height))
+            x1, y1 = x0 + int(rng.integers(width // 8, width // 2 + 1)), y0 + int(rng.integers(height // 8, height // 2 + 1))
+            draw.rectangle([x0, y0, x1, y1], fill=tuple(int(c) for c in rng.integers(0, 256, size=3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=quality)
+        pool.append(buffer.getvalue())
+    return pool
+
+
+def generate_catalog(output_dir, rows=None, scale=1, source_csv=CATALOG_CSV_PATH, source_images=IMAGES_DIR,
+                     image_size=None, image_pool=DEFAULT_IMAGE_POOL, link_images=False, seed=0,
+                     chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Écrit un catalogue synthétique (produits_original.csv et Images/) dans output_dir
+
+    Args:
+        rows: Nombre total de produits (par défaut scale x la taille du catalogue source)
+        scale: Multiple de la taille du catalogue source
+        image_size: (largeur, hauteur) des images ; None = dimensions du catalogue source
+        image_pool: Nombre d'images de substitution distinctes
+        link_images: Liens physiques vers la réserve au lieu de copies (économise le disque)
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        tuple: (chemin du CSV, répertoire des images, nombre de produits)
+    """
+    rng = np.random.default_rng(seed)
+    model = CatalogModel.from_csv(source_csv)
+    rows = int(rows if rows is not None else scale * len(model.source))
+
+    csv_path = os.path.join(output_dir, os.path.basename(CATALOG_CSV_PATH))
+    images_dir = os.path.join(output_dir, os.path.basename(IMAGES_DIR))
+    os.makedirs(images_dir, exist_ok=True)
+
+    # Catalogue source en tête (images recopiées)
+    head = model.source.head(rows)
+    head.to_csv(csv_path, index=False)
+    for name in head['image']:
+        source_path = os.path.join(source_images, name)
+        if os.path.exists(source_path) and not os.path.exists(os.path.join(images_dir, name)):
+            shutil.copyfile(source_path, os.path.join(images_dir, name))
+
+    sizes = [image_size] if image_size else (source_image_sizes(source_images) or [(1000, 1000)])
+    pool = placeholder_pool(image_pool, rng, sizes)
+    pool_dir = os.path.join(output_dir, '.image_pool')
+    if link_images:
+        os.makedirs(pool_dir, exist_ok=True)
+        for k, data in enumerate(pool):
+            with open(os.path.join(pool_dir, f"{k}.jpg"), 'wb') as f:
+                f.write(data)
+
+    for start in range(len(head), rows, chunk_rows):
+        chunk = model.generate(start, min(chunk_rows, rows - start), rng)
+        chunk.to_csv(csv_path, mode='a', header=False, index=False)
+        for name, k in zip(chunk['image'], rng.integers(0, len(pool), size=len(chunk))):
+            path = os.path.join(images_dir, name)
+            if os.path.exists(path):
+                continue
+            if link_images:
+                os.link(os.path.join(pool_dir, f"{k}.jpg"), path)
+            else:
+                with open(path, 'wb') as f:
+                    f.write(pool[k])
+    return csv_path, images_dir, rows
+
+
+def _parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Génère un catalogue synthétique au schéma de produits_original.csv")
+    parser.add_argument('--output-dir', required=True, help="Répertoire du catalogue généré")
+    parser.add_argument('--scale', type=float, default=1, help="Multiple de la taille du catalogue source")
+    parser.add_argument('--rows', type=int, default=None, help="Nombre de produits (remplace --scale)")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV du catalogue source")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Images du catalogue source")
+    parser.add_argument('--image-size', type=_parse_size, default=None,
+                        help="Dimensions des images, ex. 800x800 (défaut : celles du catalogue source)")
+    parser.add_argument('--image-pool', type=int, default=DEFAULT_IMAGE_POOL, help="Images distinctes")
+    parser.add_argument('--link-images', action='store_true', help="Liens physiques au lieu de copies")
+    parser.add_argument('--seed', type=int, default=0, help="Graine aléatoire")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    csv_path, images_dir, rows = generate_catalog(args.output_dir, args.rows, args.scale, args.csv, args.images,
+                                                  args.image_size, args.image_pool, args.link_images, args.seed)
+    print(f"✅ Catalogue synthétique : {csv_path} ({rows} produits, "
+          f"{os.path.getsize(csv_path) / 1024 ** 2:.1f} Mo), images dans {images_dir} "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -234,5 +234,1994 @@ class TestErrorHandling:
         assert safe_divide(10, 2) == 5
         assert safe_divide(10, 0) is None
 
+class TestProfiling:
+    """Tests du profilage opt-in des reruns"""
+    
+    def test_profiling_disabled_by_default(self, monkeypatch):
+        """Test qu'aucun profileur n'est créé sans l'interrupteur"""
+        import profiling
+        
+        monkeypatch.delenv(profiling.PROFILE_ENV_VAR, raising=False)
+        handle = profiling.start_rerun_profile("test_page")
+        assert handle is None
+        assert profiling.stop_rerun_profile(handle) is None
+    
+    def test_profiles_stored_in_bounded_ring(self, monkeypatch, tmp_path):
+        """Test que les profils sont enregistrés et que l'anneau est borné"""
+        import profiling
+        
+        monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+        for _ in range(4):
+            handle = profiling.start_rerun_profile("test_page")
+            assert handle is not None
+            sum(i * i for i in range(10000))
+            profiling.stop_rerun_profile(handle, directory=str(tmp_path), ring_size=3)
+        
+        profiles = profiling.list_profiles(str(tmp_path))
+        assert len(profiles) == 3
+        assert len(list(tmp_path.glob("*.prof"))) == 3
+        durations = [p['duration'] for p in profiles]
+        assert durations == sorted(durations, reverse=True)
+        
+        rows = profiling.top_functions(str(tmp_path / profiles[0]['profile_file']), limit=5)
+        assert 0 < len(rows) <= 5
+        assert {'function', 'ncalls', 'tottime', 'cumtime'} <= set(rows[0])
+    
+    def test_cpu_time_excludes_other_threads(self, monkeypatch, tmp_path):
+        """Test que le temps CPU d'un rerun ne compte pas les threads des autres sessions"""
+        import time
+        import threading
+        import profiling
+        
+        monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+        stop = threading.Event()
+        busy = threading.Thread(target=lambda: [None for _ in iter(stop.is_set, True)], daemon=True)
+        handle = profiling.start_rerun_profile("test_page")
+        busy.start()
+        time.sleep(0.3)
+        stop.set()
+        busy.join()
+        metadata = profiling.stop_rerun_profile(handle, directory=str(tmp_path))
+        assert metadata['duration'] >= 0.3
+        assert metadata['cpu_time'] < 0.1
+    
+    def test_profile_saved_when_page_reruns(self, monkeypatch, tmp_path):
+        """Test qu'un rerun interrompu par st.rerun() est enregistré au début du rerun suivant"""
+        from streamlit.testing.v1 import AppTest
+        import profiling
+        
+        monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+        monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+        script = """
+import streamlit as st
+from profiling import start_rerun_profile, stop_rerun_profile
+_rerun_profile = start_rerun_profile("interrupted" if "rerun_done" not in st.session_state else "completed")
+if "rerun_done" not in st.session_state:
+    st.session_state.rerun_done = True
+    st.rerun()
+st.write("fin")
+stop_rerun_profile(_rerun_profile)
+"""
+        at = AppTest.from_string(script).run()
+        assert not at.exception
+        profiles = profiling.list_profiles(str(tmp_path))
+        assert sorted(p['page'] for p in profiles) == ["completed", "interrupted"]
+        assert all(p['duration'] < 5 for p in profiles)
+    
+    def test_profiler_already_active(self, monkeypatch):
+        """Test qu'un profileur déjà actif (autre session, Python >= 3.12) ne fait pas échouer la page"""
+        import cProfile
+        import profiling
+        
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+        
+        monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+        monkeypatch.setattr(cProfile.Profile, 'enable', enable)
+        assert profiling.start_rerun_profile("test_page") is None
+    
+    def test_run_metrics_per_scope(self):
+        """Test du comptage des exécutions et du temps CPU par portée (track_run, record_run, get_run_metrics)"""
+        from streamlit.testing.v1 import AppTest
+        
+        script = """
+import time
+import streamlit as st
+from profiling import track_run, record_run, get_run_metrics
+with track_run("busy"):
+    end = time.thread_time() + 0.05
+    while time.thread_time() < end:
+        pass
+record_run("manual", 0.2)
+try:
+    with track_run("failing"):
+        raise ValueError("échec")
+except ValueError:
+    pass
+st.session_state['metrics'] = get_run_metrics()
+"""
+        at = AppTest.from_string(script).run()
+        at.run()
+        metrics = at.session_state['metrics']
+        assert {scope: entry['runs'] for scope, entry in metrics.items()} == {'busy': 2, 'manual': 2, 'failing': 2}
+        assert metrics['busy']['cpu_time'] >= 0.1
+        assert metrics['busy']['cpu_per_run'] == pytest.approx(metrics['busy']['cpu_time'] / 2)
+        assert metrics['manual']['cpu_per_run'] == pytest.approx(0.2)
+    
+    def test_form_edit_does_not_rerun_image_panel(self):
+        """Test qu'une saisie dans le formulaire ne réexécute que son fragment, pas le panneau image"""
+        import os
+        import inspect
+        import functools
+        from unittest.mock import patch
+        from streamlit.testing.v1 import AppTest
+        from streamlit.testing.v1 import local_script_runner
+        
+        at = AppTest.from_file(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                            "pages", "2_prediction.py"), default_timeout=60).run()
+        assert not at.exception
+        
+        def fragment_id(name):
+            for fid, wrapped in at._fragment_storage._fragments.items():
+                if any(getattr(value, '__name__', None) == name
+                       for value in inspect.getclosurevars(wrapped).nonlocals.values()):
+                    return fid
+        
+        # AppTest relance toujours le script entier : rerun limité au fragment du formulaire,
+        # comme le demande le navigateur lors d'une interaction dans ce fragment
+        at.text_area[0].input("nouvelle description")
+        fragment_rerun = functools.partial(local_script_runner.RerunData, is_fragment_scoped_rerun=True,
+                                           fragment_id_queue=[fragment_id('render_prediction_form')])
+        with patch.object(local_script_runner, 'RerunData', fragment_rerun):
+            at.run()
+        assert not at.exception
+        runs = {scope: entry['runs'] for scope, entry in at.session_state['_run_metrics'].items()}
+        assert runs['form'] == 2
+        assert runs['image_panel'] == 1 and runs['history_panel'] == 1 and runs['page'] == 1
+
+@pytest.fixture
+def tiny_catalog(tmp_path):
+    """Petit catalogue (CSV + images) au format de produits_original.csv"""
+    import pandas as pd
+    from PIL import Image
+    
+    images_dir = tmp_path / "Images"
+    images_dir.mkdir()
+    rows = []
+    for i, (tree, size) in enumerate([
+        ("Watches >> Wrist Watches >> Escort", (120, 80)),
+        ("Watches >> Wrist Watches >> Sonata", (100, 100)),
+        ("Baby Care >> Baby Bedding >> Blankets", (80, 120)),
+        ("Kitchen & Dining >> Cookware >> Pans", None),
+    ]):
+        uniq_id = f"{i:032x}"
+        if size is not None:
+            Image.new('RGB', size, color=(40 * i, 100, 200)).save(images_dir / f"{uniq_id}.jpg")
+        rows.append({
+            'uniq_id': uniq_id,
+            'product_name': f"Product {i}",
+            'product_category_tree': f'["{tree}"]',
+            'retail_price': 100.0 * (i + 1),
+            'image': f"{uniq_id}.jpg",
+            'description': f"Description of product {i}",
+            'brand': None if i == 3 else f"Brand {i}",
+        })
+    csv_path = tmp_path / "produits.csv"
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    return str(csv_path), str(images_dir)
+
+class TestEdaSnapshot:
+    """Tests du snapshot EDA pré-calculé"""
+    
+    def test_snapshot_round_trip(self, tiny_catalog, tmp_path):
+        """Test que le snapshot restitue les agrégats calculés en direct"""
+        from catalog import load_catalog, manifest_fingerprint
+        import eda_snapshot
+        
+        csv_path, images_dir = tiny_catalog
+        df = load_catalog(csv_path, images_dir)
+        fingerprint = manifest_fingerprint(csv_path, images_dir)
+        snapshot_path = str(tmp_path / "snapshot.json.gz")
+        eda_snapshot.save_snapshot(eda_snapshot.build_snapshot(df, fingerprint), snapshot_path)
+        
+        snapshot = eda_snapshot.load_snapshot(snapshot_path, expected_fingerprint=fingerprint)
+        assert snapshot is not None
+        aggregates = snapshot['aggregates']
+        main = eda_snapshot.dict_to_series(aggregates['category_counts']['main'])
+        assert main.to_dict() == df['main_category'].value_counts().to_dict()
+        assert aggregates['image_statistics']['valid_count'] == 3
+        assert len(aggregates['image_statistics']['invalid']['data']) == 1
+        assert aggregates['image_samples'][0]['category'] == 'Watches'
+        assert aggregates['image_samples'][0]['valid_count'] == 2
+    
+    def test_stale_snapshot_is_ignored(self, tiny_catalog, tmp_path):
+        """Test qu'un snapshot périmé ou d'une autre version n'est pas utilisé"""
+        from catalog import load_catalog, manifest_fingerprint
+        from PIL import Image
+        import eda_snapshot
+        
+        csv_path, images_dir = tiny_catalog
+        snapshot = eda_snapshot.build_snapshot(load_catalog(csv_path, images_dir),
+                                               manifest_fingerprint(csv_path, images_dir))
+        snapshot_path = str(tmp_path / "snapshot.json.gz")
+        eda_snapshot.save_snapshot(snapshot, snapshot_path)
+        
+        # Ajout d'une image : l'empreinte de validation change
+        Image.new('RGB', (10, 10)).save(os.path.join(images_dir, "new.jpg"))
+        assert eda_snapshot.load_snapshot(snapshot_path, manifest_fingerprint(csv_path, images_dir)) is None
+        
+        snapshot['version'] = eda_snapshot.SNAPSHOT_VERSION + 1
+        eda_snapshot.save_snapshot(snapshot, snapshot_path)
+        assert eda_snapshot.load_snapshot(snapshot_path) is None
+        assert eda_snapshot.load_snapshot(str(tmp_path / "missing.json.gz")) is None
+    
+    def test_content_fingerprint_covers_all_content(self, tiny_catalog):
+        """Test que l'empreinte suit tout le contenu (CSV entier, pixels des images) mais pas les dates"""
+        import os
+        from catalog import content_fingerprint
+        
+        csv_path, images_dir = tiny_catalog
+        fingerprint = content_fingerprint(csv_path, images_dir)
+        os.utime(csv_path, (0, 0))
+        assert content_fingerprint(csv_path, images_dir) == fingerprint
+        
+        # Modification d'un octet au milieu du CSV, taille inchangée
+        with open(csv_path, 'r+b') as f:
+            content = f.read()
+            middle = content.index(b"Product 1")
+            f.seek(middle)
+            f.write(b"Product 9")
+        changed_csv = content_fingerprint(csv_path, images_dir)
+        assert changed_csv != fingerprint
+        
+        # Image réécrite à l'identique en taille, contenu différent
+        image_path = os.path.join(images_dir, sorted(os.listdir(images_dir))[0])
+        with open(image_path, 'r+b') as f:
+            f.seek(-3, os.SEEK_END)
+            f.write(b"\x00\x00\x00")
+        assert content_fingerprint(csv_path, images_dir) != changed_csv
+    
+    def test_manifest_fingerprint_does_not_read_images(self, tiny_catalog, monkeypatch):
+        """Test que l'empreinte de validation suit le CSV, les noms et tailles d'images, sans relire les images"""
+        import os
+        import catalog
+        
+        csv_path, images_dir = tiny_catalog
+        read = []
+        original_digest = catalog.file_digest
+        monkeypatch.setattr(catalog, 'file_digest', lambda path, *args: read.append(path) or original_digest(path, *args))
+        fingerprint = catalog.manifest_fingerprint(csv_path, images_dir)
+        assert read == [csv_path]
+        
+        image_path = os.path.join(images_dir, sorted(os.listdir(images_dir))[0])
+        os.utime(image_path, (0, 0))
+        assert catalog.manifest_fingerprint(csv_path, images_dir) == fingerprint
+        with open(image_path, 'ab') as f:
+            f.write(b"\x00")
+        assert catalog.manifest_fingerprint(csv_path, images_dir) != fingerprint
+
+class TestEdaFigures:
+    """Tests de la mémorisation des graphiques EDA et des sections à exécution différée"""
+    
+    @staticmethod
+    def count_builds(monkeypatch):
+        """Compte les constructions de figures (chaque construction lit le thème de son mode)"""
+        import eda_figures
+        
+        for figure in (eda_figures.category_bar_json, eda_figures.subcategory_pie_json, eda_figures.keyword_bar_json,
+                       eda_figures.keyword_pie_json, eda_figures.wordcloud_png, eda_figures.image_scatter_json):
+            figure.clear()
+        builds = []
+        theme = eda_figures._theme
+        monkeypatch.setattr(eda_figures, '_theme', lambda mode: builds.append(mode) or theme(mode))
+        return builds
+    
+    def test_figures_memoized_on_dataset_and_mode(self, monkeypatch):
+        """Test de la clé de mémorisation (empreinte du dataset, mode d'accessibilité)"""
+        import pandas as pd
+        import eda_figures
+        
+        builds = self.count_builds(monkeypatch)
+        counts = pd.Series({'Watches': 3, 'Baby Care': 1})
+        default = eda_figures.accessibility_mode({})
+        high_contrast = eda_figures.accessibility_mode({'high_contrast': True})
+        
+        figure = eda_figures.category_bar_json("v1", default, counts)
+        # Les arguments préfixés par _ ne font pas partie de la clé
+        assert eda_figures.category_bar_json("v1", default, pd.Series({'Autre': 9})) == figure
+        assert len(builds) == 1
+        assert eda_figures.category_bar_json("v1", high_contrast, counts) != figure
+        assert eda_figures.category_bar_json("v1", default, counts) == figure
+        assert len(builds) == 2
+        eda_figures.category_bar_json("v2", default, counts)
+        assert builds == [default, high_contrast, default]
+    
+    def test_accessibility_toggle_rebuilds_open_sections_only(self, monkeypatch):
+        """Test qu'un changement d'accessibilité ne reconstruit que les figures des sections ouvertes"""
+        import os
+        from streamlit.testing.v1 import AppTest
+        
+        builds = self.count_builds(monkeypatch)
+        at = AppTest.from_file(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                            "pages", "1_eda.py"), default_timeout=60).run()
+        assert not at.exception
+        # Seule la section des catégories est ouverte par défaut : histogramme et camembert
+        assert len(builds) == 2
+        
+        at.checkbox(key="high_contrast_checkbox").check().run()
+        assert len(builds) == 4 and all(mode[0] for mode in builds[2:])
+        # Retour à un mode déjà vu : aucune reconstruction
+        at.checkbox(key="high_contrast_checkbox").uncheck().run()
+        assert len(builds) == 4
+    
+    def test_sections_computed_only_when_open(self, monkeypatch):
+        """Test du helper section() : le contenu d'une section repliée n'est ni calculé ni affiché"""
+        import os
+        from streamlit.testing.v1 import AppTest
+        
+        builds = self.count_builds(monkeypatch)
+        at = AppTest.from_file(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                            "pages", "1_eda.py"), default_timeout=60).run()
+        
+        def keywords_section():
+            return next(expander for expander in at.expander if expander.label.startswith("🔤"))
+        
+        assert len(keywords_section().children) == 0
+        assert at.session_state['eda_section_keywords'] is False
+        built = len(builds)
+        
+        # Ouverture de l'expander (on_change="rerun") : la section est calculée à ce rerun
+        at.session_state['eda_section_keywords'] = True
+        at.run()
+        assert not at.exception
+        assert len(keywords_section().children) > 0
+        assert len(builds) > built
+        
+        at.session_state['eda_section_keywords'] = False
+        at.run()
+        assert len(keywords_section().children) == 0
+
+
+class TestImportBudget:
+    """Tests du budget de temps d'import (démarrage à froid)"""
+    
+    def test_pages_do_not_import_heavy_modules(self):
+        """Test que les pages n'importent aucune dépendance lourde au premier niveau"""
+        import import_budget
+        
+        assert import_budget.check_page_imports() == []
+    
+    def test_modules_within_import_budget(self):
+        """Test que chaque module respecte son budget de temps d'import, sans dépendance lourde"""
+        import import_budget
+        
+        rows = import_budget.measure_budgets()
+        assert import_budget.heavy_import_violations(rows) == []
+        assert import_budget.budget_overruns(rows) == []
+    
+    def test_overrun_uses_median_of_fresh_processes(self, monkeypatch):
+        """Test qu'un pic ponctuel ne fait pas dépasser le budget, contrairement à un dépassement répété"""
+        import import_budget
+        
+        timings = iter([3.0, 0.5, 0.6, 3.0, 0.4])
+        monkeypatch.setattr(import_budget, 'measure_import_times',
+                            lambda module: [{'module': module, 'cumulative_s': next(timings)}])
+        assert import_budget.budget_overruns(import_budget.measure_budgets({'lent': 1.0})) == []
+        
+        timings = iter([3.0, 2.5, 0.6, 3.0, 0.4])
+        assert import_budget.budget_overruns(import_budget.measure_budgets({'lent': 1.0})) == ["lent: 2.50s > budget 1.00s"]
+    
+    def test_importtime_report_parsing(self):
+        """Test de l'analyse de la sortie -X importtime"""
+        import import_budget
+        
+        entries = import_budget.measure_import_times('json')
+        assert import_budget.total_import_time(entries, 'json') > 0
+        assert import_budget.heavy_modules_imported(entries) == []
+
+class TestSharedCatalog:
+    """Tests du catalogue partagé entre sessions"""
+    
+    def test_catalog_loaded_once_per_process(self, tiny_catalog):
+        """Test que toutes les sessions reçoivent le même catalogue surveillé et la même version"""
+        from catalog_watcher import get_live_catalog
+        
+        csv_path, images_dir = tiny_catalog
+        live = get_live_catalog(csv_path, images_dir, 3600)
+        try:
+            assert get_live_catalog(csv_path, images_dir, 3600) is live
+            version = live.current()
+            assert live.current() is version
+            assert get_live_catalog(csv_path, images_dir, 3600).current().catalog is version.catalog
+            assert len(version.catalog) == 4
+        finally:
+            live.stop()
+    
+    def test_session_view_is_copy_on_write(self, tiny_catalog):
+        """Test qu'une vue partage les données mais ne modifie jamais le catalogue partagé"""
+        import numpy as np
+        from catalog import load_catalog, catalog_view
+        
+        shared = load_catalog(*tiny_catalog)
+        view = catalog_view(shared)
+        assert np.shares_memory(view['image_pixels'].to_numpy(), shared['image_pixels'].to_numpy())
+        
+        original_name = shared.loc[0, 'product_name']
+        view.loc[0, 'product_name'] = 'Modifié'
+        view['image_pixels'] = 0
+        assert shared.loc[0, 'product_name'] == original_name
+        assert shared['image_pixels'].max() > 0
+    
+    def test_rss_measurement(self):
+        """Test de la mesure de mémoire résidente"""
+        from profiling import rss_bytes
+        
+        assert rss_bytes() > 0
+    
+    def test_rss_bounded_across_sessions(self, monkeypatch):
+        """Test que plusieurs sessions de la page EDA partagent le catalogue (mémoire résidente bornée)"""
+        from benchmark_sessions import measure_sessions
+        
+        monkeypatch.setenv('EDA_SNAPSHOT_PATH', os.devnull)
+        measures = measure_sessions(5)
+        assert len(measures) == 5
+        # Après la première session (chargements et caches uniques), quelques Mo au plus par session
+        per_session_mb = (measures[-1]['rss_mb'] - measures[1]['rss_mb']) / (len(measures) - 2)
+        assert per_session_mb < 5
+
+class TestCatalogSchema:
+    """Tests du schéma compact du catalogue"""
+    
+    def test_compact_dtypes(self, tiny_catalog):
+        """Test que les colonnes répétitives sont catégorielles et les prix en float32"""
+        from catalog import load_catalog
+        
+        df = load_catalog(*tiny_catalog)
+        assert str(df['main_category'].dtype) == 'category'
+        assert str(df['brand'].dtype) == 'category'
+        assert str(df['retail_price'].dtype) == 'float32'
+        assert 'categories' not in df.columns
+        assert list(df['main_category']) == ['Watches', 'Watches', 'Baby Care', 'Kitchen & Dining']
+    
+    def test_missing_values_and_distinct_trees(self, tmp_path):
+        """Test d'un booléen manquant et du décodage unique de chaque arbre de catégories"""
+        import pandas as pd
+        import catalog
+        
+        csv_path = tmp_path / "produits.csv"
+        tree = '["Watches >> Wrist Watches"]'
+        pd.DataFrame({'product_category_tree': [tree, tree, None, tree, '["Baby Care"]'],
+                      'is_FK_Advantage_product': [True, None, False, True, False]}).to_csv(csv_path, index=False)
+        with patch('catalog._first_category_path', wraps=catalog._first_category_path) as decode:
+            df = catalog.derive_columns(catalog.read_catalog(str(csv_path)), image_info=False)
+        assert decode.call_count == 2
+        assert list(df['main_category']) == ['Watches', 'Watches', 'Unknown', 'Watches', 'Baby Care']
+        assert list(df['sub_categories']) == ['Wrist Watches', 'Wrist Watches', 'Unknown', 'Wrist Watches', 'Unknown']
+        assert df['is_FK_Advantage_product'].isna().tolist() == [False, True, False, False, False]
+    
+    def test_consumer_column_pruning(self, tiny_catalog):
+        """Test qu'un consommateur ne charge que ses colonnes (et leurs dérivées)"""
+        from catalog import CONSUMER_COLUMNS, load_catalog
+        
+        df = load_catalog(*tiny_catalog, columns=CONSUMER_COLUMNS['images'])
+        assert 'description' not in df.columns
+        assert 'retail_price' not in df.columns
+        assert {'main_category', 'image_exists', 'image_pixels'} <= set(df.columns)
+    
+    def test_memory_report(self, tiny_catalog):
+        """Test du rapport d'empreinte mémoire par colonne"""
+        from catalog import read_catalog, memory_report
+        
+        df = read_catalog(tiny_catalog[0])
+        report = memory_report(df)
+        assert set(report.index) == set(df.columns)
+        assert report['bytes'].is_monotonic_decreasing
+        assert report['share'].sum() == pytest.approx(1.0)
+
+class TestImageHashing:
+    """Tests de l'index de hachage perceptuel"""
+    
+    @staticmethod
+    def textured_image(seed, size=(160, 120)):
+        """Image aléatoire lissée (texture reconnaissable par les empreintes)"""
+        import numpy as np
+        from PIL import Image
+        
+        noise = np.random.default_rng(seed).integers(0, 256, (12, 16, 3), dtype=np.uint8)
+        return Image.fromarray(noise).resize(size, Image.BICUBIC)
+    
+    def test_hashes_survive_recompression(self):
+        """Test qu'une copie recompressée et redimensionnée reste proche, une autre image non"""
+        import io
+        from image_hashing import image_hashes, hamming, DUPLICATE_MAX_DISTANCE
+        
+        original = self.textured_image(1)
+        buffer = io.BytesIO()
+        original.resize((80, 60)).save(buffer, format='JPEG', quality=40)
+        buffer.seek(0)
+        
+        original_hashes = image_hashes(original)
+        copy_hashes = image_hashes(buffer)
+        other_hashes = image_hashes(self.textured_image(2))
+        assert hamming(original_hashes[0], copy_hashes[0]) <= DUPLICATE_MAX_DISTANCE
+        assert hamming(original_hashes[1], copy_hashes[1]) <= DUPLICATE_MAX_DISTANCE
+        assert hamming(original_hashes[0], other_hashes[0]) > DUPLICATE_MAX_DISTANCE
+    
+    def test_bk_tree_matches_linear_scan(self):
+        """Test que le BK-tree renvoie exactement les résultats d'un parcours linéaire"""
+        import random
+        from image_hashing import BKTree, hamming
+        
+        rng = random.Random(0)
+        keys = [rng.getrandbits(64) for _ in range(300)]
+        keys += [key ^ (1 << rng.randrange(64)) for key in keys[:50]]
+        tree = BKTree()
+        for position, key in enumerate(keys):
+            tree.add(key, position)
+        
+        query = keys[7]
+        expected = sorted(position for position, key in enumerate(keys) if hamming(query, key) <= 12)
+        assert sorted(position for _, position in tree.search(query, 12)) == expected
+        assert len(tree) == len(keys)
+    
+    def test_index_round_trip_and_duplicates(self, tiny_catalog, tmp_path):
+        """Test de la sauvegarde de l'index, du contrôle de fraîcheur et du rapport de doublons"""
+        from image_hashing import ImageHashIndex, image_hashes
+        from catalog import manifest_fingerprint
+        
+        csv_path, images_dir = tiny_catalog
+        # Le produit 1 devient une copie redimensionnée du produit 0, le produit 2 une autre image
+        self.textured_image(1).save(f"{images_dir}/{0:032x}.jpg")
+        self.textured_image(1, (100, 75)).save(f"{images_dir}/{1:032x}.jpg")
+        self.textured_image(3).save(f"{images_dir}/{2:032x}.jpg")
+        
+        index = ImageHashIndex.build(csv_path, images_dir)
+        assert len(index) == 3  # l'image du produit 3 est absente
+        
+        index_path = str(tmp_path / "hashes.npz")
+        index.save(index_path)
+        loaded = ImageHashIndex.load(index_path, expected_fingerprint=manifest_fingerprint(csv_path, images_dir))
+        assert loaded is not None
+        assert ImageHashIndex.load(index_path, expected_fingerprint="périmé") is None
+        
+        assert loaded.duplicate_groups() == [[f"{0:032x}", f"{1:032x}"]]
+        matches = loaded.find(image_hashes(self.textured_image(3, (64, 48))))
+        assert [match['uniq_id'] for match in matches] == [f"{2:032x}"]
+    
+    def test_reports_use_declared_image_names(self, tiny_catalog):
+        """Test que le rapport de doublons et les entrées du catalogue suivent la colonne 'image' du CSV"""
+        import os
+        import pandas as pd
+        from image_hashing import ImageHashIndex, duplicate_report
+        from catalog_predictions import catalog_inputs
+        
+        csv_path, images_dir = tiny_catalog
+        catalog = pd.read_csv(csv_path, dtype={'uniq_id': str})
+        for position, uniq_id in enumerate(catalog['uniq_id'][:3]):
+            self.textured_image(1 if position < 2 else 3).save(os.path.join(images_dir, f"photo-{position}.jpg"))
+            os.remove(os.path.join(images_dir, f"{uniq_id}.jpg"))
+        catalog['image'] = [f"photo-{position}.jpg" for position in range(len(catalog))]
+        catalog['product_specifications'] = None
+        catalog.to_csv(csv_path, index=False)
+        
+        report = duplicate_report(ImageHashIndex.build(csv_path, images_dir), csv_path, images_dir)
+        assert report['image'].tolist() == ["photo-0.jpg", "photo-1.jpg"]
+        inputs = catalog_inputs(csv_path, images_dir, context_length=0)
+        assert [os.path.basename(image_path) for _, image_path, _ in inputs] == ["photo-0.jpg", "photo-1.jpg",
+                                                                                 "photo-2.jpg"]
+    
+    def test_prediction_memo(self):
+        """Test de la réutilisation d'une prédiction pour une image et une description identiques"""
+        from image_hashing import PredictionMemo, image_hashes
+        
+        memo = PredictionMemo(max_entries=4)
+        hashes = image_hashes(self.textured_image(1))
+        memo.add(hashes, "montre", {'predicted_category': 'Watches'})
+        assert memo.find(image_hashes(self.textured_image(1, (80, 60))), "montre") == {'predicted_category': 'Watches'}
+        assert memo.find(hashes, "autre description") is None
+        
+        for seed in range(10, 16):
+            memo.add(image_hashes(self.textured_image(seed)), "autre", {})
+        assert len(memo) <= 4
+
+class TestVisualSearch:
+    """Tests de la recherche de produits visuellement similaires"""
+    
+    @staticmethod
+    def clustered_features(size, dim, seed=0):
+        """Descripteurs normalisés groupés autour de quelques centres"""
+        import numpy as np
+        
+        rng = np.random.default_rng(seed)
+        centers = rng.random((20, dim), dtype=np.float32)
+        features = centers[rng.integers(0, 20, size)] + 0.1 * rng.standard_normal((size, dim), dtype=np.float32)
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+    
+    def test_exact_search_matches_full_sort(self):
+        """Test que le top-k par argpartition correspond à un tri complet"""
+        import numpy as np
+        from visual_search import VisualIndex, FEATURE_DIM
+        
+        features = self.clustered_features(500, FEATURE_DIM)
+        index = VisualIndex(np.arange(500).astype(str), features)
+        results = index.search(features[3], k=5, exclude='3')
+        
+        expected = [str(i) for i in np.argsort(-(features @ features[3]), kind='stable') if i != 3][:5]
+        assert [r['uniq_id'] for r in results] == expected
+        assert results[0]['similarity'] >= results[-1]['similarity']
+    
+    def test_coarse_index_recall(self):
+        """Test que l'index grossier retrouve les voisins exacts sur des données groupées"""
+        import numpy as np
+        from visual_search import VisualIndex, FEATURE_DIM
+        
+        features = self.clustered_features(2000, FEATURE_DIM, seed=1)
+        index = VisualIndex(np.arange(2000).astype(str), features)
+        exact = [{r['uniq_id'] for r in index.search(q, k=5)} for q in features[:20]]
+        index.build_coarse_index(n_clusters=20)
+        approx = [{r['uniq_id'] for r in index.search(q, k=5, nprobe=4)} for q in features[:20]]
+        
+        assert index.has_coarse_index
+        assert np.mean([len(a & e) / 5 for a, e in zip(approx, exact)]) >= 0.9
+    
+    def test_build_save_load(self, tiny_catalog, tmp_path):
+        """Test de la construction sur un petit catalogue et de la sauvegarde compacte"""
+        from visual_search import VisualIndex, image_features
+        from catalog import manifest_fingerprint
+        
+        csv_path, images_dir = tiny_catalog
+        for i in range(3):
+            TestImageHashing.textured_image(i).save(f"{images_dir}/{i:032x}.jpg")
+        index = VisualIndex.build(csv_path, images_dir)
+        assert len(index) == 3
+        
+        path = str(tmp_path / "features.npz")
+        index.save(path)
+        loaded = VisualIndex.load(path, expected_fingerprint=manifest_fingerprint(csv_path, images_dir))
+        assert loaded.features.dtype.name == 'float32'
+        assert VisualIndex.load(path, expected_fingerprint="périmé") is None
+        
+        query = image_features(f"{images_dir}/{1:032x}.jpg")
+        assert loaded.search(query, k=1)[0]['uniq_id'] == f"{1:032x}"
+
+class TestLocalClassifier:
+    """Tests du classifieur texte local de secours"""
+    
+    TEXTS = [
+        "Escort analog watch for men leather strap", "Sonata digital watch for women steel dial",
+        "Titan analog watch chronograph dial", "Baby blanket soft cotton for newborn",
+        "Baby bedding cotton blanket set", "Soft baby diaper pants for newborn",
+        "Non stick frying pan cookware", "Stainless steel kadhai cookware kitchen", "Ceramic coffee mug kitchen",
+    ]
+    LABELS = ["Watches"] * 3 + ["Baby Care"] * 3 + ["Kitchen & Dining"] * 3
+    
+    def test_predict_format(self):
+        """Test que la prédiction locale a le format de la réponse de l'API"""
+        from local_classifier import LocalClassifier
+        
+        model = LocalClassifier.fit(self.TEXTS, self.LABELS, min_df=1)
+        result = model.predict("leather strap analog watch")
+        assert result['success'] is True
+        assert result['source'] == 'local'
+        assert result['predicted_category'] == "Watches"
+        assert sum(score['score'] for score in result['scores']) == pytest.approx(1.0, abs=1e-5)
+        assert model.predict("cotton blanket for baby")['predicted_category'] == "Baby Care"
+    
+    def test_save_load(self, tmp_path):
+        """Test que le modèle rechargé prédit comme le modèle entraîné"""
+        from local_classifier import LocalClassifier
+        
+        model = LocalClassifier.fit(self.TEXTS, self.LABELS, min_df=1)
+        path = str(tmp_path / "model.npz")
+        model.save(path)
+        loaded = LocalClassifier.load(path)
+        assert loaded.classes == model.classes
+        assert loaded.predict("steel cookware pan")['predicted_category'] == "Kitchen & Dining"
+        assert LocalClassifier.load(str(tmp_path / "absent.npz")) is None
+
+class TestHedgedPrediction:
+    """Tests de la course entre l'API distante et le classifieur local"""
+    
+    LOCAL = {'success': True, 'predicted_category': 'Watches', 'source': 'local'}
+    REMOTE = {'success': True, 'predicted_category': 'Baby Care'}
+    
+    def test_fast_remote_wins(self):
+        """Test que la réponse de l'API est retournée si elle arrive avant le délai"""
+        from api_client import hedged_prediction
+        
+        result, pending = hedged_prediction(lambda: self.REMOTE, lambda: self.LOCAL, hedge_delay=1.0)
+        assert result == self.REMOTE
+        assert pending is None
+    
+    def test_slow_remote_falls_back_to_local(self):
+        """Test que le classifieur local répond si l'API dépasse le délai, l'appel continuant"""
+        import time
+        from api_client import hedged_prediction
+        
+        def slow_remote():
+            time.sleep(0.3)
+            return self.REMOTE
+        
+        result, pending = hedged_prediction(slow_remote, lambda: self.LOCAL, hedge_delay=0.05)
+        assert result['source'] == 'local'
+        assert result['fallback_reason'] == 'timeout'
+        assert pending.result(timeout=2) == self.REMOTE
+    
+    def test_remote_error_falls_back_to_local(self):
+        """Test qu'une erreur de l'API renvoie immédiatement la prédiction locale"""
+        from api_client import hedged_prediction
+        
+        result, pending = hedged_prediction(lambda: {'success': False, 'error': '503'}, lambda: self.LOCAL, hedge_delay=5)
+        assert result['source'] == 'local'
+        assert result['remote_error'] == '503'
+        assert pending is None
+    
+    @patch('requests.post')
+    def test_call_prediction_api_error(self, mock_post):
+        """Test que les erreurs réseau sont renvoyées dans le résultat"""
+        import io
+        import requests
+        from PIL import Image
+        from api_client import call_prediction_api
+        
+        mock_post.side_effect = requests.exceptions.ConnectTimeout("timeout")
+        image = io.BytesIO()
+        Image.new('RGBA', (50, 40)).save(image, format='PNG')
+        result = call_prediction_api("http://api.invalid", image, "montre")
+        assert result['success'] is False
+        assert 'timeout' in result['error']
+        assert mock_post.call_args.kwargs['files']['image'][1][:2] == b'\xff\xd8'  # JPEG 224x224
+
+class TestEndpointRouting:
+    """Tests du routage entre plusieurs points d'accès de l'API"""
+    
+    def test_parse_endpoints(self):
+        """Test de la configuration : liste, URL unique, environnement, valeurs par défaut"""
+        from api_client import parse_endpoints, DEFAULT_API_ENDPOINTS
+        
+        assert parse_endpoints({'base_urls': ["http://a/", "http://b", "http://a"]}) == ("http://a", "http://b")
+        assert parse_endpoints({'base_url': "http://a"}, environ={'API_BASE_URLS': "http://b"}) == ("http://a",)
+        assert parse_endpoints({}, environ={'API_BASE_URLS': "http://b, http://c"}) == ("http://b", "http://c")
+        assert parse_endpoints(None, environ={}) == DEFAULT_API_ENDPOINTS
+    
+    def test_router_prefers_fast_reliable_endpoint(self):
+        """Test que le point d'accès le plus rapide et le plus fiable est choisi en premier"""
+        from api_client import EndpointRouter
+        
+        router = EndpointRouter(["http://slow", "http://fast", "http://flaky"])
+        for _ in range(5):
+            router.record("http://slow", 0.2, ok=True)
+            router.record("http://fast", 0.1, ok=True)
+            router.record("http://flaky", 0.05, ok=True)
+        for _ in range(3):
+            router.record("http://flaky", 5.0, ok=False)
+        assert router.ranked() == ["http://fast", "http://slow", "http://flaky"]
+        assert router.hedge_delay("http://fast") == pytest.approx(0.1)
+    
+    def test_failover_on_error(self):
+        """Test qu'une erreur du premier point d'accès bascule aussitôt sur le suivant"""
+        from api_client import EndpointRouter, routed_request
+        
+        router = EndpointRouter(["http://down", "http://up"])
+        
+        def send(endpoint):
+            if endpoint == "http://down":
+                raise ConnectionError("refused")
+            return "ok"
+        
+        assert routed_request(router, send, hedge=False) == ("ok", "http://up")
+        assert router.ranked()[0] == "http://up"
+        with pytest.raises(ConnectionError):
+            routed_request(EndpointRouter(["http://down"]), send)
+    
+    def test_hedged_duplicate_wins_when_primary_is_slow(self):
+        """Test qu'une copie est envoyée au deuxième point d'accès quand le premier tarde"""
+        import time
+        from api_client import EndpointRouter, routed_request
+        
+        router = EndpointRouter(["http://slow", "http://fast"])
+        for _ in range(5):
+            router.record("http://slow", 0.01, ok=True)
+        router.record("http://fast", 0.02, ok=True)
+        calls = []
+        
+        def send(endpoint):
+            calls.append(endpoint)
+            time.sleep(1.0 if endpoint == "http://slow" else 0.0)
+            return endpoint
+        
+        start = time.perf_counter()
+        assert routed_request(router, send) == ("http://fast", "http://fast")
+        assert time.perf_counter() - start < 0.5
+        assert calls == ["http://slow", "http://fast"]
+    
+    def test_client_error_is_not_an_endpoint_failure(self):
+        """Test qu'une réponse 4xx n'est ni renvoyée à un autre point d'accès, ni comptée comme une panne"""
+        import requests
+        from api_client import EndpointRouter, routed_request
+        from api_health import CLOSED
+        
+        router = EndpointRouter(["http://a", "http://b"])
+        calls = []
+        
+        def send(endpoint):
+            calls.append(endpoint)
+            response = requests.Response()
+            response.status_code = 413
+            raise requests.HTTPError("413 Payload Too Large", response=response)
+        
+        for _ in range(5):
+            with pytest.raises(requests.HTTPError):
+                routed_request(router, send)
+        # Une seule requête par appel : ni nouvel essai, ni copie
+        assert len(calls) == 5
+        assert all(row['errors'] == 0 and row['state'] == CLOSED for row in router.snapshot())
+
+class TestCircuitBreaker:
+    """Tests du disjoncteur et de la sonde de santé de l'API"""
+    
+    def test_transitions(self):
+        """Test fermé -> ouvert -> semi-ouvert -> fermé, avec une horloge simulée"""
+        from api_health import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+        
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, success_threshold=2, clock=lambda: now[0])
+        for _ in range(3):
+            assert breaker.allow_request()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow_request()
+        
+        # Délai écoulé : une seule requête d'essai à la fois
+        now[0] = 31.0
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        
+        # Une sonde réussie ne remet pas à zéro les échecs des requêtes
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success(trial=False)
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        
+        # ni n'écourte le délai d'ouverture ; un échec en semi-ouvert rouvre le disjoncteur
+        breaker.record_success(trial=False)
+        assert breaker.state == OPEN
+        now[0] = 62.0
+        assert breaker.state == HALF_OPEN
+        breaker.record_failure()
+        assert breaker.state == OPEN
+    
+    def test_fast_fail_when_open(self):
+        """Test qu'un appel échoue immédiatement, sans requête, quand tous les disjoncteurs sont ouverts"""
+        import time
+        from api_client import EndpointRouter, routed_request
+        from api_health import CircuitOpenError
+        
+        router = EndpointRouter(["http://a", "http://b"])
+        for endpoint in router.endpoints:
+            for _ in range(3):
+                router.record_health(endpoint, ok=False)
+        assert not router.any_available()
+        calls = []
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            routed_request(router, calls.append)
+        assert time.perf_counter() - start < 0.01
+        assert calls == []
+    
+    def test_prober_against_local_server(self):
+        """Test de la sonde contre un serveur HTTP local dont /health tombe puis revient"""
+        import time
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from api_client import EndpointRouter
+        from api_health import HealthProber, CLOSED, OPEN, HALF_OPEN
+        
+        healthy = [True]
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200 if healthy[0] else 500)
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+            router = EndpointRouter([endpoint], reset_timeout=0.2)
+            prober = HealthProber(router, interval=60, timeout=2)
+            
+            healthy[0] = False
+            for _ in range(3):
+                prober.probe_all()
+            assert router.snapshot()[0]['state'] == OPEN
+            assert prober.status()[endpoint]['error'] == "HTTP 500"
+            
+            # Reprise progressive : ouvert jusqu'au délai, semi-ouvert, puis fermé après deux succès
+            healthy[0] = True
+            prober.probe_all()
+            assert router.snapshot()[0]['state'] == OPEN
+            time.sleep(0.25)
+            assert router.snapshot()[0]['state'] == HALF_OPEN
+            prober.probe_all()
+            prober.probe_all()
+            assert router.snapshot()[0]['state'] == CLOSED
+        finally:
+            server.shutdown()
+
+
+class TestImageIngest:
+    """Tests de l'ingestion bornée des images uploadées"""
+    
+    @staticmethod
+    def encoded(size, format='JPEG'):
+        """Image encodée en mémoire"""
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (120, 80, 40)).save(buffer, format)
+        buffer.seek(0)
+        return buffer
+    
+    def test_rejects_before_decoding(self):
+        """Test que les budgets d'octets et de pixels sont vérifiés sur l'en-tête"""
+        from image_ingest import open_image, ImageRejected
+        
+        with pytest.raises(ImageRejected):
+            open_image(self.encoded((64, 64)), max_bytes=10)
+        with pytest.raises(ImageRejected):
+            open_image(self.encoded((3000, 2000), 'PNG'), max_pixels=1_000_000)
+        with pytest.raises(ImageRejected):
+            # En-tête au-delà de ce que le mode draft peut ramener dans le budget
+            open_image(self.encoded((3000, 2000)), max_pixels=50_000, draft_size=(64, 64))
+        with pytest.raises(ImageRejected):
+            open_image(self.encoded((64, 64), 'GIF'))
+        image, original_size = open_image(self.encoded((3000, 2000), 'PNG'))
+        assert original_size == (3000, 2000)
+    
+    def test_jpeg_draft_decoding(self):
+        """Test qu'un grand JPEG est décodé réduit, dans le budget de pixels, sans consommer le fichier"""
+        from image_ingest import load_image
+        
+        source = self.encoded((4000, 3000))
+        # 12 Mpx à l'origine, mais le décodage draft au 1/2 (2000 x 1500) reste sous 4 Mpx
+        image, original_size = load_image(source, max_side=1024, max_pixels=4_000_000)
+        assert original_size == (4000, 3000)
+        assert max(image.size) == 1024
+        assert source.tell() == 0
+    
+    def test_prepare_image_bytes(self):
+        """Test de la préparation 224x224 depuis un fichier uploadé, sans getvalue()"""
+        import io
+        from PIL import Image
+        from api_client import prepare_image_bytes
+        
+        class Upload(io.BytesIO):
+            name = "produit.jpg"
+            
+            def getvalue(self):
+                raise AssertionError("copie inutile des octets")
+        
+        filename, image_bytes = prepare_image_bytes(Upload(self.encoded((2000, 1500)).read()))
+        assert filename == "produit.jpg"
+        assert Image.open(io.BytesIO(image_bytes)).size == (224, 224)
+
+
+class TestMultiImagePrediction:
+    """Tests des produits à plusieurs photos (requête groupée et agrégation des scores)"""
+    
+    RESULTS = [
+        {'success': True, 'predicted_category': 'Watches', 'confidence': 0.9,
+         'scores': [{'category': 'Watches', 'score': 0.9}, {'category': 'Jewellery', 'score': 0.1}]},
+        {'success': True, 'predicted_category': 'Jewellery', 'confidence': 0.6,
+         'scores': [{'category': 'Jewellery', 'score': 0.6}, {'category': 'Watches', 'score': 0.4}]},
+    ]
+    
+    def test_aggregation_strategies(self):
+        """Test des agrégations moyenne, maximum et pondérée par la confiance"""
+        from api_client import aggregate_predictions
+        
+        mean = aggregate_predictions(self.RESULTS, 'mean')
+        assert mean['predicted_category'] == 'Watches'
+        assert mean['confidence'] == pytest.approx(0.65)
+        assert mean['image_count'] == 2
+        
+        maximum = aggregate_predictions(self.RESULTS, 'max')
+        assert {entry['category']: entry['score'] for entry in maximum['scores']} == \
+            pytest.approx({'Watches': 0.9, 'Jewellery': 0.6})
+        
+        weighted = aggregate_predictions(self.RESULTS, 'confidence')
+        assert weighted['confidence'] == pytest.approx((0.9 * 0.9 + 0.6 * 0.4) / 1.5)
+        
+        assert not aggregate_predictions([{'success': False}])['success']
+        with pytest.raises(ValueError):
+            aggregate_predictions(self.RESULTS, 'median')
+    
+    @staticmethod
+    def serve(routes):
+        """Serveur HTTP local : routes = {chemin: fonction(parties multipart) -> (statut, corps JSON)}"""
+        import json
+        import threading
+        from email.parser import BytesParser
+        from email.policy import HTTP
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        requests_seen = []
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+                parts = [(part.get_param('name', header='content-disposition'), part.get_content())
+                         for part in message.iter_parts()]
+                requests_seen.append((self.path, parts))
+                status, payload = routes[self.path](parts) if self.path in routes else (404, {})
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    
+    def test_single_batched_request(self):
+        """Test que toutes les photos partent dans une seule requête avec une description partagée"""
+        from api_client import EndpointRouter, routed_multi_prediction
+        
+        def predict_multi(parts):
+            images = [content for name, content in parts if name == 'images']
+            return 200, {'success': True, 'results': self.RESULTS[:len(images)]}
+        
+        server, endpoint, seen = self.serve({'/predict_multi': predict_multi})
+        try:
+            images = [("a.jpg", b"\xff\xd8a"), ("b.jpg", b"\xff\xd8b")]
+            result = routed_multi_prediction(EndpointRouter([endpoint]), images, "montre acier", 'mean')
+        finally:
+            server.shutdown()
+        assert result['success'] and result['predicted_category'] == 'Watches'
+        assert result['endpoint'] == endpoint
+        assert len(seen) == 1
+        names = [name for name, _ in seen[0][1]]
+        assert names.count('images') == 2 and names.count('text_description') == 1
+    
+    def test_fallback_to_single_predictions(self):
+        """Test du repli sur /predict (une requête par photo) si l'API n'a pas de route multi-images"""
+        from api_client import EndpointRouter, routed_multi_prediction
+        
+        results = iter(self.RESULTS)
+        server, endpoint, seen = self.serve({'/predict': lambda parts: (200, next(results))})
+        try:
+            images = [("a.jpg", b"\xff\xd8a"), ("b.jpg", b"\xff\xd8b")]
+            result = routed_multi_prediction(EndpointRouter([endpoint]), images, "montre", 'max')
+        finally:
+            server.shutdown()
+        assert result['image_count'] == 2 and result['aggregation'] == 'max'
+        assert [path for path, _ in seen] == ['/predict_multi', '/predict', '/predict']
+
+
+class TestBatchPrediction:
+    """Tests du client /predict_batch et de son repli unitaire"""
+    
+    ITEMS = [((f"{i}.jpg", f"image-{i}".encode()), f"produit {i}") for i in range(5)]
+    
+    def test_batches_preserve_order(self):
+        """Test du découpage en lots de taille bornée et de l'ordre des résultats"""
+        from api_client import EndpointRouter, predict_batch
+        
+        def predict_batch_route(parts):
+            texts = [content for name, content in parts if name == 'text_descriptions']
+            return 200, {'results': [{'success': True, 'predicted_category': text} for text in texts]}
+        
+        server, endpoint, seen = TestMultiImagePrediction.serve({'/predict_batch': predict_batch_route})
+        try:
+            results = predict_batch(EndpointRouter([endpoint]), self.ITEMS, batch_size=2)
+        finally:
+            server.shutdown()
+        assert [result['predicted_category'] for result in results] == [text for _, text in self.ITEMS]
+        assert [len([name for name, _ in parts if name == 'images']) for _, parts in seen] == [2, 2, 1]
+    
+    def test_fallback_to_concurrent_single_calls(self):
+        """Test du repli sur des appels /predict simultanés, remis dans l'ordre des entrées"""
+        import random
+        import time
+        from api_client import EndpointRouter, predict_batch
+        
+        def predict(parts):
+            time.sleep(random.uniform(0, 0.05))
+            image = next(content for name, content in parts if name == 'image')
+            return 200, {'success': True, 'predicted_category': image.decode()}
+        
+        server, endpoint, seen = TestMultiImagePrediction.serve({'/predict': predict})
+        try:
+            results = predict_batch(EndpointRouter([endpoint]), self.ITEMS, batch_size=2)
+        finally:
+            server.shutdown()
+        assert [result['predicted_category'] for result in results] == [f"image-{i}" for i in range(5)]
+        # La route de lot n'est demandée qu'une fois
+        assert [path for path, _ in seen].count('/predict_batch') == 1
+    
+    def test_batches_rerouted_while_route_missing(self):
+        """Test qu'un point d'accès sans /predict_batch est évité puis re-sondé après reset_timeout"""
+        import time
+        from api_client import EndpointRouter, predict_batch
+        
+        def predict_batch_route(parts):
+            texts = [content for name, content in parts if name == 'text_descriptions']
+            return 200, {'results': [{'success': True, 'predicted_category': text} for text in texts]}
+        
+        old_server, old_endpoint, old_seen = TestMultiImagePrediction.serve({})
+        server, endpoint, seen = TestMultiImagePrediction.serve({'/predict_batch': predict_batch_route})
+        router = EndpointRouter([old_endpoint, endpoint], reset_timeout=1.0)
+        try:
+            results = predict_batch(router, self.ITEMS, batch_size=2)
+        finally:
+            old_server.shutdown()
+            server.shutdown()
+        assert [result['predicted_category'] for result in results] == [text for _, text in self.ITEMS]
+        # Aucun repli unitaire : tous les lots passent par le point d'accès qui gère la route
+        assert [path for path, _ in old_seen] == ['/predict_batch']
+        assert [path for path, _ in seen] == ['/predict_batch'] * 3
+        assert router.batch_endpoints() == [endpoint]
+        time.sleep(1.05)
+        assert router.batch_endpoints() == [old_endpoint, endpoint]
+    
+    def test_images_prepared_batch_by_batch(self):
+        """Test de la préparation par lots : au plus deux lots d'images préparées avant chaque envoi"""
+        from api_client import EndpointRouter, predict_batch
+        from worker_pool import WorkerPool, use_worker_pool
+        
+        pool = use_worker_pool(WorkerPool(workers=2, max_pending=50))
+        submitted = []
+        
+        def predict_batch_route(parts):
+            metrics = pool.metrics()
+            bulk = metrics['priorities']['bulk']
+            submitted.append(bulk['queued'] + bulk['completed'] + metrics['running'])
+            texts = [content for name, content in parts if name == 'text_descriptions']
+            return 200, {'results': [{'success': True, 'predicted_category': text} for text in texts]}
+        
+        items = [((f"{i}.jpg", f"image-{i}".encode()), f"produit {i}") for i in range(10)]
+        server, endpoint, seen = TestMultiImagePrediction.serve({'/predict_batch': predict_batch_route})
+        try:
+            results = predict_batch(EndpointRouter([endpoint]), items, batch_size=2)
+        finally:
+            server.shutdown()
+            use_worker_pool(None)
+            pool.stop()
+        assert [result['predicted_category'] for result in results] == [text for _, text in items]
+        assert submitted == [4, 6, 8, 10, 10]
+    
+    def test_saturated_pool_prepares_inline(self):
+        """Test qu'un pool saturé ralentit le lot sans faire échouer de paire"""
+        from api_client import EndpointRouter, predict_batch
+        from worker_pool import PoolSaturated, WorkerPool, use_worker_pool
+        
+        def predict_batch_route(parts):
+            texts = [content for name, content in parts if name == 'text_descriptions']
+            return 200, {'results': [{'success': True, 'predicted_category': text} for text in texts]}
+        
+        pool = use_worker_pool(WorkerPool(workers=1))
+        server, endpoint, seen = TestMultiImagePrediction.serve({'/predict_batch': predict_batch_route})
+        try:
+            with patch.object(pool, 'submit', side_effect=PoolSaturated("File pleine")) as submit:
+                results = predict_batch(EndpointRouter([endpoint]), self.ITEMS, batch_size=2)
+        finally:
+            server.shutdown()
+            use_worker_pool(None)
+            pool.stop()
+        assert [result['predicted_category'] for result in results] == [text for _, text in self.ITEMS]
+        assert submit.call_count == 3
+
+
+class TestPredictionHistory:
+    """Tests de l'historique persistant des prédictions"""
+    
+    @staticmethod
+    def result(category, confidence):
+        return {'success': True, 'predicted_category': category, 'confidence': confidence,
+                'scores': [{'category': category, 'score': confidence}], 'keywords': ['acier'],
+                'inference_time': 0.1}
+    
+    def test_record_and_queries(self, tmp_path):
+        """Test des requêtes récentes, par produit et à confiance faible"""
+        from prediction_history import PredictionHistory
+        
+        history = PredictionHistory(str(tmp_path / "history.db"))
+        history.record(self.result('Watches', 0.9), "Montre", "Escort", "montre acier",
+                       hashes=(1, 2), session_id="s1", total_time=0.3)
+        history.record(self.result('Jewellery', 0.3), "Bague", "Zaveri", session_id="s2")
+        history.record(self.result('Watches', 0.8), " montre ", "ESCORT", session_id="s1")
+        history.flush()
+        
+        assert history.count() == 3
+        assert [entry['confidence'] for entry in history.recent(session_id="s1")] == [0.8, 0.9]
+        assert len(history.by_product("Montre", "Escort")) == 2
+        low = history.low_confidence(threshold=0.5)
+        assert [entry['product_name'] for entry in low] == ["Bague"]
+        assert low[0]['result']['keywords'] == ['acier']
+        assert history.recent(limit=1)[0]['scores'][0]['category'] == 'Watches'
+    
+    def test_queries_scoped_to_session(self, tmp_path):
+        """Test que les vues et l'export d'une session n'exposent pas les autres sessions"""
+        from prediction_history import PredictionHistory
+        
+        history = PredictionHistory(str(tmp_path / "history.db"))
+        history.record(self.result('Watches', 0.3), "Montre", "Escort", session_id="s1")
+        history.record(self.result('Watches', 0.2), "Montre", "Escort", session_id="s2")
+        history.record(self.result('Jewellery', 0.4), "Bague", session_id="s2")
+        history.flush()
+        
+        assert [entry['session_id'] for entry in history.by_product("Montre", "Escort", session_id="s1")] == ["s1"]
+        assert [entry['product_name'] for entry in history.low_confidence(session_id="s2")] == ["Montre", "Bague"]
+        assert len(history.low_confidence()) == 3
+        exported = list(history.iter_frames(chunk_rows=1, session_id="s2"))
+        assert [frame['session_id'].tolist() for frame in exported] == [["s2"], ["s2"]]
+        assert sum(len(frame) for frame in history.iter_frames()) == 3
+    
+    def test_persistence_and_indexes(self, tmp_path):
+        """Test que l'historique survit à la réouverture et que les requêtes utilisent les index"""
+        from prediction_history import PredictionHistory
+        
+        path = str(tmp_path / "history.db")
+        first = PredictionHistory(path)
+        first.record(self.result('Watches', 0.9), "Montre")
+        first.flush()
+        reopened = PredictionHistory(path)
+        assert reopened.count() == 1
+        plan = " ".join(str(row[-1]) for row in reopened._reader().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM predictions WHERE product_key = ? ORDER BY created_at DESC", ("x",)))
+        assert "idx_predictions_product" in plan
+        assert reopened._reader().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    def test_record_does_not_block(self, tmp_path):
+        """Test que l'enregistrement rend la main sans attendre le disque"""
+        import time
+        from prediction_history import PredictionHistory
+        
+        history = PredictionHistory(str(tmp_path / "history.db"))
+        start = time.perf_counter()
+        for i in range(200):
+            history.record(self.result('Watches', 0.9), f"Produit {i}")
+        assert time.perf_counter() - start < 0.5
+        history.flush()
+        assert history.count() == 200
+
+
+class TestExport:
+    """Tests de l'export par morceaux"""
+    
+    @staticmethod
+    def chunks(rows, chunk_rows):
+        import numpy as np
+        import pandas as pd
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            yield pd.DataFrame({'id': np.arange(start, start + count), 'category': ['Watches'] * count,
+                                'score': np.linspace(0, 1, count)})
+    
+    @pytest.mark.parametrize("fmt,compress", [('csv', False), ('csv', True), ('jsonl', True), ('parquet', False)])
+    def test_round_trip(self, fmt, compress):
+        """Test que chaque format relu redonne toutes les lignes, dans l'ordre"""
+        import pandas as pd
+        from export import export_to_tempfile, parquet_available
+        
+        if fmt == 'parquet' and not parquet_available():
+            pytest.skip("pyarrow non installé")
+        output = export_to_tempfile(self.chunks(2500, 1000), fmt, compress)
+        compression = 'gzip' if compress else None
+        if fmt == 'csv':
+            back = pd.read_csv(output, compression=compression)
+        elif fmt == 'jsonl':
+            back = pd.read_json(output, lines=True, compression=compression)
+        else:
+            back = pd.read_parquet(output)
+        assert back['id'].tolist() == list(range(2500))
+        assert list(back.columns) == ['id', 'category', 'score']
+    
+    def test_deferred_and_bounded_memory(self):
+        """Test que l'export n'est produit qu'à l'appel et que la mémoire reste de l'ordre d'un morceau"""
+        import tracemalloc
+        import pandas as pd
+        from export import deferred_export
+        
+        calls = []
+        
+        def make_chunks():
+            calls.append(1)
+            return self.chunks(200_000, 5_000)
+        
+        export = deferred_export(make_chunks, 'jsonl', compress=True)
+        assert calls == []
+        tracemalloc.start()
+        output = export()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert calls == [1]
+        # La table complète sérialisée en JSON occupe plus de 10 Mo
+        assert peak < 5 * 1024 * 1024
+        assert len(pd.read_json(output, lines=True, compression='gzip')) == 200_000
+    
+    def test_deferred_export_accepted_by_download_button(self):
+        """Test que le résultat de la fonction différée est un type accepté par st.download_button"""
+        import gzip
+        from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+        from export import deferred_export
+        
+        export = deferred_export(lambda: self.chunks(3000, 1000), 'csv', compress=True)
+        data, _ = convert_data_to_bytes_and_infer_mime(export(), unsupported_error=TypeError("type refusé"))
+        lines = gzip.decompress(data).decode('utf-8').splitlines()
+        assert lines[0] == 'id,category,score'
+        assert len(lines) == 3001
+    
+    def test_history_frames(self, tmp_path):
+        """Test de la lecture paginée de l'historique des prédictions"""
+        import pandas as pd
+        from prediction_history import PredictionHistory
+        
+        history = PredictionHistory(str(tmp_path / "history.db"))
+        for i in range(25):
+            history.record({'success': True, 'predicted_category': 'Watches', 'confidence': 0.9}, f"Produit {i}")
+        history.flush()
+        frames = list(history.iter_frames(chunk_rows=10))
+        assert [len(frame) for frame in frames] == [10, 10, 5]
+        assert pd.concat(frames)['product_name'].tolist() == [f"Produit {i}" for i in range(25)]
+
+
+class TestCatalogPredictions:
+    """Tests de la table pré-calculée des prédictions du catalogue"""
+    
+    RESULTS = [
+        {'success': True, 'scores': [{'category': 'Watches', 'score': 0.8}, {'category': 'Baby Care', 'score': 0.2}]},
+        {'success': False, 'error': 'timeout'},
+        {'success': True, 'scores': [{'category': 'Baby Care', 'score': 0.7}], 'model_version': 'clip-v2'},
+    ]
+    
+    def test_lookup_and_edited_description(self, tmp_path):
+        """Test de la recherche par uniq_id, invalidée par une description modifiée"""
+        from catalog_predictions import PredictionTable
+        
+        table = PredictionTable.from_results(['a', 'b', 'c'], ["montre", "bague", "bavoir"], self.RESULTS)
+        assert len(table) == 2 and table.model_version == 'clip-v2'
+        result = table.lookup('a', "montre")
+        assert result['predicted_category'] == 'Watches' and result['source'] == 'precomputed'
+        assert result['confidence'] == pytest.approx(0.8, abs=1e-3)
+        assert table.lookup('a') is not None
+        assert table.lookup('a', "montre modifiée") is None
+        assert table.lookup('b', "bague") is None
+        
+        path = str(tmp_path / "predictions.npz")
+        table.fingerprint = "v1"
+        table.save(path)
+        assert PredictionTable.load(path, expected_fingerprint="v1").lookup('c', "bavoir")['predicted_category'] == 'Baby Care'
+        assert PredictionTable.load(path, expected_fingerprint="v2") is None
+    
+    def test_build_through_batch_api(self, tmp_path):
+        """Test de la construction par lots contre un serveur /predict_batch local"""
+        from api_client import EndpointRouter
+        from catalog_predictions import build_table, catalog_inputs
+        
+        def predict_batch_route(parts):
+            texts = [content for name, content in parts if name == 'text_descriptions']
+            return 200, {'results': [{'success': True, 'scores': [{'category': 'Watches', 'score': 0.9}]}
+                                     for _ in texts]}
+        
+        server, endpoint, seen = TestMultiImagePrediction.serve({'/predict_batch': predict_batch_route})
+        try:
+            table, failures = build_table(EndpointRouter([endpoint]), batch_size=2, limit=3)
+        finally:
+            server.shutdown()
+        assert len(table) == 3 and failures == 0
+        assert len(seen) == 2
+        uniq_id, _, description = catalog_inputs()[0]
+        assert table.lookup(uniq_id, description)['predicted_category'] == 'Watches'
+
+
+class TestImageDerivatives:
+    """Tests des dérivés d'affichage des images"""
+    
+    def test_encode_at_display_width(self):
+        """Test de la réduction à la largeur d'affichage, sans agrandissement, JPEG ou PNG selon la transparence"""
+        import io
+        from PIL import Image
+        from image_derivatives import encode_derivative
+        
+        data, fmt = encode_derivative(Image.new('RGB', (751, 1024), (120, 80, 40)), 400)
+        with Image.open(io.BytesIO(data)) as image:
+            assert fmt == 'JPEG' and image.format == 'JPEG' and image.size == (400, 545)
+        data, fmt = encode_derivative(Image.new('RGB', (100, 80)), 400, fmt='WEBP')
+        with Image.open(io.BytesIO(data)) as image:
+            assert fmt == 'WEBP' and image.size == (100, 80)
+        assert encode_derivative(Image.new('RGBA', (300, 300)), 120)[1] == 'PNG'
+    
+    def test_catalog_derivative_cached_per_file_and_width(self, tmp_path):
+        """Test que le dérivé d'un fichier est réduit, mis en cache et invalidé par une modification"""
+        import io
+        from PIL import Image
+        from image_derivatives import display_image
+        
+        path = str(tmp_path / "product.jpg")
+        Image.new('RGB', (2000, 1500), (10, 200, 30)).save(path, quality=95)
+        thumbnail = display_image(path, 200)
+        assert len(thumbnail) < os.path.getsize(path)
+        with Image.open(io.BytesIO(thumbnail)) as image:
+            assert image.size == (200, 150)
+        with patch('image_derivatives.file_derivative') as file_derivative:
+            assert display_image(path, 200) == thumbnail
+        file_derivative.assert_not_called()
+        
+        Image.new('RGB', (1000, 1000)).save(path)
+        with Image.open(io.BytesIO(display_image(path, 200))) as image:
+            assert image.size == (200, 200)
+        assert display_image(str(tmp_path / "absent.jpg"), 200) == str(tmp_path / "absent.jpg")
+
+
+class TestEdaEngine:
+    """Tests du moteur EDA par morceaux"""
+    
+    def test_chunked_matches_memory_engine(self, tiny_catalog):
+        """Test que les agrégats par morceaux sont identiques aux agrégats en mémoire"""
+        import json
+        from eda_engine import compute_aggregates
+        
+        csv_path, images_dir = tiny_catalog
+        expected = compute_aggregates('memory', csv_path, images_dir)
+        for chunk_rows in (1, 2, 100):
+            aggregates = compute_aggregates('chunked', csv_path, images_dir, chunk_rows=chunk_rows, workers=2)
+            assert json.dumps(aggregates, sort_keys=True) == json.dumps(expected, sort_keys=True)
+    
+    def test_chunked_matches_on_bundled_catalog(self):
+        """Test de l'identité des agrégats sur le catalogue fourni"""
+        import json
+        from catalog import CATALOG_CSV_PATH
+        from eda_engine import compute_aggregates
+        
+        if not os.path.exists(CATALOG_CSV_PATH):
+            pytest.skip("Dataset non disponible")
+        expected = compute_aggregates('memory')
+        aggregates = compute_aggregates('chunked', chunk_rows=100)
+        for name in expected:
+            assert json.dumps(aggregates[name], sort_keys=True) == json.dumps(expected[name], sort_keys=True), name
+        
+        with pytest.raises(ValueError):
+            compute_aggregates('duckdb')
+    
+    def test_chunked_state_is_bounded(self):
+        """Test que l'état reste borné au-delà des limites, avec des agrégats exacts ou estimés"""
+        import numpy as np
+        from catalog import CATALOG_CSV_PATH, iter_catalog_chunks
+        from eda_engine import ChunkedAggregates, compute_aggregates, scan_chunk
+        
+        if not os.path.exists(CATALOG_CSV_PATH):
+            pytest.skip("Dataset non disponible")
+        expected = compute_aggregates('memory')
+        aggregates = ChunkedAggregates(sample_rows=200, sketch_size=64)
+        for chunk in iter_catalog_chunks(chunk_rows=100):
+            aggregates.add(scan_chunk(chunk))
+            assert len(aggregates.sample) <= 200 and aggregates.invalid_rows <= 200
+            assert all(len(sketch.kmv) <= 64 and len(sketch.hashes) <= 64 for sketch in aggregates.distinct.values())
+        result = aggregates.finalize(chunk_rows=100)
+        
+        for name in ('overview', 'missing_values', 'category_counts'):
+            assert result[name] == expected[name], name
+        assert ([sample['valid_count'] for sample in result['image_samples']]
+                == [sample['valid_count'] for sample in expected['image_samples']])
+        assert result['image_statistics']['valid_count'] == expected['image_statistics']['valid_count']
+        assert len(result['image_statistics']['points']['image_pixels']) <= 200
+        
+        # Moments exacts, nombre de valeurs distinctes estimé (esquisse KMV)
+        numerical, reference = (np.array(table['data'], dtype=float) for table in
+                                (result['describe_tables']['numerical'], expected['describe_tables']['numerical']))
+        rows = [expected['describe_tables']['numerical']['index'].index(stat)
+                for stat in ('count', 'mean', 'std', 'min', 'max')]
+        assert np.allclose(numerical[rows], reference[rows], rtol=1e-5)
+        categorical = result['describe_tables']['categorical']
+        unique = categorical['data'][categorical['index'].index('unique')][categorical['columns'].index('uniq_id')]
+        assert abs(unique - expected['overview']['row_count']) / expected['overview']['row_count'] < 0.3
+
+
+class TestSyntheticCatalog:
+    """Tests du générateur de catalogues synthétiques"""
+    
+    def test_ruby_specifications_round_trip(self):
+        """Test de la réécriture des spécifications au format Ruby"""
+        from synthetic_catalog import parse_specifications, format_specifications
+        
+        specifications = '{"product_specification"=>[{"key"=>"Brand", "value"=>"Escort"}, {"value"=>"Pack of 2"}]}'
+        entries = parse_specifications(specifications)
+        assert entries == [{'key': 'Brand', 'value': 'Escort'}, {'value': 'Pack of 2'}]
+        assert format_specifications(entries) == specifications
+        assert parse_specifications('{"product_specification"=>{"key"=>"Type", "value"=>"Flat"}}') == [
+            {'key': 'Type', 'value': 'Flat'}]
+        assert parse_specifications(float('nan')) == []
+    
+    def test_generated_catalog_matches_schema(self, tiny_catalog, tmp_path):
+        """Test qu'un catalogue généré conserve le schéma, les catégories et des images lisibles"""
+        import pandas as pd
+        from catalog import load_catalog
+        from synthetic_catalog import generate_catalog
+        
+        csv_path, images_dir = tiny_catalog
+        output_dir = str(tmp_path / "synthetic")
+        out_csv, out_images, rows = generate_catalog(output_dir, rows=40, source_csv=csv_path,
+                                                     source_images=images_dir, image_size=(64, 48), image_pool=4)
+        source = pd.read_csv(csv_path)
+        generated = pd.read_csv(out_csv)
+        assert rows == 40 and len(generated) == 40
+        assert list(generated.columns) == list(source.columns)
+        assert generated['uniq_id'].is_unique
+        assert set(generated['product_category_tree']) <= set(source['product_category_tree'])
+        
+        df = load_catalog(out_csv, out_images)
+        synthetic = df.iloc[len(source):]
+        assert synthetic['image_exists'].all()
+        assert (synthetic['image_pixels'] == 64 * 48).all()
+
+
+class TestCatalogWatcher:
+    """Tests du rafraîchissement incrémental du catalogue"""
+    
+    def test_incremental_refresh_matches_full_load(self, tiny_catalog):
+        """Test qu'après ajout, modification et suppression la version publiée égale un chargement complet"""
+        import pandas as pd
+        from PIL import Image
+        from catalog import CONSUMER_COLUMNS, load_catalog
+        from catalog_watcher import IncrementalCatalog
+        from eda_snapshot import AGGREGATES
+        
+        csv_path, images_dir = tiny_catalog
+        live = IncrementalCatalog(str(csv_path), str(images_dir))
+        assert live.current().number == 0
+        assert live.refresh() is live.current()
+        
+        source = pd.read_csv(csv_path, dtype={'uniq_id': str})
+        source.loc[1, 'product_category_tree'] = '["Home Furnishing >> Curtains"]'
+        source.loc[4] = dict(source.loc[0], uniq_id=f"{4:032x}", image=f"{4:032x}.jpg")
+        Image.new('RGB', (60, 30)).save(os.path.join(images_dir, f"{4:032x}.jpg"))
+        source.to_csv(csv_path, index=False)
+        version = live.refresh()
+        assert version.number == 1 and version.derived_rows == 2
+        pd.testing.assert_frame_equal(version.catalog, load_catalog(csv_path, images_dir, CONSUMER_COLUMNS['eda']))
+        
+        # Image supprimée, image modifiée, ligne supprimée
+        os.remove(os.path.join(images_dir, f"{0:032x}.jpg"))
+        Image.new('RGB', (10, 10)).save(os.path.join(images_dir, f"{2:032x}.jpg"))
+        source.drop(index=3).to_csv(csv_path, index=False)
+        version = live.refresh()
+        assert version.derived_rows == 2
+        pd.testing.assert_frame_equal(version.catalog, load_catalog(csv_path, images_dir, CONSUMER_COLUMNS['eda']))
+        # Agrégats sur toutes les colonnes calculés avant élagage
+        full = load_catalog(csv_path, images_dir)
+        assert 'description' not in version.catalog.columns
+        for name in ('overview', 'missing_values', 'describe_tables'):
+            assert version.aggregates[name] == AGGREGATES[name](full)
+    
+    def test_only_changed_rows_are_derived(self, tiny_catalog, monkeypatch):
+        """Test que seules les lignes modifiées relisent leur image"""
+        import pandas as pd
+        import catalog
+        from catalog_watcher import IncrementalCatalog
+        
+        csv_path, images_dir = tiny_catalog
+        live = IncrementalCatalog(str(csv_path), str(images_dir))
+        opened = []
+        original = catalog.get_image_size
+        monkeypatch.setattr(catalog, 'get_image_size', lambda path: opened.append(path) or original(path))
+        
+        source = pd.read_csv(csv_path, dtype={'uniq_id': str})
+        source.loc[2, 'description'] = "Nouvelle description"
+        source.loc[0, 'image'] = source.loc[1, 'image']
+        source.to_csv(csv_path, index=False)
+        version = live.refresh()
+        assert version.derived_rows == 1
+        assert opened == [os.path.join(str(images_dir), source.loc[1, 'image'])]
+        assert version.aggregates['overview']['row_count'] == 4
+        assert 'description' in version.aggregates['missing_values']['index']
+    
+    def test_background_watcher_publishes_new_version(self, tiny_catalog):
+        """Test que la surveillance publie une nouvelle version sans appel explicite"""
+        import time
+        import pandas as pd
+        from catalog_watcher import IncrementalCatalog
+        
+        csv_path, images_dir = tiny_catalog
+        live = IncrementalCatalog(str(csv_path), str(images_dir), poll_interval=0.05).start()
+        try:
+            pd.read_csv(csv_path, dtype={'uniq_id': str}).head(2).to_csv(csv_path, index=False)
+            deadline = time.time() + 10
+            while live.current().number == 0 and time.time() < deadline:
+                time.sleep(0.05)
+            assert len(live.current().catalog) == 2
+        finally:
+            live.stop()
+
+
+class TestSharedCache:
+    """Tests du cache partagé entre réplicas"""
+    
+    @staticmethod
+    def serve_resp():
+        """Serveur local parlant le protocole Redis (GET, SET, DEL, SELECT), pour les tests"""
+        import socketserver
+        import threading
+        
+        store = {}
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def read_command(self):
+                header = self.rfile.readline()
+                if not header:
+                    return None
+                arguments = []
+                for _ in range(int(header[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    arguments.append(self.rfile.read(length + 2)[:-2])
+                return arguments
+        
+            def handle(self):
+                while True:
+                    command = self.read_command()
+                    if command is None:
+                        return
+                    name = command[0].upper()
+                    if name == b'GET':
+                        value = store.get(command[1])
+                        self.wfile.write(b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value))
+                    elif name == b'SET':
+                        store[command[1]] = command[2]
+                        self.wfile.write(b'+OK\r\n')
+                    elif name == b'DEL':
+                        self.wfile.write(b':%d\r\n' % int(store.pop(command[1], None) is not None))
+                    elif name == b'SELECT':
+                        self.wfile.write(b'+OK\r\n')
+                    else:
+                        self.wfile.write(b'-ERR unknown command\r\n')
+        
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, store
+    
+    def test_serialization_round_trip(self):
+        """Test de la sérialisation compacte (compressée si c'est plus petit)"""
+        import pandas as pd
+        from shared_cache import dumps, loads
+        
+        frame = pd.DataFrame({'category': ['Watches'] * 1000, 'count': range(1000)})
+        payload = dumps(frame)
+        assert payload[:1] == b'Z'
+        pd.testing.assert_frame_equal(loads(payload), frame)
+        assert loads(dumps(b'\x00')) == b'\x00'
+    
+    def test_disk_cache_shared_between_replicas(self, tmp_path):
+        """Test que deux réplicas partagent les résultats via le répertoire commun"""
+        from shared_cache import DiskCache, SharedCache, shared_memoize, use_shared_cache, current_shared_cache
+        
+        calls = []
+        
+        @shared_memoize(name='square')
+        def square(x, _ignored=None):
+            calls.append(x)
+            return x * x
+        
+        previous = current_shared_cache()
+        replica_a = SharedCache(DiskCache(str(tmp_path / "cache")), "secret")
+        replica_b = SharedCache(DiskCache(str(tmp_path / "cache")), "secret")
+        try:
+            use_shared_cache(replica_a)
+            assert square(3, _ignored=object()) == 9
+            use_shared_cache(replica_b)
+            assert square(3) == 9
+            assert square(4) == 16
+        finally:
+            use_shared_cache(previous)
+        assert calls == [3, 4]
+        assert replica_a.stats.snapshot()['square']['misses'] == 1
+        assert replica_b.stats.snapshot()['square'] == {'hits': 1, 'misses': 1, 'errors': 0, 'hit_rate': 0.5}
+        # Écritures atomiques : aucun fichier temporaire ne reste
+        assert not [name for _, _, files in os.walk(tmp_path / "cache") for name in files if name.startswith('.tmp-')]
+    
+    def test_unsigned_entries_are_never_loaded(self, tmp_path):
+        """Test que les entrées non signées ou signées avec un autre secret sont ignorées sans être lues"""
+        import pickle
+        from shared_cache import DiskCache, SharedCache, dumps, sign, get_shared_cache
+        
+        class Payload:
+            loaded = []
+            
+            def __reduce__(self):
+                return (Payload.loaded.append, (True,))
+        
+        backend = DiskCache(str(tmp_path / "cache"))
+        cache = SharedCache(backend, "secret")
+        key = "a" * 40
+        # Entrée écrite sans signature par un tiers, puis entrée signée avec un autre secret
+        for entry in (b'P' + pickle.dumps(Payload()), sign("autre", key, dumps(Payload()))):
+            backend.set(key, entry)
+            assert cache.lookup('f', key) == (False, None)
+        assert Payload.loaded == []
+        assert cache.stats.snapshot()['f']['errors'] == 2
+        cache.store('f', key, {'ok': 1})
+        assert cache.lookup('f', key) == (True, {'ok': 1})
+        # Sans secret, le stockage partagé n'est pas utilisé
+        unsigned = get_shared_cache.__wrapped__('disk', str(tmp_path / "cache"))
+        assert unsigned.backend is None and unsigned.warning
+        with pytest.raises(ValueError):
+            SharedCache(backend)
+    
+    def test_configure_from_environment(self, tmp_path, monkeypatch):
+        """Test de la configuration commune aux pages, sans section [cache] dans les secrets"""
+        from shared_cache import DiskCache, SharedCache, configure_from_secrets, current_shared_cache, use_shared_cache
+        
+        monkeypatch.setenv("SHARED_CACHE_BACKEND", "disk")
+        monkeypatch.setenv("SHARED_CACHE_DIR", str(tmp_path / "cache"))
+        monkeypatch.setenv("SHARED_CACHE_SECRET", "secret")
+        try:
+            cache = configure_from_secrets()
+            assert current_shared_cache() is cache and isinstance(cache.backend, DiskCache)
+            monkeypatch.setenv("SHARED_CACHE_BACKEND", "memcached")
+            assert configure_from_secrets().backend is None
+        finally:
+            use_shared_cache(SharedCache())
+    
+    def test_disk_cache_eviction(self, tmp_path):
+        """Test que l'éviction retire les entrées les moins récemment lues"""
+        import time
+        from shared_cache import DiskCache
+        
+        cache = DiskCache(str(tmp_path / "cache"), max_bytes=10_000)
+        for i in range(5):
+            cache.set(f"{i:040x}", b'x' * 900)
+            time.sleep(0.01)
+        assert cache.get(f"{0:040x}") is not None
+        for i in range(5, 12):
+            cache.set(f"{i:040x}", b'x' * 900)
+            time.sleep(0.01)
+        assert sum(size for _, size, _ in cache.entries()) <= 10_000
+        # Entrée relue récemment conservée, plus anciennes entrées non relues évincées
+        assert cache.get(f"{0:040x}") is not None
+        assert cache.get(f"{1:040x}") is None
+        # Entrée trop grosse ignorée
+        cache.set('f' * 40, b'x' * 5000)
+        assert cache.get('f' * 40) is None
+    
+    def test_redis_backend_with_local_server(self):
+        """Test du stockage Redis avec un serveur local, puis serveur arrêté"""
+        from shared_cache import RedisCache, SharedCache, shared_memoize, use_shared_cache, current_shared_cache
+        
+        server, store = self.serve_resp()
+        url = f"redis://127.0.0.1:{server.server_address[1]}/1"
+        calls = []
+        
+        @shared_memoize(name='describe')
+        def describe(category):
+            calls.append(category)
+            return {'category': category, 'length': len(category)}
+        
+        previous = current_shared_cache()
+        replica_a, replica_b = SharedCache(RedisCache(url), "secret"), SharedCache(RedisCache(url), "secret")
+        try:
+            use_shared_cache(replica_a)
+            assert describe('Watches') == {'category': 'Watches', 'length': 7}
+            use_shared_cache(replica_b)
+            assert describe('Watches') == {'category': 'Watches', 'length': 7}
+            assert calls == ['Watches'] and len(store) == 1
+            assert all(key.startswith(b'clip-cache:') for key in store)
+        
+            server.shutdown()
+            server.server_close()
+            replica_b.backend.client.close()
+            # Serveur injoignable : calcul direct, erreur comptée, stockage suspendu
+            assert describe('Baby Care')['length'] == 9
+            assert replica_b.stats.snapshot()['describe']['errors'] == 1
+            assert not replica_b.enabled
+        finally:
+            use_shared_cache(previous)
+    
+    def test_prediction_memo_shared(self, tmp_path):
+        """Test qu'une prédiction mémorisée par un réplica est retrouvée par un autre"""
+        from image_hashing import PredictionMemo
+        from shared_cache import DiskCache, SharedCache, use_shared_cache, current_shared_cache
+        
+        previous = current_shared_cache()
+        try:
+            use_shared_cache(SharedCache(DiskCache(str(tmp_path / "cache")), "secret"))
+            PredictionMemo().add((1 << 63, 12345), "description", {'predicted_category': 'Watches'})
+            assert PredictionMemo().find((1 << 63, 12345), "description") == {'predicted_category': 'Watches'}
+            assert PredictionMemo().find((1 << 63, 12345), "autre description") is None
+        finally:
+            use_shared_cache(previous)
+
+
+class TestClipText:
+    """Tests de la troncature du texte au contexte de CLIP"""
+    
+    def test_bpe_tokenizer_with_vocabulary(self, tmp_path):
+        """Test du découpage BPE avec un petit vocabulaire au format de CLIP"""
+        import gzip
+        from clip_text import ClipTokenizer, get_tokenizer, ApproximateTokenizer
+        
+        vocab_path = str(tmp_path / "bpe.txt.gz")
+        with gzip.open(vocab_path, 'wt', encoding='utf-8') as f:
+            f.write("#version: 0.2\nw a\nwa t\nc h</w>\nwat ch</w>\n")
+        tokenizer = ClipTokenizer.load(vocab_path)
+        assert tokenizer.count("Watch") == 1
+        assert tokenizer.count("wax") == 2
+        assert tokenizer.encode("watch, 12") == [tokenizer.encoder['watch</w>'], tokenizer.encoder[',</w>'],
+                                                  tokenizer.encoder['1</w>'], tokenizer.encoder['2</w>']]
+        assert len(tokenizer.encoder) == 512 + 4 + 2
+        assert isinstance(get_tokenizer(str(tmp_path / "absent.txt.gz")), ApproximateTokenizer)
+    
+    def test_fields_fit_in_context_by_importance(self):
+        """Test que les champs importants sont gardés et les autres coupés entre deux mots"""
+        from clip_text import ApproximateTokenizer, fit_fields
+        
+        tokenizer = ApproximateTokenizer()
+        fields = {'product_name': "Escort Analog Watch", 'brand': "Escort",
+                  'description': " ".join(f"word{i}" for i in range(200)),
+                  'specifications': "Type: Analog; Strap: Leather"}
+        fitted = fit_fields(fields, tokenizer, context_length=77)
+        assert fitted['tokens'] <= 75
+        assert fitted['text'].startswith("Escort Analog Watch word0 word1 ")
+        assert fitted['text'].endswith("Type: Analog; Strap: Leather")
+        kept = {field['name']: field for field in fitted['fields']}
+        # Marque déjà présente dans le nom : non répétée
+        assert kept['brand']['kept'] == "" and kept['brand']['dropped'] == "Escort"
+        assert kept['description']['dropped'].endswith("word199")
+        assert kept['description']['kept'].split()[-1] != kept['description']['dropped'].split()[0]
+        
+        untruncated = fit_fields(fields, tokenizer, context_length=0)
+        assert untruncated['text'].count("word") == 200
+    
+    def test_model_input_matches_description_when_short(self):
+        """Test qu'un texte court est envoyé tel que construit par build_description"""
+        from catalog_predictions import build_description, model_input
+        from clip_text import ApproximateTokenizer
+        
+        fields = ("Baby Blanket", "Brand not specified", "Soft cotton blanket.", "Pack of 2")
+        assert model_input(*fields, ApproximateTokenizer())['text'] == build_description(*fields)
+
+
+class TestWorkerPool:
+    """Tests du pool de prétraitement partagé"""
+    
+    def test_interactive_tasks_run_before_bulk(self):
+        """Test de l'ordre des priorités avec un seul thread occupé"""
+        import threading
+        from worker_pool import WorkerPool, INTERACTIVE, DISPLAY, BULK
+        
+        pool = WorkerPool(workers=1, max_pending=10)
+        release = threading.Event()
+        order = []
+        try:
+            blocker = pool.submit(release.wait, 5)
+            futures = [pool.submit(order.append, 'bulk', priority=BULK),
+                       pool.submit(order.append, 'display', priority=DISPLAY),
+                       pool.submit(order.append, 'interactive', priority=INTERACTIVE)]
+            assert pool.metrics()['priorities']['bulk']['queued'] == 1
+            release.set()
+            for future in [blocker] + futures:
+                future.result(timeout=5)
+            assert order == ['interactive', 'display', 'bulk']
+            metrics = pool.metrics()
+            assert metrics['queued'] == 0
+            assert metrics['priorities']['interactive']['completed'] == 2
+            assert metrics['priorities']['bulk']['wait_p50_ms'] is not None
+        finally:
+            release.set()
+            pool.stop()
+    
+    def test_backpressure_rejects_bulk_but_accepts_interactive(self):
+        """Test de la contre-pression : lots refusés, marge pour les tâches interactives"""
+        import threading
+        from worker_pool import WorkerPool, PoolSaturated, INTERACTIVE, BULK
+        
+        pool = WorkerPool(workers=1, max_pending=2)
+        release = threading.Event()
+        try:
+            pool.submit(release.wait, 5)
+            pool.submit(release.wait, 5, priority=BULK)
+            pool.submit(release.wait, 5, priority=BULK)
+            with pytest.raises(PoolSaturated):
+                pool.submit(len, [], priority=BULK, timeout=0.05)
+            interactive = pool.submit(len, [1, 2], priority=INTERACTIVE, timeout=0.05)
+            assert pool.metrics()['priorities']['bulk']['rejected'] == 1
+            release.set()
+            assert interactive.result(timeout=5) == 2
+        finally:
+            release.set()
+            pool.stop()
+    
+    def test_run_map_and_errors(self):
+        """Test de l'exécution synchrone, de l'ordre de map et de la propagation des erreurs"""
+        from worker_pool import WorkerPool
+        
+        pool = WorkerPool(workers=3, max_pending=4)
+        try:
+            assert pool.run(sum, [1, 2, 3]) == 6
+            # Tâche imbriquée : exécutée directement par le thread du pool
+            assert pool.run(lambda: pool.run(abs, -4)) == 4
+            assert [f.result(timeout=5) for f in pool.map(lambda x: x * x, range(10))] == [x * x for x in range(10)]
+            with pytest.raises(ZeroDivisionError):
+                pool.run(lambda: 1 / 0)
+        finally:
+            pool.stop()
+    
+    def test_reserved_worker_serves_interactive_tasks(self):
+        """Test du thread réservé : une tâche interactive passe pendant que les lots occupent le pool"""
+        import threading
+        from worker_pool import WorkerPool, BULK, get_worker_pool
+        
+        pool = WorkerPool(workers=2, max_pending=10)
+        release = threading.Event()
+        try:
+            bulk = pool.map(lambda _: release.wait(5), range(4), priority=BULK)
+            assert pool.run(len, "abc", timeout=1) == 3
+            assert pool.metrics()['priorities']['bulk']['queued'] == 3
+            release.set()
+            assert all(f.result(timeout=5) for f in bulk)
+        finally:
+            release.set()
+            pool.stop()
+        assert get_worker_pool(2, 8) is get_worker_pool(2, 8)
+    
+    def test_submit_timeout_surfaces_saturation(self):
+        """Test du délai de soumission du pool : run_in_pool lève PoolSaturated au lieu d'attendre sans fin"""
+        import os
+        import time
+        import threading
+        from worker_pool import (WorkerPool, PoolSaturated, BULK, available_cpus, use_worker_pool, run_in_pool,
+                                 get_worker_pool)
+        
+        pool = use_worker_pool(WorkerPool(workers=1, max_pending=1, submit_timeout=0.05))
+        release = threading.Event()
+        try:
+            pool.submit(release.wait, 5)
+            while pool.metrics()['running'] == 0:
+                time.sleep(0.01)
+            pool.submit(release.wait, 5, priority=BULK)
+            pool.submit(release.wait, 5)
+            with pytest.raises(PoolSaturated):
+                run_in_pool(len, [])
+            assert pool.metrics()['priorities']['interactive']['rejected'] == 1
+        finally:
+            release.set()
+            use_worker_pool(None)
+            pool.stop()
+        assert get_worker_pool(2, 8, 1.0) is not get_worker_pool(2, 8, 2.0)
+        if hasattr(os, 'sched_getaffinity'):
+            assert available_cpus() == len(os.sched_getaffinity(0))
+    
+    def test_configure_from_environment(self, monkeypatch):
+        """Test de la configuration commune aux pages, sans section [images] dans les secrets"""
+        from worker_pool import configure_from_secrets, current_worker_pool, use_worker_pool
+        
+        monkeypatch.setenv("PREPROCESS_WORKERS", "3")
+        monkeypatch.setenv("PREPROCESS_MAX_PENDING", "7")
+        monkeypatch.setenv("PREPROCESS_SUBMIT_TIMEOUT", "2.5")
+        try:
+            pool = configure_from_secrets()
+            assert current_worker_pool() is pool
+            assert (pool.workers, pool.max_pending, pool.submit_timeout) == (3, 7, 2.5)
+        finally:
+            use_worker_pool(None)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
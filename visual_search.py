@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Recherche de produits visuellement similaires, sans appel au serveur de modèle
+
+Chaque image du catalogue est décrite par un vecteur float32 calculé sur CPU
+(histogramme de couleurs + vignette en niveaux de gris), normalisé pour que le
+produit scalaire soit une similarité cosinus. Les k plus proches voisins sont
+obtenus par un produit matrice-vecteur NumPy et np.argpartition ; au-delà de
+quelques dizaines de milliers d'images, un index grossier (k-means, listes
+inversées) limite le calcul aux listes les plus proches de la requête.
+
+Usage :
+    python visual_search.py --csv produits_original.csv --images Images --output visual_features.npz
+    python visual_search.py --benchmark 100000
+"""
+
+import os
+import time
+import argparse
+import threading
+
+import numpy as np
+import streamlit as st
+from PIL import Image
+
+from catalog import CATALOG_CSV_PATH, IMAGES_DIR, read_catalog, manifest_fingerprint, content_fingerprint
+
+DEFAULT_FEATURES_PATH = 'visual_features.npz'
+
+# Version du format : l'incrémenter à chaque changement des descripteurs
+FEATURES_VERSION = 1
+
+# Histogramme RGB : nombre d'intervalles par canal (4 x 4 x 4 = 64 cases)
+COLOR_BINS = 4
+
+# Côté de la vignette en niveaux de gris (12 x 12 = 144 valeurs)
+GRAY_SIZE = 12
+
+# Poids relatif de la couleur et de la forme dans le vecteur final
+COLOR_WEIGHT = 0.6
+GRAY_WEIGHT = 0.4
+
+FEATURE_DIM = COLOR_BINS ** 3 + GRAY_SIZE ** 2
+
+# Taille de catalogue à partir de laquelle l'index grossier est construit
+COARSE_INDEX_MIN_SIZE = 20000
+
+# Listes inversées explorées par requête dans l'index grossier
+DEFAULT_NPROBE = 8
+
+
+def image_features(image):
+    """
+    Descripteur visuel d'une image
+
+    Args:
+        image: Image PIL, chemin ou objet fichier
+
+    Returns:
+        np.ndarray: Vecteur float32 de norme 1 (FEATURE_DIM valeurs)
+    """
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as img:
+            return image_features(img)
+
+    # draft() laisse le décodeur JPEG réduire l'image dès la décompression
+    image.draft('RGB', (128, 128))
+    small = image.convert('RGB').resize((64, 64), Image.BILINEAR)
+
+    # Histogramme de couleurs (racine carrée : distance de Hellinger via le cosinus)
+    rgb = np.asarray(small, dtype=np.uint8).reshape(-1, 3) // (256 // COLOR_BINS)
+    bins = (rgb[:, 0].astype(np.int32) * COLOR_BINS + rgb[:, 1]) * COLOR_BINS + rgb[:, 2]
+    color = np.sqrt(np.bincount(bins, minlength=COLOR_BINS ** 3) / len(bins))
+
+    # Vignette en niveaux de gris centrée (forme générale, insensible à la luminosité)
+    gray = np.asarray(small.convert('L').resize((GRAY_SIZE, GRAY_SIZE), Image.BILINEAR), dtype=np.float32).ravel()
+    gray -= gray.mean()
+    gray_norm = np.linalg.norm(gray)
+    if gray_norm > 0:
+        gray /= gray_norm
+
+    vector = np.concatenate([COLOR_WEIGHT * color / max(np.linalg.norm(color), 1e-12), GRAY_WEIGHT * gray])
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def _normalize_rows(matrix):
+    """Normalise chaque ligne à une norme 1 (les lignes nulles restent nulles)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Positions des k meilleurs scores, du meilleur au moins bon (argpartition puis tri de k valeurs)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def kmeans(features, n_clusters, iterations=10, sample_size=50000, seed=0):
+    """
+    k-means sphérique (centroïdes normalisés) sur un échantillon des descripteurs
+
+    Returns:
+        np.ndarray: Centroïdes float32 (n_clusters x FEATURE_DIM)
+    """
+    rng = np.random.default_rng(seed)
+    sample = features[rng.choice(len(features), min(sample_size, len(features)), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = np.bincount(assignments, minlength=n_clusters) == 0
+        # Une liste vide reçoit un point tiré au hasard
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize_rows(sums).astype(np.float32)
+    return centroids
+
+
+class VisualIndex:
+    """Descripteurs visuels du catalogue et recherche des plus proches voisins"""
+
+    def __init__(self, ids, features, fingerprint=None, centroids=None, content_hash=None):
+        self.ids = np.asarray(ids, dtype=str)
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        # Empreinte de validation (manifest_fingerprint) et empreinte de contenu complète (construction hors ligne)
+        self.fingerprint = fingerprint
+        self.content_hash = content_hash
+        self.centroids = None
+        self._lists = None
+        self._lock = threading.Lock()
+        if centroids is not None:
+            self._set_centroids(np.asarray(centroids, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def has_coarse_index(self):
+        return self.centroids is not None
+
+    def _set_centroids(self, centroids):
+        """Affecte chaque descripteur à son centroïde et construit les listes inversées"""
+        assignments = np.empty(len(self.features), dtype=np.int32)
+        for start in range(0, len(self.features), 65536):
+            block = self.features[start:start + 65536]
+            assignments[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.centroids = centroids
+        self._lists = (order, offsets)
+
+    def build_coarse_index(self, n_clusters=None, seed=0):
+        """Construit l'index grossier (environ sqrt(N) listes inversées)"""
+        n_clusters = n_clusters or max(1, int(np.sqrt(len(self))))
+        with self._lock:
+            self._set_centroids(kmeans(self.features, min(n_clusters, len(self)), seed=seed))
+
+    @classmethod
+    def build(cls, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR):
+        """Calcule les descripteurs de toutes les images référencées par le catalogue"""
+        catalog = read_catalog(csv_path, columns=['uniq_id', 'image'])
+        ids, features = [], []
+        for uniq_id, image in zip(catalog['uniq_id'], catalog['image']):
+            if not isinstance(image, str):
+                continue
+            try:
+                features.append(image_features(os.path.join(images_dir, image)))
+            except Exception:
+                continue
+            ids.append(uniq_id)
+        index = cls(ids, np.array(features, dtype=np.float32).reshape(-1, FEATURE_DIM),
+                    manifest_fingerprint(csv_path, images_dir))
+        if len(index) >= COARSE_INDEX_MIN_SIZE:
+            index.build_coarse_index()
+        return index
+
+    def save(self, path=DEFAULT_FEATURES_PATH):
+        """Écrit l'index (.npz compressé, descripteurs en float16) de façon atomique"""
+        tmp_path = path + ".tmp.npz"
+        arrays = {'version': FEATURES_VERSION, 'fingerprint': self.fingerprint or '',
+                  'content_fingerprint': self.content_hash or '', 'ids': self.ids,
+                  'features': self.features.astype(np.float16)}
+        if self.centroids is not None:
+            arrays['centroids'] = self.centroids
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_FEATURES_PATH, expected_fingerprint=None):
+        """
+        Charge un index s'il est utilisable
+
+        Returns:
+            VisualIndex: Index, ou None s'il est absent, illisible, d'une autre version ou périmé
+        """
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != FEATURES_VERSION:
+                    return None
+                fingerprint = str(data['fingerprint'])
+                if expected_fingerprint is not None and fingerprint != expected_fingerprint:
+                    return None
+                centroids = data['centroids'] if 'centroids' in data.files else None
+                # Les calculs se font en float32, le float16 ne sert qu'au stockage
+                return cls(data['ids'], _normalize_rows(data['features'].astype(np.float32)), fingerprint, centroids,
+                           str(data['content_fingerprint']) or None)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def search(self, query, k=5, exclude=None, nprobe=DEFAULT_NPROBE):
+        """
+        Produits du catalogue les plus similaires à un descripteur
+
+        Args:
+            query: Descripteur (voir image_features)
+            k: Nombre de voisins
+            exclude: uniq_id à écarter (produit de la requête lui-même)
+            nprobe: Listes inversées explorées si l'index grossier existe
+
+        Returns:
+            list[dict]: uniq_id, similarity (cosinus), du plus similaire au moins similaire
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if len(self) == 0:
+            return []
+        if self.centroids is not None:
+            order, offsets = self._lists
+            probes = top_k(self.centroids @ query, nprobe)
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+        else:
+            candidates = None
+
+        vectors = self.features if candidates is None else self.features[candidates]
+        scores = vectors @ query
+        # Un voisin de plus pour compenser l'éventuelle exclusion
+        best = top_k(scores, k + (exclude is not None))
+        positions = best if candidates is None else candidates[best]
+
+        results = []
+        for position, score in zip(positions, scores[best]):
+            uniq_id = str(self.ids[position])
+            if uniq_id != exclude:
+                results.append({'uniq_id': uniq_id, 'similarity': float(score)})
+        return results[:k]
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_shared_visual_index(fingerprint, path=DEFAULT_FEATURES_PATH, csv_path=CATALOG_CSV_PATH, images_dir=IMAGES_DIR):
+    """
+    Index visuel partagé par toutes les sessions du processus
+
+    Args:
+        fingerprint: Empreinte légère (dataset_fingerprint) des données et de l'index, clé de rechargement
+        path: Fichier de descripteurs pré-calculé
+        csv_path: Chemin du CSV des produits
+        images_dir: Répertoire des images
+
+    Returns:
+        VisualIndex: Index, ou None s'il est absent ou périmé
+    """
+    return VisualIndex.load(path, expected_fingerprint=manifest_fingerprint(csv_path, images_dir))
+
+
+def benchmark(size, k=5, queries=50, seed=0):
+    """Temps moyen d'une requête top-k (exacte et index grossier) sur un catalogue synthétique"""
+    rng = np.random.default_rng(seed)
+    # Descripteurs groupés autour de "familles" de produits, comme dans un vrai catalogue
+    centers = rng.random((max(1, size // 200), FEATURE_DIM), dtype=np.float32)
+    features = centers[rng.integers(0, len(centers), size)]
+    features = _normalize_rows(features + 0.15 * rng.standard_normal((size, FEATURE_DIM), dtype=np.float32))
+    index = VisualIndex(np.arange(size).astype(str), features)
+    query_vectors = features[rng.choice(size, queries, replace=False)]
+
+    start = time.perf_counter()
+    exact = [index.search(q, k) for q in query_vectors]
+    exact_ms = (time.perf_counter() - start) / queries * 1000
+
+    start = time.perf_counter()
+    index.build_coarse_index()
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx = [index.search(q, k) for q in query_vectors]
+    coarse_ms = (time.perf_counter() - start) / queries * 1000
+
+    recall = np.mean([len({r['uniq_id'] for r in a} & {r['uniq_id'] for r in e}) / k for a, e in zip(approx, exact)])
+    return {'exact_ms': exact_ms, 'coarse_ms': coarse_ms, 'coarse_build_s': build_s, 'recall': float(recall)}
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Construit les descripteurs visuels des images du catalogue")
+    parser.add_argument('--csv', default=CATALOG_CSV_PATH, help="CSV des produits")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Répertoire des images")
+    parser.add_argument('--output', default=DEFAULT_FEATURES_PATH, help="Fichier de descripteurs à écrire")
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help="Mesure le temps de requête sur N descripteurs synthétiques au lieu de construire l'index")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        result = benchmark(args.benchmark)
+        print(f"⏱️ {args.benchmark} images : exact {result['exact_ms']:.2f} ms/requête, "
+              f"index grossier {result['coarse_ms']:.2f} ms/requête "
+              f"(construction {result['coarse_build_s']:.1f}s, rappel@5 {result['recall']:.2f})")
+        return
+
+    start = time.perf_counter()
+    index = VisualIndex.build(args.csv, args.images)
+    index.content_hash = content_fingerprint(args.csv, args.images)
+    index.save(args.output)
+    print(f"✅ Descripteurs écrits : {args.output} ({os.path.getsize(args.output) / 1024:.1f} Ko, "
+          f"{len(index)} images, {time.perf_counter() - start:.1f}s"
+          f"{', index grossier' if index.has_coarse_index else ''})")
+
+
+if __name__ == "__main__":
+    main()
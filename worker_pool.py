@@ -0,0 +1,270 @@
+"""
+Pool de prétraitement des images partagé par toutes les sessions du processus
+
+Décodage, redimensionnement LANCZOS et encodage JPEG s'exécutaient dans le
+thread de la session qui les demandait, sans limite : cinquante uploads
+simultanés se partageaient les cœurs et ralentissaient tout le monde. Ils passent
+désormais par un pool unique de threads, dimensionné au nombre de cœurs (Pillow
+libère le GIL pendant le décodage, le redimensionnement et l'encodage).
+
+- Priorités : les prédictions interactives passent avant les dérivés
+  d'affichage, eux-mêmes avant les traitements par lots ; un thread (si le pool
+  en a plusieurs) est réservé aux tâches non groupées.
+- Contre-pression : au-delà de max_pending tâches en attente, une soumission par
+  lots ou d'affichage attend qu'une place se libère, au plus submit_timeout
+  secondes, puis lève PoolSaturated ; les tâches interactives disposent d'une
+  marge du double.
+- Métriques : profondeur de la file par priorité, tâches en cours, terminées et
+  refusées, temps d'attente (médiane et 95e centile) par priorité.
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+import collections
+from concurrent.futures import Future
+
+INTERACTIVE = 0
+DISPLAY = 1
+BULK = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', DISPLAY: 'display', BULK: 'bulk'}
+
+
+
+def available_cpus():
+    """Cœurs utilisables par le processus (affinité CPU, limites du conteneur), sinon tous les cœurs"""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+DEFAULT_WORKERS = available_cpus()
+
+# Tâches en attente au-delà desquelles les soumissions attendent (par lots et affichage)
+DEFAULT_MAX_PENDING = 4 * DEFAULT_WORKERS
+
+# Attente maximale d'une place dans la file avant PoolSaturated (secondes, None = sans limite)
+DEFAULT_SUBMIT_TIMEOUT = 10.0
+
+# Temps d'attente conservés par priorité pour les centiles
+WAIT_SAMPLES = 256
+
+
+class PoolSaturated(RuntimeError):
+    """File du pool pleine au-delà du délai de soumission"""
+
+
+class WorkerPool:
+    """Pool de threads à file de priorité bornée"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, name="preprocess",
+                 submit_timeout=DEFAULT_SUBMIT_TIMEOUT):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.submit_timeout = submit_timeout
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopped = False
+        self._local = threading.local()
+        self._running = 0
+        self._completed = collections.Counter()
+        self._rejected = collections.Counter()
+        self._queued = collections.Counter()
+        self._peak_queued = 0
+        self._waits = {priority: collections.deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+
+    def _limit(self, priority):
+        return 2 * self.max_pending if priority == INTERACTIVE else self.max_pending
+
+    def _start(self):
+        # Threads démarrés à la première soumission ; le premier est réservé aux tâches non groupées
+        for position in range(self.workers):
+            reserved = position == 0 and self.workers > 1
+            thread = threading.Thread(target=self._run, args=(reserved,), name=f"{self.name}-{position}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, priority=INTERACTIVE, timeout=None, **kwargs):
+        """
+        Soumet une tâche
+
+        Args:
+            priority: INTERACTIVE, DISPLAY ou BULK
+            timeout: Attente maximale d'une place dans la file (None = submit_timeout du pool)
+
+        Returns:
+            Future: Résultat de fn(*args, **kwargs)
+
+        Raises:
+            PoolSaturated: File pleine après timeout secondes
+        """
+        future = Future()
+        timeout = self.submit_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Pool arrêté")
+            if not self._threads:
+                self._start()
+            while len(self._heap) >= self._limit(priority):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._rejected[priority] += 1
+                    raise PoolSaturated(f"File de prétraitement pleine ({len(self._heap)} tâches en attente)")
+                self._condition.wait(remaining)
+            heapq.heappush(self._heap, (priority, next(self._sequence), time.monotonic(), future, fn, args, kwargs))
+            self._queued[priority] += 1
+            self._peak_queued = max(self._peak_queued, len(self._heap))
+            self._condition.notify_all()
+        return future
+
+    def run(self, fn, *args, priority=INTERACTIVE, timeout=None, **kwargs):
+        """Exécute une tâche dans le pool et attend son résultat (directement si appelé depuis le pool)"""
+        if getattr(self._local, 'worker', False):
+            # Tâche imbriquée : l'attendre depuis un thread du pool pourrait bloquer le pool entier
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, timeout=timeout, **kwargs).result()
+
+    def map(self, fn, items, priority=BULK, timeout=None):
+        """
+        Applique fn à chaque élément dans le pool
+
+        Returns:
+            list[Future]: Dans l'ordre des éléments (les soumissions attendent si la file est pleine)
+        """
+        return [self.submit(fn, item, priority=priority, timeout=timeout) for item in items]
+
+    def _next_task(self, reserved):
+        with self._condition:
+            while not self._stopped and not (self._heap and (not reserved or self._heap[0][0] != BULK)):
+                self._condition.wait()
+            if self._stopped:
+                return None
+            task = heapq.heappop(self._heap)
+            self._queued[task[0]] -= 1
+            self._running += 1
+            # Une place libérée dans la file : réveiller les soumissions en attente
+            self._condition.notify_all()
+            return task
+
+    def _run(self, reserved):
+        self._local.worker = True
+        while True:
+            task = self._next_task(reserved)
+            if task is None:
+                return
+            priority, _, queued_at, future, fn, args, kwargs = task
+            self._waits[priority].append(time.monotonic() - queued_at)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._condition:
+                self._running -= 1
+                self._completed[priority] += 1
+
+    def stop(self):
+        """Arrête les threads (les tâches en attente sont annulées)"""
+        with self._condition:
+            self._stopped = True
+            pending, self._heap = self._heap, []
+            self._condition.notify_all()
+        for task in pending:
+            task[3].cancel()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def metrics(self):
+        """
+        État du pool
+
+        Returns:
+            dict: workers, max_pending, submit_timeout, queued, running, peak_queued et, par priorité :
+                  queued, completed, rejected, wait_p50_ms, wait_p95_ms
+        """
+        with self._condition:
+            by_priority = {}
+            for priority, label in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                by_priority[label] = {
+                    'queued': self._queued[priority],
+                    'completed': self._completed[priority],
+                    'rejected': self._rejected[priority],
+                    'wait_p50_ms': 1000 * waits[len(waits) // 2] if waits else None,
+                    'wait_p95_ms': 1000 * waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else None,
+                }
+            return {'workers': self.workers, 'max_pending': self.max_pending,
+                    'submit_timeout': self.submit_timeout, 'queued': len(self._heap),
+                    'running': self._running, 'peak_queued': self._peak_queued, 'priorities': by_priority}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Pool courant du processus (choisi par les pages, voir use_worker_pool)
+_worker_pool = None
+
+
+def get_worker_pool(workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, submit_timeout=DEFAULT_SUBMIT_TIMEOUT):
+    """Pool unique par configuration, partagé par toutes les sessions du processus"""
+    key = (int(workers), int(max_pending), submit_timeout)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = WorkerPool(workers, max_pending, submit_timeout=submit_timeout)
+        return _pools[key]
+
+
+def use_worker_pool(pool):
+    """Pool utilisé par run_in_pool dans tout le processus"""
+    global _worker_pool
+    _worker_pool = pool
+    return pool
+
+
+def _setting(name, env_var, default):
+    """Réglage de la section [images] des secrets, sinon variable d'environnement"""
+    # Import local : le pool sert aussi hors Streamlit (scripts de construction hors ligne)
+    import streamlit as st
+    try:
+        return st.secrets["images"][name]
+    except (KeyError, FileNotFoundError):
+        return os.environ.get(env_var, default)
+
+
+def configure_from_secrets():
+    """
+    Choisit le pool courant d'après la section [images] des secrets
+
+    Variables d'environnement de repli : PREPROCESS_WORKERS, PREPROCESS_MAX_PENDING
+    et PREPROCESS_SUBMIT_TIMEOUT.
+
+    Returns:
+        WorkerPool: Pool utilisé par run_in_pool (voir use_worker_pool)
+    """
+    return use_worker_pool(get_worker_pool(
+        int(_setting('preprocess_workers', 'PREPROCESS_WORKERS', DEFAULT_WORKERS)),
+        int(_setting('preprocess_max_pending', 'PREPROCESS_MAX_PENDING', DEFAULT_MAX_PENDING)),
+        float(_setting('preprocess_submit_timeout', 'PREPROCESS_SUBMIT_TIMEOUT', DEFAULT_SUBMIT_TIMEOUT)),
+    ))
+
+
+def current_worker_pool():
+    """Pool courant (configuration par défaut si aucune page ne l'a choisi)"""
+    return _worker_pool if _worker_pool is not None else get_worker_pool()
+
+
+def run_in_pool(fn, *args, priority=INTERACTIVE, **kwargs):
+    """
+    Exécute fn dans le pool courant et renvoie son résultat (exceptions comprises)
+
+    Raises:
+        PoolSaturated: File pleine au-delà du submit_timeout du pool
+    """
+    return current_worker_pool().run(fn, *args, priority=priority, **kwargs)